@@ -39,8 +39,9 @@ class HypervisorsController(wsgi.Controller):
         super(HypervisorsController, self).__init__()
 
     def _view_hypervisor(self, hypervisor, service, detail, servers=None,
-                         **kwargs):
-        alive = self.servicegroup_api.service_is_up(service)
+                         alive=None, **kwargs):
+        if alive is None:
+            alive = self.servicegroup_api.service_is_up(service)
         hyp_dict = {
             'id': hypervisor.id,
             'hypervisor_hostname': hypervisor.hypervisor_hostname,
@@ -74,18 +75,23 @@ class HypervisorsController(wsgi.Controller):
 
         return hyp_dict
 
+    def _view_hypervisors(self, context, compute_nodes, detail):
+        services = [self.host_api.service_get_by_compute_host(context,
+                                                              hyp.host)
+                    for hyp in compute_nodes]
+        up_service_ids = self.servicegroup_api.get_up_services(services)
+        return [self._view_hypervisor(hyp, service, detail,
+                                      alive=service.id in up_service_ids)
+                for hyp, service in zip(compute_nodes, services)]
+
     @extensions.expected_errors(())
     def index(self, req):
         context = req.environ['nova.context']
         authorize(context)
         compute_nodes = self.host_api.compute_node_get_all(context)
         req.cache_db_compute_nodes(compute_nodes)
-        return dict(hypervisors=[self._view_hypervisor(
-                                 hyp,
-                                 self.host_api.service_get_by_compute_host(
-                                     context, hyp.host),
-                                 False)
-                                 for hyp in compute_nodes])
+        return dict(hypervisors=self._view_hypervisors(context, compute_nodes,
+                                                       False))
 
     @extensions.expected_errors(())
     def detail(self, req):
@@ -93,12 +99,8 @@ class HypervisorsController(wsgi.Controller):
         authorize(context)
         compute_nodes = self.host_api.compute_node_get_all(context)
         req.cache_db_compute_nodes(compute_nodes)
-        return dict(hypervisors=[self._view_hypervisor(
-                                 hyp,
-                                 self.host_api.service_get_by_compute_host(
-                                     context, hyp.host),
-                                 True)
-                                 for hyp in compute_nodes])
+        return dict(hypervisors=self._view_hypervisors(context, compute_nodes,
+                                                       True))
 
     @extensions.expected_errors(404)
     def show(self, req, id):
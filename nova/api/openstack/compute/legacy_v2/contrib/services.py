@@ -57,8 +57,9 @@ class ServiceController(object):
 
         return services
 
-    def _get_service_detail(self, svc, detailed):
-        alive = self.servicegroup_api.service_is_up(svc)
+    def _get_service_detail(self, svc, detailed, alive=None):
+        if alive is None:
+            alive = self.servicegroup_api.service_is_up(svc)
         state = (alive and "up") or "down"
         active = 'enabled'
         if svc['disabled']:
@@ -76,9 +77,11 @@ class ServiceController(object):
 
     def _get_services_list(self, req, detailed):
         services = self._get_services(req)
+        up_service_ids = self.servicegroup_api.get_up_services(services)
         svcs = []
         for svc in services:
-            svcs.append(self._get_service_detail(svc, detailed))
+            svcs.append(self._get_service_detail(
+                svc, detailed, alive=svc['id'] in up_service_ids))
 
         return svcs
 
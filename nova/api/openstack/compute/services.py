@@ -56,8 +56,9 @@ class ServiceController(wsgi.Controller):
 
         return _services
 
-    def _get_service_detail(self, svc, additional_fields):
-        alive = self.servicegroup_api.service_is_up(svc)
+    def _get_service_detail(self, svc, additional_fields, alive=None):
+        if alive is None:
+            alive = self.servicegroup_api.service_is_up(svc)
         state = (alive and "up") or "down"
         active = 'enabled'
         if svc['disabled']:
@@ -78,7 +79,9 @@ class ServiceController(wsgi.Controller):
 
     def _get_services_list(self, req, additional_fields=()):
         _services = self._get_services(req)
-        return [self._get_service_detail(svc, additional_fields)
+        up_service_ids = self.servicegroup_api.get_up_services(_services)
+        return [self._get_service_detail(svc, additional_fields,
+                                         alive=svc['id'] in up_service_ids)
                 for svc in _services]
 
     def _enable(self, body, context):
@@ -49,6 +49,7 @@ from oslo_service import periodic_task
 from oslo_utils import excutils
 from oslo_utils import strutils
 from oslo_utils import timeutils
+from oslo_utils import units
 import six
 from six.moves import range
 
@@ -141,7 +142,21 @@ compute_opts = [
     cfg.IntOpt('block_device_allocate_retries',
                default=60,
                help='Number of times to retry block device'
-                    ' allocation on failures')
+                    ' allocation on failures'),
+    cfg.IntOpt('image_precache_max_rate',
+               default=20,
+               min=0,
+               help='Maximum rate in MiB/s at which the images which the '
+                    'schedulers find popular are fetched into the image '
+                    'cache, ahead of the instances created from them. 0 '
+                    'means unlimited.'),
+    cfg.IntOpt('image_precache_disk_headroom_gb',
+               default=20,
+               min=0,
+               help='Disk space in GB which has to remain available on the '
+                    'compute nodes once a popular image is fetched into the '
+                    'image cache. Images are not fetched ahead of the '
+                    'instances if less disk space would remain.'),
     ]
 
 interval_opts = [
@@ -159,6 +174,14 @@ interval_opts = [
                default=60,
                help="Number of seconds between instance network information "
                     "cache updates"),
+    cfg.IntOpt("heal_instance_info_cache_batch_size",
+               default=1,
+               min=1,
+               max=1000,
+               help="Number of instances whose network information cache is "
+                    "updated on each run of the periodic task. Several "
+                    "instances are refreshed at once with bulk requests "
+                    "to the network service if it supports it"),
     cfg.IntOpt('reclaim_instance_interval',
                default=0,
                help='Interval in seconds for reclaiming deleted instances'),
@@ -187,10 +210,18 @@ interval_opts = [
     cfg.IntOpt('scheduler_instance_sync_interval',
                default=120,
                help='Waiting time interval (seconds) between sending the '
-                    'scheduler a list of current instance UUIDs to verify '
-                    'that its view of instances is in sync with nova. If the '
-                    'CONF option `scheduler_tracks_instance_changes` is '
-                    'False, changing this option will have no effect.'),
+                    'scheduler a digest of the current instance UUIDs to '
+                    'verify that its view of instances is in sync with nova. '
+                    'If the CONF option `scheduler_tracks_instance_changes` '
+                    'is False, changing this option will have no effect.'),
+    cfg.FloatOpt('scheduler_instance_update_window',
+                 default=0.0,
+                 help='Number of seconds over which the instances created, '
+                      'updated or deleted on this host are batched before '
+                      'being sent to the scheduler in a single message. 0 '
+                      'sends each change immediately. If the CONF option '
+                      '`scheduler_tracks_instance_changes` is False, '
+                      'changing this option will have no effect.'),
     cfg.IntOpt('update_resources_interval',
                default=0,
                help='Interval in seconds for updating compute resources. A '
@@ -261,6 +292,7 @@ CONF.import_opt('enabled', 'nova.vnc', group='vnc')
 CONF.import_opt('enabled', 'nova.spice', group='spice')
 CONF.import_opt('enable', 'nova.cells.opts', group='cells')
 CONF.import_opt('image_cache_manager_interval', 'nova.virt.imagecache')
+CONF.import_opt('force_raw_images', 'nova.virt.images')
 CONF.import_opt('enabled', 'nova.rdp', group='rdp')
 CONF.import_opt('html5_proxy_base_url', 'nova.rdp', group='rdp')
 CONF.import_opt('enabled', 'nova.mks', group='mks')
@@ -667,7 +699,7 @@ class ComputeVirtAPI(virtapi.VirtAPI):
 class ComputeManager(manager.Manager):
     """Manages the running instances from creation to destruction."""
 
-    target = messaging.Target(version='4.5')
+    target = messaging.Target(version='4.6')
 
     # How long to wait in seconds before re-issuing a shutdown
     # signal to an instance during power off.  The overall
@@ -698,6 +730,14 @@ class ComputeManager(manager.Manager):
         self._sync_power_pool = eventlet.GreenPool()
         self._syncs_in_progress = {}
         self.send_instance_updates = CONF.scheduler_tracks_instance_changes
+        # Instances created or updated, keyed by UUID, and UUIDs of the
+        # instances deleted, which have not been sent to the scheduler yet
+        self._pending_instance_updates = {}
+        self._pending_instance_deletes = set()
+        self._instance_updates_scheduled = False
+        # IDs of the images being fetched ahead of the instances
+        self._images_precaching = set()
+        self._precache_semaphore = eventlet.semaphore.Semaphore()
         if CONF.max_concurrent_builds != 0:
             self._build_semaphore = eventlet.semaphore.Semaphore(
                 CONF.max_concurrent_builds)
@@ -1763,6 +1803,11 @@ class ComputeManager(manager.Manager):
         if not self.send_instance_updates:
             return
         if isinstance(instance, obj_instance._BaseInstance):
+            if CONF.scheduler_instance_update_window > 0:
+                self._pending_instance_deletes.discard(instance.uuid)
+                self._pending_instance_updates[instance.uuid] = instance
+                self._schedule_scheduler_instance_info(context)
+                return
             instance = objects.InstanceList(objects=[instance])
         context = context.elevated()
         self.scheduler_client.update_instance_info(context, self.host,
@@ -1772,15 +1817,50 @@ class ComputeManager(manager.Manager):
         """Sends the uuid of the deleted Instance to the Scheduler client."""
         if not self.send_instance_updates:
             return
+        if CONF.scheduler_instance_update_window > 0:
+            self._pending_instance_updates.pop(instance_uuid, None)
+            self._pending_instance_deletes.add(instance_uuid)
+            self._schedule_scheduler_instance_info(context)
+            return
         context = context.elevated()
         self.scheduler_client.delete_instance_info(context, self.host,
                                                    instance_uuid)
 
+    def _schedule_scheduler_instance_info(self, context):
+        """Sends the pending instance changes to the Scheduler client at the
+        end of the update window, if they aren't already due to be sent.
+        """
+        if self._instance_updates_scheduled:
+            return
+        self._instance_updates_scheduled = True
+        greenthread.spawn_after(CONF.scheduler_instance_update_window,
+                                self._send_pending_scheduler_instance_info,
+                                context.elevated())
+
+    def _send_pending_scheduler_instance_info(self, context):
+        """Sends the instances created, updated or deleted since the last
+        batch to the Scheduler client in a single message.
+        """
+        self._instance_updates_scheduled = False
+        if not (self._pending_instance_updates or
+                self._pending_instance_deletes):
+            return
+        instances = objects.InstanceList(
+            objects=list(self._pending_instance_updates.values()))
+        deleted_uuids = list(self._pending_instance_deletes)
+        self._pending_instance_updates = {}
+        self._pending_instance_deletes = set()
+        self.scheduler_client.update_instance_info_batch(
+            context, self.host, instances, deleted_uuids)
+
     @periodic_task.periodic_task(spacing=CONF.scheduler_instance_sync_interval)
     def _sync_scheduler_instance_info(self, context):
         if not self.send_instance_updates:
             return
         context = context.elevated()
+        # Send the pending changes first, so that the scheduler's view of the
+        # instances is up to date when it checks it.
+        self._send_pending_scheduler_instance_info(context)
         instances = objects.InstanceList.get_by_host(context, self.host,
                                                      expected_attrs=[],
                                                      use_slave=True)
@@ -5492,12 +5572,13 @@ class ComputeManager(manager.Manager):
         spacing=CONF.heal_instance_info_cache_interval)
     def _heal_instance_info_cache(self, context):
         """Called periodically.  On every call, try to update the
-        info_cache's network information for another instance by
+        info_cache's network information for other instances by
         calling to the network manager.
 
         This is implemented by keeping a cache of uuids of instances
-        that live on this host.  On each call, we pop one off of a
-        list, pull the DB record, and try the call to the network API.
+        that live on this host.  On each call, we pop up to
+        heal_instance_info_cache_batch_size of them off of a list, pull
+        the DB records, and try the call to the network API.
         If anything errors don't fail, as it's possible the instance
         has been deleted, etc.
         """
@@ -5505,8 +5586,9 @@ class ComputeManager(manager.Manager):
         if not heal_interval:
             return
 
+        batch_size = CONF.heal_instance_info_cache_batch_size
         instance_uuids = getattr(self, '_instance_uuids_to_heal', [])
-        instance = None
+        instances = []
 
         LOG.debug('Starting heal instance info cache')
 
@@ -5529,41 +5611,37 @@ class ComputeManager(manager.Manager):
                               'because it is being deleted.', instance=inst)
                     continue
 
-                if not instance:
-                    # Save the first one we find so we don't
-                    # have to get it again
-                    instance = inst
+                if len(instances) < batch_size:
+                    # Save the first ones we find so we don't
+                    # have to get them again
+                    instances.append(inst)
                 else:
                     instance_uuids.append(inst['uuid'])
 
             self._instance_uuids_to_heal = instance_uuids
         else:
-            # Find the next valid instance on the list
-            while instance_uuids:
-                try:
-                    inst = objects.Instance.get_by_uuid(
-                            context, instance_uuids.pop(0),
-                            expected_attrs=['system_metadata', 'info_cache'],
-                            use_slave=True)
-                except exception.InstanceNotFound:
-                    # Instance is gone.  Try to grab another.
-                    continue
-
-                # Check the instance hasn't been migrated
-                if inst.host != self.host:
-                    LOG.debug('Skipping network cache update for instance '
-                              'because it has been migrated to another '
-                              'host.', instance=inst)
-                # Check the instance isn't being deleting
-                elif inst.task_state == task_states.DELETING:
-                    LOG.debug('Skipping network cache update for instance '
-                              'because it is being deleted.', instance=inst)
-                else:
-                    instance = inst
-                    break
+            # Find the next valid instances on the list
+            while instance_uuids and len(instances) < batch_size:
+                count = batch_size - len(instances)
+                uuids = instance_uuids[:count]
+                del instance_uuids[:count]
+                for inst in self._get_instances_to_heal(context, uuids):
+                    # Check the instance hasn't been migrated
+                    if inst.host != self.host:
+                        LOG.debug('Skipping network cache update for '
+                                  'instance because it has been migrated to '
+                                  'another host.', instance=inst)
+                    # Check the instance isn't being deleting
+                    elif inst.task_state == task_states.DELETING:
+                        LOG.debug('Skipping network cache update for '
+                                  'instance because it is being deleted.',
+                                  instance=inst)
+                    else:
+                        instances.append(inst)
 
-        if instance:
+        if len(instances) == 1:
             # We have an instance now to refresh
+            instance = instances[0]
             try:
                 # Call to network API to get instance info.. this will
                 # force an update to the instance's info_cache
@@ -5582,10 +5660,40 @@ class ComputeManager(manager.Manager):
             except Exception:
                 LOG.error(_LE('An error occurred while refreshing the network '
                               'cache.'), instance=instance, exc_info=True)
+        elif instances:
+            # Refresh the info caches of all the instances at once
+            try:
+                nw_infos = self.network_api.get_instances_nw_info(context,
+                                                                  instances)
+                LOG.debug('Updated the network info_cache for %(updated)d of '
+                          '%(total)d instances',
+                          {'updated': len(nw_infos),
+                           'total': len(instances)})
+            except Exception:
+                LOG.error(_LE('An error occurred while refreshing the network '
+                              'cache of %d instances.'), len(instances),
+                          exc_info=True)
         else:
             LOG.debug("Didn't find any instances for network info cache "
                       "update.")
 
+    def _get_instances_to_heal(self, context, instance_uuids):
+        """Returns the existing instances among instance_uuids, to refresh
+        their network info caches.
+        """
+        expected_attrs = ['system_metadata', 'info_cache']
+        if len(instance_uuids) > 1:
+            return objects.InstanceList.get_by_filters(
+                context, {'uuid': instance_uuids, 'deleted': False},
+                expected_attrs=expected_attrs, use_slave=True)
+        try:
+            return [objects.Instance.get_by_uuid(
+                context, instance_uuids[0], expected_attrs=expected_attrs,
+                use_slave=True)]
+        except exception.InstanceNotFound:
+            # Instance is gone.
+            return []
+
     @periodic_task.periodic_task
     def _poll_rebooting_instances(self, context):
         if CONF.reboot_timeout > 0:
@@ -5949,7 +6057,17 @@ class ComputeManager(manager.Manager):
                                                         expected_attrs=[],
                                                         use_slave=True)
 
-        num_vm_instances = self.driver.get_num_instances()
+        # If the driver reports the power states of all its instances at
+        # once, only the instances which are out of sync are processed
+        try:
+            vm_power_states = self.driver.get_power_states()
+        except NotImplementedError:
+            vm_power_states = None
+
+        if vm_power_states is None:
+            num_vm_instances = self.driver.get_num_instances()
+        else:
+            num_vm_instances = len(vm_power_states)
         num_db_instances = len(db_instances)
 
         if num_vm_instances != num_db_instances:
@@ -5981,6 +6099,12 @@ class ComputeManager(manager.Manager):
             # process syncs asynchronously - don't want instance locking to
             # block entire periodic task thread
             uuid = db_instance.uuid
+            if vm_power_states is not None:
+                vm_power_state = vm_power_states.get(uuid,
+                                                     power_state.NOSTATE)
+                if not self._power_state_needs_sync(db_instance,
+                                                    vm_power_state):
+                    continue
             if uuid in self._syncs_in_progress:
                 LOG.debug('Sync already in progress for %s' % uuid)
             else:
@@ -5988,6 +6112,32 @@ class ComputeManager(manager.Manager):
                 self._syncs_in_progress[uuid] = True
                 self._sync_power_pool.spawn_n(_sync, db_instance)
 
+    def _power_state_needs_sync(self, db_instance, vm_power_state):
+        """Returns whether _sync_instance_power_state has to process the
+        instance, given the power state reported by the hypervisor for it:
+        the instance has no pending task, and either its power state has to
+        be updated or its vm_state doesn't match that power state.
+        """
+        if db_instance.task_state is not None:
+            return False
+        if vm_power_state != db_instance.power_state:
+            return True
+
+        vm_state = db_instance.vm_state
+        if vm_state == vm_states.ACTIVE:
+            return vm_power_state != power_state.RUNNING
+        elif vm_state == vm_states.STOPPED:
+            return vm_power_state not in (power_state.NOSTATE,
+                                          power_state.SHUTDOWN,
+                                          power_state.CRASHED)
+        elif vm_state == vm_states.PAUSED:
+            return vm_power_state in (power_state.SHUTDOWN,
+                                      power_state.CRASHED)
+        elif vm_state in (vm_states.SOFT_DELETED, vm_states.DELETED):
+            return vm_power_state not in (power_state.NOSTATE,
+                                          power_state.SHUTDOWN)
+        return False
+
     def _query_driver_power_state_and_sync(self, context, db_instance):
         if db_instance.task_state is not None:
             LOG.info(_LI("During sync_power_state the instance has a "
@@ -6475,6 +6625,7 @@ class ComputeManager(manager.Manager):
                       instance=instance)
             if event.name == 'network-changed':
                 try:
+                    self.network_api.invalidate_network_cache(instance)
                     self.network_api.get_instance_nw_info(context, instance)
                 except exception.NotFound as e:
                     LOG.info(_LI('Failed to process external instance event '
@@ -6513,6 +6664,91 @@ class ComputeManager(manager.Manager):
 
         self.driver.manage_image_cache(context, filtered_instances)
 
+    @wrap_exception()
+    def precache_image(self, context, image_id):
+        """Fetch a popular image into the image cache in the background,
+        ahead of the instances which will be created from it.
+        """
+        if image_id in self._images_precaching:
+            return
+        if not context.auth_token:
+            # The image couldn't be fetched from glance
+            LOG.debug('Not caching image %s ahead of the instances, the '
+                      'request has no token', image_id)
+            return
+        self._images_precaching.add(image_id)
+        utils.spawn_n(self._precache_image, context.elevated(), image_id)
+
+    def _get_free_disk_gb(self):
+        """Returns the lowest disk space available on the compute nodes, as
+        last reported by their resource trackers, or None if unknown.
+        """
+        free_disk_gb = None
+        for rt in self._resource_tracker_dict.values():
+            compute_node = rt.compute_node
+            if compute_node is None or compute_node.free_disk_gb is None:
+                continue
+            node_free_disk_gb = compute_node.free_disk_gb
+            if compute_node.disk_available_least is not None:
+                node_free_disk_gb = min(node_free_disk_gb,
+                                        compute_node.disk_available_least)
+            if free_disk_gb is None or node_free_disk_gb < free_disk_gb:
+                free_disk_gb = node_free_disk_gb
+        return free_disk_gb
+
+    def _precache_image(self, context, image_id):
+        try:
+            # Images are fetched one at a time, not to compete for the
+            # bandwidth with each other
+            with self._precache_semaphore:
+                image_meta = self.image_api.get(context, image_id)
+                if not compute_utils.is_image_public(image_meta):
+                    LOG.debug('Not caching the private image %s ahead of '
+                              'the instances', image_id)
+                    return
+                image_size = image_meta.get('size') or 0
+                if (CONF.force_raw_images and
+                        image_meta.get('disk_format') != 'raw'):
+                    # The image is converted to raw once downloaded, which
+                    # takes as much disk as its virtual size
+                    image_size = max(image_size,
+                                     image_meta.get('virtual_size') or 0,
+                                     (image_meta.get('min_disk') or 0) *
+                                     units.Gi)
+                image_size_gb = float(image_size) / units.Gi
+                free_disk_gb = self._get_free_disk_gb()
+                if (free_disk_gb is None or free_disk_gb - image_size_gb <
+                        CONF.image_precache_disk_headroom_gb):
+                    LOG.info(_LI('Not caching image %(image_id)s ahead of '
+                                 'the instances, %(free)s GB of disk are '
+                                 'available'),
+                             {'image_id': image_id, 'free': free_disk_gb})
+                    return
+                # The virtual size is only known once the image is
+                # downloaded, the driver refuses to convert an image which
+                # would not leave the headroom
+                max_size = int((free_disk_gb -
+                                CONF.image_precache_disk_headroom_gb) *
+                               units.Gi)
+                max_rate = CONF.image_precache_max_rate * units.Mi or None
+                if self.driver.precache_image(context, image_id,
+                                              max_rate=max_rate,
+                                              max_size=max_size):
+                    LOG.info(_LI('Cached image %s ahead of the instances'),
+                             image_id)
+        except exception.FlavorDiskSmallerThanImage:
+            LOG.info(_LI('Not caching image %s ahead of the instances, its '
+                         'virtual size would not leave enough disk'),
+                     image_id)
+        except NotImplementedError:
+            LOG.debug('The driver does not cache images ahead of the '
+                      'instances')
+        except Exception:
+            LOG.exception(_LE('Failed to cache image %s ahead of the '
+                              'instances'), image_id)
+        finally:
+            self._images_precaching.discard(image_id)
+
     @periodic_task.periodic_task(spacing=CONF.instance_delete_interval)
     def _run_pending_deletes(self, context):
         """Retry any pending instance file deletes."""
@@ -6522,26 +6758,31 @@ class ComputeManager(manager.Manager):
                    'host': CONF.host,
                    'cleaned': False}
         attrs = ['info_cache', 'security_groups', 'system_metadata']
+        # The deleted instances pile up on the hosts whose files can't be
+        # deleted, so they are read one batch at a time
+        num_instances = 0
         with utils.temporary_mutation(context, read_deleted='yes'):
-            instances = objects.InstanceList.get_by_filters(
+            instances = objects.InstanceList.iter_by_filters(
                 context, filters, expected_attrs=attrs, use_slave=True)
-        LOG.debug('There are %d instances to clean', len(instances))
+            for instance in instances:
+                num_instances += 1
+                self._run_pending_delete(instance)
+        LOG.debug('There were %d instances to clean', num_instances)
+
+    def _run_pending_delete(self, instance):
+        attempts = int(instance.system_metadata.get('clean_attempts', '0'))
+        LOG.debug('Instance has had %(attempts)s of %(max)s '
+                  'cleanup attempts',
+                  {'attempts': attempts,
+                   'max': CONF.maximum_instance_delete_attempts},
+                  instance=instance)
+        if attempts < CONF.maximum_instance_delete_attempts:
+            success = self.driver.delete_instance_files(instance)
 
-        for instance in instances:
-            attempts = int(instance.system_metadata.get('clean_attempts', '0'))
-            LOG.debug('Instance has had %(attempts)s of %(max)s '
-                      'cleanup attempts',
-                      {'attempts': attempts,
-                       'max': CONF.maximum_instance_delete_attempts},
-                      instance=instance)
-            if attempts < CONF.maximum_instance_delete_attempts:
-                success = self.driver.delete_instance_files(instance)
-
-                instance.system_metadata['clean_attempts'] = str(attempts + 1)
-                if success:
-                    instance.cleaned = True
-                with utils.temporary_mutation(context, read_deleted='yes'):
-                    instance.save()
+            instance.system_metadata['clean_attempts'] = str(attempts + 1)
+            if success:
+                instance.cleaned = True
+            instance.save()
 
     @periodic_task.periodic_task(spacing=CONF.instance_delete_interval)
     def _cleanup_incomplete_migrations(self, context):
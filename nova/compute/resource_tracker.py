@@ -19,11 +19,15 @@ scheduler with useful information about availability through the ComputeNode
 model.
 """
 import copy
+import hashlib
+import time
 
+from eventlet import greenthread
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
 from oslo_utils import importutils
+import six
 
 from nova.compute import claims
 from nova.compute import monitors
@@ -52,6 +56,28 @@ resource_tracker_opts = [
     cfg.ListOpt('compute_resources',
                 default=['vcpu'],
                 help='The names of the extra resources to track.'),
+    cfg.BoolOpt('compute_resource_delta_updates',
+                default=False,
+                help='Only write the fields of the compute node record whose '
+                     'value changed since they were last written, instead '
+                     'of every field set by the resource tracker. The '
+                     'stats, NUMA topology, PCI pools and other serialized '
+                     'fields are compared by the hash of their content.'),
+    cfg.FloatOpt('compute_resource_update_window',
+                 default=0.0,
+                 help='Number of seconds during which the compute node '
+                      'updates caused by resource claims are coalesced into '
+                      'a single write. The updates are written immediately '
+                      'if set to 0.'),
+    cfg.IntOpt('resource_audit_full_interval',
+               default=1,
+               min=1,
+               help='Number of resource audits between two rebuilds of the '
+                    'usage of the compute node from all its instances. The '
+                    'audits in between only reconcile the usage of the '
+                    'instances whose update time or task state changed '
+                    'since the previous audit. The usage is rebuilt on '
+                    'every audit if set to 1.'),
 ]
 
 allocation_ratio_opts = [
@@ -83,6 +109,17 @@ CONF.register_opts(allocation_ratio_opts)
 LOG = logging.getLogger(__name__)
 COMPUTE_RESOURCE_SEMAPHORE = "compute_resources"
 
+# Fields of the compute node holding serialized structures, which are
+# compared by the hash of their content rather than by their value
+_HASHED_FIELDS = frozenset(['cpu_info', 'metrics', 'numa_topology',
+                            'pci_device_pools', 'stats',
+                            'supported_hv_specs'])
+
+# Resources reported by the virt driver which are instead computed from the
+# instances by the resource tracker, and kept by the incremental audits
+_USAGE_RESOURCES = frozenset(['vcpus_used', 'memory_mb_used',
+                              'local_gb_used', 'numa_topology'])
+
 CONF.import_opt('my_ip', 'nova.netconf')
 
 
@@ -128,6 +165,18 @@ class ResourceTracker(object):
         self.scheduler_client = scheduler_client.SchedulerClient()
         self.ram_allocation_ratio = CONF.ram_allocation_ratio
         self.cpu_allocation_ratio = CONF.cpu_allocation_ratio
+        # Digest of the last value written of each compute node field, used
+        # by the delta updates
+        self._written_digests = {}
+        # Time of the last compute node write, and whether a write of the
+        # coalesced updates is scheduled
+        self._last_update_time = 0
+        self._update_pending = False
+        # Number of resource audits run, and the instances seen by the last
+        # audit keyed by uuid, or None if the next audit has to rebuild the
+        # usage from all the instances
+        self._audit_count = 0
+        self._audited_instances = None
 
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def instance_claim(self, context, instance_ref, limits=None):
@@ -184,7 +233,7 @@ class ResourceTracker(object):
 
         elevated = context.elevated()
         # persist changes to the compute node:
-        self._update(elevated)
+        self._update(elevated, coalesce=True)
 
         return claim
 
@@ -255,7 +304,7 @@ class ResourceTracker(object):
         self._update_usage_from_migration(context, instance, image_meta,
                                           migration)
         elevated = context.elevated()
-        self._update(elevated)
+        self._update(elevated, coalesce=True)
 
         return claim
 
@@ -315,7 +364,7 @@ class ResourceTracker(object):
         instance['vm_state'] = vm_states.DELETED
         self._update_usage_from_instance(context, instance)
 
-        self._update(context.elevated())
+        self._update(context.elevated(), coalesce=True)
 
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def drop_move_claim(self, context, instance, instance_type=None,
@@ -348,7 +397,7 @@ class ResourceTracker(object):
                 self._update_usage(usage, sign=-1)
 
                 ctxt = context.elevated()
-                self._update(ctxt)
+                self._update(ctxt, coalesce=True)
 
             instance.drop_migration_context()
 
@@ -366,13 +415,13 @@ class ResourceTracker(object):
         # claim first:
         if uuid in self.tracked_instances:
             self._update_usage_from_instance(context, instance)
-            self._update(context.elevated())
+            self._update(context.elevated(), coalesce=True)
 
     @property
     def disabled(self):
         return self.compute_node is None
 
-    def _init_compute_node(self, context, resources):
+    def _init_compute_node(self, context, resources, keep_usage=False):
         """Initialise the compute node if it does not already exist.
 
         The resource tracker will be inoperable if compute_node
@@ -385,18 +434,21 @@ class ResourceTracker(object):
 
         :param context: security context
         :param resources: initial values
+        :param keep_usage: keep the usage computed from the instances by the
+                           previous audit, if there is already a compute node
         """
 
         # if there is already a compute node just use resources
         # to initialize
         if self.compute_node:
-            self._copy_resources(resources)
+            self._copy_resources(resources, keep_usage=keep_usage)
             return
 
         # now try to get the compute node record from the
         # database. If we get one we use resources to initialize
         self.compute_node = self._get_compute_node(context)
         if self.compute_node:
+            self._set_written_digests(self.compute_node.fields)
             self._copy_resources(resources)
             return
 
@@ -407,16 +459,26 @@ class ResourceTracker(object):
         self.compute_node.host = self.host
         self._copy_resources(resources)
         self.compute_node.create()
+        self._set_written_digests(self.compute_node.fields)
         LOG.info(_LI('Compute_service record created for '
                      '%(host)s:%(node)s'),
                  {'host': self.host, 'node': self.nodename})
 
-    def _copy_resources(self, resources):
+    def _copy_resources(self, resources, keep_usage=False):
         """Copy resource values to initialise compute_node and related
         data structures.
+
+        If keep_usage is True, the usage and the stats computed from the
+        instances are kept rather than reset to the values of the driver.
         """
-        # purge old stats and init with anything passed in by the driver
-        self.stats.clear()
+        if keep_usage:
+            resources = {key: value
+                         for key, value in six.iteritems(resources)
+                         if key not in _USAGE_RESOURCES}
+        else:
+            # purge old stats
+            self.stats.clear()
+        # init with anything passed in by the driver
         self.stats.digest_stats(resources.get('stats'))
 
         # update the allocation ratios for the related ComputeNode object
@@ -426,6 +488,13 @@ class ResourceTracker(object):
         # now copy rest to compute_node
         self.compute_node.update_from_virt_driver(resources)
 
+        if keep_usage:
+            # the totals may have changed
+            self.compute_node.free_ram_mb = (self.compute_node.memory_mb -
+                                             self.compute_node.memory_mb_used)
+            self.compute_node.free_disk_gb = (self.compute_node.local_gb -
+                                              self.compute_node.local_gb_used)
+
     def _get_host_metrics(self, context, nodename):
         """Get the metrics from monitors and
         notify information to message bus.
@@ -486,13 +555,20 @@ class ResourceTracker(object):
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def _update_available_resource(self, context, resources):
 
+        self._audit_count += 1
+        interval = CONF.resource_audit_full_interval
+        incremental = (interval > 1 and self._audit_count % interval != 0 and
+                       self._audited_instances is not None and
+                       not self.disabled)
+
         # initialise the compute node object, creating it
         # if it does not already exist.
-        self._init_compute_node(context, resources)
+        self._init_compute_node(context, resources, keep_usage=incremental)
 
         # if we could not init the compute node the tracker will be
         # disabled and we should quit now
         if self.disabled:
+            self._audited_instances = None
             return
 
         if 'pci_passthrough_devices' in resources:
@@ -510,13 +586,22 @@ class ResourceTracker(object):
             expected_attrs=['system_metadata',
                             'numa_topology'])
 
-        # Now calculate usage based on instance utilization:
-        self._update_usage_from_instances(context, instances)
-
         # Grab all in-progress migrations:
         migrations = objects.MigrationList.get_in_progress_by_host_and_node(
                 context, self.host, self.nodename)
 
+        # Now calculate usage based on instance utilization, only
+        # reconciling the instances which changed since the last audit if
+        # possible:
+        if incremental and not self._update_usage_from_changed_instances(
+                context, instances, migrations):
+            # the usage kept from the last audit can't be reconciled, reset
+            # it to the view of the driver before rebuilding it
+            self._copy_resources(resources)
+            incremental = False
+        if not incremental:
+            self._update_usage_from_instances(context, instances)
+
         self._update_usage_from_migrations(context, migrations)
 
         # Detect and account for orphaned instances that may exist on the
@@ -524,6 +609,14 @@ class ResourceTracker(object):
         orphans = self._find_orphaned_instances()
         self._update_usage_from_orphans(orphans)
 
+        # The usage of the orphans isn't tracked per instance, so the next
+        # audit has to rebuild the usage if there are any
+        if orphans:
+            self._audited_instances = None
+        else:
+            self._audited_instances = {instance.uuid: instance
+                                       for instance in instances}
+
         # NOTE(yjiang5): Because pci device tracker status is not cleared in
         # this periodic task, and also because the resource tracker is not
         # notified when instances are deleted, we need remove all usages
@@ -644,13 +737,82 @@ class ResourceTracker(object):
             return True
         return False
 
-    def _update(self, context):
-        """Update partial stats locally and populate them to Scheduler."""
+    def _get_field_digest(self, field):
+        """Returns the value of a compute node field as it is compared with
+        the last written one, or None if the field is not set.
+        """
+        if not self.compute_node.obj_attr_is_set(field):
+            return None
+        value = self.compute_node.fields[field].to_primitive(
+            self.compute_node, field, getattr(self.compute_node, field))
+        if field in _HASHED_FIELDS and value is not None:
+            serialized = jsonutils.dumps(value, sort_keys=True)
+            return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+        return value
+
+    def _set_written_digests(self, fields):
+        for field in fields:
+            self._written_digests[field] = self._get_field_digest(field)
+
+    def _get_changed_digests(self):
+        """Returns the digests of the fields of the compute node whose value
+        differs from the last written one, keyed by field. The other fields
+        are no longer tracked as changed, so that they are not written.
+        """
+        changed = {}
+        unchanged = set()
+        for field in self.compute_node.obj_what_changed():
+            digest = self._get_field_digest(field)
+            if (field in self._written_digests and
+                    self._written_digests[field] == digest):
+                unchanged.add(field)
+            else:
+                changed[field] = digest
+        if unchanged:
+            self.compute_node.obj_reset_changes(unchanged)
+        return changed
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _write_pending_update(self, context):
+        """Writes the updates coalesced since the last write, if they have
+        not been written by another update meanwhile.
+        """
+        if self._update_pending and not self.disabled:
+            self._update(context)
+
+    def _update(self, context, coalesce=False):
+        """Update partial stats locally and populate them to Scheduler.
+
+        If coalesce is set and the compute node was written less than
+        compute_resource_update_window seconds ago, the write is deferred
+        to the end of that window, along with any other update made until
+        then.
+        """
         self._write_ext_resources(self.compute_node)
-        if not self._resource_change():
+        window = CONF.compute_resource_update_window
+        if coalesce and window > 0:
+            if self._update_pending:
+                return
+            elapsed = time.time() - self._last_update_time
+            if elapsed < window:
+                self._update_pending = True
+                greenthread.spawn_after(window - elapsed,
+                                        self._write_pending_update, context)
+                return
+        self._update_pending = False
+
+        delta_updates = CONF.compute_resource_delta_updates
+        if delta_updates:
+            changed_digests = self._get_changed_digests()
+            if not changed_digests:
+                return
+        elif not self._resource_change():
             return
         # Persist the stats to the Scheduler
         self.scheduler_client.update_resource_stats(self.compute_node)
+        if delta_updates:
+            self._written_digests.update(changed_digests)
+        self._last_update_time = time.time()
         if self.pci_tracker:
             self.pci_tracker.save(context)
 
@@ -867,6 +1029,53 @@ class ResourceTracker(object):
             if instance.vm_state != vm_states.DELETED:
                 self._update_usage_from_instance(context, instance)
 
+    def _remove_usage_from_instance(self, context, instance):
+        """Remove the usage of a tracked instance, as accounted from the
+        given copy of the instance.
+        """
+        instance = instance.obj_clone()
+        instance.vm_state = vm_states.DELETED
+        self._update_usage_from_instance(context, instance)
+
+    def _update_usage_from_changed_instances(self, context, instances,
+                                             migrations):
+        """Reconcile the resource usage computed by the last audit with the
+        instances which changed since then: the instances which are no
+        longer on the node are removed, the new ones are added, and the ones
+        whose update time or task state changed are accounted again.
+
+        Returns False without changing the usage if it has to be rebuilt from
+        all the instances instead, which is the case when migrations are
+        tracked, as their usage depends on the instances.
+        """
+        if migrations or self.tracked_migrations:
+            return False
+
+        current = {instance.uuid: instance for instance in instances
+                   if instance.vm_state != vm_states.DELETED}
+        removed = set(self.tracked_instances) - set(current)
+        if not removed.issubset(self._audited_instances):
+            # an instance claimed since the last audit went away, the usage
+            # it was claimed with isn't known
+            return False
+
+        for uuid in removed:
+            self._remove_usage_from_instance(context,
+                                             self._audited_instances[uuid])
+
+        for uuid, instance in six.iteritems(current):
+            audited = self._audited_instances.get(uuid)
+            if (uuid in self.tracked_instances and audited is not None and
+                    (audited.updated_at != instance.updated_at or
+                     audited.task_state != instance.task_state)):
+                self._remove_usage_from_instance(context, audited)
+                self._update_usage_from_instance(context, instance)
+            elif uuid not in self.tracked_instances or audited is None:
+                # new, or claimed since the last audit and whose state may
+                # have changed since the claim
+                self._update_usage_from_instance(context, instance)
+        return True
+
     def _find_orphaned_instances(self):
         """Given the set of instances and migrations already account for
         by resource tracker, sanity check the hypervisor to determine
@@ -311,6 +311,7 @@ class ComputeAPI(object):
 
         * ...  - Remove refresh_security_group_members()
         * ...  - Remove refresh_security_group_rules()
+        * 4.6  - Add precache_image()
     '''
 
     VERSION_ALIASES = {
@@ -965,6 +966,13 @@ class ComputeAPI(object):
         cctxt.cast(ctxt, 'unquiesce_instance', instance=instance,
                    mapping=mapping)
 
+    def precache_image(self, ctxt, image_id):
+        version = '4.6'
+        if not self.client.can_send_version(version):
+            return
+        cctxt = self.client.prepare(fanout=True, version=version)
+        cctxt.cast(ctxt, 'precache_image', image_id=image_id)
+
     def refresh_instance_security_rules(self, ctxt, host, instance):
         version = '4.4'
         if not self.client.can_send_version(version):
@@ -21,6 +21,7 @@ import traceback
 import netifaces
 from oslo_config import cfg
 from oslo_log import log
+from oslo_utils import strutils
 import six
 
 from nova import block_device
@@ -216,6 +217,18 @@ def get_value_from_system_metadata(instance, key, type, default):
         return default
 
 
+def is_image_public(image_meta):
+    """Returns True if the image is visible to the other projects than the
+    one which owns it.
+
+    @param image_meta: The image metadata, as returned by the image API
+    """
+    visibility = image_meta.get('visibility')
+    if visibility is not None:
+        return str(visibility).lower() in ('public', 'shared')
+    return strutils.bool_from_string(image_meta.get('is_public'))
+
+
 def notify_usage_exists(notifier, context, instance_ref, current_period=False,
                         ignore_missing_network_data=True,
                         system_metadata=None, extra_usage_info=None):
@@ -691,6 +691,22 @@ def instance_get_all_by_filters_sort(context, filters, limit=None,
         sort_keys=sort_keys, sort_dirs=sort_dirs)
 
 
+def instance_get_all_by_filters_sort_batched(context, filters, batch_size,
+                                             marker=None,
+                                             columns_to_join=None,
+                                             use_slave=False, sort_keys=None,
+                                             sort_dirs=None):
+    """Yield lists of at most batch_size instances that match all filters
+    sorted by multiple keys.
+
+    sort_keys and sort_dirs must be a list of strings.
+    """
+    return IMPL.instance_get_all_by_filters_sort_batched(
+        context, filters, batch_size, marker=marker,
+        columns_to_join=columns_to_join, use_slave=use_slave,
+        sort_keys=sort_keys, sort_dirs=sort_dirs)
+
+
 def instance_get_active_by_window_joined(context, begin, end=None,
                                          project_id=None, host=None,
                                          use_slave=False,
@@ -863,6 +879,17 @@ def instance_info_cache_update(context, instance_uuid, values):
     return IMPL.instance_info_cache_update(context, instance_uuid, values)
 
 
+def instance_info_cache_update_many(context, values_by_uuid):
+    """Update several instance info cache records in a single transaction.
+
+    :param values_by_uuid: = dict of the dicts containing the column values
+                             to update, keyed by instance uuid
+    :returns: the updated records. The missing or deleted records are not
+              updated.
+    """
+    return IMPL.instance_info_cache_update_many(context, values_by_uuid)
+
+
 def instance_info_cache_delete(context, instance_uuid):
     """Deletes an existing instance_info_cache record
 
@@ -1119,6 +1146,20 @@ def quota_reserve(context, resources, quotas, user_quotas, deltas, expire,
                               project_id=project_id, user_id=user_id)
 
 
+def quota_reserve_optimistic(context, resources, quotas, user_quotas, deltas,
+                             expire, until_refresh, max_age, project_id=None,
+                             user_id=None, max_retries=10):
+    """Check quotas and create appropriate reservations, using
+    compare-and-swap updates of the usages instead of locking them.
+    """
+    return IMPL.quota_reserve_optimistic(context, resources, quotas,
+                                         user_quotas, deltas, expire,
+                                         until_refresh, max_age,
+                                         project_id=project_id,
+                                         user_id=user_id,
+                                         max_retries=max_retries)
+
+
 def reservation_commit(context, reservations, project_id=None, user_id=None):
     """Commit quota reservations."""
     return IMPL.reservation_commit(context, reservations,
@@ -1956,6 +1956,92 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
 
     session = get_session(use_slave=use_slave)
 
+    query_prefix, manual_joins = _instance_get_all_by_filters_query(
+        context, filters, columns_to_join, session)
+
+    # paginate query
+    if marker is not None:
+        try:
+            marker = _instance_get_by_uuid(
+                    context.elevated(read_deleted='yes'), marker,
+                    session=session)
+        except exception.InstanceNotFound:
+            raise exception.MarkerNotFound(marker)
+    try:
+        query_prefix = sqlalchemyutils.paginate_query(query_prefix,
+                               models.Instance, limit,
+                               sort_keys,
+                               marker=marker,
+                               sort_dirs=sort_dirs)
+    except db_exc.InvalidSortKey:
+        raise exception.InvalidSortKey()
+
+    return _instances_fill_metadata(context, query_prefix.all(), manual_joins)
+
+
+@require_context
+def instance_get_all_by_filters_sort_batched(context, filters, batch_size,
+                                             marker=None,
+                                             columns_to_join=None,
+                                             use_slave=False, sort_keys=None,
+                                             sort_dirs=None):
+    """Yield lists of at most batch_size instances matching the filters,
+    sorted by the given keys.
+
+    The filters, sorting and joins are the same as with
+    instance_get_all_by_filters_sort(), but the instances are read one batch
+    at a time, so that iterating over many instances does not hold all of
+    them in memory. Each batch starts right after the last instance of the
+    previous batch, comparing the values of all the sort keys of this
+    instance, instead of looking a marker instance up or skipping rows.
+    The manually joined columns are read with one query per batch.
+    """
+    sort_keys, sort_dirs = process_sort_params(sort_keys,
+                                               sort_dirs,
+                                               default_dir='desc')
+
+    if CONF.database.slave_connection == '':
+        use_slave = False
+
+    session = get_session(use_slave=use_slave)
+
+    query_prefix, manual_joins = _instance_get_all_by_filters_query(
+        context, filters, columns_to_join, session)
+
+    if marker is not None:
+        try:
+            marker = _instance_get_by_uuid(
+                    context.elevated(read_deleted='yes'), marker,
+                    session=session)
+        except exception.InstanceNotFound:
+            raise exception.MarkerNotFound(marker)
+
+    while True:
+        try:
+            query = sqlalchemyutils.paginate_query(query_prefix,
+                                   models.Instance, batch_size,
+                                   sort_keys,
+                                   marker=marker,
+                                   sort_dirs=sort_dirs)
+        except db_exc.InvalidSortKey:
+            raise exception.InvalidSortKey()
+        instances = query.all()
+        if instances:
+            yield _instances_fill_metadata(context, instances, manual_joins,
+                                           use_slave=use_slave)
+        if len(instances) < batch_size:
+            return
+        # The sort keys always include the unique id, so the last instance
+        # of the batch is an exact position to seek from.
+        marker = instances[-1]
+
+
+def _instance_get_all_by_filters_query(context, filters, columns_to_join,
+                                      session):
+    """Build the query of instance_get_all_by_filters_sort().
+
+    :returns: the filtered query and the list of columns to manually join
+    """
     if columns_to_join is None:
         columns_to_join_new = ['info_cache', 'security_groups']
         manual_joins = ['metadata', 'system_metadata']
@@ -2057,24 +2143,7 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     query_prefix = _regex_instance_filter(query_prefix, filters)
     query_prefix = _tag_instance_filter(context, query_prefix, filters)
 
-    # paginate query
-    if marker is not None:
-        try:
-            marker = _instance_get_by_uuid(
-                    context.elevated(read_deleted='yes'), marker,
-                    session=session)
-        except exception.InstanceNotFound:
-            raise exception.MarkerNotFound(marker)
-    try:
-        query_prefix = sqlalchemyutils.paginate_query(query_prefix,
-                               models.Instance, limit,
-                               sort_keys,
-                               marker=marker,
-                               sort_dirs=sort_dirs)
-    except db_exc.InvalidSortKey:
-        raise exception.InvalidSortKey()
-
-    return _instances_fill_metadata(context, query_prefix.all(), manual_joins)
+    return query_prefix, manual_joins
 
 
 def _tag_instance_filter(context, query, filters):
@@ -2703,6 +2772,31 @@ def instance_info_cache_update(context, instance_uuid, values):
     return info_cache
 
 
+@require_context
+def instance_info_cache_update_many(context, values_by_uuid):
+    """Update several instance info cache records in a single transaction.
+
+    :param values_by_uuid: = dict of the dicts containing column values to
+                             update, keyed by instance uuid
+    """
+    if not values_by_uuid:
+        return []
+
+    session = get_session()
+    with session.begin():
+        info_caches = model_query(context, models.InstanceInfoCache,
+                                  session=session).\
+                          filter(models.InstanceInfoCache.instance_uuid.in_(
+                              list(values_by_uuid))).\
+                          all()
+        for info_cache in info_caches:
+            values = values_by_uuid[info_cache['instance_uuid']]
+            convert_objects_related_datetimes(values)
+            info_cache.update(values)
+
+    return info_caches
+
+
 @require_context
 def instance_info_cache_delete(context, instance_uuid):
     """Deletes an existing instance_info_cache record
@@ -3333,6 +3427,7 @@ def _quota_usage_create(project_id, user_id, resource, in_use,
     quota_usage_ref.in_use = in_use
     quota_usage_ref.reserved = reserved
     quota_usage_ref.until_refresh = until_refresh
+    quota_usage_ref.generation = 0
     # updated_at is needed for judgement of max_age
     quota_usage_ref.updated_at = timeutils.utcnow()
 
@@ -3347,6 +3442,7 @@ def quota_usage_update(context, project_id, user_id, resource, **kwargs):
     for key in ['in_use', 'reserved', 'until_refresh']:
         if key in kwargs:
             updates[key] = kwargs[key]
+    updates['generation'] = models.QuotaUsage.generation + 1
 
     result = model_query(context, models.QuotaUsage, read_deleted="no").\
                      filter_by(project_id=project_id).\
@@ -3393,6 +3489,11 @@ def _get_project_user_quota_usages(context, session, project_id,
         order_by(models.QuotaUsage.id.asc()).\
         with_lockmode('update').\
         all()
+    return _sum_quota_usages(rows, user_id)
+
+
+def _sum_quota_usages(rows, user_id):
+    """Returns the project usages totals and the user usages of rows."""
     proj_result = dict()
     user_result = dict()
     # Get the total count of in_use,reserved
@@ -3529,6 +3630,37 @@ def _calculate_overquota(project_quotas, user_quotas, deltas,
     return overs
 
 
+def _raise_over_quota(project_quotas, user_quotas, deltas, overs,
+                      project_usages, user_usages):
+    """Raises OverQuota for the resources in overs."""
+    if project_quotas == user_quotas:
+        usages = project_usages
+    else:
+        # NOTE(mriedem): user_usages is a dict of resource keys to
+        # QuotaUsage sqlalchemy dict-like objects and doen't log well
+        # so convert the user_usages values to something useful for
+        # logging. Remove this if we ever change how
+        # _get_project_user_quota_usages returns the user_usages values.
+        user_usages = {k: dict(in_use=v['in_use'], reserved=v['reserved'],
+                               total=v['total'])
+                  for k, v in user_usages.items()}
+        usages = user_usages
+    usages = {k: dict(in_use=v['in_use'], reserved=v['reserved'])
+              for k, v in usages.items()}
+    LOG.debug('Raise OverQuota exception because: '
+              'project_quotas: %(project_quotas)s, '
+              'user_quotas: %(user_quotas)s, deltas: %(deltas)s, '
+              'overs: %(overs)s, project_usages: %(project_usages)s, '
+              'user_usages: %(user_usages)s',
+              {'project_quotas': project_quotas,
+               'user_quotas': user_quotas,
+               'overs': overs, 'deltas': deltas,
+               'project_usages': project_usages,
+               'user_usages': user_usages})
+    raise exception.OverQuota(overs=sorted(overs), quotas=user_quotas,
+                              usages=usages)
+
+
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 def quota_reserve(context, resources, project_quotas, user_quotas, deltas,
@@ -3640,8 +3772,11 @@ def quota_reserve(context, resources, project_quotas, user_quotas, deltas,
                 if delta > 0:
                     user_usages[res].reserved += delta
 
-        # Apply updates to the usages table
+        # Apply updates to the usages table, bumping the generation of the
+        # changed usages so that quota_reserve_optimistic() notices them
         for usage_ref in user_usages.values():
+            if session.is_modified(usage_ref):
+                usage_ref.generation += 1
             session.add(usage_ref)
 
     if unders:
@@ -3649,36 +3784,141 @@ def quota_reserve(context, resources, project_quotas, user_quotas, deltas,
                         "resources: %s"), unders)
 
     if overs:
-        if project_quotas == user_quotas:
-            usages = project_usages
-        else:
-            # NOTE(mriedem): user_usages is a dict of resource keys to
-            # QuotaUsage sqlalchemy dict-like objects and doen't log well
-            # so convert the user_usages values to something useful for
-            # logging. Remove this if we ever change how
-            # _get_project_user_quota_usages returns the user_usages values.
-            user_usages = {k: dict(in_use=v['in_use'], reserved=v['reserved'],
-                                   total=v['total'])
-                      for k, v in user_usages.items()}
-            usages = user_usages
-        usages = {k: dict(in_use=v['in_use'], reserved=v['reserved'])
-                  for k, v in usages.items()}
-        LOG.debug('Raise OverQuota exception because: '
-                  'project_quotas: %(project_quotas)s, '
-                  'user_quotas: %(user_quotas)s, deltas: %(deltas)s, '
-                  'overs: %(overs)s, project_usages: %(project_usages)s, '
-                  'user_usages: %(user_usages)s',
-                  {'project_quotas': project_quotas,
-                   'user_quotas': user_quotas,
-                   'overs': overs, 'deltas': deltas,
-                   'project_usages': project_usages,
-                   'user_usages': user_usages})
-        raise exception.OverQuota(overs=sorted(overs), quotas=user_quotas,
-                                  usages=usages)
+        _raise_over_quota(project_quotas, user_quotas, deltas, overs,
+                          project_usages, user_usages)
 
     return reservations
 
 
+class _QuotaUsageConflict(Exception):
+    """Raised when the usages changed during an optimistic reservation."""
+
+
+def _quota_reserve_optimistic(context, project_quotas, user_quotas, deltas,
+                              expire, max_age, project_id, user_id):
+    """Makes a single attempt at reserving quotas without locking.
+
+    Returns the reservations, or None if some usages need to be created or
+    refreshed. Raises _QuotaUsageConflict if the usages changed after they
+    were read, and OverQuota if the deltas are over quota.
+    """
+    # The usages are read and checked in their own session, which is never
+    # flushed, so that the until_refresh countdown done by
+    # _is_quota_refresh_needed() is only written by the updates below.
+    rows = model_query(context, models.QuotaUsage, read_deleted="no").\
+        filter_by(project_id=project_id).\
+        filter(models.QuotaUsage.resource.in_(list(deltas))).\
+        order_by(models.QuotaUsage.id.asc()).\
+        all()
+    project_usages, user_usages = _sum_quota_usages(rows, user_id)
+
+    for res in deltas:
+        if (res not in user_usages or
+                _is_quota_refresh_needed(user_usages[res], max_age)):
+            return None
+
+    unders = [res for res, delta in deltas.items()
+              if delta < 0 and delta + user_usages[res].in_use < 0]
+    overs = _calculate_overquota(project_quotas, user_quotas, deltas,
+                                 project_usages, user_usages)
+    if overs:
+        _raise_over_quota(project_quotas, user_quotas, deltas, overs,
+                          project_usages, user_usages)
+
+    # Only the usages of the user are updated, but when the project limit
+    # is checked all the usages of the project which were counted must be
+    # unchanged, so their generation is swapped as well.
+    checked = set(res for res, delta in deltas.items()
+                  if user_quotas[res] >= 0 and delta >= 0)
+    own_ids = set(usage.id for usage in user_usages.values())
+    session = get_session()
+    with session.begin():
+        for row in rows:
+            if row.id in own_ids:
+                delta = deltas[row.resource]
+                values = {'reserved': row.reserved + max(delta, 0),
+                          'until_refresh': row.until_refresh}
+            elif row.resource in checked:
+                # Leave updated_at untouched, it drives the max_age refresh
+                # of the usages of the other users
+                values = {'updated_at': row.updated_at}
+            else:
+                continue
+            values['generation'] = row.generation + 1
+            count = model_query(context, models.QuotaUsage, session=session,
+                                read_deleted="no").\
+                filter_by(id=row.id).\
+                filter_by(generation=row.generation).\
+                update(values, synchronize_session=False)
+            if not count:
+                raise _QuotaUsageConflict()
+
+        # The usages created since they were read must be counted as well
+        if checked and model_query(context, models.QuotaUsage,
+                                   session=session, read_deleted="no").\
+                filter_by(project_id=project_id).\
+                filter(models.QuotaUsage.resource.in_(list(checked))).\
+                filter(~models.QuotaUsage.id.in_([r.id for r in rows])).\
+                count():
+            raise _QuotaUsageConflict()
+
+        reservations = []
+        for res, delta in deltas.items():
+            reservation = _reservation_create(str(uuid.uuid4()),
+                                              user_usages[res],
+                                              project_id,
+                                              user_id,
+                                              res, delta, expire,
+                                              session=session)
+            reservations.append(reservation.uuid)
+
+    if unders:
+        LOG.warning(_LW("Change will make usage less than 0 for the following "
+                        "resources: %s"), unders)
+
+    return reservations
+
+
+@require_context
+def quota_reserve_optimistic(context, resources, project_quotas, user_quotas,
+                             deltas, expire, until_refresh, max_age,
+                             project_id=None, user_id=None, max_retries=10):
+    """Check quotas and create reservations, without locking the usages.
+
+    Unlike quota_reserve(), the usages are not read with SELECT ... FOR
+    UPDATE. They are checked against the quotas, then the reservations are
+    only created if the generations of the usages which were counted did not
+    change in the meantime. Otherwise the reservation is retried, up to
+    max_retries times.
+
+    The reservations needing to create or to refresh usages, and those
+    still conflicting after the retries, are made by quota_reserve().
+    """
+    if project_id is None:
+        project_id = context.project_id
+    if user_id is None:
+        user_id = context.user_id
+
+    for attempt in range(max_retries + 1):
+        try:
+            reservations = _quota_reserve_optimistic(
+                context, project_quotas, user_quotas, deltas, expire,
+                max_age, project_id, user_id)
+        except (_QuotaUsageConflict, db_exc.DBDeadlock):
+            LOG.debug('Quota usages of project %(project_id)s changed while '
+                      'reserving %(deltas)s, attempt %(attempt)d',
+                      {'project_id': project_id, 'deltas': deltas,
+                       'attempt': attempt + 1})
+            continue
+        if reservations is None:
+            break
+        return reservations
+
+    return quota_reserve(context, resources, project_quotas, user_quotas,
+                         deltas, expire, until_refresh, max_age,
+                         project_id=project_id, user_id=user_id)
+
+
 def _quota_reservations_query(session, context, reservations):
     """Return the relevant reservations."""
 
@@ -3704,6 +3944,7 @@ def reservation_commit(context, reservations, project_id=None, user_id=None):
             if reservation.delta >= 0:
                 usage.reserved -= reservation.delta
             usage.in_use += reservation.delta
+            usage.generation += 1
         reservation_query.soft_delete(synchronize_session=False)
 
 
@@ -3720,6 +3961,7 @@ def reservation_rollback(context, reservations, project_id=None, user_id=None):
             usage = user_usages[reservation.resource]
             if reservation.delta >= 0:
                 usage.reserved -= reservation.delta
+                usage.generation += 1
         reservation_query.soft_delete(synchronize_session=False)
 
 
@@ -3781,6 +4023,7 @@ def reservation_expire(context):
         for reservation in reservation_query.join(models.QuotaUsage).all():
             if reservation.delta >= 0:
                 reservation.usage.reserved -= reservation.delta
+                reservation.usage.generation += 1
                 session.add(reservation.usage)
 
         reservation_query.soft_delete(synchronize_session=False)
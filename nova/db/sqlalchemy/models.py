@@ -499,6 +499,11 @@ class QuotaUsage(BASE, NovaBase):
 
     until_refresh = Column(Integer)
 
+    # Incremented on each change of the usage, for the compare-and-swap
+    # updates of quota_reserve_optimistic()
+    generation = Column(Integer, nullable=False, default=0,
+                        server_default='0')
+
 
 class Reservation(BASE, NovaBase):
     """Represents a resource reservation for quotas."""
@@ -557,6 +557,11 @@ class ImageUnacceptable(Invalid):
     msg_fmt = _("Image %(image_id)s is unacceptable: %(reason)s")
 
 
+class ImageChecksumMismatch(ImageUnacceptable):
+    msg_fmt = _("Image %(image_id)s checksum %(actual)s doesn't match the "
+                "expected checksum %(expected)s")
+
+
 class InstanceUnacceptable(Invalid):
     msg_fmt = _("Instance %(instance_id)s is unacceptable: %(reason)s")
 
@@ -18,6 +18,7 @@ Filter support
 """
 
 from oslo_log import log as logging
+from oslo_utils import timeutils
 
 from nova.i18n import _LI
 from nova import loadables
@@ -48,6 +49,36 @@ class BaseFilter(object):
     # for each request rather than for each instance
     run_filter_once_per_request = False
 
+    # Set to true in a subclass which implements filter_mask(), so that the
+    # filter handler evaluates it once over a columnar snapshot of all the
+    # objects instead of calling _filter_one() for each of them
+    supports_batch = False
+
+    # The methods filtering the objects one at a time. A subclass overriding
+    # any of them has to override filter_mask() as well for it to be used
+    _object_methods = ('_filter_one', 'filter_all')
+
+    def filter_mask(self, snapshot, filter_properties):
+        """Return a list of booleans, one per object in the snapshot, True
+        for each object passing the filter.
+        Override this in a subclass setting supports_batch.
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def filter_mask_applies(cls):
+        """Return True if filter_mask() is defined by the class defining the
+        methods filtering the objects one at a time, or by a subclass of it.
+
+        supports_batch is inherited, so a subclass which only overrides how
+        the objects are filtered one at a time isn't evaluated by the
+        filter_mask() of its parent.
+        """
+        mask_cls = loadables.get_defining_class(cls, 'filter_mask')
+        return all(issubclass(mask_cls,
+                              loadables.get_defining_class(cls, name))
+                   for name in cls._object_methods)
+
     def run_filter_for_index(self, index):
         """Return True if the filter needs to be run for the "index-th"
         instance in a request.  Only need to override this if a filter
@@ -65,7 +96,20 @@ class BaseFilterHandler(loadables.BaseLoader):
     This class should be subclassed where one needs to use filters.
     """
 
-    def get_filtered_objects(self, filters, objs, filter_properties, index=0):
+    def get_snapshot(self, objs):
+        """Return a columnar snapshot of objs for the filters supporting
+        batch evaluation, or None if batch evaluation isn't supported by
+        this handler.
+        """
+        return None
+
+    def get_filtered_objects(self, filters, objs, filter_properties, index=0,
+                             trace=None):
+        """Return the objects passing all the filters.
+
+        If trace is set, the time spent in each filter and the number of
+        objects going in and out of it are recorded as a span of the trace.
+        """
         list_objs = list(objs)
         LOG.debug("Starting with %d host(s)", len(list_objs))
         # Track the hosts as they are removed. The 'full_filter_results' list
@@ -78,16 +122,36 @@ class BaseFilterHandler(loadables.BaseLoader):
         part_filter_results = []
         full_filter_results = []
         log_msg = "%(cls_name)s: (start: %(start)s, end: %(end)s)"
+        # The snapshot is built on the first batch-capable filter and then
+        # kept in sync with list_objs, so that it is only built once.
+        snapshot = None
         for filter_ in filters:
             if filter_.run_filter_for_index(index):
                 cls_name = filter_.__class__.__name__
                 start_count = len(list_objs)
-                objs = filter_.filter_all(list_objs, filter_properties)
-                if objs is None:
-                    LOG.debug("Filter %s says to stop filtering", cls_name)
-                    return
-                list_objs = list(objs)
+                if trace is not None:
+                    timer = timeutils.StopWatch().start()
+                batch = (filter_.supports_batch and
+                         filter_.filter_mask_applies())
+                if batch and snapshot is None:
+                    snapshot = self.get_snapshot(list_objs)
+                if batch and snapshot is not None:
+                    mask = filter_.filter_mask(snapshot, filter_properties)
+                    snapshot = snapshot.compress(mask)
+                    list_objs = list(snapshot)
+                else:
+                    objs = filter_.filter_all(list_objs, filter_properties)
+                    if objs is None:
+                        LOG.debug("Filter %s says to stop filtering",
+                                  cls_name)
+                        return
+                    list_objs = list(objs)
+                    if snapshot is not None:
+                        snapshot = snapshot.restrict(list_objs)
                 end_count = len(list_objs)
+                if trace is not None:
+                    trace.add_span(cls_name, timer.elapsed(),
+                                   hosts_in=start_count, hosts_out=end_count)
                 part_filter_results.append(log_msg % {"cls_name": cls_name,
                         "start": start_count, "end": end_count})
                 if list_objs:
@@ -140,7 +140,8 @@ class API(object):
         session, image_id = self._get_session_and_image_id(context, id_or_uri)
         return session.delete(context, image_id)
 
-    def download(self, context, id_or_uri, data=None, dest_path=None):
+    def download(self, context, id_or_uri, data=None, dest_path=None,
+                 verify_checksum=False):
         """Transfer image bits from Glance or a known source location to the
         supplied destination filepath.
 
@@ -150,6 +151,10 @@ class API(object):
                           information for.
         :param data: A file object to use in downloading image data.
         :param dest_path: Filepath to transfer image bits to.
+        :param verify_checksum: Whether to verify the checksum of the image
+                                bits while they are written, in which case
+                                the SHA-1 hex digest of the written bits is
+                                returned.
 
         Note that because of the poor design of the
         `glance.ImageService.download` method, the function returns different
@@ -179,4 +184,5 @@ class API(object):
         #                 handle streaming/copying/zero-copy as they see fit.
         session, image_id = self._get_session_and_image_id(context, id_or_uri)
         return session.download(context, image_id, data=data,
-                                dst_path=dest_path)
+                                dst_path=dest_path,
+                                verify_checksum=verify_checksum)
@@ -18,11 +18,14 @@
 from __future__ import absolute_import
 
 import copy
+import hashlib
 import itertools
+import os
 import random
 import sys
 import time
 
+import eventlet
 import glanceclient
 import glanceclient.exc
 from oslo_config import cfg
@@ -30,14 +33,16 @@ from oslo_log import log as logging
 from oslo_serialization import jsonutils
 from oslo_service import sslutils
 from oslo_utils import excutils
+from oslo_utils import fileutils
 from oslo_utils import netutils
 from oslo_utils import timeutils
+from oslo_utils import units
 import six
 from six.moves import range
 import six.moves.urllib.parse as urlparse
 
 from nova import exception
-from nova.i18n import _LE, _LI, _LW
+from nova.i18n import _, _LE, _LI, _LW
 import nova.image.download as image_xfers
 
 
@@ -72,6 +77,20 @@ glance_opts = [
                 help='A list of url scheme that can be downloaded directly '
                      'via the direct_url.  Currently supported schemes: '
                      '[file].'),
+    cfg.IntOpt('download_connections',
+               default=1,
+               min=1,
+               help='Number of connections used to download the data of an '
+                    'image to a file in parallel byte ranges. A download '
+                    'which failed is resumed from its completed ranges when '
+                    'it is retried. Images are downloaded in a single '
+                    'stream if set to 1, or if the glance server does not '
+                    'support byte ranges.'),
+    cfg.IntOpt('download_range_size',
+               default=64,
+               min=1,
+               help='Size in MiB of the byte ranges of the images '
+                    'downloaded over several connections.'),
     ]
 
 LOG = logging.getLogger(__name__)
@@ -208,6 +227,10 @@ class GlanceClientWrapper(object):
                                      self.host, self.port,
                                      self.use_ssl, version)
 
+    def get_client(self, context, version):
+        """Returns a client to make calls with."""
+        return self.client or self._create_onetime_client(context, version)
+
     def call(self, context, version, method, *args, **kwargs):
         """Call a glance client method.  If we get a connection error,
         retry the request according to CONF.glance.num_retries.
@@ -215,17 +238,10 @@ class GlanceClientWrapper(object):
         retry_excs = (glanceclient.exc.ServiceUnavailable,
                 glanceclient.exc.InvalidEndpoint,
                 glanceclient.exc.CommunicationError)
-        retries = CONF.glance.num_retries
-        if retries < 0:
-            LOG.warning(_LW("Treating negative config value (%(retries)s) for "
-                            "'glance.num_retries' as 0."),
-                        {'retries': retries})
-            retries = 0
-        num_attempts = retries + 1
+        num_attempts = _get_num_retries() + 1
 
         for attempt in range(1, num_attempts + 1):
-            client = self.client or self._create_onetime_client(context,
-                                                                version)
+            client = self.get_client(context, version)
             try:
                 return getattr(client.images, method)(*args, **kwargs)
             except retry_excs as e:
@@ -248,6 +264,195 @@ class GlanceClientWrapper(object):
                 time.sleep(1)
 
 
+def _get_num_retries():
+    retries = CONF.glance.num_retries
+    if retries < 0:
+        LOG.warning(_LW("Treating negative config value (%(retries)s) for "
+                        "'glance.num_retries' as 0."),
+                    {'retries': retries})
+        retries = 0
+    return retries
+
+
+def get_download_state_path(dst_path):
+    """Returns the path of the file recording the completed byte ranges of
+    a download to dst_path.
+    """
+    return '%s.ranges' % dst_path
+
+
+class _RangesNotSupported(Exception):
+    pass
+
+
+class _RangedDownload(object):
+    """Downloads the data of an image to a file in parallel byte ranges.
+
+    The file is preallocated as a sparse file, and each range is written at
+    its offset as it is received, through a file descriptor of its own. The
+    completed ranges are recorded in a state file next to the file, so that
+    a download which is retried only fetches the ranges it is missing.
+    """
+
+    def __init__(self, client, image, dst_path):
+        self.client = client
+        self.image = image
+        self.dst_path = dst_path
+        self.state_path = get_download_state_path(dst_path)
+        self.size = image['size']
+        self.range_size = CONF.glance.download_range_size * units.Mi
+        self.num_ranges = max(1, (self.size + self.range_size - 1) //
+                                 self.range_size)
+        self.completed = set()
+
+    def _state(self):
+        return {'image_id': self.image['id'],
+                'checksum': self.image.get('checksum'),
+                'size': self.size,
+                'range_size': self.range_size}
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                state = jsonutils.loads(f.read())
+        except (IOError, ValueError):
+            return False
+        completed = state.pop('completed', [])
+        if (state != self._state() or
+                not os.path.exists(self.dst_path) or
+                os.path.getsize(self.dst_path) != self.size):
+            return False
+        self.completed = set(completed)
+        return True
+
+    def _save_state(self):
+        state = self._state()
+        state['completed'] = sorted(self.completed)
+        with open(self.state_path, 'w') as f:
+            f.write(jsonutils.dumps(state))
+
+    def _prepare(self):
+        if self._load_state():
+            LOG.info(_LI("Resuming the download of image %(image_id)s, "
+                         "%(completed)d of %(total)d ranges were already "
+                         "downloaded"),
+                     {'image_id': self.image['id'],
+                      'completed': len(self.completed),
+                      'total': self.num_ranges})
+            return
+        self.completed = set()
+        with open(self.dst_path, 'wb') as f:
+            f.truncate(self.size)
+        self._save_state()
+
+    def _fetch_range(self, index):
+        offset = index * self.range_size
+        end = min(offset + self.range_size, self.size)
+        url = '/v1/images/%s' % urlparse.quote(str(self.image['id']))
+        num_attempts = _get_num_retries() + 1
+
+        fd = os.open(self.dst_path, os.O_WRONLY)
+        try:
+            for attempt in range(1, num_attempts + 1):
+                # A range which failed is resumed from the last byte written
+                headers = {'Range': 'bytes=%d-%d' % (offset, end - 1)}
+                try:
+                    resp, body = self.client.http_client.get(url,
+                                                             headers=headers)
+                    if resp.status_code != 206:
+                        resp.close()
+                        raise _RangesNotSupported()
+                    os.lseek(fd, offset, os.SEEK_SET)
+                    for chunk in body:
+                        chunk = chunk[:end - offset]
+                        while chunk:
+                            written = os.write(fd, chunk)
+                            chunk = chunk[written:]
+                            offset += written
+                    if offset < end:
+                        raise IOError(_("Received %(received)d bytes less "
+                                        "than requested") %
+                                      {'received': end - offset})
+                    break
+                except _RangesNotSupported:
+                    raise
+                except Exception as e:
+                    if attempt == num_attempts:
+                        raise
+                    LOG.warning(_LW("Error downloading bytes %(start)d to "
+                                    "%(end)d of image %(image_id)s, "
+                                    "retrying: %(error)s"),
+                                {'start': offset, 'end': end - 1,
+                                 'image_id': self.image['id'], 'error': e})
+                    time.sleep(1)
+        finally:
+            os.close(fd)
+
+        self.completed.add(index)
+        self._save_state()
+
+    def run(self):
+        """Downloads the ranges which aren't completed yet.
+
+        Returns False if the glance server doesn't support byte ranges, in
+        which case the image has to be downloaded in a single stream.
+        """
+        self._prepare()
+        pending = [index for index in range(self.num_ranges)
+                   if index not in self.completed]
+        if pending:
+            # The first range tells whether byte ranges are supported
+            try:
+                self._fetch_range(pending[0])
+            except _RangesNotSupported:
+                LOG.info(_LI("The glance server doesn't support byte "
+                             "ranges, downloading image %s in a single "
+                             "stream"), self.image['id'])
+                fileutils.delete_if_exists(self.state_path)
+                return False
+
+            errors = []
+
+            def fetch_range(index):
+                if errors:
+                    return
+                try:
+                    self._fetch_range(index)
+                except Exception:
+                    errors.append(sys.exc_info())
+
+            pool = eventlet.GreenPool(CONF.glance.download_connections)
+            for index in pending[1:]:
+                pool.spawn_n(fetch_range, index)
+            pool.waitall()
+            if errors:
+                six.reraise(*errors[0])
+
+        fileutils.delete_if_exists(self.state_path)
+        return True
+
+
+def _checksum_file(path):
+    md5 = hashlib.md5()
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(units.Mi), b''):
+            md5.update(chunk)
+            sha1.update(chunk)
+    return md5, sha1
+
+
+def _verify_checksum(image_id, image, md5, sha1):
+    """Raises ImageChecksumMismatch if md5 doesn't match the checksum of the
+    image, otherwise returns the SHA-1 hex digest.
+    """
+    expected = image.get('checksum')
+    if expected and md5.hexdigest() != expected:
+        raise exception.ImageChecksumMismatch(
+            image_id=image_id, expected=expected, actual=md5.hexdigest())
+    return sha1.hexdigest()
+
+
 class GlanceImageService(object):
     """Provides storage and retrieval of disk image objects within Glance."""
 
@@ -337,8 +542,21 @@ class GlanceImageService(object):
                           "for %(scheme)s"), {'scheme': scheme})
         return
 
-    def download(self, context, image_id, data=None, dst_path=None):
-        """Calls out to Glance for data and writes data."""
+    def download(self, context, image_id, data=None, dst_path=None,
+                 verify_checksum=False):
+        """Calls out to Glance for data and writes data.
+
+        If verify_checksum is set, the checksum of the written data is
+        computed as the chunks are written, ImageChecksumMismatch is raised
+        if it doesn't match the checksum of the image, and the SHA-1 hex
+        digest of the data is returned. None is returned instead when the
+        data was transferred by a download handler.
+
+        Images are downloaded to dst_path in parallel byte ranges if
+        CONF.glance.download_connections is greater than 1, see
+        _RangedDownload.
+        """
+        image = None
         if CONF.glance.allowed_direct_url_schemes and dst_path is not None:
             image = self.show(context, image_id, include_locations=True)
             for entry in image.get('locations', []):
@@ -355,6 +573,27 @@ class GlanceImageService(object):
                     except Exception:
                         LOG.exception(_LE("Download image error"))
 
+        verify_checksum = verify_checksum and (data is not None or
+                                               dst_path is not None)
+        ranged = (data is None and dst_path is not None and
+                  CONF.glance.download_connections > 1)
+        if (verify_checksum or ranged) and image is None:
+            image = self.show(context, image_id)
+
+        if ranged and image.get('size'):
+            client = self._client.get_client(context, 1)
+            try:
+                downloaded = _RangedDownload(client, image, dst_path).run()
+            except Exception:
+                _reraise_translated_image_exception(image_id)
+            if downloaded:
+                if verify_checksum:
+                    # The ranges are written out of order, the file is read
+                    # back to compute its checksum
+                    return _verify_checksum(image_id, image,
+                                            *_checksum_file(dst_path))
+                return
+
         try:
             image_chunks = self._client.call(context, 1, 'data', image_id)
         except Exception:
@@ -362,14 +601,23 @@ class GlanceImageService(object):
 
         close_file = False
         if data is None and dst_path:
+            # The ranges recorded for a previous download don't apply to
+            # the file once it is rewritten
+            fileutils.delete_if_exists(get_download_state_path(dst_path))
             data = open(dst_path, 'wb')
             close_file = True
 
         if data is None:
             return image_chunks
         else:
+            if verify_checksum:
+                md5 = hashlib.md5()
+                sha1 = hashlib.sha1()
             try:
                 for chunk in image_chunks:
+                    if verify_checksum:
+                        md5.update(chunk)
+                        sha1.update(chunk)
                     data.write(chunk)
             except Exception as ex:
                 with excutils.save_and_reraise_exception():
@@ -379,6 +627,9 @@ class GlanceImageService(object):
                 if close_file:
                     data.close()
 
+        if verify_checksum:
+            return _verify_checksum(image_id, image, md5, sha1)
+
     def create(self, context, image_meta, data=None):
         """Store the image data and return the new image object."""
         sent_service_image_meta = _translate_to_glance(image_meta)
@@ -47,6 +47,16 @@ from oslo_utils import importutils
 from nova import exception
 
 
+def get_defining_class(cls, name):
+    """Return the class in the MRO of cls which defines the attribute name,
+    or None if none does.
+    """
+    for klass in inspect.getmro(cls):
+        if name in vars(klass):
+            return klass
+    return None
+
+
 class BaseLoader(object):
     def __init__(self, loadable_cls_type):
         mod = sys.modules[self.__class__.__module__]
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import functools
 import inspect
 
@@ -21,6 +22,7 @@ from oslo_log import log as logging
 from oslo_utils import excutils
 
 from nova.db import base
+from nova import exception
 from nova import hooks
 from nova.i18n import _, _LE
 from nova.network import model as network_model
@@ -82,6 +84,25 @@ def refresh_cache(f):
     return wrapper
 
 
+@contextlib.contextmanager
+def refresh_cache_locks(instance_uuids):
+    """Hold the refresh_cache locks of several instances.
+
+    The locks are taken in the order of the instance uuids, so that two
+    callers holding several locks can't deadlock.
+    """
+    locks = []
+    try:
+        for instance_uuid in sorted(set(instance_uuids)):
+            lock = lockutils.lock('refresh_cache-%s' % instance_uuid)
+            lock.__enter__()
+            locks.append(lock)
+        yield
+    finally:
+        for lock in reversed(locks):
+            lock.__exit__(None, None, None)
+
+
 SENTINEL = object()
 
 
@@ -252,6 +273,34 @@ class NetworkAPI(base.Base):
                                                update_cells=update_cells)
         return result
 
+    def get_instances_nw_info(self, context, instances):
+        """Refresh the info caches of several instances, and return their
+        network info keyed by instance uuid.
+
+        The instances which no longer exist, or whose network info can't be
+        retrieved, are left out. This implementation refreshes one instance
+        at a time.
+        """
+        nw_infos = {}
+        for instance in instances:
+            try:
+                nw_infos[instance.uuid] = self.get_instance_nw_info(
+                    context, instance)
+            except (exception.InstanceNotFound,
+                    exception.InstanceInfoCacheNotFound):
+                LOG.debug('Instance or its info cache no longer exists. '
+                          'Unable to refresh', instance=instance)
+            except Exception:
+                LOG.exception(_LE('Failed to refresh the network info '
+                                  'cache'), instance=instance)
+        return nw_infos
+
+    def invalidate_network_cache(self, instance):
+        """Drop the cached data of the networks the instance is attached to,
+        when they have changed.
+        """
+        pass
+
     def _get_instance_nw_info(self, context, instance, **kwargs):
         """Template method, so a subclass can implement for neutron/network."""
         raise NotImplementedError()
@@ -15,6 +15,7 @@
 #    under the License.
 #
 
+import collections
 import copy
 import time
 import uuid
@@ -122,6 +123,20 @@ neutron_opts = [
                 default=600,
                 help='Number of seconds before querying neutron for'
                      ' extensions'),
+    cfg.IntOpt('metadata_cache_ttl',
+               default=0,
+               min=0,
+               help='Number of seconds the networks, subnets and DHCP ports '
+                    'used to build the network info of the instances are '
+                    'cached for. The cached networks are invalidated when '
+                    'a network-changed event is received for an instance '
+                    'attached to them. 0 disables the cache'),
+    cfg.IntOpt('metadata_cache_size',
+               default=1000,
+               min=1,
+               help='Maximum number of networks, subnets and DHCP port '
+                    'lists in the cache, the least recently used ones are '
+                    'evicted beyond it'),
    ]
 
 NEUTRON_GROUP = 'neutron'
@@ -151,6 +166,85 @@ soft_external_network_attach_authorize = extensions.soft_core_authorizer(
 _SESSION = None
 _ADMIN_AUTH = None
 
+# Maximum number of IDs searched in a single neutron list call, as the
+# search criteria form part of the URL, which has a fixed max size
+MAX_SEARCH_IDS = 150
+
+
+class _MetadataCache(object):
+    """Process-local cache of the neutron networks, subnets and DHCP ports
+    used to build the network info of the instances.
+
+    The entries expire after CONF.neutron.metadata_cache_ttl seconds, and the
+    least recently used ones are evicted beyond
+    CONF.neutron.metadata_cache_size entries. Each entry belongs to a
+    network, so that all the cached data of a network can be invalidated at
+    once. The cached values are shared, they must not be modified.
+    """
+
+    def __init__(self):
+        # (expiry time, network id, value) keyed by (kind, id), from the
+        # least to the most recently used
+        self._entries = collections.OrderedDict()
+        # Set of the keys of the entries of each network, keyed by network
+        # id
+        self._keys_by_network = collections.defaultdict(set)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def enabled():
+        return CONF.neutron.metadata_cache_ttl > 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._keys_by_network[entry[1]]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_network[entry[1]]
+        return entry
+
+    def get(self, key):
+        entry = self._remove(key)
+        if entry is None or entry[0] <= time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries[key] = entry
+        self._keys_by_network[entry[1]].add(key)
+        return entry[2]
+
+    def set(self, key, network_id, value):
+        self._remove(key)
+        self._entries[key] = (time.time() + CONF.neutron.metadata_cache_ttl,
+                              network_id, value)
+        self._keys_by_network[network_id].add(key)
+        while len(self._entries) > CONF.neutron.metadata_cache_size:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate_network(self, network_id):
+        for key in self._keys_by_network.pop(network_id, set()):
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_network.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._entries)}
+
+
+_METADATA_CACHE = _MetadataCache()
+
+
+def get_metadata_cache_stats():
+    """Return the hit and miss counters and the size of the process-local
+    cache of the neutron networks, subnets and DHCP ports.
+    """
+    return _METADATA_CACHE.stats()
+
 
 def list_opts():
     list = copy.deepcopy(_neutron_options)
@@ -177,6 +271,7 @@ def reset_state():
 
     _ADMIN_AUTH = None
     _SESSION = None
+    _METADATA_CACHE.clear()
 
 
 def _load_auth_plugin(conf):
@@ -253,6 +348,90 @@ def get_client(context, admin=False):
                             region_name=CONF.neutron.region_name)
 
 
+def _list_by_ids(list_func, resource, id_key, ids, **search_opts):
+    """Returns the neutron resources whose id_key is one of ids, listed
+    with one call per chunk of MAX_SEARCH_IDS ids.
+    """
+    ids = list(ids)
+    result = []
+    for start in range(0, len(ids), MAX_SEARCH_IDS):
+        search_opts[id_key] = ids[start:start + MAX_SEARCH_IDS]
+        result.extend(list_func(**search_opts).get(resource, []))
+    return result
+
+
+class _BulkNetworkData(object):
+    """The neutron resources needed to build the network info of several
+    instances, listed with a single neutron call per kind of resource and
+    per chunk of MAX_SEARCH_IDS ids.
+    """
+
+    def __init__(self, client, instances):
+        # Ports of the instances, keyed by instance uuid
+        self.ports = collections.defaultdict(list)
+        ports = _list_by_ids(client.list_ports, 'ports', 'device_id',
+                             [instance.uuid for instance in instances])
+        for port in ports:
+            self.ports[port['device_id']].append(port)
+
+        net_ids = set(port['network_id'] for port in ports)
+        for instance in instances:
+            ifaces = compute_utils.get_nw_info_for_instance(instance)
+            net_ids.update(iface['network']['id'] for iface in ifaces)
+        # Networks of the ports and of the cached network info, keyed by id
+        self.networks = {}
+        if net_ids:
+            nets = _list_by_ids(client.list_networks, 'networks', 'id',
+                                net_ids)
+            self.networks = {net['id']: net for net in nets}
+
+        subnet_ids = set(fixed_ip['subnet_id']
+                         for port in ports for fixed_ip in port['fixed_ips'])
+        # Subnets of the ports keyed by id, and DHCP ports keyed by network
+        # id
+        self.subnets = {}
+        self.dhcp_ports = collections.defaultdict(list)
+        if subnet_ids:
+            subnets = _list_by_ids(client.list_subnets, 'subnets', 'id',
+                                   subnet_ids)
+            self.subnets = {subnet['id']: subnet for subnet in subnets}
+            subnet_net_ids = set(subnet['network_id'] for subnet in subnets)
+            if subnet_net_ids:
+                dhcp_ports = _list_by_ids(client.list_ports, 'ports',
+                                          'network_id', subnet_net_ids,
+                                          device_owner='network:dhcp')
+                for port in dhcp_ports:
+                    self.dhcp_ports[port['network_id']].append(port)
+
+        # Floating IPs keyed by (port id, fixed IP address)
+        self.floating_ips = collections.defaultdict(list)
+        if ports:
+            try:
+                fips = _list_by_ids(client.list_floatingips, 'floatingips',
+                                    'port_id', [port['id'] for port in ports])
+            # If a neutron plugin does not implement the L3 API a 404 from
+            # list_floatingips will be raised.
+            except neutron_client_exc.NeutronClientException as e:
+                if e.status_code != 404:
+                    raise
+                fips = []
+            for fip in fips:
+                key = (fip['port_id'], fip['fixed_ip_address'])
+                self.floating_ips[key].append(fip)
+
+    def get_ports(self, instance):
+        return [port for port in self.ports.get(instance.uuid, [])
+                if port['tenant_id'] == instance.project_id]
+
+    def get_networks(self, project_id, net_ids):
+        if net_ids:
+            return [self.networks[net_id] for net_id in net_ids
+                    if net_id in self.networks]
+        # The networks owned by the tenant and the public networks
+        return [net for net in six.itervalues(self.networks)
+                if net['tenant_id'] == project_id or net.get('shared')]
+
+
 class API(base_api.NetworkAPI):
     """API for interacting with the neutron 2.x API."""
 
@@ -930,8 +1109,137 @@ class API(base_api.NetworkAPI):
                                                  preexisting_port_ids)
         return network_model.NetworkInfo.hydrate(nw_info)
 
+    def get_instances_nw_info(self, context, instances):
+        """Refresh the info caches of several instances, and return their
+        network info keyed by instance uuid.
+
+        The ports, networks, subnets, DHCP ports and floating IPs of all the
+        instances are listed with a single neutron call each, and the info
+        caches are saved in a single database transaction. The instances
+        which no longer exist are left out.
+        """
+        if not instances:
+            return {}
+
+        uuids = [instance.uuid for instance in instances]
+        nw_infos = {}
+        with base_api.refresh_cache_locks(uuids):
+            # Ensure that we have up to date copies of the instance info
+            # caches, as _get_instance_nw_info() does.
+            current = objects.InstanceList.get_by_filters(
+                context, {'uuid': uuids, 'deleted': False},
+                expected_attrs=['info_cache'])
+            info_caches = {instance.uuid: instance.info_cache
+                           for instance in current}
+            instances = [instance for instance in instances
+                         if instance.uuid in info_caches]
+            for instance in instances:
+                instance.info_cache = info_caches[instance.uuid]
+
+            client = get_client(context, admin=True)
+            bulk_data = _BulkNetworkData(client, instances)
+            info_caches = objects.InstanceInfoCacheList(context=context,
+                                                        objects=[])
+            for instance in instances:
+                try:
+                    nw_info = self._build_network_info_model(
+                        context, instance, admin_client=client,
+                        bulk_data=bulk_data)
+                except Exception:
+                    LOG.exception(_LE('Failed to build the network info'),
+                                  instance=instance)
+                    continue
+                nw_info = network_model.NetworkInfo.hydrate(nw_info)
+                info_cache = objects.InstanceInfoCache.new(context,
+                                                           instance.uuid)
+                info_cache.network_info = nw_info
+                info_caches.objects.append(info_cache)
+                nw_infos[instance.uuid] = nw_info
+            if info_caches:
+                info_caches.save()
+        return nw_infos
+
+    def _get_networks_by_ids(self, context, project_id, net_ids):
+        """Return the networks of an instance, from the metadata cache if it
+        is enabled.
+        """
+        if not net_ids or not _METADATA_CACHE.enabled():
+            return self._get_available_networks(context, project_id,
+                                                net_ids)
+
+        net_ids = list(collections.OrderedDict.fromkeys(net_ids))
+        # The networks visible to a tenant depend on the tenant, so they are
+        # cached per tenant
+        nets = {}
+        for net_id in net_ids:
+            net = _METADATA_CACHE.get(('network', project_id, net_id))
+            if net is not None:
+                nets[net_id] = net
+        missing_ids = [net_id for net_id in net_ids if net_id not in nets]
+        if missing_ids:
+            for net in self._get_available_networks(context, project_id,
+                                                    missing_ids):
+                _METADATA_CACHE.set(('network', project_id, net['id']),
+                                    net['id'], net)
+                nets[net['id']] = net
+        return [nets[net_id] for net_id in net_ids if net_id in nets]
+
+    def _get_subnets_by_ids(self, context, subnet_ids):
+        """Return the subnets with the given IDs, from the metadata cache if
+        it is enabled.
+        """
+        if not _METADATA_CACHE.enabled():
+            data = get_client(context).list_subnets(id=subnet_ids)
+            return data.get('subnets', [])
+
+        subnet_ids = list(collections.OrderedDict.fromkeys(subnet_ids))
+        subnets = {}
+        for subnet_id in subnet_ids:
+            subnet = _METADATA_CACHE.get(('subnet', subnet_id))
+            if subnet is not None:
+                subnets[subnet_id] = subnet
+        missing_ids = [subnet_id for subnet_id in subnet_ids
+                       if subnet_id not in subnets]
+        if missing_ids:
+            data = get_client(context).list_subnets(id=missing_ids)
+            for subnet in data.get('subnets', []):
+                _METADATA_CACHE.set(('subnet', subnet['id']),
+                                    subnet['network_id'], subnet)
+                subnets[subnet['id']] = subnet
+        return [subnets[subnet_id] for subnet_id in subnet_ids
+                if subnet_id in subnets]
+
+    def _get_dhcp_ports(self, context, network_id):
+        """Return the DHCP ports of a network, from the metadata cache if it
+        is enabled.
+        """
+        if _METADATA_CACHE.enabled():
+            dhcp_ports = _METADATA_CACHE.get(('dhcp_ports', network_id))
+            if dhcp_ports is not None:
+                return dhcp_ports
+        search_opts = {'network_id': network_id,
+                       'device_owner': 'network:dhcp'}
+        data = get_client(context).list_ports(**search_opts)
+        dhcp_ports = data.get('ports', [])
+        if _METADATA_CACHE.enabled():
+            _METADATA_CACHE.set(('dhcp_ports', network_id), network_id,
+                                dhcp_ports)
+        return dhcp_ports
+
+    def invalidate_network_cache(self, instance):
+        """Drop the cached networks, subnets and DHCP ports of the networks
+        the instance is attached to.
+        """
+        if not _METADATA_CACHE.enabled():
+            return
+        for vif in compute_utils.get_nw_info_for_instance(instance):
+            _METADATA_CACHE.invalidate_network(vif['network']['id'])
+        LOG.debug('Invalidated the cached networks of the instance, '
+                  'network metadata cache stats: %s',
+                  _METADATA_CACHE.stats(), instance=instance)
+
     def _gather_port_ids_and_networks(self, context, instance, networks=None,
-                                      port_ids=None):
+                                      port_ids=None, bulk_data=None):
         """Return an instance's complete list of port_ids and networks."""
 
         if ((networks is None and port_ids is not None) or
@@ -947,10 +1255,12 @@ class API(base_api.NetworkAPI):
             port_ids = [iface['id'] for iface in ifaces]
             net_ids = [iface['network']['id'] for iface in ifaces]
 
-        if networks is None:
-            networks = self._get_available_networks(context,
-                                                    instance.project_id,
-                                                    net_ids)
+        if networks is None and bulk_data is not None:
+            networks = bulk_data.get_networks(instance.project_id, net_ids)
+        elif networks is None:
+            networks = self._get_networks_by_ids(context,
+                                                 instance.project_id,
+                                                 net_ids)
         # an interface was added/removed from instance.
         else:
             # Since networks does not contain the existing networks on the
@@ -1548,12 +1858,16 @@ class API(base_api.NetworkAPI):
         """Force add a network to the project."""
         raise NotImplementedError()
 
-    def _nw_info_get_ips(self, client, port):
+    def _nw_info_get_ips(self, client, port, bulk_data=None):
         network_IPs = []
         for fixed_ip in port['fixed_ips']:
             fixed = network_model.FixedIP(address=fixed_ip['ip_address'])
-            floats = self._get_floating_ips_by_fixed_and_port(
-                client, fixed_ip['ip_address'], port['id'])
+            if bulk_data is not None:
+                floats = bulk_data.floating_ips.get(
+                    (port['id'], fixed_ip['ip_address']), [])
+            else:
+                floats = self._get_floating_ips_by_fixed_and_port(
+                    client, fixed_ip['ip_address'], port['id'])
             for ip in floats:
                 fip = network_model.IP(address=ip['floating_ip_address'],
                                        type='floating')
@@ -1561,8 +1875,18 @@ class API(base_api.NetworkAPI):
             network_IPs.append(fixed)
         return network_IPs
 
-    def _nw_info_get_subnets(self, context, port, network_IPs):
-        subnets = self._get_subnets_from_port(context, port)
+    def _nw_info_get_subnets(self, context, port, network_IPs,
+                             bulk_data=None):
+        if bulk_data is not None:
+            subnets = []
+            for subnet_id in set(fixed_ip['subnet_id']
+                                 for fixed_ip in port['fixed_ips']):
+                subnet = bulk_data.subnets.get(subnet_id)
+                if subnet is not None:
+                    subnets.append(self._build_subnet(
+                        subnet, bulk_data.dhcp_ports[subnet['network_id']]))
+        else:
+            subnets = self._get_subnets_from_port(context, port)
         for subnet in subnets:
             subnet['ips'] = [fixed_ip for fixed_ip in network_IPs
                              if fixed_ip.is_in_subnet(subnet)]
@@ -1643,7 +1967,7 @@ class API(base_api.NetworkAPI):
 
     def _build_network_info_model(self, context, instance, networks=None,
                                   port_ids=None, admin_client=None,
-                                  preexisting_port_ids=None):
+                                  preexisting_port_ids=None, bulk_data=None):
         """Return list of ordered VIFs attached to instance.
 
         :param context - request context.
@@ -1660,21 +1984,30 @@ class API(base_api.NetworkAPI):
         allocate and there shouldn't be deleted when an instance is
         de-allocated. Supplied list will be added to the cached list of
         preexisting port IDs for this instance.
+        :param bulk_data - a _BulkNetworkData holding the neutron resources
+        of the instance, listed along with those of other instances.
         """
 
-        search_opts = {'tenant_id': instance.project_id,
-                       'device_id': instance.uuid, }
         if admin_client is None:
             client = get_client(context, admin=True)
         else:
             client = admin_client
 
-        data = client.list_ports(**search_opts)
-
-        current_neutron_ports = data.get('ports', [])
+        if bulk_data is not None:
+            current_neutron_ports = bulk_data.get_ports(instance)
+        else:
+            search_opts = {'tenant_id': instance.project_id,
+                           'device_id': instance.uuid, }
+            data = client.list_ports(**search_opts)
+            current_neutron_ports = data.get('ports', [])
         nw_info_refresh = networks is None and port_ids is None
-        networks, port_ids = self._gather_port_ids_and_networks(
-                context, instance, networks, port_ids)
+        if bulk_data is not None:
+            networks, port_ids = self._gather_port_ids_and_networks(
+                    context, instance, networks, port_ids,
+                    bulk_data=bulk_data)
+        else:
+            networks, port_ids = self._gather_port_ids_and_networks(
+                    context, instance, networks, port_ids)
         nw_info = network_model.NetworkInfo()
 
         if preexisting_port_ids is None:
@@ -1701,10 +2034,12 @@ class API(base_api.NetworkAPI):
                     vif_active = True
 
                 network_IPs = self._nw_info_get_ips(client,
-                                                    current_neutron_port)
+                                                    current_neutron_port,
+                                                    bulk_data=bulk_data)
                 subnets = self._nw_info_get_subnets(context,
                                                     current_neutron_port,
-                                                    network_IPs)
+                                                    network_IPs,
+                                                    bulk_data=bulk_data)
 
                 devname = "tap" + current_neutron_port['id']
                 devname = devname[:network_model.NIC_NAME_LEN]
@@ -1748,44 +2083,46 @@ class API(base_api.NetworkAPI):
         # related to the port. To avoid this, the method returns here.
         if not fixed_ips:
             return []
-        search_opts = {'id': [ip['subnet_id'] for ip in fixed_ips]}
-        data = get_client(context).list_subnets(**search_opts)
-        ipam_subnets = data.get('subnets', [])
+        ipam_subnets = self._get_subnets_by_ids(
+            context, [ip['subnet_id'] for ip in fixed_ips])
         subnets = []
 
         for subnet in ipam_subnets:
-            subnet_dict = {'cidr': subnet['cidr'],
-                           'gateway': network_model.IP(
-                                address=subnet['gateway_ip'],
-                                type='gateway'),
-            }
-
             # attempt to populate DHCP server field
-            search_opts = {'network_id': subnet['network_id'],
-                           'device_owner': 'network:dhcp'}
-            data = get_client(context).list_ports(**search_opts)
-            dhcp_ports = data.get('ports', [])
-            for p in dhcp_ports:
-                for ip_pair in p['fixed_ips']:
-                    if ip_pair['subnet_id'] == subnet['id']:
-                        subnet_dict['dhcp_server'] = ip_pair['ip_address']
-                        break
-
-            subnet_object = network_model.Subnet(**subnet_dict)
-            for dns in subnet.get('dns_nameservers', []):
-                subnet_object.add_dns(
-                    network_model.IP(address=dns, type='dns'))
-
-            for route in subnet.get('host_routes', []):
-                subnet_object.add_route(
-                    network_model.Route(cidr=route['destination'],
-                                        gateway=network_model.IP(
-                                            address=route['nexthop'],
-                                            type='gateway')))
-
-            subnets.append(subnet_object)
+            dhcp_ports = self._get_dhcp_ports(context, subnet['network_id'])
+            subnets.append(self._build_subnet(subnet, dhcp_ports))
         return subnets
 
+    def _build_subnet(self, subnet, dhcp_ports):
+        """Return the Subnet model of a neutron subnet, given the DHCP ports
+        of its network.
+        """
+        subnet_dict = {'cidr': subnet['cidr'],
+                       'gateway': network_model.IP(
+                            address=subnet['gateway_ip'],
+                            type='gateway'),
+        }
+
+        for p in dhcp_ports:
+            for ip_pair in p['fixed_ips']:
+                if ip_pair['subnet_id'] == subnet['id']:
+                    subnet_dict['dhcp_server'] = ip_pair['ip_address']
+                    break
+
+        subnet_object = network_model.Subnet(**subnet_dict)
+        for dns in subnet.get('dns_nameservers', []):
+            subnet_object.add_dns(
+                network_model.IP(address=dns, type='dns'))
+
+        for route in subnet.get('host_routes', []):
+            subnet_object.add_route(
+                network_model.Route(cidr=route['destination'],
+                                    gateway=network_model.IP(
+                                        address=route['nexthop'],
+                                        type='gateway')))
+
+        return subnet_object
+
     def get_dns_domains(self, context):
         """Return a list of available dns domains.
 
@@ -20,6 +20,7 @@ import functools
 import traceback
 
 import netaddr
+from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging as messaging
 from oslo_utils import timeutils
@@ -33,6 +34,18 @@ from nova.objects import fields as obj_fields
 from nova import utils
 
 
+serializer_opts = [
+    cfg.BoolOpt('compact_object_serialization',
+                default=False,
+                help='Send the objects passed in RPC messages in a compact '
+                     'form, without the namespace and with shorter keys. '
+                     'Only enable this once all the services are able to '
+                     'read this form.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(serializer_opts)
+
 LOG = logging.getLogger('object')
 
 
@@ -250,6 +263,85 @@ class ObjectListBase(ovoo_base.ObjectListBase):
             return primitive.get(key, default)
 
 
+# Key of the compact primitives, holding the name, version, data and
+# optionally the changes of a nova object. See _compact_primitive().
+_COMPACT_KEY = 'nova_object.c'
+# Key of the escaped dicts, which are plain dicts having one of the keys
+# above as their own key, such as user supplied metadata
+_ESCAPED_KEY = 'nova_object.e'
+
+
+def _is_compact(value):
+    """Return whether value is the compact primitive of a nova object."""
+    if not isinstance(value, dict) or len(value) != 1:
+        return False
+    compact = value.get(_COMPACT_KEY)
+    return isinstance(compact, list) and len(compact) in (3, 4)
+
+
+def _escape_dict(value):
+    """Return the dict value escaped if one of its keys could be mistaken
+    for a compact primitive or an escaped dict.
+    """
+    if _COMPACT_KEY in value or _ESCAPED_KEY in value:
+        return {_ESCAPED_KEY: value}
+    return value
+
+
+def _is_escaped(value):
+    return (isinstance(value, dict) and len(value) == 1 and
+            isinstance(value.get(_ESCAPED_KEY), dict))
+
+
+def _compact_primitive(value):
+    """Return value with the primitives of the nova objects it contains
+    turned into their compact form.
+
+    A primitive like {'nova_object.name': name,
+    'nova_object.namespace': 'nova', 'nova_object.version': version,
+    'nova_object.data': data, 'nova_object.changes': changes} becomes
+    {'nova_object.c': [name, version, data, changes]}, the changes being
+    omitted when missing, and the data being compacted in turn. The other
+    dicts are escaped when they have one of the reserved keys.
+    """
+    namespace = NovaObject.OBJ_PROJECT_NAMESPACE
+    if isinstance(value, dict):
+        if (value.get('nova_object.namespace') == namespace and
+                'nova_object.name' in value):
+            compact = [value['nova_object.name'],
+                       value['nova_object.version'],
+                       _compact_primitive(value['nova_object.data'])]
+            if 'nova_object.changes' in value:
+                compact.append(value['nova_object.changes'])
+            return {_COMPACT_KEY: compact}
+        return _escape_dict({k: _compact_primitive(v)
+                             for k, v in six.iteritems(value)})
+    elif isinstance(value, (list, tuple)):
+        return [_compact_primitive(v) for v in value]
+    return value
+
+
+def _expand_primitive(value):
+    """Reverse of _compact_primitive()."""
+    if isinstance(value, dict):
+        if _is_escaped(value):
+            value = value[_ESCAPED_KEY]
+        elif _is_compact(value):
+            compact = value[_COMPACT_KEY]
+            primitive = {
+                'nova_object.name': compact[0],
+                'nova_object.namespace': NovaObject.OBJ_PROJECT_NAMESPACE,
+                'nova_object.version': compact[1],
+                'nova_object.data': _expand_primitive(compact[2])}
+            if len(compact) > 3:
+                primitive['nova_object.changes'] = compact[3]
+            return primitive
+        return {k: _expand_primitive(v) for k, v in six.iteritems(value)}
+    elif isinstance(value, (list, tuple)):
+        return [_expand_primitive(v) for v in value]
+    return value
+
+
 class NovaObjectSerializer(messaging.NoOpSerializer):
     """A NovaObject-aware Serializer.
 
@@ -312,13 +404,23 @@ class NovaObjectSerializer(messaging.NoOpSerializer):
         if isinstance(entity, (tuple, list, set, dict)):
             entity = self._process_iterable(context, self.serialize_entity,
                                             entity)
+            if CONF.compact_object_serialization and isinstance(entity,
+                                                                dict):
+                entity = _escape_dict(entity)
         elif (hasattr(entity, 'obj_to_primitive') and
               callable(entity.obj_to_primitive)):
             entity = entity.obj_to_primitive()
+            if CONF.compact_object_serialization:
+                entity = _compact_primitive(entity)
         return entity
 
     def deserialize_entity(self, context, entity):
-        if isinstance(entity, dict) and 'nova_object.name' in entity:
+        if _is_escaped(entity):
+            entity = self._process_iterable(context, self.deserialize_entity,
+                                            entity[_ESCAPED_KEY])
+        elif _is_compact(entity):
+            entity = self._process_object(context, _expand_primitive(entity))
+        elif isinstance(entity, dict) and 'nova_object.name' in entity:
             entity = self._process_object(context, entity)
         elif isinstance(entity, (tuple, list, set, dict)):
             entity = self._process_iterable(context, self.deserialize_entity,
@@ -348,6 +450,53 @@ def obj_to_primitive(obj):
         return obj
 
 
+# The field classes whose coerce() returns values of the given types as they
+# are. Values of those types, as most of the values read from the database
+# are, can be stored without going through coerce().
+_UNCOERCED_FIELD_TYPES = {
+    obj_fields.BooleanField: (bool,),
+    obj_fields.FloatField: (float,),
+    obj_fields.IntegerField: (int,),
+    obj_fields.StringField: (six.text_type,),
+}
+
+
+def _get_uncoerced_types(cls):
+    """Return the value types each field of cls stores without coercion."""
+    # Look the cache up in the class itself, as subclasses may have other
+    # fields than their parents.
+    types = cls.__dict__.get('_obj_uncoerced_types')
+    if types is None:
+        types = {}
+        for name, field in six.iteritems(cls.fields):
+            if field.read_only:
+                types[name] = ()
+                continue
+            types[name] = _UNCOERCED_FIELD_TYPES.get(type(field), ())
+            if field.nullable:
+                types[name] += (type(None),)
+        cls._obj_uncoerced_types = types
+    return types
+
+
+def obj_set_db_fields(obj, db_obj, field_names):
+    """Set the fields of obj named in field_names from db_obj.
+
+    This is equivalent to setting each field in turn, but the values which
+    coercion would not change are stored directly, skipping the field
+    setters. This is meant for hydrating many objects from the database.
+    """
+    types = _get_uncoerced_types(obj.__class__)
+    changed_fields = obj._changed_fields
+    for name in field_names:
+        value = db_obj[name]
+        if type(value) in types[name]:
+            setattr(obj, get_attrname(name), value)
+            changed_fields.add(name)
+        else:
+            setattr(obj, name, value)
+
+
 def obj_make_list(context, list_obj, item_cls, db_list, **extra_args):
     """Construct an object list from a list of primitives.
 
@@ -361,11 +510,9 @@ def obj_make_list(context, list_obj, item_cls, db_list, **extra_args):
     :param:extra_args: Extra arguments to pass to _from_db_object()
     :returns: list_obj
     """
-    list_obj.objects = []
-    for db_item in db_list:
-        item = item_cls._from_db_object(context, item_cls(), db_item,
-                                        **extra_args)
-        list_obj.objects.append(item)
+    list_obj.objects = [item_cls._from_db_object(context, item_cls(), db_item,
+                                                 **extra_args)
+                        for db_item in db_list]
     list_obj._context = context
     list_obj.obj_reset_changes()
     return list_obj
@@ -58,6 +58,21 @@ INSTANCE_DEFAULT_FIELDS = ['metadata', 'system_metadata',
                            'info_cache', 'security_groups']
 
 
+# The fields read as they are from the database, by Instance class
+_DB_FIELD_NAMES = {}
+
+
+def _get_db_field_names(cls):
+    try:
+        return _DB_FIELD_NAMES[cls]
+    except KeyError:
+        names = [field for field in cls.fields
+                 if field not in INSTANCE_OPTIONAL_ATTRS and
+                 field not in ('deleted', 'cleaned', 'scheduled_at')]
+        _DB_FIELD_NAMES[cls] = names
+        return names
+
+
 def _expected_cols(expected_attrs):
     """Return expected_attrs that are columns needing joining.
 
@@ -268,17 +283,12 @@ class _BaseInstance(base.NovaPersistentObject, base.NovaObject,
         if expected_attrs is None:
             expected_attrs = []
         # Most of the field names match right now, so be quick
-        for field in instance.fields:
-            if field in INSTANCE_OPTIONAL_ATTRS:
-                continue
-            elif field == 'deleted':
-                instance.deleted = db_inst['deleted'] == db_inst['id']
-            elif field == 'cleaned':
-                instance.cleaned = db_inst['cleaned'] == 1
-            elif field == 'scheduled_at':
-                instance.scheduled_at = None
-            else:
-                instance[field] = db_inst[field]
+        base.obj_set_db_fields(instance, db_inst,
+                               _get_db_field_names(instance.__class__))
+        instance.deleted = db_inst['deleted'] == db_inst['id']
+        instance.cleaned = db_inst['cleaned'] == 1
+        if 'scheduled_at' in instance.fields:
+            instance.scheduled_at = None
 
         # NOTE(danms): We can be called with a dict instead of a
         # SQLAlchemy object, so we have to be careful here
@@ -1136,6 +1146,50 @@ class _BaseInstanceList(base.ObjectListBase, base.NovaObject):
         return _make_instance_list(context, cls(), db_inst_list,
                                    expected_attrs)
 
+    @classmethod
+    def iter_by_filters(cls, context, filters, sort_keys=None,
+                        sort_dirs=None, marker=None, expected_attrs=None,
+                        use_slave=False, batch_size=1000):
+        """Yield the Instance objects matching the filters.
+
+        The instances are read batch_size at a time, so that iterating over
+        many instances only holds one batch of them in memory. Without
+        direct access to the database, the batches are read through
+        get_by_filters(). The instances are sorted by creation time and id
+        by default.
+        """
+        if batch_size < 1:
+            raise ValueError('batch_size must be at least 1, got %r' %
+                             batch_size)
+        sort_keys = sort_keys or ['created_at', 'id']
+
+        def _copy(attrs):
+            # _make_instance_list() modifies the list of expected attributes
+            return list(attrs) if attrs is not None else None
+
+        if cls.indirection_api:
+            while True:
+                inst_list = cls.get_by_filters(
+                    context, filters, limit=batch_size, marker=marker,
+                    expected_attrs=_copy(expected_attrs),
+                    use_slave=use_slave, sort_keys=sort_keys,
+                    sort_dirs=sort_dirs)
+                for instance in inst_list:
+                    yield instance
+                if len(inst_list) < batch_size:
+                    return
+                marker = inst_list[-1].uuid
+
+        for db_inst_list in db.instance_get_all_by_filters_sort_batched(
+                context, filters, batch_size, marker=marker,
+                columns_to_join=_expected_cols(_copy(expected_attrs)),
+                use_slave=use_slave, sort_keys=sort_keys,
+                sort_dirs=sort_dirs):
+            inst_list = _make_instance_list(context, cls(), db_inst_list,
+                                            _copy(expected_attrs))
+            for instance in inst_list:
+                yield instance
+
     @base.remotable_classmethod
     def get_by_host(cls, context, host, expected_attrs=None, use_slave=False):
         db_inst_list = db.instance_get_all_by_host(
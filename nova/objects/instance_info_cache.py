@@ -118,3 +118,40 @@ class InstanceInfoCache(base.NovaPersistentObject, base.NovaObject,
                 self[field] = current[field]
 
         self.obj_reset_changes()
+
+
+@base.NovaObjectRegistry.register
+class InstanceInfoCacheList(base.ObjectListBase, base.NovaObject):
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'objects': fields.ListOfObjectsField('InstanceInfoCache'),
+        }
+    obj_relationships = {
+        'objects': [('1.0', '1.5')],
+        }
+
+    @base.remotable
+    def save(self):
+        """Save the changed network info of all the info caches in a single
+        database transaction. Unlike InstanceInfoCache.save(), the cells are
+        not updated.
+        """
+        values_by_uuid = {}
+        for info_cache in self.objects:
+            if 'network_info' in info_cache.obj_what_changed():
+                nw_info_json = info_cache.fields['network_info'].to_primitive(
+                    info_cache, 'network_info', info_cache.network_info)
+                values_by_uuid[info_cache.instance_uuid] = {
+                    'network_info': nw_info_json}
+        db_objs = db.instance_info_cache_update_many(self._context,
+                                                     values_by_uuid)
+        db_objs = {db_obj['instance_uuid']: db_obj for db_obj in db_objs}
+        for info_cache in self.objects:
+            db_obj = db_objs.get(info_cache.instance_uuid)
+            if db_obj is not None:
+                info_cache._from_db_object(self._context, info_cache, db_obj)
+            else:
+                info_cache.obj_reset_changes()
+        self.obj_reset_changes()
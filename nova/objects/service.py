@@ -28,7 +28,7 @@ LOG = logging.getLogger(__name__)
 
 
 # NOTE(danms): This is the global service version counter
-SERVICE_VERSION = 2
+SERVICE_VERSION = 3
 
 
 # NOTE(danms): This is our SERVICE_VERSION history. The idea is that any
@@ -56,6 +56,8 @@ SERVICE_VERSION_HISTORY = (
     {'compute_rpc': '4.4'},
     # Version 2: Changes to rebuild_instance signature in the compute_rpc
     {'compute_rpc': '4.5'},
+    # Version 3: Add precache_image() to the compute_rpc
+    {'compute_rpc': '4.6'},
 )
 
 
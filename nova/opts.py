@@ -44,6 +44,7 @@ import nova.keymgr.barbican
 import nova.keymgr.conf_key_mgr
 import nova.netconf
 import nova.notifications
+import nova.objects.base
 import nova.objects.network
 import nova.objectstore.s3server
 import nova.paths
@@ -90,6 +91,7 @@ def list_opts():
              nova.image.s3.s3_opts,
              nova.netconf.netconf_opts,
              nova.notifications.notify_opts,
+             nova.objects.base.serializer_opts,
              nova.objects.network.network_opts,
              nova.objectstore.s3server.s3_opts,
              nova.paths.path_opts,
@@ -96,6 +96,21 @@ quota_opts = [
     cfg.StrOpt('quota_driver',
                default='nova.quota.DbQuotaDriver',
                help='Default driver to use for quota checks'),
+    cfg.StrOpt('quota_reserve_strategy',
+               default='locking',
+               choices=('locking', 'optimistic'),
+               help='How the database quota driver reserves resources. '
+                    '"locking" locks the quota usages of the project while '
+                    'reserving. "optimistic" does not lock them, and only '
+                    'creates the reservations if the usages did not change '
+                    'in the meantime, retrying otherwise. The optimistic '
+                    'strategy avoids serializing the reservations of busy '
+                    'projects, and the deadlocks this can cause.'),
+    cfg.IntOpt('quota_reserve_max_retries',
+               default=10,
+               help='Number of times an optimistic reservation is retried '
+                    'when the quota usages changed concurrently, before '
+                    'falling back to locking them.'),
     ]
 
 CONF = cfg.CONF
@@ -577,6 +592,11 @@ class DbQuotaDriver(object):
         #            which means access to the session.  Since the
         #            session isn't available outside the DBAPI, we
         #            have to do the work there.
+        if CONF.quota_reserve_strategy == 'optimistic':
+            return db.quota_reserve_optimistic(
+                context, resources, quotas, user_quotas, deltas, expire,
+                CONF.until_refresh, CONF.max_age, project_id=project_id,
+                user_id=user_id, max_retries=CONF.quota_reserve_max_retries)
         return db.quota_reserve(context, resources, quotas, user_quotas,
                                 deltas, expire,
                                 CONF.until_refresh, CONF.max_age,
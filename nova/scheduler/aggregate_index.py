@@ -0,0 +1,142 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Index of the aggregate metadata of the hosts.
+
+The aggregate-based filters used to merge the metadata of the aggregates of
+each host for each request. The HostManager instead keeps an
+AggregateMetadataIndex up to date when the aggregates change, which holds the
+merged metadata of each host, and the hosts having each metadata key and
+value, so that those filters can select the hosts of a request with a few
+set operations.
+"""
+
+import collections
+
+import six
+
+
+class AggregateMetadataIndex(object):
+    """Merged aggregate metadata of each host, and its inverted index.
+
+    As in nova.scheduler.filters.utils, the merged metadata of a host is a
+    dict of the sets of values of each key, where the comma separated values
+    are split. The returned dicts and sets are shared, they must not be
+    modified.
+    """
+
+    def __init__(self):
+        # Aggregates of the hosts whose metadata has to be reindexed before
+        # the next lookup, keyed by host name
+        self._pending = {}
+        # Merged metadata dict of each host, keyed by host name
+        self._metadata = {}
+        # Merged metadata of the aggregates of a host having a given key,
+        # keyed by (host name, key)
+        self._metadata_with_key = {}
+        # Set of the unsplit values of a key, keyed by (host name, key)
+        self._raw_values = {}
+        # Sets of host names, keyed by metadata key then by value
+        self._hosts_by_value = collections.defaultdict(
+            lambda: collections.defaultdict(set))
+        # Set of host names having each metadata key
+        self._hosts_by_key = collections.defaultdict(set)
+
+    @staticmethod
+    def _merge(aggregates):
+        metadata = collections.defaultdict(set)
+        for aggregate in aggregates:
+            for key, value in six.iteritems(aggregate.metadata):
+                metadata[key].update(x.strip() for x in value.split(','))
+        return dict(metadata)
+
+    def _remove_host(self, host):
+        metadata = self._metadata.pop(host, {})
+        for key, values in six.iteritems(metadata):
+            self._hosts_by_key[key].discard(host)
+            if not self._hosts_by_key[key]:
+                del self._hosts_by_key[key]
+            hosts_by_value = self._hosts_by_value[key]
+            for value in values:
+                hosts_by_value[value].discard(host)
+                if not hosts_by_value[value]:
+                    del hosts_by_value[value]
+            if not hosts_by_value:
+                del self._hosts_by_value[key]
+            self._metadata_with_key.pop((host, key), None)
+            self._raw_values.pop((host, key), None)
+
+    def update_host(self, host, aggregates):
+        """Sets the aggregates the host belongs to.
+
+        Their metadata is only indexed on the next lookup, so that a burst
+        of aggregate updates doesn't reindex the same hosts over and over.
+        """
+        self._pending[host] = list(aggregates)
+
+    def _refresh(self):
+        while self._pending:
+            host, aggregates = self._pending.popitem()
+            self._index_host(host, aggregates)
+
+    def _index_host(self, host, aggregates):
+        self._remove_host(host)
+        if not aggregates:
+            return
+
+        metadata = self._merge(aggregates)
+        self._metadata[host] = metadata
+        for key, values in six.iteritems(metadata):
+            self._hosts_by_key[key].add(host)
+            for value in values:
+                self._hosts_by_value[key][value].add(host)
+            with_key = [aggregate for aggregate in aggregates
+                        if key in aggregate.metadata]
+            self._metadata_with_key[(host, key)] = self._merge(with_key)
+            self._raw_values[(host, key)] = set(
+                aggregate.metadata[key] for aggregate in with_key)
+
+    def metadata(self, host, key=None):
+        """Returns the merged metadata of the aggregates of the host. If key
+        is set, only the aggregates having that key are merged.
+        """
+        self._refresh()
+        if key is None:
+            return self._metadata.get(host, {})
+        return self._metadata_with_key.get((host, key), {})
+
+    def raw_values(self, host, key):
+        """Returns the set of values of key in the aggregates of the host."""
+        self._refresh()
+        return self._raw_values.get((host, key), set())
+
+    def hosts_with_key(self, key):
+        """Returns the set of hosts having the metadata key."""
+        self._refresh()
+        return self._hosts_by_key.get(key, set())
+
+    def hosts_with_value(self, key, value):
+        """Returns the set of hosts having value among the values of key."""
+        self._refresh()
+        hosts_by_value = self._hosts_by_value.get(key)
+        if not hosts_by_value:
+            return set()
+        return hosts_by_value.get(value, set())
+
+    def values(self, key):
+        """Returns the values of key among all the hosts."""
+        self._refresh()
+        hosts_by_value = self._hosts_by_value.get(key)
+        if not hosts_by_value:
+            return []
+        return list(hosts_by_value)
@@ -68,5 +68,10 @@ class SchedulerClient(object):
         self.queryclient.delete_instance_info(context, host_name,
                                               instance_uuid)
 
+    def update_instance_info_batch(self, context, host_name, instance_info,
+                                   deleted_instance_uuids):
+        self.queryclient.update_instance_info_batch(
+            context, host_name, instance_info, deleted_instance_uuids)
+
     def sync_instance_info(self, context, host_name, instance_uuids):
         self.queryclient.sync_instance_info(context, host_name, instance_uuids)
@@ -72,6 +72,20 @@ class SchedulerQueryClient(object):
         self.scheduler_rpcapi.delete_instance_info(context, host_name,
                                                    instance_uuid)
 
+    def update_instance_info_batch(self, context, host_name, instance_info,
+                                   deleted_instance_uuids):
+        """Updates the HostManager with the instances which have been created
+        or updated, and those which have been deleted, on a host.
+
+        :param context: local context
+        :param host_name: name of host sending the update
+        :param instance_info: an InstanceList object of the created or
+                              updated instances.
+        :param deleted_instance_uuids: the uuids of the deleted instances
+        """
+        self.scheduler_rpcapi.update_instance_info_batch(
+            context, host_name, instance_info, deleted_instance_uuids)
+
     def sync_instance_info(self, context, host_name, instance_uuids):
         """Notifies the HostManager of the current instances on a host by
         sending a list of the uuids for those instances. The HostManager can
@@ -13,13 +13,49 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
+from oslo_config import cfg
+
+from nova import context as nova_context
+from nova import objects
+from nova.scheduler import rpcapi as scheduler_rpcapi
+
+CONF = cfg.CONF
+CONF.import_opt('scheduler_tracks_compute_changes',
+                'nova.scheduler.host_manager')
+
 
 class SchedulerReportClient(object):
     """Client class for updating the scheduler."""
 
+    def __init__(self):
+        self.scheduler_rpcapi = scheduler_rpcapi.SchedulerAPI()
+        # Generation of the last update sent, keyed by (host, node)
+        self._generations = collections.defaultdict(int)
+
     def update_resource_stats(self, compute_node):
         """Creates or updates stats for the supplied compute node.
 
         :param compute_node: updated nova.objects.ComputeNode to report
         """
+        changes = compute_node.obj_what_changed()
         compute_node.save()
+        if CONF.scheduler_tracks_compute_changes:
+            self._send_compute_node_update(compute_node, changes)
+
+    def _send_compute_node_update(self, compute_node, changes):
+        """Sends the fields of the compute node which changed to the
+        schedulers, along with a generation incremented on each update.
+        """
+        state_key = (compute_node.host, compute_node.hypervisor_hostname)
+        update = objects.ComputeNode(host=state_key[0],
+                                     hypervisor_hostname=state_key[1])
+        # updated_at is set by the DB when saving
+        for field in changes | set(['updated_at']):
+            if compute_node.obj_attr_is_set(field):
+                setattr(update, field, getattr(compute_node, field))
+        self._generations[state_key] += 1
+        context = nova_context.get_admin_context()
+        self.scheduler_rpcapi.update_compute_node(
+            context, update, self._generations[state_key])
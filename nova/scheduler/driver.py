@@ -24,6 +24,7 @@ from oslo_utils import importutils
 
 from nova import db
 from nova.i18n import _
+from nova.scheduler import tracing
 from nova import servicegroup
 
 scheduler_driver_opts = [
@@ -43,11 +44,16 @@ class Scheduler(object):
         self.host_manager = importutils.import_object(
                 CONF.scheduler_host_manager)
         self.servicegroup_api = servicegroup.API()
+        self.tracer = tracing.SchedulerTracer()
 
     def run_periodic_tasks(self, context):
         """Manager calls this so drivers can perform periodic tasks."""
         pass
 
+    def get_traces(self, context):
+        """Return the traces of the last scheduling decisions."""
+        return self.tracer.get_report()
+
     def hosts_up(self, context, topic):
         """Return the list of hosts that have a running service for topic."""
 
@@ -19,6 +19,7 @@ You can customize this scheduler by specifying your own Host Filters and
 Weighing Functions.
 """
 
+import heapq
 import random
 
 from oslo_config import cfg
@@ -31,6 +32,7 @@ from nova import objects
 from nova import rpc
 from nova.scheduler import driver
 from nova.scheduler import scheduler_options
+from nova.scheduler import tracing
 
 
 CONF = cfg.CONF
@@ -46,7 +48,15 @@ filter_scheduler_opts = [
                     'chosen from. A value of 1 chooses the '
                     'first host returned by the weighing functions. '
                     'This value must be at least 1. Any value less than 1 '
-                    'will be ignored, and 1 will be used instead')
+                    'will be ignored, and 1 will be used instead'),
+    cfg.BoolOpt('scheduler_bulk_placement',
+                default=False,
+                help='Place all the instances of a multi-create request '
+                     'from a single filtering and weighing pass. Only the '
+                     'hosts chosen for an instance are filtered and weighed '
+                     'again before the next instance is placed, instead of '
+                     'all of the hosts. This does not apply to requests '
+                     'using server groups or forcing hosts or nodes.'),
 ]
 
 CONF.register_opts(filter_scheduler_opts)
@@ -65,8 +75,12 @@ class FilterScheduler(driver.Scheduler):
                            dict(request_spec=request_spec))
 
         num_instances = request_spec['num_instances']
-        selected_hosts = self._schedule(context, request_spec,
-                                        filter_properties)
+        trace = self.tracer.start_trace(context.request_id)
+        try:
+            selected_hosts = self._schedule(context, request_spec,
+                                            filter_properties, trace=trace)
+        finally:
+            self.tracer.finish_trace(trace)
 
         # Couldn't fulfill the request_spec
         if len(selected_hosts) < num_instances:
@@ -100,9 +114,13 @@ class FilterScheduler(driver.Scheduler):
         """Fetch options dictionary. Broken out for testing."""
         return self.options.get_configuration()
 
-    def _schedule(self, context, request_spec, filter_properties):
+    def _schedule(self, context, request_spec, filter_properties,
+                  trace=None):
         """Returns a list of hosts that meet the required specs,
         ordered by their fitness.
+
+        If trace is set, the time spent in each step of the decision is
+        recorded in it.
         """
         elevated = context.elevated()
         instance_properties = request_spec['instance_properties']
@@ -121,6 +139,12 @@ class FilterScheduler(driver.Scheduler):
         instance_type = request_spec.get("instance_type", None)
 
         update_group_hosts = filter_properties.get('group_updated', False)
+        group_members = filter_properties.get('group_members')
+        if group_members:
+            group_hosts = set(filter_properties.get('group_hosts') or [])
+            group_hosts |= self.host_manager.get_group_hosts(elevated,
+                                                             group_members)
+            filter_properties['group_hosts'] = group_hosts
 
         config_options = self._get_configuration_options()
 
@@ -137,30 +161,43 @@ class FilterScheduler(driver.Scheduler):
         # Note: remember, we are using an iterator here. So only
         # traverse this list once. This can bite you if the hosts
         # are being scanned in a filter or weighing function.
-        hosts = self._get_all_host_states(elevated)
+        with tracing.span(trace, 'get_all_host_states'):
+            hosts = self._get_all_host_states(elevated)
 
         selected_hosts = []
         num_instances = request_spec.get('num_instances', 1)
+        if trace is not None:
+            trace.count('instances', num_instances)
+            retry = filter_properties.get('retry') or {}
+            trace.count('attempts', retry.get('num_attempts', 1))
+        if self._can_schedule_in_bulk(filter_properties, num_instances):
+            return self._schedule_in_bulk(hosts, filter_properties,
+                                          instance_properties, num_instances,
+                                          trace=trace)
         for num in range(num_instances):
             # Filter local hosts based on requirements ...
             hosts = self.host_manager.get_filtered_hosts(hosts,
-                    filter_properties, index=num)
+                    filter_properties, index=num, trace=trace)
             if not hosts:
                 # Can't get any more locally.
                 break
 
             LOG.debug("Filtered %(hosts)s", {'hosts': hosts})
 
+            scheduler_host_subset_size = CONF.scheduler_host_subset_size
+            if scheduler_host_subset_size < 1:
+                scheduler_host_subset_size = 1
+
+            # Only the best hosts of the subset are needed, which spares
+            # sorting all of the weighed hosts.
             weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
-                    filter_properties)
+                    filter_properties, max_hosts=scheduler_host_subset_size,
+                    trace=trace)
 
             LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
 
-            scheduler_host_subset_size = CONF.scheduler_host_subset_size
             if scheduler_host_subset_size > len(weighed_hosts):
                 scheduler_host_subset_size = len(weighed_hosts)
-            if scheduler_host_subset_size < 1:
-                scheduler_host_subset_size = 1
 
             chosen_host = random.choice(
                 weighed_hosts[0:scheduler_host_subset_size])
@@ -170,6 +207,8 @@ class FilterScheduler(driver.Scheduler):
             # Now consume the resources so the filter/weights
             # will change for the next instance.
             chosen_host.obj.consume_from_instance(instance_properties)
+            if trace is not None:
+                trace.count('consumed')
             if update_group_hosts is True:
                 # NOTE(sbauza): Group details are serialized into a list now
                 # that they are populated by the conductor, we need to
@@ -180,6 +219,83 @@ class FilterScheduler(driver.Scheduler):
                 filter_properties['group_hosts'].add(chosen_host.obj.host)
         return selected_hosts
 
+    @staticmethod
+    def _can_schedule_in_bulk(filter_properties, num_instances):
+        # Server groups update the group hosts after each instance, and
+        # forced hosts skip the filters, so both need the serial placement.
+        return (CONF.scheduler_bulk_placement and num_instances > 1 and
+                not filter_properties.get('group_updated') and
+                not filter_properties.get('force_hosts') and
+                not filter_properties.get('force_nodes'))
+
+    def _schedule_in_bulk(self, hosts, filter_properties, instance_properties,
+                          num_instances, trace=None):
+        """Returns a list of hosts for num_instances instances, filtering
+        and weighing all the hosts only once.
+
+        The weighed hosts are kept in a heap. Once a host is chosen and its
+        resources consumed, only this host is filtered and weighed again
+        before being pushed back in the heap, so that placing N instances
+        over H hosts costs O(H + N log H) filter and weigher runs instead of
+        O(N * H). The weight of a consumed host is normalized against the
+        ranges recorded when weighing all the hosts.
+        """
+        hosts = self.host_manager.get_filtered_hosts(hosts,
+                filter_properties, index=0, trace=trace)
+        if not hosts:
+            return []
+
+        LOG.debug("Filtered %(hosts)s", {'hosts': hosts})
+
+        weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
+                filter_properties, trace=trace)
+
+        LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
+
+        scheduler_host_subset_size = max(CONF.scheduler_host_subset_size, 1)
+
+        # heapq is a min-heap, hence the negated weights. The counter keeps
+        # the order of the hosts with the same weight, and the hosts are
+        # sorted already so the list is a valid heap.
+        heap = [(-weighed_host.weight, count, weighed_host)
+                for count, weighed_host in enumerate(weighed_hosts)]
+        counter = len(heap)
+        selected_hosts = []
+        for num in range(num_instances):
+            if not heap:
+                # Can't get any more locally.
+                break
+
+            best = [heapq.heappop(heap)
+                    for i in range(min(scheduler_host_subset_size,
+                                       len(heap)))]
+            chosen = random.choice(best)
+            for entry in best:
+                if entry is not chosen:
+                    heapq.heappush(heap, entry)
+
+            chosen_host = chosen[2]
+            LOG.debug("Selected host: %(host)s", {'host': chosen_host})
+            selected_hosts.append(chosen_host)
+
+            # Now consume the resources so the filters and weights of this
+            # host will change for the next instance.
+            chosen_host.obj.consume_from_instance(instance_properties)
+            if trace is not None:
+                trace.count('consumed')
+
+            next_num = num + 1
+            if next_num == num_instances:
+                break
+            if not self.host_manager.host_passes_filters(chosen_host.obj,
+                    filter_properties, index=next_num):
+                continue
+            weighed_host = self.host_manager.get_weighed_host(
+                chosen_host.obj, filter_properties)
+            heapq.heappush(heap, (-weighed_host.weight, counter, weighed_host))
+            counter += 1
+        return selected_hosts
+
     def _get_all_host_states(self, context):
         """Template method, so a subclass can implement caching."""
         return self.host_manager.get_all_host_states(context)
@@ -18,10 +18,13 @@ Scheduler host filters
 """
 
 from nova import filters
+from nova.scheduler import host_snapshot
 
 
 class BaseHostFilter(filters.BaseFilter):
     """Base class for host filters."""
+    _object_methods = filters.BaseFilter._object_methods + ('host_passes',)
+
     def _filter_one(self, obj, filter_properties):
         """Return True if the object passes the filter, otherwise False."""
         return self.host_passes(obj, filter_properties)
@@ -37,6 +40,9 @@ class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
         super(HostFilterHandler, self).__init__(BaseHostFilter)
 
+    def get_snapshot(self, objs):
+        return host_snapshot.HostStateSnapshot(objs)
+
 
 def all_filters():
     """Return a list of filter classes found in this directory.
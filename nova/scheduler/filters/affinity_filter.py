@@ -87,6 +87,9 @@ class _GroupAntiAffinityFilter(filters.BaseHostFilter):
     """Schedule the instance on a different host from a set of group
     hosts.
     """
+
+    supports_batch = True
+
     def host_passes(self, host_state, filter_properties):
         # Only invoke the filter is 'anti-affinity' is configured
         policies = filter_properties.get('group_policies', [])
@@ -103,6 +106,17 @@ class _GroupAntiAffinityFilter(filters.BaseHostFilter):
         # No groups configured
         return True
 
+    def filter_mask(self, snapshot, filter_properties):
+        policies = filter_properties.get('group_policies', [])
+        group_hosts = filter_properties.get('group_hosts')
+        if self.policy_name not in policies or not group_hosts:
+            return [True] * len(snapshot)
+
+        # The group hosts may have been deserialized as a list
+        group_hosts = set(group_hosts)
+        return [host_state.host not in group_hosts
+                for host_state in snapshot]
+
 
 class ServerGroupAntiAffinityFilter(_GroupAntiAffinityFilter):
     def __init__(self):
@@ -113,6 +127,9 @@ class ServerGroupAntiAffinityFilter(_GroupAntiAffinityFilter):
 class _GroupAffinityFilter(filters.BaseHostFilter):
     """Schedule the instance on to host from a set of group hosts.
     """
+
+    supports_batch = True
+
     def host_passes(self, host_state, filter_properties):
         # Only invoke the filter is 'affinity' is configured
         policies = filter_properties.get('group_policies', [])
@@ -129,6 +146,16 @@ class _GroupAffinityFilter(filters.BaseHostFilter):
         # No groups configured
         return True
 
+    def filter_mask(self, snapshot, filter_properties):
+        policies = filter_properties.get('group_policies', [])
+        group_hosts = filter_properties.get('group_hosts')
+        if self.policy_name not in policies or not group_hosts:
+            return [True] * len(snapshot)
+
+        # The group hosts may have been deserialized as a list
+        group_hosts = set(group_hosts)
+        return [host_state.host in group_hosts for host_state in snapshot]
+
 
 class ServerGroupAffinityFilter(_GroupAffinityFilter):
     def __init__(self):
@@ -40,6 +40,8 @@ class AggregateImagePropertiesIsolation(filters.BaseHostFilter):
     # Aggregate data and instance type does not change within a request
     run_filter_once_per_request = True
 
+    supports_batch = True
+
     def host_passes(self, host_state, filter_properties):
         """Checks a host in an aggregate that metadata key/value match
         with image properties.
@@ -65,3 +67,32 @@ class AggregateImagePropertiesIsolation(filters.BaseHostFilter):
                            'options': options})
                 return False
         return True
+
+    def filter_mask(self, snapshot, filter_properties):
+        index = utils.get_aggregate_index(snapshot)
+        if index is None:
+            return [self.host_passes(host_state, filter_properties)
+                    for host_state in snapshot]
+
+        cfg_namespace = CONF.aggregate_image_properties_isolation_namespace
+        cfg_separator = CONF.aggregate_image_properties_isolation_separator
+
+        spec = filter_properties.get('request_spec', {})
+        image_props = spec.get('image', {}).get('properties', {})
+
+        # A host fails when one of its aggregates has a key of the image
+        # properties, while none of them has the value of the property
+        failing = set()
+        for key, prop in six.iteritems(image_props):
+            if not prop:
+                continue
+            if (cfg_namespace and
+                    not key.startswith(cfg_namespace + cfg_separator)):
+                continue
+            failing |= (index.hosts_with_key(key) -
+                        index.hosts_with_value(key, prop))
+        mask = [host_state.host not in failing for host_state in snapshot]
+        LOG.debug("%(passed)d of %(total)d hosts match the image aggregate "
+                  "properties requirements.",
+                  {'passed': mask.count(True), 'total': len(mask)})
+        return mask
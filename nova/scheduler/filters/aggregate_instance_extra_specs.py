@@ -33,6 +33,23 @@ class AggregateInstanceExtraSpecsFilter(filters.BaseHostFilter):
     # Aggregate data and instance type does not change within a request
     run_filter_once_per_request = True
 
+    supports_batch = True
+
+    @staticmethod
+    def _get_extra_specs(instance_type):
+        """Yields the (key, requirement) pairs of the extra specs checked
+        against the aggregate metadata.
+        """
+        for key, req in six.iteritems(instance_type['extra_specs']):
+            # Either not scope format, or aggregate_instance_extra_specs scope
+            scope = key.split(':', 1)
+            if len(scope) > 1:
+                if scope[0] != _SCOPE:
+                    continue
+                else:
+                    del scope[0]
+            yield scope[0], req
+
     def host_passes(self, host_state, filter_properties):
         """Return a list of hosts that can create instance_type
 
@@ -45,15 +62,7 @@ class AggregateInstanceExtraSpecsFilter(filters.BaseHostFilter):
 
         metadata = utils.aggregate_metadata_get_by_host(host_state)
 
-        for key, req in six.iteritems(instance_type['extra_specs']):
-            # Either not scope format, or aggregate_instance_extra_specs scope
-            scope = key.split(':', 1)
-            if len(scope) > 1:
-                if scope[0] != _SCOPE:
-                    continue
-                else:
-                    del scope[0]
-            key = scope[0]
+        for key, req in self._get_extra_specs(instance_type):
             aggregate_vals = metadata.get(key, None)
             if not aggregate_vals:
                 LOG.debug("%(host_state)s fails instance_type extra_specs "
@@ -71,3 +80,31 @@ class AggregateInstanceExtraSpecsFilter(filters.BaseHostFilter):
                            'aggregate_vals': aggregate_vals})
                 return False
         return True
+
+    def filter_mask(self, snapshot, filter_properties):
+        instance_type = filter_properties.get('instance_type')
+        if 'extra_specs' not in instance_type:
+            return [True] * len(snapshot)
+
+        index = utils.get_aggregate_index(snapshot)
+        if index is None:
+            return [self.host_passes(host_state, filter_properties)
+                    for host_state in snapshot]
+
+        # Each distinct value is only matched once, rather than once per
+        # host having it
+        passing = None
+        for key, req in self._get_extra_specs(instance_type):
+            matching = set()
+            for value in index.values(key):
+                if extra_specs_ops.match(value, req):
+                    matching |= index.hosts_with_value(key, value)
+            passing = matching if passing is None else passing & matching
+        if passing is None:
+            return [True] * len(snapshot)
+
+        mask = [host_state.host in passing for host_state in snapshot]
+        LOG.debug("%(passed)d of %(total)d hosts match the instance_type "
+                  "extra_specs requirements.",
+                  {'passed': mask.count(True), 'total': len(mask)})
+        return mask
@@ -28,6 +28,14 @@ class AggregateMultiTenancyIsolation(filters.BaseHostFilter):
     # Aggregate data and tenant do not change within a request
     run_filter_once_per_request = True
 
+    supports_batch = True
+
+    @staticmethod
+    def _get_tenant_id(filter_properties):
+        spec = filter_properties.get('request_spec', {})
+        props = spec.get('instance_properties', {})
+        return props.get('project_id')
+
     def host_passes(self, host_state, filter_properties):
         """If a host is in an aggregate that has the metadata key
         "filter_tenant_id" it can only create instances from that tenant(s).
@@ -36,9 +44,7 @@ class AggregateMultiTenancyIsolation(filters.BaseHostFilter):
         If a host doesn't belong to an aggregate with the metadata key
         "filter_tenant_id" it can create instances from all tenants.
         """
-        spec = filter_properties.get('request_spec', {})
-        props = spec.get('instance_properties', {})
-        tenant_id = props.get('project_id')
+        tenant_id = self._get_tenant_id(filter_properties)
 
         metadata = utils.aggregate_metadata_get_by_host(host_state,
                                                         key="filter_tenant_id")
@@ -53,3 +59,19 @@ class AggregateMultiTenancyIsolation(filters.BaseHostFilter):
             else:
                 LOG.debug("No tenant id's defined on host. Host passes.")
         return True
+
+    def filter_mask(self, snapshot, filter_properties):
+        index = utils.get_aggregate_index(snapshot)
+        if index is None:
+            return [self.host_passes(host_state, filter_properties)
+                    for host_state in snapshot]
+
+        tenant_id = self._get_tenant_id(filter_properties)
+        isolated = index.hosts_with_key('filter_tenant_id')
+        allowed = index.hosts_with_value('filter_tenant_id', tenant_id)
+        mask = [host_state.host not in isolated or host_state.host in allowed
+                for host_state in snapshot]
+        LOG.debug("%(passed)d of %(total)d hosts accept tenant %(tenant)s.",
+                  {'passed': mask.count(True), 'total': len(mask),
+                   'tenant': tenant_id})
+        return mask
@@ -36,10 +36,16 @@ class AvailabilityZoneFilter(filters.BaseHostFilter):
     # Availability zones do not change within a request
     run_filter_once_per_request = True
 
-    def host_passes(self, host_state, filter_properties):
+    supports_batch = True
+
+    @staticmethod
+    def _get_availability_zone(filter_properties):
         spec = filter_properties.get('request_spec', {})
         props = spec.get('instance_properties', {})
-        availability_zone = props.get('availability_zone')
+        return props.get('availability_zone')
+
+    def host_passes(self, host_state, filter_properties):
+        availability_zone = self._get_availability_zone(filter_properties)
 
         if not availability_zone:
             return True
@@ -62,3 +68,29 @@ class AvailabilityZoneFilter(filters.BaseHostFilter):
                        'host_az': host_az})
 
         return hosts_passes
+
+    def filter_mask(self, snapshot, filter_properties):
+        availability_zone = self._get_availability_zone(filter_properties)
+        if not availability_zone:
+            return [True] * len(snapshot)
+
+        index = utils.get_aggregate_index(snapshot)
+        if index is None:
+            return [self.host_passes(host_state, filter_properties)
+                    for host_state in snapshot]
+
+        in_zone = index.hosts_with_value('availability_zone',
+                                         availability_zone)
+        if availability_zone == CONF.default_availability_zone:
+            # The hosts not in any availability zone are in the default one
+            in_other_zone = index.hosts_with_key('availability_zone')
+            mask = [host_state.host in in_zone or
+                    host_state.host not in in_other_zone
+                    for host_state in snapshot]
+        else:
+            mask = [host_state.host in in_zone for host_state in snapshot]
+        LOG.debug("%(passed)d of %(total)d hosts are in availability zone "
+                  "'%(az)s'.", {'passed': mask.count(True),
+                                'total': len(mask),
+                                'az': availability_zone})
+        return mask
@@ -34,6 +34,28 @@ class ComputeFilter(filters.BaseHostFilter):
     # Host state does not change within a request
     run_filter_once_per_request = True
 
+    def filter_all(self, filter_obj_list, filter_properties):
+        """Yield the hosts whose compute service is enabled and up.
+
+        The enabled services of all the hosts are checked with a single
+        call to the servicegroup API.
+        """
+        host_states = list(filter_obj_list)
+        services = [host_state.service for host_state in host_states
+                    if not host_state.service['disabled']]
+        up_service_ids = self.servicegroup_api.get_up_services(services)
+        for host_state in host_states:
+            service = host_state.service
+            if service['disabled']:
+                LOG.debug("%(host_state)s is disabled, reason: %(reason)s",
+                          {'host_state': host_state,
+                           'reason': service.get('disabled_reason')})
+            elif service['id'] not in up_service_ids:
+                LOG.warning(_LW("%(host_state)s has not been heard from in a "
+                                "while"), {'host_state': host_state})
+            else:
+                yield host_state
+
     def host_passes(self, host_state, filter_properties):
         """Returns True for only active compute nodes."""
         service = host_state.service
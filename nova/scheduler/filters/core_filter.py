@@ -26,9 +26,15 @@ LOG = logging.getLogger(__name__)
 
 class BaseCoreFilter(filters.BaseHostFilter):
 
+    supports_batch = True
+
     def _get_cpu_allocation_ratio(self, host_state, filter_properties):
         raise NotImplementedError
 
+    def _get_cpu_allocation_ratios(self, snapshot, filter_properties):
+        return [self._get_cpu_allocation_ratio(host_state, filter_properties)
+                for host_state in snapshot]
+
     def host_passes(self, host_state, filter_properties):
         """Return True if host has sufficient CPU cores."""
         instance_type = filter_properties.get('instance_type')
@@ -72,6 +78,50 @@ class BaseCoreFilter(filters.BaseHostFilter):
 
         return True
 
+    def filter_mask(self, snapshot, filter_properties):
+        """Return True for each host having sufficient CPU cores."""
+        instance_type = filter_properties.get('instance_type')
+        if not instance_type:
+            return [True] * len(snapshot)
+
+        instance_vcpus = instance_type['vcpus']
+        ratios = self._get_cpu_allocation_ratios(snapshot, filter_properties)
+
+        mask = []
+        broken_hosts = 0
+        for host_state, vcpus_total, vcpus_used, ratio in zip(
+                snapshot, snapshot['vcpus_total'], snapshot['vcpus_used'],
+                ratios):
+            if not vcpus_total:
+                # Fail safe
+                broken_hosts += 1
+                mask.append(True)
+                continue
+
+            vcpus_limit = vcpus_total * ratio
+            # Only provide a VCPU limit to compute if the virt driver is
+            # reporting an accurate count of installed VCPUs. (XenServer
+            # driver does not)
+            if vcpus_limit > 0:
+                host_state.limits['vcpu'] = vcpus_limit
+
+                # Do not allow an instance to overcommit against itself, only
+                # against other instances.
+                if instance_vcpus > vcpus_total:
+                    mask.append(False)
+                    continue
+
+            mask.append(vcpus_limit - vcpus_used >= instance_vcpus)
+
+        if broken_hosts:
+            LOG.warning(_LW("VCPUs not set on %d host(s); assuming CPU "
+                            "collection broken"), broken_hosts)
+        LOG.debug("%(passed)d of %(total)d hosts have %(instance_vcpus)d "
+                  "usable vcpus", {'passed': mask.count(True),
+                                   'total': len(mask),
+                                   'instance_vcpus': instance_vcpus})
+        return mask
+
 
 class CoreFilter(BaseCoreFilter):
     """CoreFilter filters based on CPU core utilization."""
@@ -79,6 +129,9 @@ class CoreFilter(BaseCoreFilter):
     def _get_cpu_allocation_ratio(self, host_state, filter_properties):
         return host_state.cpu_allocation_ratio
 
+    def _get_cpu_allocation_ratios(self, snapshot, filter_properties):
+        return snapshot['cpu_allocation_ratio']
+
 
 class AggregateCoreFilter(BaseCoreFilter):
     """AggregateCoreFilter with per-aggregate CPU subscription flag.
@@ -32,9 +32,14 @@ CONF.register_opt(disk_allocation_ratio_opt)
 class DiskFilter(filters.BaseHostFilter):
     """Disk Filter with over subscription flag."""
 
+    supports_batch = True
+
     def _get_disk_allocation_ratio(self, host_state, filter_properties):
         return CONF.disk_allocation_ratio
 
+    def _get_disk_allocation_ratios(self, snapshot, filter_properties):
+        return [CONF.disk_allocation_ratio] * len(snapshot)
+
     def host_passes(self, host_state, filter_properties):
         """Filter based on disk usage."""
         instance_type = filter_properties.get('instance_type')
@@ -64,6 +69,33 @@ class DiskFilter(filters.BaseHostFilter):
         host_state.limits['disk_gb'] = disk_gb_limit
         return True
 
+    def filter_mask(self, snapshot, filter_properties):
+        """Filter based on disk usage."""
+        instance_type = filter_properties.get('instance_type')
+        requested_disk = (1024 * (instance_type['root_gb'] +
+                                 instance_type['ephemeral_gb']) +
+                         instance_type['swap'])
+        ratios = self._get_disk_allocation_ratios(snapshot, filter_properties)
+
+        total_usable_disk_mbs = [total_usable_disk_gb * 1024
+                                 for total_usable_disk_gb
+                                 in snapshot['total_usable_disk_gb']]
+        limits = [total_usable_disk_mb * ratio for total_usable_disk_mb, ratio
+                  in zip(total_usable_disk_mbs, ratios)]
+        mask = [limit - (total_usable_disk_mb - free_disk_mb) >= requested_disk
+                for free_disk_mb, total_usable_disk_mb, limit
+                in zip(snapshot['free_disk_mb'], total_usable_disk_mbs,
+                       limits)]
+
+        for host_state, passes, limit in zip(snapshot, mask, limits):
+            if passes:
+                host_state.limits['disk_gb'] = limit / 1024
+        LOG.debug("%(passed)d of %(total)d hosts have %(requested_disk)s MB "
+                  "usable disk.", {'passed': mask.count(True),
+                                   'total': len(mask),
+                                   'requested_disk': requested_disk})
+        return mask
+
 
 class AggregateDiskFilter(DiskFilter):
     """AggregateDiskFilter with per-aggregate disk allocation ratio flag.
@@ -84,3 +116,7 @@ class AggregateDiskFilter(DiskFilter):
             ratio = CONF.disk_allocation_ratio
 
         return ratio
+
+    def _get_disk_allocation_ratios(self, snapshot, filter_properties):
+        return [self._get_disk_allocation_ratio(host_state, filter_properties)
+                for host_state in snapshot]
@@ -36,9 +36,14 @@ CONF.register_opt(max_io_ops_per_host_opt)
 class IoOpsFilter(filters.BaseHostFilter):
     """Filter out hosts with too many concurrent I/O operations."""
 
+    supports_batch = True
+
     def _get_max_io_ops_per_host(self, host_state, filter_properties):
         return CONF.max_io_ops_per_host
 
+    def _get_max_io_ops_values(self, snapshot, filter_properties):
+        return [CONF.max_io_ops_per_host] * len(snapshot)
+
     def host_passes(self, host_state, filter_properties):
         """Use information about current vm and task states collected from
         compute node statistics to decide whether to filter.
@@ -54,6 +59,15 @@ class IoOpsFilter(filters.BaseHostFilter):
                          'max_io_ops': max_io_ops})
         return passes
 
+    def filter_mask(self, snapshot, filter_properties):
+        max_io_ops_values = self._get_max_io_ops_values(
+            snapshot, filter_properties)
+        mask = [num_io_ops < max_io_ops for num_io_ops, max_io_ops
+                in zip(snapshot['num_io_ops'], max_io_ops_values)]
+        LOG.debug("%(failed)d of %(total)d hosts fail I/O ops check",
+                  {'failed': mask.count(False), 'total': len(mask)})
+        return mask
+
 
 class AggregateIoOpsFilter(IoOpsFilter):
     """AggregateIoOpsFilter with per-aggregate the max io operations.
@@ -73,3 +87,7 @@ class AggregateIoOpsFilter(IoOpsFilter):
             value = CONF.max_io_ops_per_host
 
         return value
+
+    def _get_max_io_ops_values(self, snapshot, filter_properties):
+        return [self._get_max_io_ops_per_host(host_state, filter_properties)
+                for host_state in snapshot]
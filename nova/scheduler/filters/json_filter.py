@@ -22,10 +22,103 @@ import six
 from nova.scheduler import filters
 
 
+class _Constant(object):
+    """A term of a compiled query which doesn't depend on the host."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def evaluate(self, host_state):
+        return self.value
+
+    def evaluate_all(self, snapshot):
+        return [self.value] * len(snapshot)
+
+
+class _Variable(object):
+    """A '$variable' or '$variable.dictkey' term of a compiled query."""
+
+    def __init__(self, name, keys):
+        self.name = name
+        self.keys = keys
+
+    def _lookup_keys(self, obj):
+        for key in self.keys:
+            if obj is None:
+                return None
+            obj = obj.get(key, None)
+        return obj
+
+    def evaluate(self, host_state):
+        return self._lookup_keys(getattr(host_state, self.name, None))
+
+    def evaluate_all(self, snapshot):
+        try:
+            column = snapshot[self.name]
+        except AttributeError:
+            column = [getattr(host_state, self.name, None)
+                      for host_state in snapshot]
+        if not self.keys:
+            return column
+        return [self._lookup_keys(obj) for obj in column]
+
+
+class _Command(object):
+    """A command term of a compiled query, applied to its argument terms."""
+
+    def __init__(self, json_filter, method, args, op=None):
+        self.json_filter = json_filter
+        self.method = method
+        self.args = args
+        self.op = op
+
+    def evaluate(self, host_state):
+        cooked_args = []
+        for arg in self.args:
+            value = arg.evaluate(host_state)
+            if value is not None:
+                cooked_args.append(value)
+        return self.method(self.json_filter, cooked_args)
+
+    def evaluate_all(self, snapshot):
+        first = self.args[0]
+        others = self.args[1:]
+        if (self.op is not None and not isinstance(first, _Constant) and
+                all(isinstance(arg, _Constant) for arg in others)):
+            # Comparing a variable with constants, the most common case, is
+            # done without building the arguments of each host
+            values = [arg.value for arg in others]
+            op = self.op
+            missing = self.json_filter._op_compare(values, op)
+            if not values:
+                passes = lambda value: False
+            elif op is operator.contains:
+                passes = lambda value: value in values
+            else:
+                passes = lambda value: all(op(value, other)
+                                           for other in values)
+            return [missing if value is None else passes(value)
+                    for value in first.evaluate_all(snapshot)]
+
+        columns = [arg.evaluate_all(snapshot) for arg in self.args]
+        return [self.method(self.json_filter,
+                            [value for value in row if value is not None])
+                for row in six.moves.zip(*columns)]
+
+
 class JsonFilter(filters.BaseHostFilter):
     """Host Filter to allow simple JSON-based grammar for
     selecting hosts.
     """
+
+    supports_batch = True
+
+    def __init__(self):
+        super(JsonFilter, self).__init__()
+        # The last query string and its compiled form, so that a query is
+        # only parsed and compiled once per request
+        self._compiled_query = (None, None)
+
     def _op_compare(self, args, op):
         """Returns True if the specified operator can successfully
         compare the first item in the args with all the rest. Will
@@ -88,63 +181,83 @@ class JsonFilter(filters.BaseHostFilter):
         'and': _and,
     }
 
-    def _parse_string(self, string, host_state):
-        """Strings prefixed with $ are capability lookups in the
-        form '$variable' where 'variable' is an attribute in the
-        HostState class.  If $variable is a dictionary, you may
-        use: $variable.dictkey
-        """
-        if not string:
-            return None
-        if not string.startswith("$"):
-            return string
+    comparison_operators = {
+        '=': operator.eq,
+        '<': operator.lt,
+        '>': operator.gt,
+        'in': operator.contains,
+        '<=': operator.le,
+        '>=': operator.ge,
+    }
 
-        path = string[1:].split(".")
-        obj = getattr(host_state, path[0], None)
-        if obj is None:
-            return None
-        for item in path[1:]:
-            obj = obj.get(item, None)
-            if obj is None:
-                return None
-        return obj
+    def _compile_arg(self, arg):
+        """Compiles an argument of a command.
 
-    def _process_filter(self, query, host_state):
-        """Recursively parse the query structure."""
+        Strings prefixed with $ are capability lookups in the form
+        '$variable' where 'variable' is an attribute in the HostState class.
+        If $variable is a dictionary, you may use: $variable.dictkey
+        """
+        if isinstance(arg, list):
+            return self._compile_query(arg)
+        if isinstance(arg, six.string_types):
+            if not arg:
+                return _Constant(None)
+            if arg.startswith("$"):
+                path = arg[1:].split(".")
+                return _Variable(path[0], path[1:])
+        return _Constant(arg)
+
+    def _compile_query(self, query):
+        """Recursively compile the query structure into terms."""
         if not query:
-            return True
+            return _Constant(True)
         cmd = query[0]
         method = self.commands[cmd]
-        cooked_args = []
-        for arg in query[1:]:
-            if isinstance(arg, list):
-                arg = self._process_filter(arg, host_state)
-            elif isinstance(arg, six.string_types):
-                arg = self._parse_string(arg, host_state)
-            if arg is not None:
-                cooked_args.append(arg)
-        result = method(self, cooked_args)
-        return result
+        args = [self._compile_arg(arg) for arg in query[1:]]
+        # The arguments which are always None are ignored
+        args = [arg for arg in args
+                if not (isinstance(arg, _Constant) and arg.value is None)]
+        if all(isinstance(arg, _Constant) for arg in args):
+            return _Constant(method(self, [arg.value for arg in args]))
+        return _Command(self, method, args,
+                        op=self.comparison_operators.get(cmd))
 
-    def host_passes(self, host_state, filter_properties):
-        """Return a list of hosts that can fulfill the requirements
-        specified in the query.
-        """
+    def _get_query(self, filter_properties):
+        """Returns the compiled query of the request, or None."""
         try:
             query = filter_properties['scheduler_hints']['query']
         except KeyError:
             query = None
         if not query:
-            return True
+            return None
 
-        # NOTE(comstud): Not checking capabilities or service for
-        # enabled/disabled so that a provided json filter can decide
+        query_string, compiled = self._compiled_query
+        if query_string != query:
+            compiled = self._compile_query(jsonutils.loads(query))
+            self._compiled_query = (query, compiled)
+        return compiled
 
-        result = self._process_filter(jsonutils.loads(query), host_state)
+    @staticmethod
+    def _passes(result):
         if isinstance(result, list):
             # If any succeeded, include the host
             result = any(result)
-        if result:
-            # Filter it out.
+        return bool(result)
+
+    def host_passes(self, host_state, filter_properties):
+        """Return a list of hosts that can fulfill the requirements
+        specified in the query.
+        """
+        # NOTE(comstud): Not checking capabilities or service for
+        # enabled/disabled so that a provided json filter can decide
+        query = self._get_query(filter_properties)
+        if query is None:
             return True
-        return False
+        return self._passes(query.evaluate(host_state))
+
+    def filter_mask(self, snapshot, filter_properties):
+        query = self._get_query(filter_properties)
+        if query is None:
+            return [True] * len(snapshot)
+        return [self._passes(result)
+                for result in query.evaluate_all(snapshot)]
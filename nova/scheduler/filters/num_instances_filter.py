@@ -33,9 +33,14 @@ CONF.register_opt(max_instances_per_host_opt)
 class NumInstancesFilter(filters.BaseHostFilter):
     """Filter out hosts with too many instances."""
 
+    supports_batch = True
+
     def _get_max_instances_per_host(self, host_state, filter_properties):
         return CONF.max_instances_per_host
 
+    def _get_max_instances_values(self, snapshot, filter_properties):
+        return [CONF.max_instances_per_host] * len(snapshot)
+
     def host_passes(self, host_state, filter_properties):
         num_instances = host_state.num_instances
         max_instances = self._get_max_instances_per_host(
@@ -48,6 +53,15 @@ class NumInstancesFilter(filters.BaseHostFilter):
                          'max_instances': max_instances})
         return passes
 
+    def filter_mask(self, snapshot, filter_properties):
+        max_instances_values = self._get_max_instances_values(
+            snapshot, filter_properties)
+        mask = [num_instances < max_instances for num_instances, max_instances
+                in zip(snapshot['num_instances'], max_instances_values)]
+        LOG.debug("%(failed)d of %(total)d hosts fail num_instances check",
+                  {'failed': mask.count(False), 'total': len(mask)})
+        return mask
+
 
 class AggregateNumInstancesFilter(NumInstancesFilter):
     """AggregateNumInstancesFilter with per-aggregate the max num instances.
@@ -69,3 +83,7 @@ class AggregateNumInstancesFilter(NumInstancesFilter):
             value = CONF.max_instances_per_host
 
         return value
+
+    def _get_max_instances_values(self, snapshot, filter_properties):
+        return [self._get_max_instances_per_host(host_state, filter_properties)
+                for host_state in snapshot]
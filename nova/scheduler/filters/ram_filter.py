@@ -25,9 +25,15 @@ LOG = logging.getLogger(__name__)
 
 class BaseRamFilter(filters.BaseHostFilter):
 
+    supports_batch = True
+
     def _get_ram_allocation_ratio(self, host_state, filter_properties):
         raise NotImplementedError
 
+    def _get_ram_allocation_ratios(self, snapshot, filter_properties):
+        return [self._get_ram_allocation_ratio(host_state, filter_properties)
+                for host_state in snapshot]
+
     def host_passes(self, host_state, filter_properties):
         """Only return hosts with sufficient available RAM."""
         instance_type = filter_properties.get('instance_type')
@@ -64,6 +70,32 @@ class BaseRamFilter(filters.BaseHostFilter):
         host_state.limits['memory_mb'] = memory_mb_limit
         return True
 
+    def filter_mask(self, snapshot, filter_properties):
+        """Only return hosts with sufficient available RAM."""
+        instance_type = filter_properties.get('instance_type')
+        requested_ram = instance_type['memory_mb']
+        ratios = self._get_ram_allocation_ratios(snapshot, filter_properties)
+
+        limits = [total_usable_ram_mb * ratio for total_usable_ram_mb, ratio
+                  in zip(snapshot['total_usable_ram_mb'], ratios)]
+        # Do not allow an instance to overcommit against itself, only against
+        # other instances.
+        mask = [total_usable_ram_mb >= requested_ram and
+                limit - (total_usable_ram_mb - free_ram_mb) >= requested_ram
+                for free_ram_mb, total_usable_ram_mb, limit
+                in zip(snapshot['free_ram_mb'],
+                       snapshot['total_usable_ram_mb'], limits)]
+
+        # save oversubscription limit for compute node to test against:
+        for host_state, passes, limit in zip(snapshot, mask, limits):
+            if passes:
+                host_state.limits['memory_mb'] = limit
+        LOG.debug("%(passed)d of %(total)d hosts have %(requested_ram)s MB "
+                  "usable ram.", {'passed': mask.count(True),
+                                  'total': len(mask),
+                                  'requested_ram': requested_ram})
+        return mask
+
 
 class RamFilter(BaseRamFilter):
     """Ram Filter with over subscription flag."""
@@ -71,6 +103,9 @@ class RamFilter(BaseRamFilter):
     def _get_ram_allocation_ratio(self, host_state, filter_properties):
         return host_state.ram_allocation_ratio
 
+    def _get_ram_allocation_ratios(self, snapshot, filter_properties):
+        return snapshot['ram_allocation_ratio']
+
 
 class AggregateRamFilter(BaseRamFilter):
     """AggregateRamFilter with per-aggregate ram subscription flag.
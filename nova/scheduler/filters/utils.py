@@ -24,8 +24,23 @@ from nova.i18n import _LI
 LOG = logging.getLogger(__name__)
 
 
+def get_aggregate_index(host_states):
+    """Returns the AggregateMetadataIndex shared by the host states, or None
+    if some of them don't have one.
+    """
+    index = None
+    for host_state in host_states:
+        if host_state.aggregate_index is None:
+            return None
+        index = host_state.aggregate_index
+    return index
+
+
 def aggregate_values_from_key(host_state, key_name):
     """Returns a set of values based on a metadata key for a specific host."""
+    if host_state.aggregate_index is not None:
+        return host_state.aggregate_index.raw_values(host_state.host,
+                                                     key_name)
     aggrlist = host_state.aggregates
     return {aggr.metadata[key_name]
               for aggr in aggrlist
@@ -37,6 +52,8 @@ def aggregate_metadata_get_by_host(host_state, key=None):
     """Returns a dict of all metadata based on a metadata key for a specific
     host. If the key is not provided, returns a dict of all metadata.
     """
+    if host_state.aggregate_index is not None:
+        return host_state.aggregate_index.metadata(host_state.host, key)
     aggrlist = host_state.aggregates
     metadata = collections.defaultdict(set)
     for aggr in aggrlist:
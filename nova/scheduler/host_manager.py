@@ -37,6 +37,7 @@ from nova import exception
 from nova.i18n import _LI, _LW
 from nova import objects
 from nova.pci import stats as pci_stats
+from nova.scheduler import aggregate_index
 from nova.scheduler import filters
 from nova.scheduler import weights
 from nova import utils
@@ -70,6 +71,32 @@ host_manager_opts = [
                default=True,
                help='Determines if the Scheduler tracks changes to instances '
                     'to help with its filtering decisions.'),
+    cfg.BoolOpt('scheduler_tracks_compute_changes',
+               default=False,
+               help='Determines if the Scheduler keeps its view of the '
+                    'compute nodes up to date with the resource updates sent '
+                    'by the compute nodes, instead of reading all the compute '
+                    'nodes from the database for each request. This must be '
+                    'set on both the scheduler and compute nodes.'),
+    cfg.IntOpt('scheduler_compute_resync_interval',
+               default=600,
+               min=0,
+               help='Interval in seconds at which all the compute nodes are '
+                    'read again from the database when '
+                    'scheduler_tracks_compute_changes is set, so that the '
+                    'deleted nodes and the lost updates are eventually '
+                    'accounted for. 0 disables the periodic reads.'),
+    cfg.BoolOpt('scheduler_tracks_group_hosts',
+               default=False,
+               help='Determines if the hosts of the members of a server '
+                    'group are looked up in the view of the instances kept '
+                    'by the Scheduler, instead of reading the instances of '
+                    'all the members from the database for each request. '
+                    'The members not reported yet by their compute node, '
+                    'like the ones still building, are still read from the '
+                    'database. '
+                    'This must be set on both the scheduler and conductor '
+                    'nodes, and needs scheduler_tracks_instance_changes.'),
 ]
 
 CONF = cfg.CONF
@@ -156,6 +183,8 @@ class HostState(object):
         # Additional host information from the compute node stats:
         self.num_instances = 0
         self.num_io_ops = 0
+        # IDs of the images in the image cache of the host
+        self.cached_images = frozenset()
 
         # Other information
         self.host_ip = None
@@ -173,6 +202,8 @@ class HostState(object):
 
         # List of aggregates the host belongs to
         self.aggregates = []
+        # AggregateMetadataIndex of the HostManager, if any
+        self.aggregate_index = None
 
         # Instances on this host
         self.instances = {}
@@ -245,6 +276,11 @@ class HostState(object):
 
         self.num_io_ops = int(self.stats.get('io_workload', 0))
 
+        # The image cache is reported as the comma separated image IDs
+        cached_images = self.stats.get('cached_images')
+        self.cached_images = frozenset(
+            cached_images.split(',') if cached_images else ())
+
         # update metrics
         self.metrics = objects.MonitorMetricList.from_json(compute.metrics)
 
@@ -325,12 +361,28 @@ class HostManager(object):
         # Dict of set of aggregate IDs keyed by the name of the host belonging
         # to those aggregates
         self.host_aggregates_map = collections.defaultdict(set)
+        self.aggregate_index = aggregate_index.AggregateMetadataIndex()
         self._init_aggregates()
         self.tracks_instance_changes = CONF.scheduler_tracks_instance_changes
         # Dict of instances and status, keyed by host
         self._instance_info = {}
+        # Host of each instance of _instance_info, keyed by instance UUID.
+        # It is only complete once the initial view of the instances has been
+        # loaded.
+        self._instance_hosts = {}
+        self._instance_hosts_loaded = False
         if self.tracks_instance_changes:
             self._init_instance_info()
+        self.tracks_compute_changes = CONF.scheduler_tracks_compute_changes
+        # Dict of the last known ComputeNode and the generation of the last
+        # update received from it, keyed by (host, node). A ComputeNode of
+        # None means the node has to be read from the DB again.
+        self._compute_node_info = {}
+        # Time of the last read of all the compute nodes from the DB
+        self._last_compute_resync = None
+        # Hosts having a service but no compute node in the DB, as of the
+        # last read of all the compute nodes
+        self._hosts_without_nodes = set()
 
     def _load_filters(self):
         return CONF.scheduler_default_filters
@@ -342,6 +394,14 @@ class HostManager(object):
             self.aggs_by_id[agg.id] = agg
             for host in agg.hosts:
                 self.host_aggregates_map[host].add(agg.id)
+        self._update_aggregate_index(self.host_aggregates_map)
+
+    def _update_aggregate_index(self, hosts):
+        """Updates the aggregate metadata index of the given hosts."""
+        for host in hosts:
+            self.aggregate_index.update_host(
+                host, [self.aggs_by_id[agg_id]
+                       for agg_id in self.host_aggregates_map.get(host, ())])
 
     def update_aggregates(self, aggregates):
         """Updates internal HostManager information about aggregates."""
@@ -353,6 +413,9 @@ class HostManager(object):
 
     def _update_aggregate(self, aggregate):
         self.aggs_by_id[aggregate.id] = aggregate
+        # The metadata of the aggregate may have changed too, so all the
+        # hosts which are or were part of it are reindexed
+        changed_hosts = set(aggregate.hosts)
         for host in aggregate.hosts:
             self.host_aggregates_map[host].add(aggregate.id)
         # Refreshing the mapping dict to remove all hosts that are no longer
@@ -361,6 +424,8 @@ class HostManager(object):
             if (aggregate.id in self.host_aggregates_map[host]
                     and host not in aggregate.hosts):
                 self.host_aggregates_map[host].remove(aggregate.id)
+                changed_hosts.add(host)
+        self._update_aggregate_index(changed_hosts)
 
     def delete_aggregate(self, aggregate):
         """Deletes internal HostManager information about a specific aggregate.
@@ -370,6 +435,7 @@ class HostManager(object):
         for host in aggregate.hosts:
             if aggregate.id in self.host_aggregates_map[host]:
                 self.host_aggregates_map[host].remove(aggregate.id)
+        self._update_aggregate_index(aggregate.hosts)
 
     def _init_instance_info(self):
         """Creates the initial view of instances for all hosts.
@@ -384,6 +450,7 @@ class HostManager(object):
             context = context_module.get_admin_context()
             LOG.debug("START:_async_init_instance_info")
             self._instance_info = {}
+            self._instance_hosts = {}
             compute_nodes = objects.ComputeNodeList.get_all(context).objects
             LOG.debug("Total number of compute nodes: %s", len(compute_nodes))
             # Break the queries into batches of 10 to reduce the total number
@@ -409,8 +476,10 @@ class HostManager(object):
                                                      "updated": False}
                     inst_dict = self._instance_info[host]
                     inst_dict["instances"][instance.uuid] = instance
+                    self._instance_hosts[instance.uuid] = host
                 # Call sleep() to cooperatively yield
                 time.sleep(0)
+            self._instance_hosts_loaded = True
             LOG.debug("END:_async_init_instance_info")
 
         # Run this async so that we don't block the scheduler start-up
@@ -441,7 +510,7 @@ class HostManager(object):
         return good_filters
 
     def get_filtered_hosts(self, hosts, filter_properties,
-            filter_class_names=None, index=0):
+            filter_class_names=None, index=0, trace=None):
         """Filter hosts and return only ones passing all filters."""
 
         def _strip_ignore_hosts(host_map, hosts_to_ignore):
@@ -514,12 +583,30 @@ class HostManager(object):
             hosts = six.itervalues(name_to_cls_map)
 
         return self.filter_handler.get_filtered_objects(filters,
-                hosts, filter_properties, index)
+                hosts, filter_properties, index, trace=trace)
 
-    def get_weighed_hosts(self, hosts, weight_properties):
-        """Weigh the hosts."""
+    def get_weighed_hosts(self, hosts, weight_properties, max_hosts=None,
+                          trace=None):
+        """Weigh the hosts, only returning the max_hosts best ones if set."""
         return self.weight_handler.get_weighed_objects(self.weighers,
-                hosts, weight_properties)
+                hosts, weight_properties, max_objects=max_hosts, trace=trace)
+
+    def get_weighed_host(self, host, weight_properties):
+        """Weigh a single host, against the weights of the hosts weighed
+        last.
+        """
+        return self.weight_handler.get_weighed_object(self.weighers, host,
+                                                      weight_properties)
+
+    def host_passes_filters(self, host, filter_properties, index=0):
+        """Return whether a single host passes all the default filters."""
+        for filter_ in self.default_filters:
+            if not filter_.run_filter_for_index(index):
+                continue
+            objs = filter_.filter_all([host], filter_properties)
+            if objs is None or not list(objs):
+                return False
+        return True
 
     def get_all_host_states(self, context):
         """Returns a list of HostStates that represents all the hosts
@@ -531,7 +618,11 @@ class HostManager(object):
                         for service in objects.ServiceList.get_by_binary(
                             context, 'nova-compute')}
         # Get resource usage across the available compute nodes:
-        compute_nodes = objects.ComputeNodeList.get_all(context)
+        if self.tracks_compute_changes:
+            compute_nodes = self._get_tracked_compute_nodes(context,
+                                                            service_refs)
+        else:
+            compute_nodes = objects.ComputeNodeList.get_all(context)
         seen_nodes = set()
         for compute in compute_nodes:
             service = service_refs.get(compute.host)
@@ -556,6 +647,7 @@ class HostManager(object):
             host_state.aggregates = [self.aggs_by_id[agg_id] for agg_id in
                                      self.host_aggregates_map[
                                          host_state.host]]
+            host_state.aggregate_index = self.aggregate_index
             host_state.update_service(dict(service))
             self._add_instance_info(context, compute, host_state)
             seen_nodes.add(state_key)
@@ -570,6 +662,122 @@ class HostManager(object):
 
         return six.itervalues(self.host_state_map)
 
+    def _get_tracked_compute_nodes(self, context, service_refs):
+        """Returns the list of ComputeNodes known from the compute updates.
+
+        Only the nodes of the hosts for which an update was missed, or which
+        never sent any update, are read again from the DB. All the nodes are
+        read when the scheduler starts, when most of them are stale, and
+        every scheduler_compute_resync_interval seconds.
+        """
+        stale_keys = set(state_key for state_key, info
+                         in six.iteritems(self._compute_node_info)
+                         if info['compute'] is None)
+        known_hosts = set(host for host, node in self._compute_node_info)
+        stale_hosts = set(host for host, node in stale_keys)
+        stale_hosts.update(host for host in service_refs
+                           if host not in known_hosts and
+                           host not in self._hosts_without_nodes)
+
+        now = time.time()
+        interval = CONF.scheduler_compute_resync_interval
+        resync_all = (self._last_compute_resync is None or
+                      (interval and
+                       now - self._last_compute_resync >= interval) or
+                      len(stale_hosts) * 2 > len(service_refs))
+
+        if stale_hosts or resync_all:
+            # Remember the generations, so that any update received while
+            # reading the DB can be detected.
+            generations = {state_key: info['generation'] for state_key, info
+                           in six.iteritems(self._compute_node_info)}
+            if resync_all:
+                compute_nodes = objects.ComputeNodeList.get_all(context)
+                read_hosts = None
+                self._last_compute_resync = now
+                self._hosts_without_nodes = (
+                    set(service_refs) -
+                    set(compute.host for compute in compute_nodes))
+            else:
+                compute_nodes = []
+                for host in stale_hosts:
+                    try:
+                        host_nodes = objects.ComputeNodeList.get_all_by_host(
+                            context, host)
+                    except exception.ComputeHostNotFound:
+                        host_nodes = []
+                    if not host_nodes:
+                        self._hosts_without_nodes.add(host)
+                    compute_nodes.extend(host_nodes)
+                read_hosts = stale_hosts
+            self._resync_compute_nodes(compute_nodes, read_hosts,
+                                       generations)
+
+        return [info['compute']
+                for info in six.itervalues(self._compute_node_info)
+                if info['compute'] is not None]
+
+    def _resync_compute_nodes(self, compute_nodes, read_hosts, generations):
+        """Stores the ComputeNodes read from the DB.
+
+        :param read_hosts: the hosts whose nodes were read, or None if all the
+                           nodes were read
+        :param generations: the generations of the nodes before the DB read
+        """
+        read_keys = set()
+        for compute in compute_nodes:
+            state_key = (compute.host, compute.hypervisor_hostname)
+            read_keys.add(state_key)
+            info = self._compute_node_info.setdefault(
+                state_key, {"compute": None, "generation": None})
+            if info["generation"] != generations.get(state_key):
+                # An update was received in the meantime which may not be
+                # part of what was read, keep the node stale.
+                continue
+            info["compute"] = compute
+        # Forget about the nodes which were deleted
+        for state_key in list(self._compute_node_info):
+            host = state_key[0]
+            if read_hosts is not None and host not in read_hosts:
+                continue
+            if state_key not in read_keys:
+                del self._compute_node_info[state_key]
+
+    def update_compute_node(self, context, compute_node, generation):
+        """Receives the resources which changed on a compute node.
+
+        The compute_node only has the fields which changed since the previous
+        update set, and generation is incremented by the compute node on each
+        update. When an update was missed, the node is read again from the DB
+        on the next request.
+        """
+        if not self.tracks_compute_changes:
+            return
+        state_key = (compute_node.host, compute_node.hypervisor_hostname)
+        info = self._compute_node_info.get(state_key)
+        if info is None:
+            # This is a new node, it will be read from the DB
+            self._hosts_without_nodes.discard(compute_node.host)
+            self._compute_node_info[state_key] = {"compute": None,
+                                                  "generation": generation}
+            return
+        last_generation = info["generation"]
+        info["generation"] = generation
+        compute = info["compute"]
+        if compute is None:
+            return
+        if last_generation is None or generation != last_generation + 1:
+            if last_generation is not None:
+                LOG.info(_LI("Missed resource updates from compute node "
+                             "%(host)s:%(node)s, it will be read again from "
+                             "the database."),
+                         {'host': state_key[0], 'node': state_key[1]})
+            info["compute"] = None
+            return
+        for field in compute_node.fields:
+            if compute_node.obj_attr_is_set(field):
+                setattr(compute, field, getattr(compute_node, field))
+
     def _add_instance_info(self, context, compute, host_state):
         """Adds the host instance info to the host_state object.
 
@@ -591,12 +799,26 @@ class HostManager(object):
                          for instance in inst_list.objects}
         host_state.instances = inst_dict
 
+    def _set_instance_hosts(self, host_name, old_uuids, new_uuids):
+        """Updates the host of the instances whose UUIDs are no longer, or
+        are now, in the view of the instances of the host.
+        """
+        for instance_uuid in old_uuids:
+            if self._instance_hosts.get(instance_uuid) == host_name:
+                del self._instance_hosts[instance_uuid]
+        for instance_uuid in new_uuids:
+            self._instance_hosts[instance_uuid] = host_name
+
     def _recreate_instance_info(self, context, host_name):
         """Get the InstanceList for the specified host, and store it in the
         _instance_info dict.
         """
         instances = objects.InstanceList.get_by_host(context, host_name)
         inst_dict = {instance.uuid: instance for instance in instances}
+        old_info = self._instance_info.get(host_name)
+        old_uuids = old_info["instances"] if old_info else ()
+        self._set_instance_hosts(host_name, set(old_uuids) - set(inst_dict),
+                                 inst_dict)
         host_info = self._instance_info[host_name] = {}
         host_info["instances"] = inst_dict
         host_info["updated"] = False
@@ -615,6 +837,9 @@ class HostManager(object):
             for instance in instance_info.objects:
                 # Overwrite the entry (if any) with the new info.
                 inst_dict[instance.uuid] = instance
+            self._set_instance_hosts(
+                host_name, (), [instance.uuid
+                                for instance in instance_info.objects])
             host_info["updated"] = True
         else:
             instances = instance_info.objects
@@ -624,6 +849,8 @@ class HostManager(object):
                 host_info["instances"] = {instance.uuid: instance
                                           for instance in instances}
                 host_info["updated"] = True
+                self._set_instance_hosts(host_name, (),
+                                         host_info["instances"])
             else:
                 self._recreate_instance_info(context, host_name)
                 LOG.info(_LI("Received an update from an unknown host '%s'. "
@@ -641,12 +868,67 @@ class HostManager(object):
             inst_dict = host_info["instances"]
             # Remove the existing Instance object, if any
             inst_dict.pop(instance_uuid, None)
+            self._set_instance_hosts(host_name, [instance_uuid], ())
             host_info["updated"] = True
         else:
             self._recreate_instance_info(context, host_name)
             LOG.info(_LI("Received a delete update from an unknown host '%s'. "
                          "Re-created its InstanceList."), host_name)
 
+    @utils.synchronized(HOST_INSTANCE_SEMAPHORE)
+    def update_instance_info_batch(self, context, host_name, instance_info,
+                                   deleted_instance_uuids):
+        """Receives the instances created or updated, and the UUIDs of the
+        instances deleted, on a compute node over a short period of time.
+
+        Unlike update_instance_info(), several instances from an unknown host
+        are not taken as its full instance list.
+        """
+        host_info = self._instance_info.get(host_name)
+        if host_info:
+            inst_dict = host_info["instances"]
+            for instance in instance_info.objects:
+                inst_dict[instance.uuid] = instance
+            for instance_uuid in deleted_instance_uuids:
+                inst_dict.pop(instance_uuid, None)
+            self._set_instance_hosts(
+                host_name, deleted_instance_uuids,
+                [instance.uuid for instance in instance_info.objects])
+            host_info["updated"] = True
+        else:
+            self._recreate_instance_info(context, host_name)
+            LOG.info(_LI("Received an update from an unknown host '%s'. "
+                         "Re-created its InstanceList."), host_name)
+
+    def get_group_hosts(self, context, member_uuids):
+        """Returns the set of the hosts running the given members of a
+        server group.
+
+        The hosts are looked up in the local view of the instances once it
+        has been loaded, or else read from the database as
+        InstanceGroup.get_hosts() does. The compute nodes only report an
+        instance once it is built, so the members missing from the local
+        view, like the ones still building, are read from the database.
+        """
+        hosts = set()
+        missing_uuids = list(member_uuids)
+        if self._instance_hosts_loaded:
+            instance_hosts = self._instance_hosts
+            missing_uuids = []
+            for instance_uuid in member_uuids:
+                host = instance_hosts.get(instance_uuid)
+                if host is None:
+                    missing_uuids.append(instance_uuid)
+                else:
+                    hosts.add(host)
+        if missing_uuids:
+            filters = {'uuid': missing_uuids, 'deleted': False}
+            instances = objects.InstanceList.get_by_filters(context,
+                                                            filters=filters)
+            hosts.update(instance.host for instance in instances
+                         if instance.host)
+        return hosts
+
     @utils.synchronized(HOST_INSTANCE_SEMAPHORE)
     def sync_instance_info(self, context, host_name, instance_uuids):
         """Receives the uuids of the instances on a host.
@@ -656,11 +938,30 @@ class HostManager(object):
         used by the scheduler's HostManager to detect when its view of the
         compute node's instances is out of sync.
         """
+        self._sync_instance_info(
+            context, host_name,
+            lambda local_uuids: set(local_uuids) == set(instance_uuids))
+
+    @utils.synchronized(HOST_INSTANCE_SEMAPHORE)
+    def sync_instance_info_digest(self, context, host_name, digest):
+        """Receives the digest of the uuids of the instances on a host.
+
+        This is the same as sync_instance_info(), except that the compute
+        nodes only send the digest computed by nova.utils.get_set_digest()
+        rather than all the UUIDs, and the instances of the host are read
+        from the database if the digest of the local view of them differs.
+        """
+        self._sync_instance_info(
+            context, host_name,
+            lambda local_uuids: utils.get_set_digest(local_uuids) == digest)
+
+    def _sync_instance_info(self, context, host_name, in_sync):
+        """Checks the local view of the instances of a host with the in_sync
+        function of their UUIDs, and re-creates it if it returns False.
+        """
         host_info = self._instance_info.get(host_name)
         if host_info:
-            local_set = set(host_info["instances"].keys())
-            compute_set = set(instance_uuids)
-            if not local_set == compute_set:
+            if not in_sync(host_info["instances"]):
                 self._recreate_instance_info(context, host_name)
                 LOG.info(_LI("The instance sync for host '%s' did not match. "
                              "Re-created its InstanceList."), host_name)
@@ -0,0 +1,77 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Columnar snapshot of host states.
+
+Filters and weighers which declare batch support are evaluated once over the
+whole list of hosts instead of once per host. They read the host resources
+from a HostStateSnapshot, which stores each HostState attribute as a column
+(a list indexed like the list of host states), so that a whole filtering or
+weighing pass can be expressed as a few list comprehensions.
+"""
+
+import itertools
+
+
+class HostStateSnapshot(object):
+    """Columnar view of a list of HostState objects.
+
+    Columns are built lazily on first access, so that only the attributes
+    used by the batch-capable filters and weighers of the current request
+    are ever read. Snapshots are only valid for the duration of a single
+    filtering or weighing pass: they are not refreshed when the underlying
+    HostState objects are consumed.
+    """
+
+    def __init__(self, host_states, columns=None):
+        self.host_states = list(host_states)
+        self._columns = columns or {}
+
+    def __len__(self):
+        return len(self.host_states)
+
+    def __iter__(self):
+        return iter(self.host_states)
+
+    def __getitem__(self, name):
+        """Return the column of values for the HostState attribute name."""
+        try:
+            return self._columns[name]
+        except KeyError:
+            column = [getattr(host_state, name)
+                      for host_state in self.host_states]
+            self._columns[name] = column
+            return column
+
+    def compress(self, mask):
+        """Return a new snapshot with only the rows whose mask is True."""
+        mask = list(mask)
+        host_states = list(itertools.compress(self.host_states, mask))
+        columns = {name: list(itertools.compress(column, mask))
+                   for name, column in self._columns.items()}
+        return HostStateSnapshot(host_states, columns)
+
+    def restrict(self, host_states):
+        """Return a new snapshot with only the given host states.
+
+        This is used to keep the snapshot in sync after a filter without
+        batch support has removed some hosts from the list.
+        """
+        keep = set(id(host_state) for host_state in host_states)
+        if len(keep) == len(self.host_states):
+            return self
+        return self.compress(id(host_state) in keep
+                             for host_state in self.host_states)
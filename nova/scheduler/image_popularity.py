@@ -0,0 +1,93 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Popularity of the images the instances are scheduled from.
+
+The SchedulerManager records the image of each request it schedules in an
+ImagePopularity, and asks the compute nodes to fetch an image into their
+image cache once it becomes popular, so that the next instances created from
+it do not wait for their image to be downloaded from glance.
+"""
+
+import math
+import time
+
+import six
+
+
+class ImagePopularity(object):
+    """Exponentially decaying count of the instances scheduled from each
+    image.
+
+    Each instance counts for 1 when it is scheduled, and for half as much
+    after each half life, so that the images which stop being used are
+    eventually forgotten.
+    """
+
+    # Scores below which an image is forgotten
+    _PRUNE_SCORE = 0.01
+
+    def __init__(self, half_life):
+        self._decay = math.log(2) / half_life
+        self._half_life = half_life
+        # (score, time of the score) of each image, keyed by image ID
+        self._scores = {}
+        # Time at which each image was last precached, keyed by image ID
+        self._precached = {}
+        self._last_prune = None
+
+    def _score(self, image_id, now):
+        score, updated_at = self._scores.get(image_id, (0.0, now))
+        return score * math.exp(-self._decay * (now - updated_at))
+
+    def _prune(self, now):
+        if (self._last_prune is not None and
+                now - self._last_prune < self._half_life):
+            return
+        self._last_prune = now
+        for image_id in list(self._scores):
+            if self._score(image_id, now) < self._PRUNE_SCORE:
+                del self._scores[image_id]
+        for image_id, precached_at in list(six.iteritems(self._precached)):
+            if now - precached_at >= self._half_life:
+                del self._precached[image_id]
+
+    def record(self, image_id, num_instances=1, now=None):
+        """Records instances scheduled from the image, and returns the
+        updated score of the image.
+        """
+        if now is None:
+            now = time.time()
+        self._prune(now)
+        score = self._score(image_id, now) + num_instances
+        self._scores[image_id] = (score, now)
+        return score
+
+    def get_score(self, image_id, now=None):
+        if now is None:
+            now = time.time()
+        return self._score(image_id, now)
+
+    def mark_precached(self, image_id, now=None):
+        """Records that the compute nodes were asked to precache the image.
+
+        Returns False if they were already asked to within the last half
+        life, in which case they should not be asked again.
+        """
+        if now is None:
+            now = time.time()
+        precached_at = self._precached.get(image_id)
+        if precached_at is not None and now - precached_at < self._half_life:
+            return False
+        self._precached[image_id] = now
+        return True
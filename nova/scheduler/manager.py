@@ -26,9 +26,13 @@ from oslo_serialization import jsonutils
 from oslo_service import periodic_task
 from oslo_utils import importutils
 
+from nova.compute import rpcapi as compute_rpcapi
+from nova.compute import utils as compute_utils
 from nova import exception
+from nova.i18n import _LI
 from nova import manager
 from nova import quota
+from nova.scheduler import image_popularity
 
 
 LOG = logging.getLogger(__name__)
@@ -44,6 +48,23 @@ scheduler_driver_opts = [
                     'Please note this is likely to interact with the value '
                     'of service_down_time, but exactly how they interact '
                     'will depend on your choice of scheduler driver.'),
+    cfg.FloatOpt('image_precache_threshold',
+                 default=0,
+                 min=0,
+                 help='Number of instances recently scheduled from an image '
+                      'above which the compute nodes are asked to fetch the '
+                      'image into their image cache, ahead of the next '
+                      'instances created from it. The instances count for '
+                      'half as much after each '
+                      'image_popularity_half_life. 0 disables the fetching '
+                      'of the popular images.'),
+    cfg.IntOpt('image_popularity_half_life',
+               default=3600,
+               min=1,
+               help='Time in seconds after which the instances scheduled '
+                    'from an image count for half as much in the popularity '
+                    'of the image. The compute nodes are asked at most once '
+                    'per half life to fetch a popular image.'),
 ]
 CONF = cfg.CONF
 CONF.register_opts(scheduler_driver_opts)
@@ -54,12 +75,15 @@ QUOTAS = quota.QUOTAS
 class SchedulerManager(manager.Manager):
     """Chooses a host to run instances on."""
 
-    target = messaging.Target(version='4.2')
+    target = messaging.Target(version='4.5')
 
     def __init__(self, scheduler_driver=None, *args, **kwargs):
         if not scheduler_driver:
             scheduler_driver = CONF.scheduler_driver
         self.driver = importutils.import_object(scheduler_driver)
+        self.compute_rpcapi = compute_rpcapi.ComputeAPI()
+        self.image_popularity = image_popularity.ImagePopularity(
+            CONF.image_popularity_half_life)
         super(SchedulerManager, self).__init__(service_name='scheduler',
                                                *args, **kwargs)
 
@@ -82,8 +106,28 @@ class SchedulerManager(manager.Manager):
         """
         dests = self.driver.select_destinations(context, request_spec,
             filter_properties)
+        self._record_image_popularity(context, request_spec)
         return jsonutils.to_primitive(dests)
 
+    def _record_image_popularity(self, context, request_spec):
+        """Records the image of the request, and asks the compute nodes to
+        fetch it into their image cache once it becomes popular.
+        """
+        if not CONF.image_precache_threshold or not request_spec:
+            return
+        image = request_spec.get('image') or {}
+        image_id = image.get('id')
+        # The private images are not cached for the other projects
+        if not image_id or not compute_utils.is_image_public(image):
+            return
+        score = self.image_popularity.record(
+            image_id, request_spec.get('num_instances', 1))
+        if (score >= CONF.image_precache_threshold and
+                self.image_popularity.mark_precached(image_id)):
+            LOG.info(_LI('Asking the compute nodes to cache the popular '
+                         'image %s'), image_id)
+            self.compute_rpcapi.precache_image(context, image_id)
+
     def update_aggregates(self, ctxt, aggregates):
         """Updates HostManager internal aggregates information.
 
@@ -123,3 +167,31 @@ class SchedulerManager(manager.Manager):
         """
         self.driver.host_manager.sync_instance_info(context, host_name,
                                                     instance_uuids)
+
+    def update_instance_info_batch(self, context, host_name, instance_info,
+                                   deleted_instance_uuids):
+        """Receives the changes to a host's instances made over a short
+        period of time, and updates the driver's HostManager with them.
+        """
+        self.driver.host_manager.update_instance_info_batch(
+            context, host_name, instance_info, deleted_instance_uuids)
+
+    def sync_instance_info_digest(self, context, host_name, digest):
+        """Receives a sync request from a host with the digest of the UUIDs
+        of its instances, and passes it on to the driver's HostManager.
+        """
+        self.driver.host_manager.sync_instance_info_digest(context, host_name,
+                                                           digest)
+
+    def update_compute_node(self, context, compute_node, generation):
+        """Receives the resources which changed on a compute node, and passes
+        them on to the driver's HostManager.
+        """
+        self.driver.host_manager.update_compute_node(context, compute_node,
+                                                     generation)
+
+    def get_scheduler_traces(self, context):
+        """Returns the traces of the last scheduling decisions, along with
+        the histograms of the time spent in each of their steps.
+        """
+        return jsonutils.to_primitive(self.driver.get_traces(context))
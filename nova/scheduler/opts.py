@@ -27,7 +27,9 @@ import nova.scheduler.ironic_host_manager
 import nova.scheduler.manager
 import nova.scheduler.rpcapi
 import nova.scheduler.scheduler_options
+import nova.scheduler.tracing
 import nova.scheduler.utils
+import nova.scheduler.weights.image_cache
 import nova.scheduler.weights.io_ops
 import nova.scheduler.weights.metrics
 import nova.scheduler.weights.ram
@@ -51,7 +53,9 @@ def list_opts():
              nova.scheduler.ironic_host_manager.host_manager_opts,
              nova.scheduler.manager.scheduler_driver_opts,
              nova.scheduler.rpcapi.rpcapi_opts,
+             nova.scheduler.tracing.tracing_opts,
              nova.scheduler.utils.scheduler_opts,
+             nova.scheduler.weights.image_cache.image_cache_weight_opts,
              nova.scheduler.weights.io_ops.io_ops_weight_opts,
              nova.scheduler.weights.ram.ram_weight_opts,
          )),
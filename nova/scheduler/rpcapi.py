@@ -21,6 +21,7 @@ import oslo_messaging as messaging
 
 from nova.objects import base as objects_base
 from nova import rpc
+from nova import utils
 
 rpcapi_opts = [
     cfg.StrOpt('scheduler_topic',
@@ -96,6 +97,11 @@ class SchedulerAPI(object):
         done such that they can handle the version_cap being set to
         4.2.
 
+        * 4.3 - Added update_compute_node()
+        * 4.4 - Added get_scheduler_traces()
+        * 4.5 - Added sync_instance_info_digest() and
+                update_instance_info_batch()
+
     '''
 
     VERSION_ALIASES = {
@@ -141,7 +147,43 @@ class SchedulerAPI(object):
         return cctxt.cast(ctxt, 'delete_instance_info', host_name=host_name,
                           instance_uuid=instance_uuid)
 
+    def update_instance_info_batch(self, ctxt, host_name, instance_info,
+                                   deleted_instance_uuids):
+        version = '4.5'
+        if not self.client.can_send_version(version):
+            if instance_info.objects:
+                self.update_instance_info(ctxt, host_name, instance_info)
+            for instance_uuid in deleted_instance_uuids:
+                self.delete_instance_info(ctxt, host_name, instance_uuid)
+            return
+        cctxt = self.client.prepare(version=version, fanout=True)
+        return cctxt.cast(ctxt, 'update_instance_info_batch',
+                          host_name=host_name, instance_info=instance_info,
+                          deleted_instance_uuids=deleted_instance_uuids)
+
     def sync_instance_info(self, ctxt, host_name, instance_uuids):
+        version = '4.5'
+        if self.client.can_send_version(version):
+            # Only send the digest of the instance UUIDs, the schedulers
+            # read the instances of the host from the DB if theirs differs.
+            cctxt = self.client.prepare(version=version, fanout=True)
+            return cctxt.cast(ctxt, 'sync_instance_info_digest',
+                              host_name=host_name,
+                              digest=utils.get_set_digest(instance_uuids))
         cctxt = self.client.prepare(version='4.2', fanout=True)
         return cctxt.cast(ctxt, 'sync_instance_info', host_name=host_name,
                           instance_uuids=instance_uuids)
+
+    def update_compute_node(self, ctxt, compute_node, generation):
+        version = '4.3'
+        if not self.client.can_send_version(version):
+            # Older schedulers read all the compute nodes from the DB for
+            # each request anyway, so there is nothing to fall back to.
+            return
+        cctxt = self.client.prepare(version=version, fanout=True)
+        return cctxt.cast(ctxt, 'update_compute_node',
+                          compute_node=compute_node, generation=generation)
+
+    def get_scheduler_traces(self, ctxt, host=None):
+        cctxt = self.client.prepare(version='4.4', server=host)
+        return cctxt.call(ctxt, 'get_scheduler_traces')
@@ -0,0 +1,152 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Scheduler decision tracing.
+
+When enabled, the scheduler records a trace for each request it handles,
+made of spans timing each step of the decision: reading the host states,
+running each filter and each weigher. Filter spans also record how many hosts
+went in and out of the filter. The last traces are kept in memory, along with
+rolling histograms of the span durations, and can be retrieved from a
+scheduler through the get_scheduler_traces() RPC call.
+"""
+
+import bisect
+import collections
+import contextlib
+
+from oslo_config import cfg
+from oslo_utils import timeutils
+
+tracing_opts = [
+    cfg.BoolOpt('scheduler_tracing',
+                default=False,
+                help='Record the time spent in each step of the scheduling '
+                     'decisions, such as each filter and weigher, and the '
+                     'number of hosts going through each filter.'),
+    cfg.IntOpt('scheduler_tracing_history',
+               default=100,
+               help='Number of request traces kept by each scheduler when '
+                    'scheduler_tracing is enabled. The duration histograms '
+                    'are computed over those traces.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(tracing_opts)
+
+# Upper bounds, in milliseconds, of the buckets of the duration histograms.
+# The last bucket counts everything above the last bound.
+HISTOGRAM_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class SchedulerTrace(object):
+    """Spans recorded while handling a single scheduling request."""
+
+    def __init__(self, request_id=None):
+        self.request_id = request_id
+        self.started_at = timeutils.utcnow()
+        self.spans = []
+        self.counters = collections.Counter()
+
+    def add_span(self, name, duration, **details):
+        """Records a span of duration seconds.
+
+        The details, such as the number of hosts going in and out of a
+        filter, are stored along with the span.
+        """
+        span = {'name': name, 'duration': duration}
+        span.update(details)
+        self.spans.append(span)
+
+    @contextlib.contextmanager
+    def span(self, name, **details):
+        """Records a span for the duration of the with block."""
+        with timeutils.StopWatch() as timer:
+            yield
+        self.add_span(name, timer.elapsed(), **details)
+
+    def count(self, name, value=1):
+        """Increments the counter name, such as the number of retries."""
+        self.counters[name] += value
+
+    def to_dict(self):
+        return {'request_id': self.request_id,
+                'started_at': timeutils.isotime(self.started_at),
+                'spans': list(self.spans),
+                'counters': dict(self.counters)}
+
+
+class SchedulerTracer(object):
+    """Keeps the traces of the last requests handled by a scheduler."""
+
+    def __init__(self):
+        self.enabled = CONF.scheduler_tracing
+        self._traces = collections.deque(
+            maxlen=max(CONF.scheduler_tracing_history, 1))
+
+    def start_trace(self, request_id=None):
+        """Returns a new SchedulerTrace, or None if tracing is disabled."""
+        if not self.enabled:
+            return None
+        return SchedulerTrace(request_id)
+
+    def finish_trace(self, trace):
+        """Stores a trace once its request was handled."""
+        if trace is not None:
+            self._traces.append(trace)
+
+    def get_histograms(self):
+        """Returns the histograms of the durations of the spans of the kept
+        traces, keyed by span name.
+
+        Each histogram is a dict with the count, total duration and the list
+        of bucket counts, bucket i counting the spans lasting up to
+        HISTOGRAM_BUCKETS[i] milliseconds.
+        """
+        histograms = {}
+        for trace in self._traces:
+            for span in trace.spans:
+                histogram = histograms.get(span['name'])
+                if histogram is None:
+                    histogram = histograms[span['name']] = {
+                        'count': 0,
+                        'total': 0.0,
+                        'buckets': [0] * (len(HISTOGRAM_BUCKETS) + 1)}
+                histogram['count'] += 1
+                histogram['total'] += span['duration']
+                bucket = bisect.bisect_left(HISTOGRAM_BUCKETS,
+                                            span['duration'] * 1000)
+                histogram['buckets'][bucket] += 1
+        return histograms
+
+    def get_report(self):
+        """Returns the kept traces and the span histograms."""
+        return {'enabled': self.enabled,
+                'buckets': list(HISTOGRAM_BUCKETS),
+                'traces': [trace.to_dict() for trace in self._traces],
+                'histograms': self.get_histograms()}
+
+
+def span(trace, name, **details):
+    """Returns a context manager recording a span in trace, if any."""
+    if trace is None:
+        return _null_span()
+    return trace.span(name, **details)
+
+
+@contextlib.contextmanager
+def _null_span():
+    yield
@@ -45,8 +45,12 @@ CONF = cfg.CONF
 CONF.register_opts(scheduler_opts)
 
 CONF.import_opt('scheduler_default_filters', 'nova.scheduler.host_manager')
+CONF.import_opt('scheduler_tracks_group_hosts', 'nova.scheduler.host_manager')
 
-GroupDetails = collections.namedtuple('GroupDetails', ['hosts', 'policies'])
+GroupDetails = collections.namedtuple('GroupDetails',
+                                      ['hosts', 'policies', 'members'])
+# The members are only set when the scheduler looks up their hosts
+GroupDetails.__new__.__defaults__ = (None,)
 
 
 def build_request_spec(ctxt, image, instances, instance_type=None):
@@ -300,8 +304,13 @@ def _get_group_details(context, instance_uuid, user_group_hosts=None):
             msg = _("ServerGroupAntiAffinityFilter not configured")
             LOG.error(msg)
             raise exception.UnsupportedPolicyException(reason=msg)
-        group_hosts = set(group.get_hosts())
         user_hosts = set(user_group_hosts) if user_group_hosts else set()
+        if CONF.scheduler_tracks_group_hosts:
+            # The scheduler adds the hosts of the members from its own view
+            # of the instances
+            return GroupDetails(hosts=user_hosts, policies=group.policies,
+                                members=group.members)
+        group_hosts = set(group.get_hosts())
         return GroupDetails(hosts=user_hosts | group_hosts,
                             policies=group.policies)
 
@@ -324,6 +333,8 @@ def setup_instance_group(context, request_spec, filter_properties):
         filter_properties['group_updated'] = True
         filter_properties['group_hosts'] = group_info.hosts
         filter_properties['group_policies'] = group_info.policies
+        if group_info.members is not None:
+            filter_properties['group_members'] = group_info.members
 
 
 def retry_on_timeout(retries=1):
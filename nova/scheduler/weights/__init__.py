@@ -17,6 +17,7 @@
 Scheduler host weights
 """
 
+from nova.scheduler import host_snapshot
 from nova import weights
 
 
@@ -42,6 +43,9 @@ class HostWeightHandler(weights.BaseWeightHandler):
     def __init__(self):
         super(HostWeightHandler, self).__init__(BaseHostWeigher)
 
+    def get_snapshot(self, objs):
+        return host_snapshot.HostStateSnapshot(objs)
+
 
 def all_weighers():
     """Return a list of weight plugin classes found in this directory."""
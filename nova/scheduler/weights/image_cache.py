@@ -0,0 +1,65 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Image Cache Weigher. Weigh hosts by whether their image cache holds the image
+of the request.
+
+The weigher is disabled by default, so that enabling it doesn't change where
+the instances are placed. Setting the 'image_cache_weight_multiplier' option
+to a positive number makes the scheduler prefer the hosts which don't need to
+download the image from glance.
+"""
+
+from oslo_config import cfg
+
+from nova.scheduler import weights
+
+image_cache_weight_opts = [
+    cfg.FloatOpt('image_cache_weight_multiplier',
+                 default=0.0,
+                 help='Multiplier used for weighing the hosts whose image '
+                      'cache holds the image of the request. Positive '
+                      'numbers mean a preference to choose these hosts, 0 '
+                      'disables the weigher. As the weight is either 0 or '
+                      '1, a multiplier of 1.0 weighs as much as the whole '
+                      'range of the RAM weigher.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(image_cache_weight_opts)
+
+
+def _get_image_id(weight_properties):
+    spec = weight_properties.get('request_spec') or {}
+    return (spec.get('image') or {}).get('id')
+
+
+class ImageCacheWeigher(weights.BaseHostWeigher):
+    minval = 0
+    maxval = 1
+    supports_batch = True
+
+    def weight_multiplier(self):
+        """Override the weight multiplier."""
+        return CONF.image_cache_weight_multiplier
+
+    def _weigh_object(self, host_state, weight_properties):
+        """Higher weights win. We want to choose the hosts having the image
+        in their cache to be the default.
+        """
+        image_id = _get_image_id(weight_properties)
+        return int(image_id in host_state.cached_images)
+
+    def _weigh_snapshot(self, snapshot, weight_properties):
+        image_id = _get_image_id(weight_properties)
+        return [int(image_id in cached_images)
+                for cached_images in snapshot['cached_images']]
@@ -39,6 +39,7 @@ CONF.register_opts(io_ops_weight_opts)
 
 class IoOpsWeigher(weights.BaseHostWeigher):
     minval = 0
+    supports_batch = True
 
     def weight_multiplier(self):
         """Override the weight multiplier."""
@@ -49,3 +50,6 @@ class IoOpsWeigher(weights.BaseHostWeigher):
         to be the default.
         """
         return host_state.num_io_ops
+
+    def _weigh_snapshot(self, snapshot, weight_properties):
+        return snapshot['num_io_ops']
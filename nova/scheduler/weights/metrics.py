@@ -68,6 +68,8 @@ CONF.register_opts(metrics_weight_opts, group='metrics')
 
 
 class MetricsWeigher(weights.BaseHostWeigher):
+    supports_batch = True
+
     def __init__(self):
         self._parse_setting()
 
@@ -105,3 +107,7 @@ class MetricsWeigher(weights.BaseHostWeigher):
                         return CONF.metrics.weight_of_unavailable
 
         return value
+
+    def _weigh_snapshot(self, snapshot, weight_properties):
+        return [self._weigh_object(host_state, weight_properties)
+                for host_state in snapshot]
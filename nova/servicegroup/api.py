@@ -16,9 +16,12 @@
 
 """Define APIs for the servicegroup access."""
 
+import collections
+
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import importutils
+import six
 
 from nova.i18n import _, _LW
 
@@ -91,6 +94,23 @@ class API(object):
 
         return self._driver.is_up(member)
 
+    def get_up_services(self, services):
+        """Returns the set of the IDs of the given services which are up.
+
+        The services are checked with a single call to the driver for each
+        of their groups, rather than one call per service.
+        """
+        services_by_group = collections.defaultdict(list)
+        for service in services:
+            if not service.get('forced_down'):
+                services_by_group[service['topic']].append(service)
+        up_service_ids = set()
+        for group_id, group_services in six.iteritems(services_by_group):
+            up_service_ids.update(
+                service['id'] for service in
+                self._driver.get_up_services(group_id, group_services))
+        return up_service_ids
+
     def get_all(self, group_id):
         """Returns ALL members of the given group."""
         LOG.debug('Returns ALL members of the [%s] '
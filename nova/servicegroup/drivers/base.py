@@ -27,3 +27,15 @@ class Driver(object):
     def is_up(self, member):
         """Check whether the given member is up."""
         raise NotImplementedError()
+
+    def get_up_services(self, group_id, service_refs):
+        """Returns the services of the given group which are up.
+
+        :param group_id: the group ID/name, the topic of the services
+        :param service_refs: the services of the group to check
+
+        Drivers which can check all the members of a group at once should
+        override this rather than check each service with is_up().
+        """
+        return [service_ref for service_ref in service_refs
+                if self.is_up(service_ref)]
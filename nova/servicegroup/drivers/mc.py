@@ -69,6 +69,21 @@ class MemcachedDriver(base.Driver):
 
         return is_up
 
+    def get_up_services(self, group_id, service_refs):
+        """Returns the services of the given group which are up, reading all
+        their keys with a single memcached request.
+        """
+        if not hasattr(self.mc, 'get_multi'):
+            # The in-memory cache used without memcached servers
+            return super(MemcachedDriver, self).get_up_services(group_id,
+                                                                service_refs)
+        keys = [str("%(topic)s:%(host)s" % service_ref)
+                for service_ref in service_refs]
+        values = self.mc.get_multi(keys) if keys else {}
+        return [service_ref
+                for key, service_ref in zip(keys, service_refs)
+                if values.get(key) is not None]
+
     def _report_state(self, service):
         """Update the state of this service in the datastore."""
         try:
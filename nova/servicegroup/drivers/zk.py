@@ -140,6 +140,14 @@ class ZooKeeperDriver(base.Driver):
         all_members = self._get_all(group_id)
         return member_id in all_members
 
+    def get_up_services(self, group_id, service_refs):
+        """Returns the services of the given group which are up, listing the
+        members of the group only once.
+        """
+        all_members = set(self._get_all(group_id))
+        return [service_ref for service_ref in service_refs
+                if service_ref['host'] in all_members]
+
     def _get_all(self, group_id):
         """Return all members in a list, or a ServiceGroupUnavailable
         exception.
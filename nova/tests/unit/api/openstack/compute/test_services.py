@@ -565,6 +565,21 @@ class ServicesTestV21(test.TestCase):
         req = FakeRequestWithHostService()
         self.assertRaises(self.service_is_up_exc, self.controller.index, req)
 
+    def test_services_list_checks_services_at_once(self):
+        req = FakeRequest()
+        with test.nested(
+            mock.patch.object(self.controller.servicegroup_api,
+                              'get_up_services', return_value=set([2])),
+            mock.patch.object(self.controller.servicegroup_api,
+                              'service_is_up')
+        ) as (mock_get_up_services, mock_service_is_up):
+            res_dict = self.controller.index(req)
+        mock_get_up_services.assert_called_once_with(mock.ANY)
+        self.assertFalse(mock_service_is_up.called)
+        self.assertEqual(['down', 'up', 'down', 'down'],
+                         [service['state']
+                          for service in res_dict['services']])
+
 
 class ServicesTestV211(ServicesTestV21):
     wsgi_api_version = '2.11'
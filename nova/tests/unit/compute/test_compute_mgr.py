@@ -111,6 +111,106 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
             event_pwr_state=power_state.SHUTDOWN,
             current_pwr_state=power_state.RUNNING)
 
+    @mock.patch.object(utils, 'spawn_n')
+    def test_precache_image(self, mock_spawn):
+        ctxt = context.RequestContext('fake-user', 'fake-project',
+                                      auth_token='fake-token')
+        self.compute.precache_image(ctxt, 'fake-image')
+        self.compute.precache_image(ctxt, 'fake-image')
+        mock_spawn.assert_called_once_with(
+            self.compute._precache_image,
+            test.MatchType(context.RequestContext), 'fake-image')
+        # The image is fetched with the token of the request, elevated to
+        # read the image whichever project it belongs to
+        precache_ctxt = mock_spawn.call_args[0][1]
+        self.assertTrue(precache_ctxt.is_admin)
+        self.assertEqual('fake-token', precache_ctxt.auth_token)
+        self.assertEqual(set(['fake-image']),
+                         self.compute._images_precaching)
+
+    @mock.patch.object(utils, 'spawn_n')
+    def test_precache_image_no_token(self, mock_spawn):
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+        self.compute.precache_image(ctxt, 'fake-image')
+        self.assertFalse(mock_spawn.called)
+        self.assertEqual(set(), self.compute._images_precaching)
+
+    def _test_precache_image(self, free_disk_gb, disk_available_least=None,
+                             error=None, **image_meta):
+        rt = mock.Mock()
+        rt.compute_node = objects.ComputeNode(
+            free_disk_gb=free_disk_gb,
+            disk_available_least=disk_available_least)
+        self.compute._resource_tracker_dict['fake-node'] = rt
+        self.compute._images_precaching.add('fake-image')
+        self.flags(image_precache_max_rate=10,
+                   image_precache_disk_headroom_gb=20)
+        image = {'size': 5 * 1024 ** 3, 'disk_format': 'raw',
+                 'is_public': True}
+        image.update(image_meta)
+        with test.nested(
+            mock.patch.object(self.compute.image_api, 'get',
+                              return_value=image),
+            mock.patch.object(self.compute.driver, 'precache_image',
+                              return_value=True, side_effect=error),
+        ) as (mock_get, mock_precache):
+            self.compute._precache_image(mock.sentinel.ctxt, 'fake-image')
+            mock_get.assert_called_once_with(mock.sentinel.ctxt,
+                                             'fake-image')
+        self.assertEqual(set(), self.compute._images_precaching)
+        return mock_precache
+
+    def test_precache_image_fetches(self):
+        mock_precache = self._test_precache_image(30)
+        mock_precache.assert_called_once_with(
+            mock.sentinel.ctxt, 'fake-image',
+            max_rate=10 * 1024 ** 2, max_size=10 * 1024 ** 3)
+
+    def test_precache_image_private(self):
+        mock_precache = self._test_precache_image(30, is_public=False)
+        self.assertFalse(mock_precache.called)
+
+    def test_precache_image_not_enough_disk(self):
+        mock_precache = self._test_precache_image(24)
+        self.assertFalse(mock_precache.called)
+
+    def test_precache_image_not_enough_disk_available(self):
+        mock_precache = self._test_precache_image(
+            30, disk_available_least=24)
+        self.assertFalse(mock_precache.called)
+
+    def test_precache_image_not_enough_disk_for_raw(self):
+        # The image would take its minimum disk once converted to raw
+        self.flags(force_raw_images=True)
+        mock_precache = self._test_precache_image(
+            30, disk_format='qcow2', min_disk=15)
+        self.assertFalse(mock_precache.called)
+
+    def test_precache_image_virtual_size_too_big(self):
+        self.flags(force_raw_images=True)
+        mock_precache = self._test_precache_image(
+            30, disk_format='qcow2',
+            error=exception.FlavorDiskSmallerThanImage(flavor_size=1,
+                                                       image_size=2))
+        self.assertTrue(mock_precache.called)
+
+    def test_precache_image_not_implemented(self):
+        self.compute._images_precaching.add('fake-image')
+        self.flags(image_precache_disk_headroom_gb=0)
+        rt = mock.Mock()
+        rt.compute_node = objects.ComputeNode(free_disk_gb=10,
+                                              disk_available_least=None)
+        self.compute._resource_tracker_dict['fake-node'] = rt
+        with test.nested(
+            mock.patch.object(self.compute.image_api, 'get',
+                              return_value={'size': 1024,
+                                            'is_public': True}),
+            mock.patch.object(self.compute.driver, 'precache_image',
+                              side_effect=NotImplementedError),
+        ):
+            self.compute._precache_image(mock.sentinel.ctxt, 'fake-image')
+        self.assertEqual(set(), self.compute._images_precaching)
+
     def test_delete_instance_info_cache_delete_ordering(self):
         call_tracker = mock.Mock()
         call_tracker.clear_events_for_instance.return_value = None
@@ -1371,6 +1471,97 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                                         use_slave=True)
             mock_spawn.assert_called_once_with(mock.ANY, instance)
 
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_sync_power_states_bulk(self, mock_get):
+        instances = [objects.Instance(uuid='fake-uuid%d' % i,
+                                      power_state=power_state.RUNNING,
+                                      vm_state=vm_states.ACTIVE,
+                                      task_state=None) for i in range(3)]
+        mock_get.return_value = instances
+        vm_power_states = {'fake-uuid0': power_state.RUNNING,
+                           'fake-uuid1': power_state.SHUTDOWN}
+        with test.nested(
+            mock.patch.object(self.compute.driver, 'get_power_states',
+                              return_value=vm_power_states),
+            mock.patch.object(self.compute.driver, 'get_num_instances'),
+            mock.patch.object(self.compute._sync_power_pool, 'spawn_n')
+        ) as (mock_get_power_states, mock_get_num_instances, mock_spawn):
+            self.compute._sync_power_states(mock.sentinel.context)
+            self.assertFalse(mock_get_num_instances.called)
+            self.assertEqual([mock.call(mock.ANY, instances[1]),
+                              mock.call(mock.ANY, instances[2])],
+                             mock_spawn.call_args_list)
+
+    def test_power_state_needs_sync(self):
+        def needs_sync(db_power_state, vm_state, vm_power_state,
+                       task_state=None):
+            instance = objects.Instance(power_state=db_power_state,
+                                        vm_state=vm_state,
+                                        task_state=task_state)
+            return self.compute._power_state_needs_sync(instance,
+                                                        vm_power_state)
+
+        self.assertFalse(needs_sync(power_state.RUNNING, vm_states.ACTIVE,
+                                    power_state.RUNNING))
+        self.assertTrue(needs_sync(power_state.RUNNING, vm_states.ACTIVE,
+                                   power_state.NOSTATE))
+        self.assertFalse(needs_sync(power_state.RUNNING, vm_states.ACTIVE,
+                                    power_state.SHUTDOWN,
+                                    task_state=task_states.POWERING_OFF))
+        self.assertTrue(needs_sync(power_state.SHUTDOWN, vm_states.ACTIVE,
+                                   power_state.SHUTDOWN))
+        self.assertFalse(needs_sync(power_state.SHUTDOWN, vm_states.STOPPED,
+                                    power_state.SHUTDOWN))
+        self.assertTrue(needs_sync(power_state.RUNNING, vm_states.STOPPED,
+                                   power_state.RUNNING))
+        self.assertFalse(needs_sync(power_state.PAUSED, vm_states.PAUSED,
+                                    power_state.PAUSED))
+        self.assertTrue(needs_sync(power_state.CRASHED, vm_states.PAUSED,
+                                   power_state.CRASHED))
+        self.assertFalse(needs_sync(power_state.NOSTATE, vm_states.DELETED,
+                                    power_state.NOSTATE))
+        self.assertFalse(needs_sync(power_state.RUNNING, vm_states.ERROR,
+                                    power_state.RUNNING))
+
+    @mock.patch.object(objects.InstanceList, 'get_by_filters')
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_heal_instance_info_cache_batch(self, mock_get_by_host,
+                                            mock_get_by_filters):
+        self.flags(heal_instance_info_cache_batch_size=2)
+        instances = [objects.Instance(uuid='fake-uuid%d' % i,
+                                      host=self.compute.host,
+                                      vm_state=vm_states.ACTIVE,
+                                      task_state=None) for i in range(5)]
+        instances[3].host = 'other-host'
+        mock_get_by_host.return_value = instances
+        with mock.patch.object(self.compute.network_api,
+                               'get_instances_nw_info',
+                               return_value={}) as mock_get_nw_infos:
+            self.compute._heal_instance_info_cache(self.context)
+            mock_get_nw_infos.assert_called_once_with(self.context,
+                                                      instances[:2])
+            self.assertEqual(['fake-uuid2', 'fake-uuid3', 'fake-uuid4'],
+                             self.compute._instance_uuids_to_heal)
+
+            # The instance migrated to another host is skipped, the next
+            # one fills the batch
+            mock_get_by_filters.return_value = [instances[2], instances[3]]
+            mock_get_nw_infos.reset_mock()
+            with mock.patch.object(objects.Instance, 'get_by_uuid',
+                                   return_value=instances[4]) as mock_get:
+                self.compute._heal_instance_info_cache(self.context)
+            mock_get_nw_infos.assert_called_once_with(
+                self.context, [instances[2], instances[4]])
+            expected_attrs = ['system_metadata', 'info_cache']
+            mock_get_by_filters.assert_called_once_with(
+                self.context,
+                {'uuid': ['fake-uuid2', 'fake-uuid3'], 'deleted': False},
+                expected_attrs=expected_attrs, use_slave=True)
+            mock_get.assert_called_once_with(
+                self.context, 'fake-uuid4', expected_attrs=expected_attrs,
+                use_slave=True)
+            self.assertEqual([], self.compute._instance_uuids_to_heal)
+
     def _get_sync_instance(self, power_state, vm_state, task_state=None,
                            shutdown_terminate=False):
         instance = objects.Instance()
@@ -1500,14 +1691,14 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
         c = FakeInstance('789', 'banana', {})
 
         self.mox.StubOutWithMock(objects.InstanceList,
-                                 'get_by_filters')
-        objects.InstanceList.get_by_filters(
+                                 'iter_by_filters')
+        objects.InstanceList.iter_by_filters(
             {'read_deleted': 'yes'},
             {'deleted': True, 'soft_deleted': False, 'host': 'fake-mini',
              'cleaned': False},
             expected_attrs=['info_cache', 'security_groups',
                             'system_metadata'],
-            use_slave=True).AndReturn([a, b, c])
+            use_slave=True).AndReturn(iter([a, b, c]))
 
         self.mox.StubOutWithMock(self.compute.driver, 'delete_instance_files')
         self.compute.driver.delete_instance_files(
@@ -1979,12 +2170,16 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                                           tag='tag3')]
 
         @mock.patch.object(self.compute, '_process_instance_vif_deleted_event')
+        @mock.patch.object(self.compute.network_api,
+                           'invalidate_network_cache')
         @mock.patch.object(self.compute.network_api, 'get_instance_nw_info')
         @mock.patch.object(self.compute, '_process_instance_event')
         def do_test(_process_instance_event, get_instance_nw_info,
+                    invalidate_network_cache,
                     _process_instance_vif_deleted_event):
             self.compute.external_instance_event(self.context,
                                                  instances, events)
+            invalidate_network_cache.assert_called_once_with(instances[0])
             get_instance_nw_info.assert_called_once_with(self.context,
                                                          instances[0])
             _process_instance_event.assert_called_once_with(instances[1],
@@ -2786,6 +2981,33 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
         self.assertEqual(args[1], self.compute.host)
         self.assertEqual(args[2], mock.sentinel.inst_uuid)
 
+    @mock.patch.object(manager.greenthread, 'spawn_after')
+    @mock.patch.object(nova.scheduler.client.SchedulerClient,
+                       'update_instance_info_batch')
+    def test_batch_scheduler_instance_info(self, mock_update_batch,
+                                           mock_spawn_after):
+        self.flags(scheduler_instance_update_window=2)
+        inst1 = objects.Instance(uuid='fake1')
+        inst2 = objects.Instance(uuid='fake2')
+        self.compute._update_scheduler_instance_info(self.context, inst1)
+        self.compute._update_scheduler_instance_info(self.context, inst2)
+        self.compute._delete_scheduler_instance_info(self.context, 'fake2')
+        self.compute._delete_scheduler_instance_info(self.context, 'fake3')
+        self.assertFalse(mock_update_batch.called)
+        mock_spawn_after.assert_called_once_with(
+            2, self.compute._send_pending_scheduler_instance_info, mock.ANY)
+
+        self.compute._send_pending_scheduler_instance_info(self.context)
+        self.assertEqual(1, mock_update_batch.call_count)
+        args = mock_update_batch.call_args[0]
+        self.assertEqual(self.compute.host, args[1])
+        self.assertEqual([inst1], args[2].objects)
+        self.assertEqual(['fake2', 'fake3'], sorted(args[3]))
+
+        # Nothing is sent when there are no pending changes
+        self.compute._send_pending_scheduler_instance_info(self.context)
+        self.assertEqual(1, mock_update_batch.call_count)
+
     @mock.patch.object(nova.context.RequestContext, 'elevated')
     @mock.patch.object(nova.objects.InstanceList, 'get_by_host')
     @mock.patch.object(nova.scheduler.client.SchedulerClient,
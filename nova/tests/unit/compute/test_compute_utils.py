@@ -643,6 +643,22 @@ class ComputeUtilsGetValFromSysMetadata(test.NoDBTestCase):
         self.assertEqual(0, result)
 
 
+class ComputeUtilsIsImagePublic(test.NoDBTestCase):
+    def test_is_image_public_v1(self):
+        self.assertTrue(compute_utils.is_image_public({'is_public': True}))
+        self.assertTrue(compute_utils.is_image_public({'is_public': 'True'}))
+        self.assertFalse(compute_utils.is_image_public({'is_public': False}))
+        self.assertFalse(compute_utils.is_image_public({}))
+
+    def test_is_image_public_visibility(self):
+        self.assertTrue(compute_utils.is_image_public(
+            {'visibility': 'PUBLIC'}))
+        self.assertTrue(compute_utils.is_image_public(
+            {'visibility': 'shared'}))
+        self.assertFalse(compute_utils.is_image_public(
+            {'visibility': 'private', 'is_public': True}))
+
+
 class ComputeUtilsGetNWInfo(test.NoDBTestCase):
     def test_instance_object_none_info_cache(self):
         inst = fake_instance.fake_instance_obj('fake-context',
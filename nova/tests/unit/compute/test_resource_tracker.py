@@ -754,6 +754,188 @@ class SchedulerClientTrackerTestCase(BaseTrackerTestCase):
                                         "called when there is no change")
 
 
+class DeltaUpdatesTrackerTestCase(BaseTrackerTestCase):
+
+    def setUp(self):
+        super(DeltaUpdatesTrackerTestCase, self).setUp()
+        self.flags(compute_resource_delta_updates=True)
+        self.written_changes = []
+        self.tracker.scheduler_client.update_resource_stats = mock.Mock(
+            side_effect=lambda compute_node: self.written_changes.append(
+                compute_node.obj_what_changed()))
+        # Write the current state of the compute node
+        self.tracker.compute_node.obj_reset_changes()
+        self.tracker._set_written_digests(self.tracker.compute_node.fields)
+
+    def test_update_only_changed_fields(self):
+        compute_node = self.tracker.compute_node
+        compute_node.local_gb_used += 1
+        compute_node.memory_mb = compute_node.memory_mb
+        compute_node.stats = copy.deepcopy(compute_node.stats)
+        self.tracker._update(self.context)
+        self.assertEqual([set(['local_gb_used'])], self.written_changes)
+        # The same value is not written twice
+        compute_node.local_gb_used = compute_node.local_gb_used
+        self.tracker._update(self.context)
+        self.assertEqual(1, len(self.written_changes))
+
+    def test_update_changed_blob(self):
+        compute_node = self.tracker.compute_node
+        stats = copy.deepcopy(compute_node.stats)
+        stats['new_stat'] = '1'
+        self.tracker.stats['new_stat'] = '1'
+        compute_node.stats = stats
+        self.tracker._update(self.context)
+        self.assertEqual([set(['stats'])], self.written_changes)
+
+    def test_no_update(self):
+        compute_node = self.tracker.compute_node
+        compute_node.numa_topology = compute_node.numa_topology
+        self.tracker._update(self.context)
+        self.assertEqual([], self.written_changes)
+        self.assertFalse(compute_node.obj_what_changed())
+
+    @mock.patch.object(resource_tracker.greenthread, 'spawn_after')
+    @mock.patch.object(resource_tracker.time, 'time')
+    def test_coalesced_update(self, mock_time, mock_spawn_after):
+        self.flags(compute_resource_update_window=5)
+        compute_node = self.tracker.compute_node
+        mock_time.return_value = 100
+        compute_node.local_gb_used += 1
+        self.tracker._update(self.context, coalesce=True)
+        self.assertEqual(1, len(self.written_changes))
+        self.assertFalse(mock_spawn_after.called)
+
+        # Updates within the window are deferred to its end
+        mock_time.return_value = 101
+        compute_node.local_gb_used += 1
+        self.tracker._update(self.context, coalesce=True)
+        compute_node.memory_mb_used += 1
+        self.tracker._update(self.context, coalesce=True)
+        self.assertEqual(1, len(self.written_changes))
+        mock_spawn_after.assert_called_once_with(
+            4, self.tracker._write_pending_update, self.context)
+
+        self.tracker._write_pending_update(self.context)
+        self.assertEqual(set(['local_gb_used', 'memory_mb_used']),
+                         self.written_changes[1])
+
+    @mock.patch.object(resource_tracker.greenthread, 'spawn_after')
+    @mock.patch.object(resource_tracker.time, 'time')
+    def test_coalesced_update_written_by_audit(self, mock_time,
+                                               mock_spawn_after):
+        self.flags(compute_resource_update_window=5)
+        mock_time.return_value = 100
+        self.tracker.compute_node.local_gb_used += 1
+        self.tracker._update(self.context)
+        self.tracker.compute_node.local_gb_used += 1
+        self.tracker._update(self.context, coalesce=True)
+        self.assertTrue(mock_spawn_after.called)
+        self.assertEqual(1, len(self.written_changes))
+        # An update which is not coalesced writes the pending changes
+        self.tracker._update(self.context)
+        self.assertEqual(2, len(self.written_changes))
+        self.tracker._write_pending_update(self.context)
+        self.assertEqual(2, len(self.written_changes))
+
+
+class IncrementalAuditTrackerTestCase(BaseTrackerTestCase):
+
+    def setUp(self):
+        super(IncrementalAuditTrackerTestCase, self).setUp()
+        # The first audit was run by _init_tracker(), the next one is
+        # incremental and the one after is a full audit
+        self.flags(resource_audit_full_interval=3)
+        self.stubs.Set(objects.InstanceList, 'get_by_host_and_node',
+                       self._fake_cloned_instances)
+        self.instance1 = self._fake_instance_obj(vm_state=vm_states.ACTIVE,
+                                                 host=self.host)
+        self.instance2 = self._fake_instance_obj(vm_state=vm_states.ACTIVE,
+                                                 host=self.host)
+
+    def _fake_cloned_instances(self, context, host, nodename,
+                               expected_attrs=None):
+        # The database returns new instance objects on each audit
+        instances = self._fake_instance_get_by_host_and_node(
+            context, host, nodename, expected_attrs=expected_attrs)
+        return objects.InstanceList(
+            objects=[instance.obj_clone() for instance in instances])
+
+    def _usage(self):
+        compute_node = self.tracker.compute_node
+        return (compute_node.memory_mb_used, compute_node.local_gb_used,
+                compute_node.vcpus_used, compute_node.running_vms,
+                compute_node.free_ram_mb, compute_node.free_disk_gb,
+                set(self.tracker.tracked_instances))
+
+    def _assert_full_audit_usage(self, usage):
+        self.flags(resource_audit_full_interval=1)
+        self.tracker.update_available_resource(self.context)
+        self.assertEqual(self._usage(), usage)
+
+    def test_new_instances(self):
+        with mock.patch.object(self.tracker, '_update_usage_from_instances'
+                               ) as mock_update_usage:
+            self.tracker.update_available_resource(self.context)
+        self.assertFalse(mock_update_usage.called)
+        self.assertEqual(2, self.tracker.compute_node.running_vms)
+        self._assert_full_audit_usage(self._usage())
+
+    def test_unchanged_instances(self):
+        self.tracker.update_available_resource(self.context)
+        self.tracker.update_available_resource(self.context)
+        self.tracker.update_available_resource(self.context)
+        usage = self._usage()
+        with mock.patch.object(self.tracker, '_update_usage_from_instance'
+                               ) as mock_update_usage:
+            self.tracker.update_available_resource(self.context)
+        self.assertFalse(mock_update_usage.called)
+        self.assertEqual(usage, self._usage())
+
+    def test_changed_instances(self):
+        self.tracker.update_available_resource(self.context)
+        self.tracker.update_available_resource(self.context)
+        self.instance1.task_state = task_states.REBOOTING
+        self.instance2.host = 'otherhost'
+        self.tracker.update_available_resource(self.context)
+        self.assertEqual(set([self.instance1.uuid]),
+                         set(self.tracker.tracked_instances))
+        self.assertEqual(1, self.tracker.stats.num_instances)
+        self.assertEqual(1, self.tracker.stats['num_task_rebooting'])
+        self._assert_full_audit_usage(self._usage())
+
+    def test_full_audit(self):
+        self.tracker.update_available_resource(self.context)
+        with mock.patch.object(self.tracker, '_update_usage_from_instances'
+                               ) as mock_update_usage:
+            self.tracker.update_available_resource(self.context)
+        mock_update_usage.assert_called_once_with(self.context, mock.ANY)
+
+    @mock.patch('nova.objects.MigrationList.get_in_progress_by_host_and_node')
+    def test_migrations_force_full_audit(self, mock_migration_list):
+        self.tracker.update_available_resource(self.context)
+        self.instance1.host = 'otherhost'
+        migration = objects.Migration(context=self.context,
+                                      migration_type='live-migration',
+                                      instance_uuid=self.instance1.uuid)
+        mock_migration_list.return_value = [migration]
+        self.tracker.update_available_resource(self.context)
+        self.assertEqual(set([self.instance2.uuid]),
+                         set(self.tracker.tracked_instances))
+        self.assertEqual(1, self.tracker.compute_node.running_vms)
+
+    def test_orphans_force_full_audit(self):
+        self.tracker.driver.get_per_instance_usage = mock.Mock(
+            return_value={'1-2-3-4-5': {'memory_mb': FAKE_VIRT_MEMORY_MB,
+                                        'uuid': '1-2-3-4-5'}})
+        self.tracker.update_available_resource(self.context)
+        self.assertIsNone(self.tracker._audited_instances)
+        with mock.patch.object(self.tracker, '_update_usage_from_instances'
+                               ) as mock_update_usage:
+            self.tracker.update_available_resource(self.context)
+        self.assertTrue(mock_update_usage.called)
+
+
 class TrackerPciStatsTestCase(BaseTrackerTestCase):
 
     def test_update_compute_node(self):
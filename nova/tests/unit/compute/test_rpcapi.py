@@ -352,6 +352,29 @@ class ComputeRpcAPITestCase(test.NoDBTestCase):
         self._test_compute_api('refresh_provider_fw_rules', 'cast',
                 host='host')
 
+    def test_precache_image(self):
+        rpcapi = compute_rpcapi.ComputeAPI()
+        with test.nested(
+            mock.patch.object(rpcapi.client, 'can_send_version',
+                              return_value=True),
+            mock.patch.object(rpcapi.client, 'prepare'),
+        ) as (csv_mock, prepare_mock):
+            rpcapi.precache_image(self.context, 'fake-image')
+            csv_mock.assert_called_once_with('4.6')
+            prepare_mock.assert_called_once_with(fanout=True, version='4.6')
+            prepare_mock.return_value.cast.assert_called_once_with(
+                self.context, 'precache_image', image_id='fake-image')
+
+    def test_precache_image_old_compute(self):
+        rpcapi = compute_rpcapi.ComputeAPI()
+        with test.nested(
+            mock.patch.object(rpcapi.client, 'can_send_version',
+                              return_value=False),
+            mock.patch.object(rpcapi.client, 'prepare'),
+        ) as (csv_mock, prepare_mock):
+            rpcapi.precache_image(self.context, 'fake-image')
+            self.assertFalse(prepare_mock.called)
+
     def test_refresh_instance_security_rules(self):
         expected_args = {'instance': self.fake_instance_obj}
         self._test_compute_api('refresh_instance_security_rules', 'cast',
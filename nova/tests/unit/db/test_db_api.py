@@ -402,6 +402,59 @@ class UnsupportedDbRegexpTestCase(DbTestCase):
                     marker = insts[-1]['uuid']
                     self.assertEqual(correct[-1]['uuid'], marker)
 
+    def test_instance_get_all_by_filters_sort_batched(self,
+            mock_get_regexp):
+        '''Verifies sort order and batch sizes when reading in batches.'''
+        test1_active = self.create_instance_with_args(
+                            display_name='test1',
+                            vm_state=vm_states.ACTIVE)
+        test1_error = self.create_instance_with_args(
+                           display_name='test1',
+                           vm_state=vm_states.ERROR)
+        test1_error2 = self.create_instance_with_args(
+                            display_name='test1',
+                            vm_state=vm_states.ERROR)
+        test2_active = self.create_instance_with_args(
+                            display_name='test2',
+                            vm_state=vm_states.ACTIVE)
+        test2_error = self.create_instance_with_args(
+                           display_name='test2',
+                           vm_state=vm_states.ERROR)
+        self.create_instance_with_args(display_name='other')
+        filters = {'display_name': '%test%'}
+        sort_keys = ['display_name', 'vm_state', 'created_at']
+        sort_dirs = ['asc', 'desc', 'asc']
+        correct_order = [test1_error, test1_error2, test1_active,
+                         test2_error, test2_active]
+
+        for batch_size in range(1, 7):
+            batches = list(db.instance_get_all_by_filters_sort_batched(
+                self.ctxt, filters, batch_size,
+                sort_keys=sort_keys, sort_dirs=sort_dirs))
+            self.assertTrue(all(len(batch) <= batch_size
+                                for batch in batches))
+            self.assertEqual([inst['uuid'] for inst in correct_order],
+                             [inst['uuid'] for batch in batches
+                              for inst in batch])
+            for batch in batches:
+                for inst in batch:
+                    self.assertIn('metadata', inst)
+                    self.assertIn('system_metadata', inst)
+
+        # Starting after a marker
+        batches = list(db.instance_get_all_by_filters_sort_batched(
+            self.ctxt, filters, 2, marker=test1_active['uuid'],
+            sort_keys=sort_keys, sort_dirs=sort_dirs))
+        self.assertEqual([test2_error['uuid'], test2_active['uuid']],
+                         [inst['uuid'] for batch in batches
+                          for inst in batch])
+
+    def test_instance_get_all_by_filters_sort_batched_bad_marker(self,
+            mock_get_regexp):
+        batches = db.instance_get_all_by_filters_sort_batched(
+            self.ctxt, {}, 2, marker='foo')
+        self.assertRaises(exception.MarkerNotFound, list, batches)
+
     def test_instance_get_deleted_by_filters_sort_keys_paginate(self,
             mock_get_regexp):
         '''Verifies sort order with pagination for deleted instances.'''
@@ -2956,6 +3009,25 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         self.assertIsInstance(instance['access_ip_v4'], six.string_types)
         self.assertIsInstance(instance['access_ip_v6'], six.string_types)
 
+    def test_instance_info_cache_update_many(self):
+        uuid1 = self.create_instance_with_args()['uuid']
+        uuid2 = self.create_instance_with_args()['uuid']
+        uuid3 = self.create_instance_with_args()['uuid']
+        db.instance_destroy(self.ctxt, uuid3)
+        updated = db.instance_info_cache_update_many(
+            self.ctxt, {uuid1: {'network_info': '[1]'},
+                        uuid2: {'network_info': '[2]'},
+                        uuid3: {'network_info': '[3]'}})
+        self.assertEqual(set([uuid1, uuid2]),
+                         set(info_cache['instance_uuid']
+                             for info_cache in updated))
+        self.assertEqual('[1]', db.instance_info_cache_get(
+            self.ctxt, uuid1)['network_info'])
+        self.assertEqual('[2]', db.instance_info_cache_get(
+            self.ctxt, uuid2)['network_info'])
+        self.assertEqual([], db.instance_info_cache_update_many(self.ctxt,
+                                                                {}))
+
     @mock.patch('nova.db.sqlalchemy.api._check_instance_exists_in_project',
                 return_value=None)
     def test_instance_destroy(self, mock_check_inst_exists):
@@ -6793,6 +6865,86 @@ class QuotaTestCase(test.TestCase, ModelsObjectComparatorMixin):
         for key, value in expected.items():
             self.assertEqual(value, quota_usage[key])
 
+    def test_quota_reserve_optimistic(self):
+        _quota_reserve(self.ctxt, 'p1', 'u1')
+        generation = db.quota_usage_get(self.ctxt, 'p1', 'resource0',
+                                        'u1').generation
+        with mock.patch.object(sqlalchemy_api, 'quota_reserve') as mock_res:
+            reservations = db.quota_reserve_optimistic(
+                self.ctxt, {}, {'resource0': 1}, {'resource0': 1},
+                {'resource0': 1}, timeutils.utcnow(), 0, 0, 'p1', 'u1')
+        self.assertFalse(mock_res.called)
+        self.assertEqual(1, len(reservations))
+        reservation = _reservation_get(self.ctxt, reservations[0])
+        self.assertEqual('resource0', reservation.resource)
+        self.assertEqual(1, reservation.delta)
+        usage = db.quota_usage_get(self.ctxt, 'p1', 'resource0', 'u1')
+        self.assertEqual(1, usage.reserved)
+        self.assertEqual(generation + 1, usage.generation)
+
+    def test_quota_reserve_optimistic_over_quota(self):
+        _quota_reserve(self.ctxt, 'p1', 'u1')
+        self.assertRaises(exception.OverQuota,
+                          db.quota_reserve_optimistic, self.ctxt, {},
+                          {'resource1': 2}, {'resource1': 2},
+                          {'resource1': 1}, timeutils.utcnow(), 0, 0,
+                          'p1', 'u1')
+        usage = db.quota_usage_get(self.ctxt, 'p1', 'resource1', 'u1')
+        self.assertEqual(1, usage.reserved)
+
+    def test_quota_reserve_optimistic_concurrent_change(self):
+        _quota_reserve(self.ctxt, 'p1', 'u1')
+        calculate = sqlalchemy_api._calculate_overquota
+
+        def fake_calculate(*args):
+            # Another reservation changes the usage once it was read
+            if mock_calculate.call_count == 1:
+                db.quota_usage_update(self.ctxt, 'p1', 'u1', 'resource0',
+                                      in_use=1)
+            return calculate(*args)
+
+        with mock.patch.object(sqlalchemy_api, '_calculate_overquota',
+                               side_effect=fake_calculate) as mock_calculate:
+            self.assertRaises(exception.OverQuota,
+                              db.quota_reserve_optimistic, self.ctxt, {},
+                              {'resource0': 1}, {'resource0': 1},
+                              {'resource0': 1}, timeutils.utcnow(), 0, 0,
+                              'p1', 'u1')
+        self.assertEqual(2, mock_calculate.call_count)
+        usage = db.quota_usage_get(self.ctxt, 'p1', 'resource0', 'u1')
+        self.assertEqual(0, usage.reserved)
+
+    def test_quota_reserve_optimistic_missing_usage(self):
+        with mock.patch.object(sqlalchemy_api, 'quota_reserve',
+                               return_value=['fake-uuid']) as mock_res:
+            reservations = db.quota_reserve_optimistic(
+                self.ctxt, {}, {'resource0': 1}, {'resource0': 1},
+                {'resource0': 1}, 'expire', 0, 0, 'p1', 'u1')
+        self.assertEqual(['fake-uuid'], reservations)
+        mock_res.assert_called_once_with(
+            self.ctxt, {}, {'resource0': 1}, {'resource0': 1},
+            {'resource0': 1}, 'expire', 0, 0, project_id='p1', user_id='u1')
+
+    @mock.patch.object(sqlalchemy_api, 'quota_reserve',
+                       return_value=['fake-uuid'])
+    @mock.patch.object(sqlalchemy_api, '_quota_reserve_optimistic',
+                       side_effect=sqlalchemy_api._QuotaUsageConflict)
+    def test_quota_reserve_optimistic_retries(self, mock_optimistic,
+                                              mock_res):
+        reservations = db.quota_reserve_optimistic(
+            self.ctxt, {}, {}, {}, {'resource0': 1}, 'expire', 0, 0,
+            'p1', 'u1', max_retries=2)
+        self.assertEqual(['fake-uuid'], reservations)
+        self.assertEqual(3, mock_optimistic.call_count)
+        self.assertTrue(mock_res.called)
+
+    def test_quota_usage_update_bumps_generation(self):
+        _quota_reserve(self.ctxt, 'p1', 'u1')
+        usage = db.quota_usage_get(self.ctxt, 'p1', 'resource0', 'u1')
+        db.quota_usage_update(self.ctxt, 'p1', 'u1', 'resource0', in_use=42)
+        self.assertEqual(usage.generation + 1, db.quota_usage_get(
+            self.ctxt, 'p1', 'resource0', 'u1').generation)
+
     def test_quota_create_exists(self):
         db.quota_create(self.ctxt, 'project1', 'resource1', 41)
         self.assertRaises(exception.QuotaExists, db.quota_create, self.ctxt,
@@ -806,6 +806,10 @@ class NovaMigrationsCheckers(test_migrations.ModelsMigrationsSync,
         self.assertIndexMembers(engine, 'instance_system_metadata',
                                 'instance_uuid', ['instance_uuid'])
 
+    def _check_313(self, engine, data):
+        self.assertColumnExists(engine, 'quota_usages', 'generation')
+        self.assertColumnExists(engine, 'shadow_quota_usages', 'generation')
+
 
 class TestNovaMigrationsSQLite(NovaMigrationsCheckers,
                                test_base.DbTestCase,
@@ -15,11 +15,15 @@
 
 
 import datetime
+import hashlib
+import os
 from six.moves import StringIO
 
+import eventlet
 import glanceclient.exc
 import mock
 from oslo_config import cfg
+from oslo_serialization import jsonutils
 from oslo_utils import netutils
 import testtools
 
@@ -27,6 +31,7 @@ from nova import context
 from nova import exception
 from nova.image import glance
 from nova import test
+from nova import utils
 
 CONF = cfg.CONF
 NOW_GLANCE_FORMAT = "2010-10-11T10:30:22.000000"
@@ -548,6 +553,54 @@ class TestDownloadNoDirectUri(test.NoDBTestCase):
         self.assertRaises(FakeDiskException, service.download, ctx,
                           mock.sentinel.image_id, data=Exceptionator())
 
+    @mock.patch('__builtin__.open')
+    @mock.patch('nova.image.glance.GlanceImageService.show')
+    def test_download_verify_checksum(self, show_mock, open_mock):
+        client = mock.MagicMock()
+        client.call.return_value = ['ab', 'cd']
+        show_mock.return_value = {'checksum': hashlib.md5('abcd').hexdigest()}
+        ctx = mock.sentinel.ctx
+        writer = mock.MagicMock()
+        open_mock.return_value = writer
+        service = glance.GlanceImageService(client)
+        res = service.download(ctx, mock.sentinel.image_id,
+                               dst_path=mock.sentinel.dst_path,
+                               verify_checksum=True)
+
+        show_mock.assert_called_once_with(ctx, mock.sentinel.image_id)
+        self.assertEqual(hashlib.sha1('abcd').hexdigest(), res)
+        writer.write.assert_has_calls([mock.call('ab'), mock.call('cd')])
+        writer.close.assert_called_once_with()
+
+    @mock.patch('__builtin__.open')
+    @mock.patch('nova.image.glance.GlanceImageService.show')
+    def test_download_verify_checksum_mismatch(self, show_mock, open_mock):
+        client = mock.MagicMock()
+        client.call.return_value = ['ab', 'cd']
+        show_mock.return_value = {'checksum': hashlib.md5('ab').hexdigest()}
+        ctx = mock.sentinel.ctx
+        writer = mock.MagicMock()
+        open_mock.return_value = writer
+        service = glance.GlanceImageService(client)
+
+        self.assertRaises(exception.ImageChecksumMismatch, service.download,
+                          ctx, mock.sentinel.image_id,
+                          dst_path=mock.sentinel.dst_path,
+                          verify_checksum=True)
+        writer.close.assert_called_once_with()
+
+    @mock.patch('nova.image.glance.GlanceImageService.show')
+    def test_download_verify_checksum_no_data(self, show_mock):
+        client = mock.MagicMock()
+        client.call.return_value = mock.sentinel.image_chunks
+        ctx = mock.sentinel.ctx
+        service = glance.GlanceImageService(client)
+        res = service.download(ctx, mock.sentinel.image_id,
+                               verify_checksum=True)
+
+        self.assertFalse(show_mock.called)
+        self.assertEqual(mock.sentinel.image_chunks, res)
+
     @mock.patch('nova.image.glance.GlanceImageService._get_transfer_module')
     @mock.patch('nova.image.glance.GlanceImageService.show')
     def test_download_direct_file_uri(self, show_mock, get_tran_mock):
@@ -681,6 +734,156 @@ class TestDownloadNoDirectUri(test.NoDBTestCase):
         writer.close.assert_called_once_with()
 
 
+class TestDownloadRanges(test.NoDBTestCase):
+
+    """Tests the download method of the GlanceImageService when images are
+    downloaded in byte ranges.
+    """
+
+    def setUp(self):
+        super(TestDownloadRanges, self).setUp()
+        self.flags(download_connections=2, download_range_size=1,
+                   group='glance')
+        self.image_data = ''.join(chr(i % 256) for i in range(2621440))
+        self.image = {'id': 'fake-image', 'size': len(self.image_data),
+                      'checksum': hashlib.md5(self.image_data).hexdigest()}
+        self.requested = []
+        self.failures = {}
+        self.status_code = 206
+
+        self.glance_client = mock.Mock()
+        self.glance_client.http_client.get.side_effect = self._fake_get
+        self.client = mock.Mock()
+        self.client.get_client.return_value = self.glance_client
+        self.service = glance.GlanceImageService(self.client)
+        self.stub_out_show = mock.patch.object(self.service, 'show',
+                                               return_value=self.image)
+        self.stub_out_show.start()
+        self.addCleanup(self.stub_out_show.stop)
+        self.stub_out_sleep = mock.patch('time.sleep')
+        self.stub_out_sleep.start()
+        self.addCleanup(self.stub_out_sleep.stop)
+
+    def _fake_get(self, url, headers):
+        self.assertEqual('/v1/images/fake-image', url)
+        start, end = headers['Range'][len('bytes='):].split('-')
+        start, end = int(start), int(end) + 1
+        self.requested.append((start, end))
+        resp = mock.Mock(status_code=self.status_code)
+        data = self.image_data[start:end]
+        failure = self.failures.get(start)
+        if failure == 'error':
+            # Lets the other ranges proceed while this one is failing
+            eventlet.sleep(0)
+            raise glanceclient.exc.CommunicationError()
+        elif failure == 'truncated':
+            del self.failures[start]
+            data = data[:len(data) // 2]
+        return resp, iter([data[i:i + 65536]
+                           for i in range(0, len(data), 65536)])
+
+    def _download(self, dst_path):
+        return self.service.download(mock.sentinel.ctx, 'fake-image',
+                                     dst_path=dst_path, verify_checksum=True)
+
+    def test_download_ranges(self):
+        with utils.tempdir() as tmpdir:
+            dst_path = os.path.join(tmpdir, 'image')
+            res = self._download(dst_path)
+
+            self.assertEqual(hashlib.sha1(self.image_data).hexdigest(), res)
+            with open(dst_path, 'rb') as f:
+                self.assertEqual(self.image_data, f.read())
+            self.assertFalse(os.path.exists(
+                glance.get_download_state_path(dst_path)))
+        self.assertEqual([(0, 1048576), (1048576, 2097152),
+                          (2097152, 2621440)], sorted(self.requested))
+        self.client.get_client.assert_called_once_with(mock.sentinel.ctx, 1)
+        self.assertFalse(self.client.call.called)
+
+    def test_download_ranges_truncated(self):
+        self.flags(num_retries=1, group='glance')
+        self.failures[1048576] = 'truncated'
+        with utils.tempdir() as tmpdir:
+            dst_path = os.path.join(tmpdir, 'image')
+            self._download(dst_path)
+
+            with open(dst_path, 'rb') as f:
+                self.assertEqual(self.image_data, f.read())
+        # The truncated range is resumed from the last byte received
+        self.assertIn((1572864, 2097152), self.requested)
+
+    def test_download_ranges_resumed(self):
+        self.failures[2097152] = 'error'
+        with utils.tempdir() as tmpdir:
+            dst_path = os.path.join(tmpdir, 'image')
+            self.assertRaises(glanceclient.exc.CommunicationError,
+                              self._download, dst_path)
+            self.assertTrue(os.path.exists(
+                glance.get_download_state_path(dst_path)))
+
+            self.failures = {}
+            self.requested = []
+            self._download(dst_path)
+
+            with open(dst_path, 'rb') as f:
+                self.assertEqual(self.image_data, f.read())
+        self.assertEqual([(2097152, 2621440)], self.requested)
+
+    def test_download_ranges_range_fails(self):
+        self.flags(num_retries=2, group='glance')
+        self.failures[1048576] = 'error'
+        with utils.tempdir() as tmpdir:
+            dst_path = os.path.join(tmpdir, 'image')
+            self.assertRaises(glanceclient.exc.CommunicationError,
+                              self._download, dst_path)
+
+            # The ranges downloaded while the failing one was retried are
+            # kept along with the partial file
+            self.assertTrue(os.path.exists(dst_path))
+            state_path = glance.get_download_state_path(dst_path)
+            with open(state_path) as f:
+                state = jsonutils.loads(f.read())
+            self.assertEqual([0, 2], state['completed'])
+        self.assertEqual(3, self.requested.count((1048576, 2097152)))
+        self.assertEqual(1, self.requested.count((2097152, 2621440)))
+
+    def test_download_single_stream_drops_ranges(self):
+        self.flags(download_connections=1, group='glance')
+        self.client.call.return_value = [self.image_data]
+        with utils.tempdir() as tmpdir:
+            dst_path = os.path.join(tmpdir, 'image')
+            state_path = glance.get_download_state_path(dst_path)
+            with open(state_path, 'w') as f:
+                f.write('{}')
+            self._download(dst_path)
+
+            self.assertFalse(os.path.exists(state_path))
+            with open(dst_path, 'rb') as f:
+                self.assertEqual(self.image_data, f.read())
+
+    def test_download_ranges_checksum_mismatch(self):
+        self.image['checksum'] = hashlib.md5('wrong').hexdigest()
+        with utils.tempdir() as tmpdir:
+            self.assertRaises(exception.ImageChecksumMismatch,
+                              self._download, os.path.join(tmpdir, 'image'))
+
+    def test_download_ranges_not_supported(self):
+        self.status_code = 200
+        self.client.call.return_value = [self.image_data]
+        with utils.tempdir() as tmpdir:
+            dst_path = os.path.join(tmpdir, 'image')
+            res = self._download(dst_path)
+
+            self.assertEqual(hashlib.sha1(self.image_data).hexdigest(), res)
+            with open(dst_path, 'rb') as f:
+                self.assertEqual(self.image_data, f.read())
+            self.assertFalse(os.path.exists(
+                glance.get_download_state_path(dst_path)))
+        self.client.call.assert_called_once_with(mock.sentinel.ctx, 1,
+                                                 'data', 'fake-image')
+
+
 class TestIsImageAvailable(test.NoDBTestCase):
     """Tests the internal _is_image_available function."""
 
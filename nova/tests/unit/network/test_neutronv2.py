@@ -2733,6 +2733,38 @@ class TestNeutronv2(TestNeutronv2Base):
         self.assertEqual(subnet_data1[0]['host_routes'][0]['nexthop'],
                          subnets[0]['routes'][0]['gateway']['address'])
 
+    def test_get_subnets_from_port_cached(self):
+        self.flags(metadata_cache_ttl=60, group='neutron')
+        self.addCleanup(neutronapi.reset_state)
+        api = neutronapi.API()
+
+        port_data = copy.copy(self.port_data1[0])
+        subnet_data1 = copy.copy(self.subnet_data1)
+        for i in range(2):
+            self.moxed_client.list_subnets(
+                id=[port_data['fixed_ips'][0]['subnet_id']]
+            ).AndReturn({'subnets': subnet_data1})
+            self.moxed_client.list_ports(
+                network_id=subnet_data1[0]['network_id'],
+                device_owner='network:dhcp').AndReturn({'ports': []})
+        self.mox.ReplayAll()
+
+        subnets = api._get_subnets_from_port(self.context, port_data)
+        self.assertEqual(subnets,
+                         api._get_subnets_from_port(self.context, port_data))
+        self.assertEqual({'hits': 2, 'misses': 2, 'size': 2},
+                         neutronapi.get_metadata_cache_stats())
+
+        # A network-changed event for an instance attached to the network
+        # invalidates its cached subnets
+        vif = model.VIF(network=model.Network(
+            id=subnet_data1[0]['network_id']))
+        instance = objects.Instance(info_cache=objects.InstanceInfoCache(
+            network_info=model.NetworkInfo([vif])))
+        api.invalidate_network_cache(instance)
+        self.assertEqual(subnets,
+                         api._get_subnets_from_port(self.context, port_data))
+
     def test_get_all_empty_list_networks(self):
         api = neutronapi.API()
         self.moxed_client.list_networks().AndReturn({'networks': []})
@@ -2862,6 +2894,125 @@ class TestNeutronv2WithMock(test.TestCase):
                                             update_cells=False)
         self.assertEqual(fake_result, result)
 
+    def test_bulk_network_data(self):
+        instances = [fake_instance.fake_instance_obj(
+            self.context, uuid='fake-uuid%d' % i) for i in range(2)]
+        for instance in instances:
+            instance.info_cache = None
+        mocked_client = mock.create_autospec(client.Client)
+        ports = [{'id': 'port0', 'device_id': 'fake-uuid0',
+                  'network_id': 'net0', 'tenant_id': 'fake-project',
+                  'fixed_ips': [{'subnet_id': 'subnet0',
+                                 'ip_address': '10.0.0.2'}]},
+                 {'id': 'port1', 'device_id': 'fake-uuid1',
+                  'network_id': 'net0', 'tenant_id': 'other-project',
+                  'fixed_ips': []}]
+        dhcp_port = {'id': 'dhcp0', 'network_id': 'net0',
+                     'fixed_ips': [{'subnet_id': 'subnet0',
+                                    'ip_address': '10.0.0.1'}]}
+        mocked_client.list_ports.side_effect = [{'ports': ports},
+                                                {'ports': [dhcp_port]}]
+        net = {'id': 'net0', 'tenant_id': 'fake-project'}
+        mocked_client.list_networks.return_value = {'networks': [net]}
+        subnet = {'id': 'subnet0', 'network_id': 'net0'}
+        mocked_client.list_subnets.return_value = {'subnets': [subnet]}
+        fip = {'port_id': 'port0', 'fixed_ip_address': '10.0.0.2',
+               'floating_ip_address': '172.24.4.2'}
+        mocked_client.list_floatingips.return_value = {'floatingips': [fip]}
+
+        bulk_data = neutronapi._BulkNetworkData(mocked_client, instances)
+
+        mocked_client.list_ports.assert_has_calls([
+            mock.call(device_id=['fake-uuid0', 'fake-uuid1']),
+            mock.call(network_id=['net0'], device_owner='network:dhcp')])
+        mocked_client.list_networks.assert_called_once_with(id=['net0'])
+        mocked_client.list_subnets.assert_called_once_with(id=['subnet0'])
+        mocked_client.list_floatingips.assert_called_once_with(
+            port_id=['port0', 'port1'])
+        self.assertEqual([ports[0]], bulk_data.get_ports(instances[0]))
+        self.assertEqual([], bulk_data.get_ports(instances[1]))
+        self.assertEqual([net], bulk_data.get_networks('fake-project',
+                                                       ['net0']))
+        self.assertEqual([net], bulk_data.get_networks('fake-project', []))
+        self.assertEqual([], bulk_data.get_networks('other-project', []))
+        self.assertEqual({'subnet0': subnet}, bulk_data.subnets)
+        self.assertEqual([dhcp_port], bulk_data.dhcp_ports['net0'])
+        self.assertEqual([fip],
+                         bulk_data.floating_ips[('port0', '10.0.0.2')])
+
+    def test_bulk_network_data_chunks_ids(self):
+        self.stubs.Set(neutronapi, 'MAX_SEARCH_IDS', 2)
+        instances = [fake_instance.fake_instance_obj(
+            self.context, uuid='fake-uuid%d' % i) for i in range(5)]
+        for instance in instances:
+            instance.info_cache = None
+        mocked_client = mock.create_autospec(client.Client)
+        ports = [{'id': 'port%d' % i, 'device_id': 'fake-uuid%d' % i,
+                  'network_id': 'net0', 'tenant_id': 'fake-project',
+                  'fixed_ips': []} for i in range(5)]
+        mocked_client.list_ports.side_effect = [{'ports': ports[:2]},
+                                                {'ports': ports[2:4]},
+                                                {'ports': ports[4:]}]
+        mocked_client.list_networks.return_value = {'networks': []}
+        mocked_client.list_floatingips.return_value = {'floatingips': []}
+
+        bulk_data = neutronapi._BulkNetworkData(mocked_client, instances)
+
+        mocked_client.list_ports.assert_has_calls([
+            mock.call(device_id=['fake-uuid0', 'fake-uuid1']),
+            mock.call(device_id=['fake-uuid2', 'fake-uuid3']),
+            mock.call(device_id=['fake-uuid4'])])
+        mocked_client.list_floatingips.assert_has_calls([
+            mock.call(port_id=['port0', 'port1']),
+            mock.call(port_id=['port2', 'port3']),
+            mock.call(port_id=['port4'])])
+        for instance, port in zip(instances, ports):
+            self.assertEqual([port], bulk_data.get_ports(instance))
+
+    @mock.patch.object(objects.InstanceInfoCacheList, 'save')
+    @mock.patch.object(neutronapi, '_BulkNetworkData')
+    @mock.patch.object(neutronapi.API, '_build_network_info_model')
+    @mock.patch.object(objects.InstanceList, 'get_by_filters')
+    @mock.patch.object(neutronapi, 'get_client')
+    @mock.patch('oslo_concurrency.lockutils.lock')
+    def test_get_instances_nw_info(self, mock_lock, mock_get_client,
+                                   mock_get_by_filters, mock_build,
+                                   mock_bulk_data, mock_save):
+        instances = [fake_instance.fake_instance_obj(
+            self.context, uuid='fake-uuid%d' % i) for i in range(3)]
+        # The second instance has been deleted
+        current = [fake_instance.fake_instance_obj(self.context, uuid=uuid)
+                   for uuid in ('fake-uuid0', 'fake-uuid2')]
+        for instance in current:
+            instance.info_cache = objects.InstanceInfoCache(
+                instance_uuid=instance.uuid,
+                network_info=model.NetworkInfo())
+        mock_get_by_filters.return_value = current
+        mock_build.return_value = model.NetworkInfo()
+
+        result = self.api.get_instances_nw_info(self.context, instances)
+
+        self.assertEqual(['fake-uuid0', 'fake-uuid2'], sorted(result))
+        mock_lock.assert_has_calls([mock.call('refresh_cache-fake-uuid0'),
+                                    mock.call('refresh_cache-fake-uuid1'),
+                                    mock.call('refresh_cache-fake-uuid2')],
+                                   any_order=True)
+        mock_get_by_filters.assert_called_once_with(
+            self.context,
+            {'uuid': ['fake-uuid0', 'fake-uuid1', 'fake-uuid2'],
+             'deleted': False},
+            expected_attrs=['info_cache'])
+        mock_get_client.assert_called_once_with(self.context, admin=True)
+        client = mock_get_client.return_value
+        mock_bulk_data.assert_called_once_with(
+            client, [instances[0], instances[2]])
+        mock_build.assert_has_calls([
+            mock.call(self.context, instance, admin_client=client,
+                      bulk_data=mock_bulk_data.return_value)
+            for instance in (instances[0], instances[2])])
+        self.assertEqual(current[1].info_cache, instances[2].info_cache)
+        mock_save.assert_called_once_with()
+
     def _test_validate_networks_fixed_ip_no_dup(self, nets, requested_networks,
                                                 ids, list_port_values):
 
@@ -3561,6 +3712,41 @@ class TestNeutronv2WithMock(test.TestCase):
                           requested_networks=nw_req)
 
 
+class TestNeutronv2MetadataCache(test.NoDBTestCase):
+
+    def setUp(self):
+        super(TestNeutronv2MetadataCache, self).setUp()
+        self.flags(metadata_cache_ttl=60, metadata_cache_size=2,
+                   group='neutron')
+        self.cache = neutronapi._MetadataCache()
+
+    @mock.patch('time.time')
+    def test_expiry(self, mock_time):
+        mock_time.return_value = 100
+        self.cache.set(('network', 'proj', 'net1'), 'net1', 'value')
+        self.assertEqual('value', self.cache.get(('network', 'proj', 'net1')))
+        mock_time.return_value = 160
+        self.assertIsNone(self.cache.get(('network', 'proj', 'net1')))
+        self.assertEqual({'hits': 1, 'misses': 1, 'size': 0},
+                         self.cache.stats())
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set(('subnet', 'subnet1'), 'net1', 'value1')
+        self.cache.set(('subnet', 'subnet2'), 'net1', 'value2')
+        self.assertEqual('value1', self.cache.get(('subnet', 'subnet1')))
+        self.cache.set(('subnet', 'subnet3'), 'net2', 'value3')
+        self.assertIsNone(self.cache.get(('subnet', 'subnet2')))
+        self.assertEqual('value1', self.cache.get(('subnet', 'subnet1')))
+        self.assertEqual('value3', self.cache.get(('subnet', 'subnet3')))
+
+    def test_invalidate_network(self):
+        self.cache.set(('subnet', 'subnet1'), 'net1', 'value1')
+        self.cache.set(('dhcp_ports', 'net2'), 'net2', 'value2')
+        self.cache.invalidate_network('net1')
+        self.assertIsNone(self.cache.get(('subnet', 'subnet1')))
+        self.assertEqual('value2', self.cache.get(('dhcp_ports', 'net2')))
+
+
 class TestNeutronv2ModuleMethods(test.NoDBTestCase):
 
     def test_gather_port_ids_and_networks_wrong_params(self):
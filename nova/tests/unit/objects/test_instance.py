@@ -1723,12 +1723,61 @@ class _TestInstanceListObject(object):
 
 class TestInstanceListObject(test_objects._LocalTest,
                              _TestInstanceListObject):
-    pass
+    @mock.patch.object(db, 'instance_get_all_by_filters_sort_batched')
+    def test_iter_by_filters(self, mock_get_batched):
+        fakes = [self.fake_instance(1), self.fake_instance(2),
+                 self.fake_instance(3)]
+        mock_get_batched.return_value = iter([fakes[:2], fakes[2:]])
+        instances = objects.InstanceList.iter_by_filters(
+            self.context, {'foo': 'bar'}, sort_keys=['uuid'],
+            sort_dirs=['asc'], expected_attrs=['metadata'], batch_size=2)
+        # Nothing is read until the instances are iterated over
+        self.assertFalse(mock_get_batched.called)
+        instances = list(instances)
+        mock_get_batched.assert_called_once_with(
+            self.context, {'foo': 'bar'}, 2, marker=None,
+            columns_to_join=['metadata'], use_slave=False,
+            sort_keys=['uuid'], sort_dirs=['asc'])
+        for inst, fake in zip(instances, fakes):
+            self.assertIsInstance(inst, objects.Instance)
+            self.assertEqual(fake['uuid'], inst.uuid)
+        self.assertEqual(3, len(instances))
+
+    @mock.patch.object(db, 'instance_get_all_by_filters_sort_batched',
+                       return_value=iter([]))
+    def test_iter_by_filters_default_sort(self, mock_get_batched):
+        list(objects.InstanceList.iter_by_filters(self.context, {}))
+        mock_get_batched.assert_called_once_with(
+            self.context, {}, 1000, marker=None, columns_to_join=None,
+            use_slave=False, sort_keys=['created_at', 'id'], sort_dirs=None)
+
+    def test_iter_by_filters_invalid_batch_size(self):
+        for batch_size in (0, -1):
+            self.assertRaises(ValueError, list,
+                              objects.InstanceList.iter_by_filters(
+                                  self.context, {}, batch_size=batch_size))
 
 
 class TestRemoteInstanceListObject(test_objects._RemoteTest,
                                    _TestInstanceListObject):
-    pass
+    @mock.patch.object(db, 'instance_get_all_by_filters_sort')
+    def test_iter_by_filters(self, mock_get_sort):
+        fakes = [self.fake_instance(1), self.fake_instance(2),
+                 self.fake_instance(3)]
+        mock_get_sort.side_effect = [fakes[:2], fakes[2:]]
+        instances = list(objects.InstanceList.iter_by_filters(
+            self.context, {'foo': 'bar'}, sort_keys=['uuid'],
+            sort_dirs=['asc'], batch_size=2))
+        self.assertEqual([fake['uuid'] for fake in fakes],
+                         [inst.uuid for inst in instances])
+        mock_get_sort.assert_has_calls([
+            mock.call(self.context, {'foo': 'bar'}, limit=2, marker=None,
+                      columns_to_join=None, use_slave=False,
+                      sort_keys=['uuid'], sort_dirs=['asc']),
+            mock.call(self.context, {'foo': 'bar'}, limit=2,
+                      marker=fakes[1]['uuid'], columns_to_join=None,
+                      use_slave=False, sort_keys=['uuid'],
+                      sort_dirs=['asc'])])
 
 
 class TestInstanceObjectMisc(test.TestCase):
@@ -131,6 +131,30 @@ class _TestInstanceInfoCacheObject(object):
         obj.refresh()
         self.assertEqual(fake_info_cache['instance_uuid'], obj.instance_uuid)
 
+    @mock.patch.object(db, 'instance_info_cache_update_many')
+    def test_list_save(self, mock_update_many):
+        nwinfo = network_model.NetworkInfo.hydrate([{'address': 'foo'}])
+        nwinfo_json = nwinfo.json()
+        mock_update_many.return_value = [
+            dict(fake_info_cache, instance_uuid='fake-uuid1',
+                 network_info=nwinfo_json)]
+        info_caches = [instance_info_cache.InstanceInfoCache.new(
+            self.context, uuid) for uuid in ('fake-uuid1', 'fake-uuid2')]
+        info_caches[0].network_info = nwinfo
+        info_caches[1].network_info = nwinfo
+        unchanged = instance_info_cache.InstanceInfoCache(
+            context=self.context, instance_uuid='fake-uuid3')
+        unchanged.obj_reset_changes()
+        info_cache_list = instance_info_cache.InstanceInfoCacheList(
+            context=self.context, objects=info_caches + [unchanged])
+        info_cache_list.save()
+        mock_update_many.assert_called_once_with(
+            self.context, {'fake-uuid1': {'network_info': nwinfo_json},
+                           'fake-uuid2': {'network_info': nwinfo_json}})
+        self.assertEqual(nwinfo, info_cache_list[0].network_info)
+        for info_cache in info_cache_list:
+            self.assertFalse(info_cache.obj_what_changed())
+
 
 class TestInstanceInfoCacheObject(test_objects._LocalTest,
                                   _TestInstanceInfoCacheObject):
@@ -216,6 +216,39 @@ class TestObjMakeList(test.NoDBTestCase):
             self.assertEqual(db_objs[index]['missing'], item.missing)
 
 
+class TestObjSetDBFields(test.NoDBTestCase):
+
+    def test_obj_set_db_fields(self):
+        obj = MyObj()
+        db_obj = {'foo': 1, 'bar': u'baz', 'created_at': None,
+                  'updated_at': datetime.datetime(1955, 11, 5)}
+        base.obj_set_db_fields(obj, db_obj, db_obj.keys())
+        self.assertEqual(1, obj.foo)
+        self.assertEqual(u'baz', obj.bar)
+        self.assertIsNone(obj.created_at)
+        # Values which need coercion still go through it
+        self.assertIsNotNone(obj.updated_at.utcoffset())
+        self.assertEqual(set(db_obj), obj.obj_what_changed())
+
+    def test_obj_set_db_fields_coerces(self):
+        obj = MyObj()
+        base.obj_set_db_fields(obj, {'foo': '2', 'bar': 3}, ['foo', 'bar'])
+        self.assertEqual(2, obj.foo)
+        self.assertEqual(u'3', obj.bar)
+
+    def test_obj_set_db_fields_not_nullable(self):
+        obj = MyObj()
+        self.assertRaises(ValueError, base.obj_set_db_fields,
+                          obj, {'bar': None}, ['bar'])
+
+    def test_obj_set_db_fields_read_only(self):
+        obj = MyObj()
+        obj.readonly = 1
+        self.assertRaises(ovo_exc.ReadOnlyFieldError,
+                          base.obj_set_db_fields,
+                          obj, {'readonly': 2}, ['readonly'])
+
+
 def compare_obj(test, obj, db_obj, subs=None, allow_missing=None,
                 comparators=None):
     """Compare a NovaObject and a dict-like database object.
@@ -933,6 +966,68 @@ class TestObjectSerializer(_BaseTestCase):
         ser = base.NovaObjectSerializer()
         self.assertEqual([1, 2], ser.serialize_entity(None, set([1, 2])))
 
+    def test_serialize_entity_compact(self):
+        self.flags(compact_object_serialization=True)
+        ser = base.NovaObjectSerializer()
+        obj = MyObj(foo=1, bar='bar', rel_object=MyOwnedObject(baz=2))
+        primitive = ser.serialize_entity(self.context, obj)
+        self.assertEqual(['nova_object.c'], list(primitive))
+        name, version, data, changes = primitive['nova_object.c']
+        self.assertEqual('MyObj', name)
+        self.assertEqual(obj.VERSION, version)
+        self.assertEqual(['MyOwnedObject', MyOwnedObject.VERSION,
+                          {'baz': 2}, ['baz']],
+                         data['rel_object']['nova_object.c'])
+        self.assertEqual(sorted(['foo', 'bar', 'rel_object']),
+                         sorted(changes))
+
+        obj2 = ser.deserialize_entity(self.context, primitive)
+        self.assertIsInstance(obj2, MyObj)
+        self.assertEqual(1, obj2.foo)
+        self.assertEqual('bar', obj2.bar)
+        self.assertEqual(2, obj2.rel_object.baz)
+        self.assertEqual(set(['foo', 'bar', 'rel_object']),
+                         obj2.obj_what_changed())
+
+    def test_deserialize_entity_compact_without_flag(self):
+        # Compact primitives are always accepted, so that the flag can be
+        # enabled on the senders once all the receivers are upgraded
+        ser = base.NovaObjectSerializer()
+        primitive = {'nova_object.c': ['MyObj', MyObj.VERSION, {'foo': 1}]}
+        obj = ser.deserialize_entity(self.context, primitive)
+        self.assertIsInstance(obj, MyObj)
+        self.assertEqual(1, obj.foo)
+        self.assertEqual(set(), obj.obj_what_changed())
+
+    def test_serialize_entity_compact_reserved_keys(self):
+        # User supplied dicts may have the keys of the compact form
+        self.flags(compact_object_serialization=True)
+        ser = base.NovaObjectSerializer()
+        metadata = {'nova_object.c': 'x', 'nova_object.e': 'y'}
+        inst = objects.Instance(uuid='fake-uuid', metadata=metadata)
+        entity = {'instance': inst,
+                  'diff': {'nova_object.c': ['+', 'x']},
+                  'other': {'nova_object.e': {}}}
+        primitive = ser.serialize_entity(self.context, entity)
+
+        result = ser.deserialize_entity(self.context, primitive)
+        self.assertIsInstance(result['instance'], objects.Instance)
+        self.assertEqual(metadata, result['instance'].metadata)
+        self.assertEqual({'nova_object.c': ['+', 'x']}, result['diff'])
+        self.assertEqual({'nova_object.e': {}}, result['other'])
+
+    def test_deserialize_entity_reserved_key_without_flag(self):
+        ser = base.NovaObjectSerializer()
+        for thing in ({'nova_object.c': 'x'},
+                      {'nova_object.c': ['+', 'x']},
+                      {'nova_object.c': 'x', 'foo': 'bar'}):
+            self.assertEqual(thing, ser.deserialize_entity(None, thing))
+
+    def test_serialize_entity_not_compact_by_default(self):
+        ser = base.NovaObjectSerializer()
+        primitive = ser.serialize_entity(self.context, MyObj(foo=1))
+        self.assertEqual('MyObj', primitive['nova_object.name'])
+
     def _test_deserialize_entity_newer(self, obj_version, backported_to,
                                        my_version='1.6'):
         ser = base.NovaObjectSerializer()
@@ -1203,6 +1298,7 @@ object_data = {
     'InstanceGroup': '1.10-1a0c8c7447dc7ecb9da53849430c4a5f',
     'InstanceGroupList': '1.7-be18078220513316abd0ae1b2d916873',
     'InstanceInfoCache': '1.5-cd8b96fefe0fc8d4d337243ba0bf0e1e',
+    'InstanceInfoCacheList': '1.0-6ef6f1ba9a2f716a6447a753a8d66824',
     'InstanceList': '2.0-6c8ba6147cca3082b1e4643f795068bf',
     # NOTE(danms): Reviewers: do not approve changes to the InstanceList1
     # object schema. It is frozen for Liberty and will be removed in
@@ -203,3 +203,23 @@ class TestGroupAffinityFilter(test.NoDBTestCase):
     def test_group_affinity_filter_fails(self):
         self._test_group_affinity_filter_fails(
                 affinity_filter.ServerGroupAffinityFilter(), 'affinity')
+
+    def _test_group_filter_mask(self, filt_cls, policy, expected):
+        hosts = [fakes.FakeHostState(host, 'node', {})
+                 for host in ('host1', 'host2', 'host3')]
+        filter_properties = {'group_policies': [policy]}
+        self.assertEqual([True, True, True],
+                         filt_cls.filter_mask(hosts, filter_properties))
+        filter_properties['group_hosts'] = ['host1', 'host3']
+        self.assertEqual(expected,
+                         filt_cls.filter_mask(hosts, filter_properties))
+
+    def test_group_anti_affinity_filter_mask(self):
+        self._test_group_filter_mask(
+                affinity_filter.ServerGroupAntiAffinityFilter(),
+                'anti-affinity', [False, True, False])
+
+    def test_group_affinity_filter_mask(self):
+        self._test_group_filter_mask(
+                affinity_filter.ServerGroupAffinityFilter(), 'affinity',
+                [True, False, True])
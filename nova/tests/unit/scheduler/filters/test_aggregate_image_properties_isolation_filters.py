@@ -12,6 +12,8 @@
 
 import mock
 
+from nova import objects
+from nova.scheduler import aggregate_index
 from nova.scheduler.filters import aggregate_image_properties_isolation as aipi
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -105,3 +107,24 @@ class TestAggImagePropsIsolationFilter(test.NoDBTestCase):
                                                     'foo2': 'bar3'}}}}
         host = fakes.FakeHostState('host1', 'compute', {})
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
+
+    def test_aggregate_image_properties_isolation_filter_mask(self,
+            agg_mock):
+        index = aggregate_index.AggregateMetadataIndex()
+        index.update_host('host1', [objects.Aggregate(
+            id=1, metadata={'foo': 'bar,bar2', 'foo2': 'bar2'})])
+        index.update_host('host2', [objects.Aggregate(
+            id=2, metadata={'foo': 'no-bar'})])
+        index.update_host('host3', [objects.Aggregate(
+            id=3, metadata={'foo2': 'bar3'})])
+        hosts = [fakes.FakeHostState(host, 'compute',
+                                     {'aggregate_index': index})
+                 for host in ('host1', 'host2', 'host3', 'host4')]
+        filter_properties = {'context': mock.sentinel.ctx,
+                             'request_spec': {
+                                 'image': {
+                                     'properties': {'foo': 'bar',
+                                                    'foo2': 'bar2'}}}}
+        self.assertEqual([True, False, False, True],
+                         self.filt_cls.filter_mask(hosts, filter_properties))
+        self.assertFalse(agg_mock.called)
@@ -12,6 +12,8 @@
 
 import mock
 
+from nova import objects
+from nova.scheduler import aggregate_index
 from nova.scheduler.filters import aggregate_instance_extra_specs as agg_specs
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -82,3 +84,25 @@ class TestAggregateInstanceExtraSpecsFilter(test.NoDBTestCase):
             'trust:trusted_host': 'true'
         }
         self._do_test_aggregate_filter_extra_specs(especs, passes=False)
+
+    def test_aggregate_filter_mask(self, agg_mock):
+        index = aggregate_index.AggregateMetadataIndex()
+        index.update_host('host1', [objects.Aggregate(
+            id=1, metadata={'opt1': '1,3', 'opt2': '2'})])
+        index.update_host('host2', [objects.Aggregate(
+            id=2, metadata={'opt1': '1', 'opt2': '222'})])
+        index.update_host('host3', [objects.Aggregate(
+            id=3, metadata={'opt1': '1'})])
+        hosts = [fakes.FakeHostState(host, 'node1',
+                                     {'aggregate_index': index})
+                 for host in ('host1', 'host2', 'host3', 'host4')]
+        especs = {
+            'opt1': '1',
+            'aggregate_instance_extra_specs:opt2': '<in> 2',
+            'trust:trusted_host': 'true',
+        }
+        filter_properties = {'context': mock.sentinel.ctx,
+            'instance_type': {'memory_mb': 1024, 'extra_specs': especs}}
+        self.assertEqual([True, True, False, False],
+                         self.filt_cls.filter_mask(hosts, filter_properties))
+        self.assertFalse(agg_mock.called)
@@ -12,6 +12,8 @@
 
 import mock
 
+from nova import objects
+from nova.scheduler import aggregate_index
 from nova.scheduler.filters import aggregate_multitenancy_isolation as ami
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -72,3 +74,21 @@ class TestAggregateMultitenancyIsolationFilter(test.NoDBTestCase):
                                      'project_id': 'my_tenantid'}}}
         host = fakes.FakeHostState('host1', 'compute', {})
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
+
+    def test_aggregate_multi_tenancy_isolation_filter_mask(self, agg_mock):
+        index = aggregate_index.AggregateMetadataIndex()
+        index.update_host('host1', [objects.Aggregate(
+            id=1, metadata={'filter_tenant_id': 'my_tenantid,other'})])
+        index.update_host('host2', [objects.Aggregate(
+            id=2, metadata={'filter_tenant_id': 'other_tenantid'})])
+        index.update_host('host3', [objects.Aggregate(id=3, metadata={})])
+        hosts = [fakes.FakeHostState(host, 'compute',
+                                     {'aggregate_index': index})
+                 for host in ('host1', 'host2', 'host3', 'host4')]
+        filter_properties = {'context': mock.sentinel.ctx,
+                             'request_spec': {
+                                 'instance_properties': {
+                                     'project_id': 'my_tenantid'}}}
+        self.assertEqual([True, False, True, True],
+                         self.filt_cls.filter_mask(hosts, filter_properties))
+        self.assertFalse(agg_mock.called)
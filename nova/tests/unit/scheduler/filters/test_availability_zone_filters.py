@@ -12,6 +12,8 @@
 
 import mock
 
+from nova import objects
+from nova.scheduler import aggregate_index
 from nova.scheduler.filters import availability_zone_filter
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -52,3 +54,25 @@ class TestAvailabilityZoneFilter(test.NoDBTestCase):
         request = self._make_zone_request('bad')
         host = fakes.FakeHostState('host1', 'node1', {})
         self.assertFalse(self.filt_cls.host_passes(host, request))
+
+    def _get_indexed_hosts(self):
+        index = aggregate_index.AggregateMetadataIndex()
+        index.update_host('host1', [objects.Aggregate(
+            id=1, metadata={'availability_zone': 'nova'})])
+        index.update_host('host2', [objects.Aggregate(
+            id=2, metadata={'availability_zone': 'az2'})])
+        return [fakes.FakeHostState(host, 'node', {'aggregate_index': index})
+                for host in ('host1', 'host2', 'host3')]
+
+    def test_availability_zone_filter_mask(self, agg_mock):
+        hosts = self._get_indexed_hosts()
+        self.assertEqual([False, True, False], self.filt_cls.filter_mask(
+            hosts, self._make_zone_request('az2')))
+        self.assertFalse(agg_mock.called)
+
+    def test_availability_zone_filter_mask_default_zone(self, agg_mock):
+        self.flags(default_availability_zone='nova')
+        hosts = self._get_indexed_hosts()
+        self.assertEqual([True, False, True], self.filt_cls.filter_mask(
+            hosts, self._make_zone_request('nova')))
+        self.assertFalse(agg_mock.called)
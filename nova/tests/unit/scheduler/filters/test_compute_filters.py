@@ -48,3 +48,18 @@ class TestComputeFilter(test.NoDBTestCase):
         service_up_mock.return_value = False
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
         service_up_mock.assert_called_once_with(service)
+
+    @mock.patch('nova.servicegroup.API.get_up_services')
+    def test_compute_filter_filter_all(self, get_up_mock, service_up_mock):
+        filt_cls = compute_filter.ComputeFilter()
+        filter_properties = {'instance_type': {'memory_mb': 1024}}
+        hosts = [fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                     {'service': {'id': i,
+                                                  'disabled': i == 1}})
+                 for i in range(4)]
+        get_up_mock.return_value = set([0, 1, 3])
+        self.assertEqual([hosts[0], hosts[3]],
+                         list(filt_cls.filter_all(hosts, filter_properties)))
+        get_up_mock.assert_called_once_with(
+            [hosts[0].service, hosts[2].service, hosts[3].service])
+        self.assertFalse(service_up_mock.called)
@@ -13,6 +13,7 @@
 import mock
 
 from nova.scheduler.filters import core_filter
+from nova.scheduler import host_snapshot
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -49,6 +50,37 @@ class TestCoreFilter(test.NoDBTestCase):
                  'cpu_allocation_ratio': 2})
         self.assertFalse(self.filt_cls.host_passes(host, filter_properties))
 
+    def test_core_filter_mask(self):
+        self.filt_cls = core_filter.CoreFilter()
+        filter_properties = {'instance_type': {'vcpus': 2}}
+        host1 = fakes.FakeHostState('host1', 'node1',
+                {'vcpus_total': 4, 'vcpus_used': 6,
+                 'cpu_allocation_ratio': 2})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                {'vcpus_total': 4, 'vcpus_used': 7,
+                 'cpu_allocation_ratio': 2})
+        host3 = fakes.FakeHostState('host3', 'node3', {})
+        host4 = fakes.FakeHostState('host4', 'node4',
+                {'vcpus_total': 1, 'vcpus_used': 0,
+                 'cpu_allocation_ratio': 2})
+        snapshot = host_snapshot.HostStateSnapshot([host1, host2, host3,
+                                                    host4])
+        self.assertEqual([True, False, True, False],
+                         self.filt_cls.filter_mask(snapshot,
+                                                   filter_properties))
+        self.assertEqual(8, host1.limits['vcpu'])
+        self.assertEqual(8, host2.limits['vcpu'])
+        self.assertNotIn('vcpu', host3.limits)
+        self.assertEqual(2, host4.limits['vcpu'])
+
+    def test_core_filter_mask_no_instance_type(self):
+        self.filt_cls = core_filter.CoreFilter()
+        host = fakes.FakeHostState('host1', 'node1',
+                {'vcpus_total': 4, 'vcpus_used': 8,
+                 'cpu_allocation_ratio': 2})
+        snapshot = host_snapshot.HostStateSnapshot([host])
+        self.assertEqual([True], self.filt_cls.filter_mask(snapshot, {}))
+
     @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_aggregate_core_filter_value_error(self, agg_mock):
         self.filt_cls = core_filter.AggregateCoreFilter()
@@ -13,6 +13,7 @@
 import mock
 
 from nova.scheduler.filters import disk_filter
+from nova.scheduler import host_snapshot
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -51,6 +52,21 @@ class TestDiskFilter(test.NoDBTestCase):
         self.assertTrue(filt_cls.host_passes(host, filter_properties))
         self.assertEqual(12 * 10.0, host.limits['disk_gb'])
 
+    def test_disk_filter_mask(self):
+        self.flags(disk_allocation_ratio=10.0)
+        filt_cls = disk_filter.DiskFilter()
+        filter_properties = {'instance_type': {'root_gb': 100,
+            'ephemeral_gb': 18, 'swap': 1024}}
+        host1 = fakes.FakeHostState('host1', 'node1',
+                {'free_disk_mb': 11 * 1024, 'total_usable_disk_gb': 12})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                {'free_disk_mb': 10 * 1024, 'total_usable_disk_gb': 12})
+        snapshot = host_snapshot.HostStateSnapshot([host1, host2])
+        self.assertEqual([True, False],
+                         filt_cls.filter_mask(snapshot, filter_properties))
+        self.assertEqual(12 * 10.0, host1.limits['disk_gb'])
+        self.assertNotIn('disk_gb', host2.limits)
+
     def test_disk_filter_oversubscribe_fail(self):
         self.flags(disk_allocation_ratio=10.0)
         filt_cls = disk_filter.DiskFilter()
@@ -14,6 +14,7 @@
 import mock
 
 from nova.scheduler.filters import io_ops_filter
+from nova.scheduler import host_snapshot
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -36,6 +37,17 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         filter_properties = {}
         self.assertFalse(self.filt_cls.host_passes(host, filter_properties))
 
+    def test_filter_num_iops_mask(self):
+        self.flags(max_io_ops_per_host=8)
+        self.filt_cls = io_ops_filter.IoOpsFilter()
+        host1 = fakes.FakeHostState('host1', 'node1',
+                                    {'num_io_ops': 7})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                                    {'num_io_ops': 8})
+        snapshot = host_snapshot.HostStateSnapshot([host1, host2])
+        self.assertEqual([True, False],
+                         self.filt_cls.filter_mask(snapshot, {}))
+
     @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_aggregate_filter_num_iops_value(self, agg_mock):
         self.flags(max_io_ops_per_host=7)
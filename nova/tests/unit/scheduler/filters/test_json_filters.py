@@ -10,9 +10,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
 from oslo_serialization import jsonutils
 
 from nova.scheduler.filters import json_filter
+from nova.scheduler import host_snapshot
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -287,3 +289,53 @@ class TestJsonFilter(test.NoDBTestCase):
             },
         }
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
+
+    def test_json_filter_query_compiled_once(self):
+        filter_properties = {'scheduler_hints': {'query': self.json_query}}
+        host = fakes.FakeHostState('host1', 'node1',
+                {'free_ram_mb': 1024,
+                 'free_disk_mb': 200 * 1024})
+        with mock.patch.object(jsonutils, 'loads',
+                               wraps=jsonutils.loads) as mock_loads:
+            for _ in range(3):
+                self.assertTrue(self.filt_cls.host_passes(host,
+                                                          filter_properties))
+        self.assertEqual(1, mock_loads.call_count)
+
+    def test_json_filter_mask(self):
+        raw = ['and',
+                  '$capabilities.enabled',
+                  ['in', '$free_ram_mb', 10, 40],
+                  ['or',
+                      ['not', '$unknown'],
+                      ['>', '$free_disk_mb', 300, 100]]]
+        filter_properties = {
+            'scheduler_hints': {
+                'query': jsonutils.dumps(raw),
+            },
+        }
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                {'free_ram_mb': 10, 'free_disk_mb': 200,
+                 'capabilities': {'enabled': True}}),
+            fakes.FakeHostState('host2', 'node2',
+                {'free_ram_mb': 40, 'free_disk_mb': 400,
+                 'capabilities': {}}),
+            fakes.FakeHostState('host3', 'node3',
+                {'free_ram_mb': 30, 'free_disk_mb': 400,
+                 'capabilities': {'enabled': True}}),
+            fakes.FakeHostState('host4', 'node4',
+                {'free_ram_mb': 40, 'free_disk_mb': 400,
+                 'capabilities': {'enabled': False}}),
+        ]
+        snapshot = host_snapshot.HostStateSnapshot(hosts)
+        mask = self.filt_cls.filter_mask(snapshot, filter_properties)
+        self.assertEqual([False, True, False, False], mask)
+        self.assertEqual([self.filt_cls.host_passes(host, filter_properties)
+                          for host in hosts], mask)
+
+    def test_json_filter_mask_no_query(self):
+        hosts = [fakes.FakeHostState('host1', 'node1', {}),
+                 fakes.FakeHostState('host2', 'node2', {})]
+        snapshot = host_snapshot.HostStateSnapshot(hosts)
+        self.assertEqual([True, True], self.filt_cls.filter_mask(snapshot, {}))
@@ -13,6 +13,7 @@
 import mock
 
 from nova.scheduler.filters import num_instances_filter
+from nova.scheduler import host_snapshot
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -35,6 +36,17 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         filter_properties = {}
         self.assertFalse(self.filt_cls.host_passes(host, filter_properties))
 
+    def test_filter_num_instances_mask(self):
+        self.flags(max_instances_per_host=5)
+        self.filt_cls = num_instances_filter.NumInstancesFilter()
+        host1 = fakes.FakeHostState('host1', 'node1',
+                                    {'num_instances': 4})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                                    {'num_instances': 5})
+        snapshot = host_snapshot.HostStateSnapshot([host1, host2])
+        self.assertEqual([True, False],
+                         self.filt_cls.filter_mask(snapshot, {}))
+
     @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_filter_aggregate_num_instances_value(self, agg_mock):
         self.flags(max_instances_per_host=4)
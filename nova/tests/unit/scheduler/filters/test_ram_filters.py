@@ -13,6 +13,7 @@
 import mock
 
 from nova.scheduler.filters import ram_filter
+from nova.scheduler import host_snapshot
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -52,6 +53,34 @@ class TestRamFilter(test.NoDBTestCase):
                  'ram_allocation_ratio': 2.0})
         self.assertFalse(self.filt_cls.host_passes(host, filter_properties))
 
+    def test_ram_filter_mask(self):
+        filter_properties = {'instance_type': {'memory_mb': 1024}}
+        host1 = fakes.FakeHostState('host1', 'node1',
+                {'free_ram_mb': 1023, 'total_usable_ram_mb': 1024,
+                 'ram_allocation_ratio': 1.0})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                {'free_ram_mb': -1024, 'total_usable_ram_mb': 2048,
+                 'ram_allocation_ratio': 2.0})
+        host3 = fakes.FakeHostState('host3', 'node3',
+                {'free_ram_mb': 512, 'total_usable_ram_mb': 512,
+                 'ram_allocation_ratio': 2.0})
+        snapshot = host_snapshot.HostStateSnapshot([host1, host2, host3])
+        self.assertEqual([False, True, False],
+                         self.filt_cls.filter_mask(snapshot,
+                                                   filter_properties))
+        self.assertEqual({}, host1.limits)
+        self.assertEqual(2048 * 2.0, host2.limits['memory_mb'])
+
+    def test_ram_filter_mask_applies(self):
+        class FakeRamFilter(ram_filter.RamFilter):
+            def host_passes(self, host_state, filter_properties):
+                return False
+
+        self.assertTrue(self.filt_cls.filter_mask_applies())
+        self.assertTrue(ram_filter.AggregateRamFilter.filter_mask_applies())
+        # The mask of RamFilter would ignore the overridden host_passes()
+        self.assertFalse(FakeRamFilter.filter_mask_applies())
+
 
 @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
 class TestAggregateRamFilter(test.NoDBTestCase):
@@ -94,3 +123,19 @@ class TestAggregateRamFilter(test.NoDBTestCase):
         # use the minimum ratio from aggregates
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
         self.assertEqual(1024 * 1.5, host.limits['memory_mb'])
+
+    def test_aggregate_ram_filter_mask(self, agg_mock):
+        filter_properties = {'context': mock.sentinel.ctx,
+                             'instance_type': {'memory_mb': 1024}}
+        host1 = fakes.FakeHostState('host1', 'node1',
+                {'free_ram_mb': 1023, 'total_usable_ram_mb': 1024,
+                 'ram_allocation_ratio': 1.0})
+        host2 = fakes.FakeHostState('host2', 'node2',
+                {'free_ram_mb': 1023, 'total_usable_ram_mb': 1024,
+                 'ram_allocation_ratio': 1.0})
+        agg_mock.side_effect = [set(), set(['2.0'])]
+        snapshot = host_snapshot.HostStateSnapshot([host1, host2])
+        self.assertEqual([False, True],
+                         self.filt_cls.filter_mask(snapshot,
+                                                   filter_properties))
+        self.assertEqual(1024 * 2.0, host2.limits['memory_mb'])
@@ -14,6 +14,7 @@
 #    under the License.
 
 from nova import objects
+from nova.scheduler import aggregate_index
 from nova.scheduler.filters import utils
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -88,6 +89,38 @@ class TestUtils(test.NoDBTestCase):
 
         self.assertEqual({}, metadata)
 
+    def _get_indexed_host_state(self):
+        index = aggregate_index.AggregateMetadataIndex()
+        index.update_host('fake', _AGGREGATE_FIXTURES)
+        # The aggregates of the host state are ignored in favor of the index
+        return fakes.FakeHostState('fake', 'node',
+                                   {'aggregates': [],
+                                    'aggregate_index': index})
+
+    def test_aggregate_values_from_key_with_index(self):
+        host_state = self._get_indexed_host_state()
+
+        values = utils.aggregate_values_from_key(host_state, key_name='k1')
+
+        self.assertEqual(set(['1', '3', '6,7']), values)
+
+    def test_aggregate_metadata_get_by_host_with_index(self):
+        host_state = self._get_indexed_host_state()
+
+        metadata = utils.aggregate_metadata_get_by_host(host_state, 'k1')
+
+        self.assertEqual(set(['1', '3', '7', '6']), metadata['k1'])
+        self.assertEqual(set(['9', '8', '2', '4']), metadata['k2'])
+
+    def test_get_aggregate_index(self):
+        host_state = self._get_indexed_host_state()
+        other = fakes.FakeHostState('other', 'node', {})
+
+        self.assertIs(host_state.aggregate_index,
+                      utils.get_aggregate_index([host_state]))
+        self.assertIsNone(utils.get_aggregate_index([host_state, other]))
+        self.assertIsNone(utils.get_aggregate_index([]))
+
     def test_validate_num_values(self):
         f = utils.validate_num_values
 
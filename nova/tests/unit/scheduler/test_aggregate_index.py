@@ -0,0 +1,74 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For AggregateMetadataIndex.
+"""
+
+from nova import objects
+from nova.scheduler import aggregate_index
+from nova import test
+
+
+class AggregateMetadataIndexTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(AggregateMetadataIndexTestCase, self).setUp()
+        self.agg1 = objects.Aggregate(id=1, metadata={'k1': '1', 'k2': '2'})
+        self.agg2 = objects.Aggregate(id=2, metadata={'k1': '3,4'})
+        self.index = aggregate_index.AggregateMetadataIndex()
+        self.index.update_host('host1', [self.agg1, self.agg2])
+        self.index.update_host('host2', [self.agg2])
+        self.index.update_host('host3', [])
+
+    def test_metadata(self):
+        self.assertEqual({'k1': set(['1', '3', '4']), 'k2': set(['2'])},
+                         self.index.metadata('host1'))
+        self.assertEqual({'k1': set(['3', '4'])},
+                         self.index.metadata('host2'))
+        self.assertEqual({}, self.index.metadata('host3'))
+        self.assertEqual({}, self.index.metadata('unknown'))
+
+    def test_metadata_with_key(self):
+        # Only the aggregates having the key are merged
+        self.assertEqual({'k1': set(['1']), 'k2': set(['2'])},
+                         self.index.metadata('host1', 'k2'))
+        self.assertEqual({}, self.index.metadata('host2', 'k2'))
+
+    def test_raw_values(self):
+        self.assertEqual(set(['1', '3,4']),
+                         self.index.raw_values('host1', 'k1'))
+        self.assertEqual(set(), self.index.raw_values('host3', 'k1'))
+
+    def test_hosts(self):
+        self.assertEqual(set(['host1', 'host2']),
+                         self.index.hosts_with_key('k1'))
+        self.assertEqual(set(['host1']), self.index.hosts_with_key('k2'))
+        self.assertEqual(set(), self.index.hosts_with_key('k3'))
+        self.assertEqual(set(['host1', 'host2']),
+                         self.index.hosts_with_value('k1', '4'))
+        self.assertEqual(set(['host1']),
+                         self.index.hosts_with_value('k1', '1'))
+        self.assertEqual(set(), self.index.hosts_with_value('k1', '2'))
+        self.assertEqual(set(), self.index.hosts_with_value('k3', '2'))
+        self.assertEqual(set(['1', '3', '4']), set(self.index.values('k1')))
+        self.assertEqual([], self.index.values('k3'))
+
+    def test_update_host(self):
+        self.index.metadata('host1')
+        self.index.update_host('host1', [self.agg1])
+        self.index.update_host('host2', [])
+        self.assertEqual({'k1': set(['1']), 'k2': set(['2'])},
+                         self.index.metadata('host1'))
+        self.assertEqual({}, self.index.metadata('host2'))
+        self.assertEqual(set(['host1']), self.index.hosts_with_key('k1'))
+        self.assertEqual(set(), self.index.hosts_with_value('k1', '4'))
+        self.assertEqual(['1'], self.index.values('k1'))
@@ -50,6 +50,37 @@ class SchedulerReportClientTestCase(test.NoDBTestCase):
         self.client.update_resource_stats(cn)
         mock_save.assert_called_once_with()
 
+    @mock.patch.object(scheduler_rpcapi.SchedulerAPI, 'update_compute_node')
+    @mock.patch.object(objects.ComputeNode, 'save')
+    def test_update_resource_stats_sends_changes(self, mock_save,
+                                                 mock_update):
+        self.flags(scheduler_tracks_compute_changes=True)
+        cn = objects.ComputeNode(host='fakehost',
+                                 hypervisor_hostname='fakenode',
+                                 free_ram_mb=512, vcpus_used=1)
+        cn.obj_reset_changes()
+        cn.free_ram_mb = 256
+
+        self.client.update_resource_stats(cn)
+        self.client.update_resource_stats(cn)
+        self.assertEqual(2, mock_update.call_count)
+        update, generation = mock_update.call_args_list[0][0][1:]
+        self.assertEqual(1, generation)
+        self.assertEqual('fakehost', update.host)
+        self.assertEqual('fakenode', update.hypervisor_hostname)
+        self.assertEqual(256, update.free_ram_mb)
+        self.assertFalse(update.obj_attr_is_set('vcpus_used'))
+        self.assertEqual(2, mock_update.call_args_list[1][0][2])
+
+    @mock.patch.object(scheduler_rpcapi.SchedulerAPI, 'update_compute_node')
+    @mock.patch.object(objects.ComputeNode, 'save')
+    def test_update_resource_stats_not_tracked(self, mock_save, mock_update):
+        cn = objects.ComputeNode(host='fakehost',
+                                 hypervisor_hostname='fakenode')
+        self.client.update_resource_stats(cn)
+        mock_save.assert_called_once_with()
+        self.assertFalse(mock_update.called)
+
 
 class SchedulerQueryClientTestCase(test.NoDBTestCase):
 
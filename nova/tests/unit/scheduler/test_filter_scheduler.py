@@ -29,7 +29,7 @@ from nova.tests.unit.scheduler import fakes
 from nova.tests.unit.scheduler import test_scheduler
 
 
-def fake_get_filtered_hosts(hosts, filter_properties, index):
+def fake_get_filtered_hosts(hosts, filter_properties, index, trace=None):
     return list(hosts)
 
 
@@ -54,7 +54,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
 
         self.next_weight = 1.0
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                max_objects=None, trace=None):
             self.next_weight += 2.0
             host_state = hosts[0]
             return [weights.WeighedHost(host_state, self.next_weight)]
@@ -207,7 +208,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
 
         self.next_weight = 50
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                max_objects=None, trace=None):
             this_weight = self.next_weight
             self.next_weight = 0
             host_state = hosts[0]
@@ -237,6 +239,59 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
 
         self.assertEqual(50, hosts[0].weight)
 
+    def _test_schedule_in_bulk(self, passes_filters):
+        self.flags(scheduler_bulk_placement=True)
+        host1 = fakes.FakeHostState('host1', 'node1', {})
+        host2 = fakes.FakeHostState('host2', 'node2', {})
+        hm = self.driver.host_manager
+        self.driver._get_all_host_states = mock.Mock(
+            return_value=[host1, host2])
+        # host1 is the best host until it has been consumed twice
+        new_weights = iter([1.5, 0.5, 0.8])
+        with test.nested(
+            mock.patch.object(hm, 'get_filtered_hosts',
+                              return_value=[host1, host2]),
+            mock.patch.object(hm, 'get_weighed_hosts',
+                              return_value=[weights.WeighedHost(host1, 2.0),
+                                            weights.WeighedHost(host2, 1.0)]),
+            mock.patch.object(hm, 'host_passes_filters',
+                              side_effect=passes_filters),
+            mock.patch.object(hm, 'get_weighed_host',
+                              side_effect=lambda host, props:
+                                  weights.WeighedHost(host,
+                                                      next(new_weights))),
+            mock.patch.object(fakes.FakeHostState, 'consume_from_instance'),
+        ) as (mock_filter, mock_weigh, mock_passes, mock_weigh_one,
+              mock_consume):
+            request_spec = {'num_instances': 4,
+                            'instance_properties': {},
+                            'instance_type': {}}
+            hosts = self.driver._schedule(self.context, request_spec, {})
+        # The hosts are only filtered and weighed once as a whole
+        self.assertEqual(1, mock_filter.call_count)
+        self.assertEqual(1, mock_weigh.call_count)
+        return [weighed.obj.host for weighed in hosts]
+
+    def test_schedule_in_bulk(self):
+        hosts = self._test_schedule_in_bulk(lambda *args, **kwargs: True)
+        self.assertEqual(['host1', 'host1', 'host2', 'host2'], hosts)
+
+    def test_schedule_in_bulk_host_full(self):
+        # Every host can only host a single instance
+        hosts = self._test_schedule_in_bulk(lambda *args, **kwargs: False)
+        self.assertEqual(['host1', 'host2'], hosts)
+
+    def test_can_schedule_in_bulk(self):
+        self.flags(scheduler_bulk_placement=True)
+        can_schedule = self.driver._can_schedule_in_bulk
+        self.assertTrue(can_schedule({}, 2))
+        self.assertFalse(can_schedule({}, 1))
+        self.assertFalse(can_schedule({'group_updated': True}, 2))
+        self.assertFalse(can_schedule({'force_hosts': ['host1']}, 2))
+        self.assertFalse(can_schedule({'force_nodes': ['node1']}, 2))
+        self.flags(scheduler_bulk_placement=False)
+        self.assertFalse(can_schedule({}, 2))
+
     @mock.patch.object(objects.InstancePCIRequests,
                        'from_request_spec_instance_props')
     @mock.patch.object(host_manager.HostManager, 'get_filtered_hosts')
@@ -255,6 +310,25 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         from_rs_ip.assert_called_once_with('anything_as_it_is_mocked')
         self.assertEqual(fake_requests, instance_properties['pci_requests'])
 
+    @mock.patch.object(host_manager.HostManager, 'get_group_hosts')
+    @mock.patch.object(host_manager.HostManager, 'get_filtered_hosts')
+    def test_schedule_with_group_members(self, get_filtered_hosts,
+                                         get_group_hosts):
+        self.driver._get_all_host_states = mock.Mock()
+        get_filtered_hosts.return_value = None
+        get_group_hosts.return_value = set(['hostA'])
+
+        request_spec = dict(instance_properties={}, instance_type={})
+        filter_properties = {'group_updated': True,
+                             'group_hosts': ['hostB'],
+                             'group_policies': ['anti-affinity'],
+                             'group_members': ['uuid1', 'uuid2']}
+
+        self.driver._schedule(self.context, request_spec, filter_properties)
+        get_group_hosts.assert_called_once_with(mock.ANY, ['uuid1', 'uuid2'])
+        self.assertEqual(set(['hostA', 'hostB']),
+                         filter_properties['group_hosts'])
+
     @mock.patch('nova.objects.ServiceList.get_by_binary',
                 return_value=fakes.SERVICES)
     @mock.patch('nova.objects.InstanceList.get_by_host')
@@ -276,7 +350,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         selected_hosts = []
         selected_nodes = []
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                max_objects=None, trace=None):
             self.next_weight += 2.0
             host_state = hosts[0]
             selected_hosts.append(host_state.host)
@@ -321,6 +396,37 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
                  dict(request_spec=request_spec))]
             self.assertEqual(expected, mock_info.call_args_list)
 
+    def test_select_destinations_traced(self):
+        self.driver.tracer.enabled = True
+
+        def _fake_schedule(context, request_spec, filter_properties,
+                           trace=None):
+            trace.add_span('RamFilter', 0.001, hosts_in=2, hosts_out=1)
+            return [mock.Mock()]
+
+        with mock.patch.object(self.driver, '_schedule',
+                               side_effect=_fake_schedule):
+            self.driver.select_destinations(self.context,
+                                            {'num_instances': 1}, {})
+
+        report = self.driver.get_traces(self.context)
+        self.assertEqual(1, len(report['traces']))
+        trace = report['traces'][0]
+        self.assertEqual(self.context.request_id, trace['request_id'])
+        self.assertEqual([{'name': 'RamFilter', 'duration': 0.001,
+                           'hosts_in': 2, 'hosts_out': 1}], trace['spans'])
+
+    def test_select_destinations_not_traced(self):
+        with mock.patch.object(self.driver, '_schedule',
+                               return_value=[mock.Mock()]) as mock_schedule:
+            self.driver.select_destinations(self.context,
+                                            {'num_instances': 1}, {})
+        mock_schedule.assert_called_once_with(self.context,
+                                              {'num_instances': 1}, {},
+                                              trace=None)
+        self.assertEqual([],
+                         self.driver.get_traces(self.context)['traces'])
+
     def test_select_destinations_no_valid_host(self):
 
         def _return_no_host(*args, **kwargs):
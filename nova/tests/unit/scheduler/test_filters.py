@@ -277,3 +277,96 @@ class FiltersTestCase(test.NoDBTestCase):
             self.assertIn("with reservation ID '%s'" % fake_res_id, cargs)
             self.assertIn("and instance ID '%s'" % fake_uuid, cargs)
             self.assertIn(exp_output, cargs)
+
+    def test_get_filtered_objects_batch(self):
+        class FakeSnapshot(object):
+            def __init__(self, objs):
+                self.objs = list(objs)
+
+            def __iter__(self):
+                return iter(self.objs)
+
+            def compress(self, mask):
+                return FakeSnapshot(obj for obj, passes
+                                    in zip(self.objs, mask) if passes)
+
+            def restrict(self, objs):
+                return FakeSnapshot(objs)
+
+        class BatchFilter(filters.BaseFilter):
+            supports_batch = True
+
+            def filter_mask(self, snapshot, filter_properties):
+                return [obj != 'Host0' for obj in snapshot]
+
+        class OneFilter(filters.BaseFilter):
+            def _filter_one(self, obj, filter_properties):
+                return obj != 'Host1'
+
+        batch_filter = BatchFilter()
+        all_filters = [batch_filter, OneFilter(), batch_filter]
+        hosts = ["Host0", "Host1", "Host2"]
+        with mock.patch.object(self.filter_handler, 'get_snapshot',
+                               side_effect=FakeSnapshot) as mock_snapshot:
+            result = self.filter_handler.get_filtered_objects(
+                    all_filters, hosts, {})
+        self.assertEqual(['Host2'], result)
+        # The snapshot is only built once, then kept in sync
+        mock_snapshot.assert_called_once_with(hosts)
+
+    def test_get_filtered_objects_batch_unsupported(self):
+        class BatchFilter(filters.BaseFilter):
+            supports_batch = True
+
+            def _filter_one(self, obj, filter_properties):
+                return obj != 'Host0'
+
+        hosts = ["Host0", "Host1", "Host2"]
+        result = self.filter_handler.get_filtered_objects(
+                [BatchFilter()], hosts, {})
+        self.assertEqual(['Host1', 'Host2'], result)
+
+    def test_get_filtered_objects_batch_overridden(self):
+        class BatchFilter(filters.BaseFilter):
+            supports_batch = True
+
+            def _filter_one(self, obj, filter_properties):
+                return obj != 'Host0'
+
+            def filter_mask(self, snapshot, filter_properties):
+                return [obj != 'Host0' for obj in snapshot]
+
+        class OneFilter(BatchFilter):
+            def _filter_one(self, obj, filter_properties):
+                return obj != 'Host1'
+
+        hosts = ["Host0", "Host1", "Host2"]
+        with mock.patch.object(self.filter_handler, 'get_snapshot',
+                               side_effect=AssertionError):
+            result = self.filter_handler.get_filtered_objects(
+                    [OneFilter()], hosts, {})
+        self.assertEqual(['Host0', 'Host2'], result)
+
+    def test_get_filtered_objects_traced(self):
+        class OneFilter(filters.BaseFilter):
+            def _filter_one(self, obj, filter_properties):
+                return obj != 'Host1'
+
+        trace = mock.Mock()
+        hosts = ["Host0", "Host1", "Host2"]
+        result = self.filter_handler.get_filtered_objects(
+                [OneFilter()], hosts, {}, trace=trace)
+        self.assertEqual(['Host0', 'Host2'], result)
+        trace.add_span.assert_called_once_with('OneFilter', mock.ANY,
+                                               hosts_in=3, hosts_out=2)
+
+    @mock.patch.object(filters.timeutils, 'StopWatch')
+    def test_get_filtered_objects_untraced(self, mock_stopwatch):
+        class OneFilter(filters.BaseFilter):
+            def _filter_one(self, obj, filter_properties):
+                return obj != 'Host1'
+
+        result = self.filter_handler.get_filtered_objects(
+                [OneFilter()], ["Host0", "Host1", "Host2"], {})
+        self.assertEqual(['Host0', 'Host2'], result)
+        self.assertFalse(mock_stopwatch.called)
@@ -18,6 +18,7 @@ Tests For HostManager
 
 import collections
 import datetime
+import time
 
 import mock
 from oslo_config import cfg
@@ -112,6 +113,9 @@ class HostManagerTestCase(test.NoDBTestCase):
         self.assertIn('uuid1', fake_info['instances'])
         self.assertIn('uuid2', fake_info['instances'])
         self.assertNotIn('uuid3', fake_info['instances'])
+        self.assertEqual({'uuid1': 'host1', 'uuid2': 'host1',
+                          'uuid3': 'host2'}, hm._instance_hosts)
+        self.assertTrue(hm._instance_hosts_loaded)
 
     def test_default_filters(self):
         default_filters = self.host_manager.default_filters
@@ -177,6 +181,28 @@ class HostManagerTestCase(test.NoDBTestCase):
         self.assertEqual({'fake-host': set([])},
                          self.host_manager.host_aggregates_map)
 
+    def test_update_aggregates_updates_index(self):
+        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'],
+                                     metadata={'k1': 'v1'})
+        self.host_manager.update_aggregates([fake_agg])
+        index = self.host_manager.aggregate_index
+        self.assertEqual(set(['fake-host']), index.hosts_with_key('k1'))
+        # Change both the hosts and the metadata of the aggregate
+        fake_agg = objects.Aggregate(id=1, hosts=['other-host'],
+                                     metadata={'k1': 'v2'})
+        self.host_manager.update_aggregates([fake_agg])
+        self.assertEqual(set(['other-host']),
+                         index.hosts_with_value('k1', 'v2'))
+        self.assertEqual({}, index.metadata('fake-host'))
+
+    def test_delete_aggregate_updates_index(self):
+        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'],
+                                     metadata={'k1': 'v1'})
+        self.host_manager.update_aggregates([fake_agg])
+        self.host_manager.delete_aggregate(fake_agg)
+        index = self.host_manager.aggregate_index
+        self.assertEqual(set(), index.hosts_with_key('k1'))
+
     def test_choose_host_filters_not_found(self):
         self.assertRaises(exception.SchedulerHostFilterNotFound,
                           self.host_manager._choose_host_filters,
@@ -219,6 +245,25 @@ class HostManagerTestCase(test.NoDBTestCase):
                 fake_properties)
         self._verify_result(info, result)
 
+    @mock.patch.object(FakeFilterClass1, '_filter_one', return_value=True)
+    def test_host_passes_filters(self, mock_filter_one):
+        self.assertTrue(self.host_manager.host_passes_filters(
+            self.fake_hosts[0], {'moo': 1}, index=1))
+        mock_filter_one.assert_called_once_with(self.fake_hosts[0],
+                                                {'moo': 1})
+
+    @mock.patch.object(FakeFilterClass1, '_filter_one', return_value=False)
+    def test_host_passes_filters_fails(self, mock_filter_one):
+        self.assertFalse(self.host_manager.host_passes_filters(
+            self.fake_hosts[0], {'moo': 1}))
+
+    @mock.patch.object(FakeFilterClass1, '_filter_one', return_value=False)
+    @mock.patch.object(FakeFilterClass1, 'run_filter_once_per_request', True)
+    def test_host_passes_filters_once_per_request(self, mock_filter_one):
+        self.assertTrue(self.host_manager.host_passes_filters(
+            self.fake_hosts[0], {'moo': 1}, index=1))
+        self.assertFalse(mock_filter_one.called)
+
     @mock.patch.object(FakeFilterClass2, '_filter_one', return_value=True)
     def test_get_filtered_hosts_with_specified_filters(self, mock_filter_one):
         fake_properties = {'moo': 1, 'cow': 2}
@@ -459,6 +504,8 @@ class HostManagerTestCase(test.NoDBTestCase):
         self.host_manager.get_all_host_states('fake-context')
         host_state = self.host_manager.host_state_map[('fake', 'fake')]
         self.assertEqual([fake_agg], host_state.aggregates)
+        self.assertIs(self.host_manager.aggregate_index,
+                      host_state.aggregate_index)
 
     @mock.patch.object(nova.objects.InstanceList, 'get_by_host')
     @mock.patch.object(host_manager.HostState, 'update_from_compute_node')
@@ -674,6 +721,305 @@ class HostManagerTestCase(test.NoDBTestCase):
                 'fake_context', host_name)
         self.assertFalse(new_info['updated'])
 
+    def test_sync_instance_info_digest(self):
+        self.host_manager._recreate_instance_info = mock.MagicMock()
+        host_name = 'fake_host'
+        inst1 = fake_instance.fake_instance_obj('fake_context', uuid='aaa',
+                                                host=host_name)
+        inst2 = fake_instance.fake_instance_obj('fake_context', uuid='bbb',
+                                                host=host_name)
+        orig_inst_dict = {inst1.uuid: inst1, inst2.uuid: inst2}
+        self.host_manager._instance_info = {
+                host_name: {
+                    'instances': orig_inst_dict,
+                    'updated': False,
+                }}
+        self.host_manager.sync_instance_info_digest(
+            'fake_context', host_name, utils.get_set_digest(['bbb', 'aaa']))
+        new_info = self.host_manager._instance_info[host_name]
+        self.assertFalse(self.host_manager._recreate_instance_info.called)
+        self.assertTrue(new_info['updated'])
+
+        new_info['updated'] = False
+        self.host_manager.sync_instance_info_digest(
+            'fake_context', host_name,
+            utils.get_set_digest(['bbb', 'aaa', 'new']))
+        self.host_manager._recreate_instance_info.assert_called_once_with(
+                'fake_context', host_name)
+        self.assertFalse(new_info['updated'])
+
+    def test_update_instance_info_batch(self):
+        host_name = 'fake_host'
+        inst1 = fake_instance.fake_instance_obj('fake_context', uuid='aaa',
+                                                host=host_name)
+        inst2 = fake_instance.fake_instance_obj('fake_context', uuid='bbb',
+                                                host=host_name)
+        self.host_manager._instance_info = {
+                host_name: {
+                    'instances': {inst1.uuid: inst1, inst2.uuid: inst2},
+                    'updated': False,
+                }}
+        self.host_manager._instance_hosts = {'aaa': host_name,
+                                             'bbb': host_name}
+        inst3 = fake_instance.fake_instance_obj('fake_context', uuid='ccc',
+                                                host=host_name)
+        update = objects.InstanceList(objects=[inst3])
+        self.host_manager.update_instance_info_batch('fake_context',
+                                                     host_name, update,
+                                                     ['aaa'])
+        new_info = self.host_manager._instance_info[host_name]
+        self.assertEqual({'bbb': inst2, 'ccc': inst3}, new_info['instances'])
+        self.assertEqual({'bbb': host_name, 'ccc': host_name},
+                         self.host_manager._instance_hosts)
+        self.assertTrue(new_info['updated'])
+
+    def test_update_instance_info_batch_unknown_host(self):
+        self.host_manager._recreate_instance_info = mock.MagicMock()
+        inst1 = fake_instance.fake_instance_obj('fake_context', uuid='aaa',
+                                                host='bad_host')
+        inst2 = fake_instance.fake_instance_obj('fake_context', uuid='bbb',
+                                                host='bad_host')
+        update = objects.InstanceList(objects=[inst1, inst2])
+        self.host_manager.update_instance_info_batch('fake_context',
+                                                     'bad_host', update, [])
+        # Unlike update_instance_info(), a batch isn't the full list of the
+        # instances of the host.
+        self.host_manager._recreate_instance_info.assert_called_once_with(
+                'fake_context', 'bad_host')
+
+    @mock.patch('nova.objects.InstanceList.get_by_filters',
+                return_value=objects.InstanceList(objects=[]))
+    @mock.patch('nova.objects.InstanceList.get_by_host')
+    def test_get_group_hosts(self, mock_get_by_host, mock_get_by_filters):
+        hm = self.host_manager
+        hm._instance_hosts_loaded = True
+        inst1 = fake_instance.fake_instance_obj('fake_context', uuid='aaa',
+                                                host='host1')
+        inst2 = fake_instance.fake_instance_obj('fake_context', uuid='bbb',
+                                                host='host1')
+        inst3 = fake_instance.fake_instance_obj('fake_context', uuid='ccc',
+                                                host='host2')
+        hm.update_instance_info('fake_context', 'host1',
+                                objects.InstanceList(objects=[inst1, inst2]))
+        mock_get_by_host.return_value = objects.InstanceList(objects=[inst3])
+        hm.update_instance_info('fake_context', 'host2',
+                                objects.InstanceList(objects=[inst3]))
+        self.assertEqual(set(['host1', 'host2']),
+                         hm.get_group_hosts('fake_context',
+                                            ['aaa', 'ccc', 'ddd']))
+        mock_get_by_filters.assert_called_once_with(
+            'fake_context', filters={'uuid': ['ddd'], 'deleted': False})
+
+        # The instance moved to host2, then host1 reports it deleted
+        mock_get_by_host.return_value = objects.InstanceList(
+            objects=[inst1, inst3])
+        hm._recreate_instance_info('fake_context', 'host2')
+        hm.delete_instance_info('fake_context', 'host1', 'aaa')
+        self.assertEqual(set(['host2']),
+                         hm.get_group_hosts('fake_context', ['aaa']))
+
+        hm.delete_instance_info('fake_context', 'host1', 'bbb')
+        self.assertEqual(set(),
+                         hm.get_group_hosts('fake_context', ['bbb']))
+
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
+    def test_get_group_hosts_building_member(self, mock_get_by_filters):
+        hm = self.host_manager
+        hm._instance_hosts_loaded = True
+        hm._instance_hosts = {'aaa': 'host1'}
+        # The member still building isn't reported by its host yet, but
+        # the claim saved its host
+        building = fake_instance.fake_instance_obj('fake_context', uuid='bbb',
+                                                   host='host2')
+        mock_get_by_filters.return_value = objects.InstanceList(
+            objects=[building])
+        self.assertEqual(set(['host1', 'host2']),
+                         hm.get_group_hosts('fake_context', ['aaa', 'bbb']))
+        mock_get_by_filters.assert_called_once_with(
+            'fake_context', filters={'uuid': ['bbb'], 'deleted': False})
+
+        # Nothing is read when all the members are known
+        mock_get_by_filters.reset_mock()
+        self.assertEqual(set(['host1']),
+                         hm.get_group_hosts('fake_context', ['aaa']))
+        self.assertFalse(mock_get_by_filters.called)
+
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
+    def test_get_group_hosts_not_loaded(self, mock_get_by_filters):
+        inst1 = fake_instance.fake_instance_obj('fake_context', uuid='aaa',
+                                                host='host1')
+        inst2 = fake_instance.fake_instance_obj('fake_context', uuid='bbb',
+                                                host=None)
+        mock_get_by_filters.return_value = objects.InstanceList(
+            objects=[inst1, inst2])
+        self.assertEqual(set(['host1']),
+                         self.host_manager.get_group_hosts(
+                             'fake_context', ['aaa', 'bbb']))
+        mock_get_by_filters.assert_called_once_with(
+            'fake_context', filters={'uuid': ['aaa', 'bbb'],
+                                     'deleted': False})
+
+    @mock.patch.object(objects.ComputeNodeList, 'get_all_by_host')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all')
+    def test_get_tracked_compute_nodes_initial(self, mock_get_all,
+                                               mock_get_by_host):
+        cn1 = objects.ComputeNode(host='host1', hypervisor_hostname='node1')
+        cn2 = objects.ComputeNode(host='host2', hypervisor_hostname='node2')
+        mock_get_all.return_value = [cn1, cn2]
+        service_refs = {'host1': 'service1', 'host2': 'service2'}
+
+        compute_nodes = self.host_manager._get_tracked_compute_nodes(
+            'fake_context', service_refs)
+        self.assertEqual(set([cn1, cn2]), set(compute_nodes))
+        mock_get_all.assert_called_once_with('fake_context')
+
+        # Nothing is read again from the DB when all nodes are known
+        mock_get_all.reset_mock()
+        compute_nodes = self.host_manager._get_tracked_compute_nodes(
+            'fake_context', service_refs)
+        self.assertEqual(set([cn1, cn2]), set(compute_nodes))
+        self.assertFalse(mock_get_all.called)
+        self.assertFalse(mock_get_by_host.called)
+
+    @mock.patch.object(objects.ComputeNodeList, 'get_all_by_host')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all')
+    def test_get_tracked_compute_nodes_stale_host(self, mock_get_all,
+                                                  mock_get_by_host):
+        cns = [objects.ComputeNode(host='host%s' % x,
+                                   hypervisor_hostname='node%s' % x)
+               for x in range(1, 5)]
+        new_cn2 = objects.ComputeNode(host='host2',
+                                      hypervisor_hostname='node2')
+        mock_get_by_host.return_value = [new_cn2]
+        self.host_manager._compute_node_info = {
+            (cn.host, cn.hypervisor_hostname): {'compute': cn,
+                                                'generation': 1}
+            for cn in cns}
+        self.host_manager._compute_node_info[('host2', 'node2')] = {
+            'compute': None, 'generation': 3}
+        self.host_manager._last_compute_resync = time.time()
+        service_refs = {cn.host: 'service' for cn in cns}
+
+        compute_nodes = self.host_manager._get_tracked_compute_nodes(
+            'fake_context', service_refs)
+        self.assertEqual(set([cns[0], new_cn2, cns[2], cns[3]]),
+                         set(compute_nodes))
+        self.assertFalse(mock_get_all.called)
+        mock_get_by_host.assert_called_once_with('fake_context', 'host2')
+        self.assertEqual(
+            {'compute': new_cn2, 'generation': 3},
+            self.host_manager._compute_node_info[('host2', 'node2')])
+
+    @mock.patch.object(objects.ComputeNodeList, 'get_all_by_host')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all')
+    def test_get_tracked_compute_nodes_periodic_resync(self, mock_get_all,
+                                                       mock_get_by_host):
+        self.flags(scheduler_compute_resync_interval=600)
+        cn1 = objects.ComputeNode(host='host1', hypervisor_hostname='node1')
+        cn2 = objects.ComputeNode(host='host1', hypervisor_hostname='node2')
+        mock_get_all.return_value = [cn1, cn2]
+        service_refs = {'host1': 'service1'}
+
+        with mock.patch.object(time, 'time', return_value=1000):
+            self.host_manager._get_tracked_compute_nodes('fake_context',
+                                                         service_refs)
+        with mock.patch.object(time, 'time', return_value=1599):
+            self.host_manager._get_tracked_compute_nodes('fake_context',
+                                                         service_refs)
+        self.assertEqual(1, mock_get_all.call_count)
+
+        # The node deleted while its host kept running is forgotten on the
+        # next periodic read
+        mock_get_all.return_value = [cn1]
+        with mock.patch.object(time, 'time', return_value=1600):
+            compute_nodes = self.host_manager._get_tracked_compute_nodes(
+                'fake_context', service_refs)
+        self.assertEqual(2, mock_get_all.call_count)
+        self.assertEqual([cn1], compute_nodes)
+        self.assertFalse(mock_get_by_host.called)
+
+    @mock.patch.object(objects.ComputeNodeList, 'get_all_by_host')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all')
+    def test_get_tracked_compute_nodes_host_without_nodes(self, mock_get_all,
+                                                          mock_get_by_host):
+        self.host_manager.tracks_compute_changes = True
+        cns = [objects.ComputeNode(host='host%s' % x,
+                                   hypervisor_hostname='node%s' % x)
+               for x in range(1, 4)]
+        mock_get_all.return_value = cns
+        service_refs = {'host%s' % x: 'service' for x in range(1, 5)}
+
+        self.host_manager._get_tracked_compute_nodes('fake_context',
+                                                     service_refs)
+        self.assertEqual(set(['host4']),
+                         self.host_manager._hosts_without_nodes)
+
+        # The host without compute node isn't looked up on each request
+        self.host_manager._get_tracked_compute_nodes('fake_context',
+                                                     service_refs)
+        self.assertEqual(1, mock_get_all.call_count)
+        self.assertFalse(mock_get_by_host.called)
+
+        # Until one of its nodes sends an update
+        cn4 = objects.ComputeNode(host='host4', hypervisor_hostname='node4')
+        mock_get_by_host.return_value = [cn4]
+        self.host_manager.update_compute_node('fake_context', cn4, 1)
+        compute_nodes = self.host_manager._get_tracked_compute_nodes(
+            'fake_context', service_refs)
+        mock_get_by_host.assert_called_once_with('fake_context', 'host4')
+        self.assertEqual(set(cns + [cn4]), set(compute_nodes))
+        self.assertEqual(set(), self.host_manager._hosts_without_nodes)
+
+    def test_update_compute_node(self):
+        self.host_manager.tracks_compute_changes = True
+        cn = objects.ComputeNode(host='host1', hypervisor_hostname='node1',
+                                 free_ram_mb=1024, vcpus_used=1)
+        self.host_manager._compute_node_info = {
+            ('host1', 'node1'): {'compute': cn, 'generation': 1}}
+        update = objects.ComputeNode(host='host1',
+                                     hypervisor_hostname='node1',
+                                     free_ram_mb=512)
+
+        self.host_manager.update_compute_node('fake_context', update, 2)
+        self.assertEqual(512, cn.free_ram_mb)
+        self.assertEqual(1, cn.vcpus_used)
+        self.assertEqual(
+            {'compute': cn, 'generation': 2},
+            self.host_manager._compute_node_info[('host1', 'node1')])
+
+    def test_update_compute_node_missed_generation(self):
+        self.host_manager.tracks_compute_changes = True
+        cn = objects.ComputeNode(host='host1', hypervisor_hostname='node1',
+                                 free_ram_mb=1024)
+        self.host_manager._compute_node_info = {
+            ('host1', 'node1'): {'compute': cn, 'generation': 1}}
+        update = objects.ComputeNode(host='host1',
+                                     hypervisor_hostname='node1',
+                                     free_ram_mb=512)
+
+        self.host_manager.update_compute_node('fake_context', update, 3)
+        self.assertEqual(1024, cn.free_ram_mb)
+        self.assertEqual(
+            {'compute': None, 'generation': 3},
+            self.host_manager._compute_node_info[('host1', 'node1')])
+
+    def test_update_compute_node_unknown(self):
+        self.host_manager.tracks_compute_changes = True
+        update = objects.ComputeNode(host='host1',
+                                     hypervisor_hostname='node1',
+                                     free_ram_mb=512)
+
+        self.host_manager.update_compute_node('fake_context', update, 5)
+        self.assertEqual(
+            {'compute': None, 'generation': 5},
+            self.host_manager._compute_node_info[('host1', 'node1')])
+
+    def test_update_compute_node_not_tracked(self):
+        update = objects.ComputeNode(host='host1',
+                                     hypervisor_hostname='node1')
+        self.host_manager.update_compute_node('fake_context', update, 1)
+        self.assertEqual({}, self.host_manager._compute_node_info)
+
 
 class HostManagerChangedNodesTestCase(test.NoDBTestCase):
     """Test case for HostManager class."""
@@ -800,6 +1146,26 @@ class HostStateTestCase(test.NoDBTestCase):
         self.assertEqual([], host.supported_instances)
         self.assertEqual(hyper_ver_int, host.hypervisor_version)
 
+    def test_cached_images_from_compute_node(self):
+        compute = objects.ComputeNode(
+            stats={'cached_images': 'image1,image2'}, memory_mb=0,
+            free_disk_gb=0, local_gb=0, local_gb_used=0, free_ram_mb=0,
+            vcpus=0, vcpus_used=0, disk_available_least=None,
+            updated_at=None, host_ip='127.0.0.1', hypervisor_type='htype',
+            hypervisor_hostname='hostname', cpu_info='cpu_info',
+            supported_hv_specs=[], hypervisor_version=0, numa_topology=None,
+            pci_device_pools=None, metrics=None,
+            cpu_allocation_ratio=16.0, ram_allocation_ratio=1.5)
+
+        host = host_manager.HostState("fakehost", "fakenode")
+        self.assertEqual(frozenset(), host.cached_images)
+        host.update_from_compute_node(compute)
+        self.assertEqual(frozenset(['image1', 'image2']), host.cached_images)
+
+        compute.stats = {'cached_images': ''}
+        host.update_from_compute_node(compute)
+        self.assertEqual(frozenset(), host.cached_images)
+
     def test_stat_consumption_from_compute_node_non_pci(self):
         stats = {
             'num_instances': '5',
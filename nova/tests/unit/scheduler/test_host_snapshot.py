@@ -0,0 +1,61 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For HostStateSnapshot.
+"""
+
+from nova.scheduler import host_snapshot
+from nova import test
+from nova.tests.unit.scheduler import fakes
+
+
+class HostStateSnapshotTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(HostStateSnapshotTestCase, self).setUp()
+        self.hosts = [fakes.FakeHostState('host%s' % i, 'node%s' % i,
+                                          {'free_ram_mb': i * 512,
+                                           'num_instances': i})
+                      for i in range(4)]
+        self.snapshot = host_snapshot.HostStateSnapshot(self.hosts)
+
+    def test_len_and_iter(self):
+        self.assertEqual(4, len(self.snapshot))
+        self.assertEqual(self.hosts, list(self.snapshot))
+
+    def test_column(self):
+        self.assertEqual([0, 512, 1024, 1536], self.snapshot['free_ram_mb'])
+        # Columns are only read once
+        self.hosts[0].free_ram_mb = 2048
+        self.assertEqual([0, 512, 1024, 1536], self.snapshot['free_ram_mb'])
+
+    def test_compress(self):
+        free_ram_mb = self.snapshot['free_ram_mb']
+        snapshot = self.snapshot.compress([True, False, True, False])
+        self.assertEqual([self.hosts[0], self.hosts[2]], list(snapshot))
+        self.assertEqual([0, 1024], snapshot['free_ram_mb'])
+        self.assertEqual([0, 2], snapshot['num_instances'])
+        # The original snapshot is left untouched
+        self.assertEqual([0, 512, 1024, 1536], free_ram_mb)
+
+    def test_restrict(self):
+        self.snapshot['num_instances']
+        snapshot = self.snapshot.restrict([self.hosts[3], self.hosts[1]])
+        self.assertEqual([self.hosts[1], self.hosts[3]], list(snapshot))
+        self.assertEqual([1, 3], snapshot['num_instances'])
+
+    def test_restrict_all(self):
+        snapshot = self.snapshot.restrict(self.hosts)
+        self.assertIs(self.snapshot, snapshot)
@@ -0,0 +1,46 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For ImagePopularity.
+"""
+
+from nova.scheduler import image_popularity
+from nova import test
+
+
+class ImagePopularityTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(ImagePopularityTestCase, self).setUp()
+        self.popularity = image_popularity.ImagePopularity(100)
+
+    def test_record(self):
+        self.assertEqual(1, self.popularity.record('image1', now=0))
+        self.assertEqual(3, self.popularity.record('image1', 2, now=0))
+        self.assertEqual(1, self.popularity.record('image2', now=0))
+        self.assertEqual(0, self.popularity.get_score('image3', now=0))
+
+    def test_record_decays(self):
+        self.popularity.record('image1', 4, now=0)
+        self.assertAlmostEqual(2, self.popularity.get_score('image1', now=100))
+        self.assertAlmostEqual(2, self.popularity.record('image1', now=200))
+
+    def test_record_prunes_forgotten_images(self):
+        self.popularity.record('image1', now=0)
+        self.popularity.record('image2', now=1000)
+        self.assertEqual(['image2'], list(self.popularity._scores))
+
+    def test_mark_precached(self):
+        self.assertTrue(self.popularity.mark_precached('image1', now=0))
+        self.assertFalse(self.popularity.mark_precached('image1', now=50))
+        self.assertTrue(self.popularity.mark_precached('image2', now=50))
+        self.assertTrue(self.popularity.mark_precached('image1', now=100))
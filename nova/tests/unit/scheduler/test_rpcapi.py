@@ -16,12 +16,15 @@
 Unit Tests for nova.scheduler.rpcapi
 """
 
+import mock
 from mox3 import mox
 from oslo_config import cfg
 
 from nova import context
+from nova import objects
 from nova.scheduler import rpcapi as scheduler_rpcapi
 from nova import test
+from nova import utils
 
 CONF = cfg.CONF
 
@@ -95,9 +98,74 @@ class SchedulerRpcAPITestCase(test.NoDBTestCase):
                 fanout=True,
                 version='4.2')
 
-    def test_sync_instance_info(self):
-        self._test_scheduler_api('sync_instance_info', rpc_method='cast',
+    def test_update_instance_info_batch(self):
+        self._test_scheduler_api('update_instance_info_batch',
+                rpc_method='cast',
                 host_name='fake_host',
-                instance_uuids=['fake1', 'fake2'],
+                instance_info='fake_instances',
+                deleted_instance_uuids=['fake1'],
                 fanout=True,
-                version='4.2')
+                version='4.5')
+
+    def test_update_instance_info_batch_old_scheduler(self):
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        rpcapi = scheduler_rpcapi.SchedulerAPI()
+        instances = objects.InstanceList(
+            objects=[objects.Instance(uuid='fake1')])
+        with mock.patch.object(rpcapi, 'client') as mock_client:
+            mock_client.can_send_version.return_value = False
+            cctxt = mock_client.prepare.return_value
+            rpcapi.update_instance_info_batch(ctxt, 'fake_host', instances,
+                                              ['fake2'])
+        mock_client.can_send_version.assert_called_once_with('4.5')
+        self.assertEqual(
+            [mock.call(ctxt, 'update_instance_info', host_name='fake_host',
+                       instance_info=instances),
+             mock.call(ctxt, 'delete_instance_info', host_name='fake_host',
+                       instance_uuid='fake2')],
+            cctxt.cast.call_args_list)
+
+    def test_sync_instance_info(self):
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        rpcapi = scheduler_rpcapi.SchedulerAPI()
+        with mock.patch.object(rpcapi, 'client') as mock_client:
+            mock_client.can_send_version.return_value = True
+            cctxt = mock_client.prepare.return_value
+            rpcapi.sync_instance_info(ctxt, 'fake_host', ['fake1', 'fake2'])
+        mock_client.prepare.assert_called_once_with(version='4.5',
+                                                    fanout=True)
+        cctxt.cast.assert_called_once_with(
+            ctxt, 'sync_instance_info_digest', host_name='fake_host',
+            digest=utils.get_set_digest(['fake2', 'fake1']))
+
+    def test_sync_instance_info_old_scheduler(self):
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        rpcapi = scheduler_rpcapi.SchedulerAPI()
+        with mock.patch.object(rpcapi, 'client') as mock_client:
+            mock_client.can_send_version.return_value = False
+            cctxt = mock_client.prepare.return_value
+            rpcapi.sync_instance_info(ctxt, 'fake_host', ['fake1', 'fake2'])
+        mock_client.prepare.assert_called_once_with(version='4.2',
+                                                    fanout=True)
+        cctxt.cast.assert_called_once_with(
+            ctxt, 'sync_instance_info', host_name='fake_host',
+            instance_uuids=['fake1', 'fake2'])
+
+    def test_update_compute_node(self):
+        self._test_scheduler_api('update_compute_node', rpc_method='cast',
+                compute_node='fake_compute_node',
+                generation=1,
+                fanout=True,
+                version='4.3')
+
+    def test_get_scheduler_traces(self):
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        rpcapi = scheduler_rpcapi.SchedulerAPI()
+        with mock.patch.object(rpcapi, 'client') as mock_client:
+            cctxt = mock_client.prepare.return_value
+            cctxt.call.return_value = 'foo'
+            retval = rpcapi.get_scheduler_traces(ctxt, host='fake_host')
+        self.assertEqual('foo', retval)
+        mock_client.prepare.assert_called_once_with(version='4.4',
+                                                    server='fake_host')
+        cctxt.call.assert_called_once_with(ctxt, 'get_scheduler_traces')
@@ -24,6 +24,7 @@ from nova import db
 from nova.scheduler import driver
 from nova.scheduler import host_manager
 from nova.scheduler import manager
+from nova.scheduler import tracing
 from nova import servicegroup
 from nova import test
 from nova.tests.unit import fake_server_actions
@@ -60,6 +61,34 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
             self.manager.select_destinations(None, None, {})
             select_destinations.assert_called_once_with(None, None, {})
 
+    def test_select_destination_precaches_popular_image(self):
+        self.flags(image_precache_threshold=3)
+        request_spec = {'image': {'id': 'fake-image', 'is_public': True},
+                        'num_instances': 2}
+        with test.nested(
+            mock.patch.object(self.manager.driver, 'select_destinations'),
+            mock.patch.object(self.manager.compute_rpcapi, 'precache_image'),
+        ) as (select_destinations, precache_image):
+            self.manager.select_destinations(self.context, request_spec, {})
+            self.assertFalse(precache_image.called)
+            self.manager.select_destinations(self.context, request_spec, {})
+            precache_image.assert_called_once_with(self.context,
+                                                   'fake-image')
+            # The compute nodes are asked once per half life
+            self.manager.select_destinations(self.context, request_spec, {})
+            self.assertEqual(1, precache_image.call_count)
+
+    def test_select_destination_private_image_not_precached(self):
+        self.flags(image_precache_threshold=1)
+        request_spec = {'image': {'id': 'fake-image', 'is_public': False},
+                        'num_instances': 2}
+        with test.nested(
+            mock.patch.object(self.manager.driver, 'select_destinations'),
+            mock.patch.object(self.manager.compute_rpcapi, 'precache_image'),
+        ) as (select_destinations, precache_image):
+            self.manager.select_destinations(self.context, request_spec, {})
+            self.assertFalse(precache_image.called)
+
     def test_update_aggregates(self):
         with mock.patch.object(self.manager.driver.host_manager,
                                'update_aggregates'
@@ -104,6 +133,44 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
                                               mock.sentinel.host_name,
                                               mock.sentinel.instance_uuids)
 
+    def test_update_instance_info_batch(self):
+        with mock.patch.object(self.manager.driver.host_manager,
+                               'update_instance_info_batch') as mock_update:
+            self.manager.update_instance_info_batch(
+                mock.sentinel.context, mock.sentinel.host_name,
+                mock.sentinel.instance_info, mock.sentinel.deleted_uuids)
+            mock_update.assert_called_once_with(mock.sentinel.context,
+                                                mock.sentinel.host_name,
+                                                mock.sentinel.instance_info,
+                                                mock.sentinel.deleted_uuids)
+
+    def test_sync_instance_info_digest(self):
+        with mock.patch.object(self.manager.driver.host_manager,
+                               'sync_instance_info_digest') as mock_sync:
+            self.manager.sync_instance_info_digest(mock.sentinel.context,
+                                                   mock.sentinel.host_name,
+                                                   mock.sentinel.digest)
+            mock_sync.assert_called_once_with(mock.sentinel.context,
+                                              mock.sentinel.host_name,
+                                              mock.sentinel.digest)
+
+    def test_update_compute_node(self):
+        with mock.patch.object(self.manager.driver.host_manager,
+                               'update_compute_node') as mock_update:
+            self.manager.update_compute_node(mock.sentinel.context,
+                                             mock.sentinel.compute_node,
+                                             mock.sentinel.generation)
+            mock_update.assert_called_once_with(mock.sentinel.context,
+                                                mock.sentinel.compute_node,
+                                                mock.sentinel.generation)
+
+    def test_get_scheduler_traces(self):
+        with mock.patch.object(self.manager.driver, 'get_traces',
+                               return_value={'traces': []}) as mock_get:
+            report = self.manager.get_scheduler_traces(mock.sentinel.context)
+        mock_get.assert_called_once_with(mock.sentinel.context)
+        self.assertEqual({'traces': []}, report)
+
 
 class SchedulerTestCase(test.NoDBTestCase):
     """Test case for base scheduler driver class."""
@@ -137,6 +204,18 @@ class SchedulerTestCase(test.NoDBTestCase):
         result = self.driver.hosts_up(self.context, self.topic)
         self.assertEqual(result, ['host2'])
 
+    def test_get_traces(self):
+        trace = tracing.SchedulerTrace('fake-request')
+        trace.add_span('RamFilter', 0.003)
+        self.driver.tracer.enabled = True
+        self.driver.tracer.finish_trace(trace)
+
+        report = self.driver.get_traces(self.context)
+
+        self.assertEqual(['fake-request'],
+                         [t['request_id'] for t in report['traces']])
+        self.assertEqual(1, report['histograms']['RamFilter']['count'])
+
 
 class SchedulerDriverBaseTestCase(SchedulerTestCase):
     """Test cases for base scheduler driver class methods
@@ -259,7 +259,7 @@ class SchedulerUtilsTestCase(test.NoDBTestCase):
             group_info = scheduler_utils._get_group_details(
                 self.context, 'fake_uuid', group_hosts)
             self.assertEqual(
-                (set(['hostA', 'hostB']), [policy]),
+                (set(['hostA', 'hostB']), [policy], None),
                 group_info)
 
     def test_get_group_details(self):
@@ -267,6 +267,24 @@ class SchedulerUtilsTestCase(test.NoDBTestCase):
             group = self._create_server_group(policy)
             self._get_group_details(group, policy=policy)
 
+    def test_get_group_details_tracks_group_hosts(self):
+        self.flags(scheduler_tracks_group_hosts=True)
+        group = self._create_server_group()
+
+        with test.nested(
+            mock.patch.object(objects.InstanceGroup, 'get_by_instance_uuid',
+                              return_value=group),
+            mock.patch.object(objects.InstanceGroup, 'get_hosts'),
+        ) as (get_group, get_hosts):
+            scheduler_utils._SUPPORTS_ANTI_AFFINITY = None
+            scheduler_utils._SUPPORTS_AFFINITY = None
+            group_info = scheduler_utils._get_group_details(
+                self.context, 'fake_uuid', ['hostB'])
+            self.assertEqual(
+                (set(['hostB']), ['anti-affinity'], group.members),
+                group_info)
+            self.assertFalse(get_hosts.called)
+
     def test_get_group_details_with_no_affinity_filters(self):
         self.flags(scheduler_default_filters=['fake'])
         scheduler_utils._SUPPORTS_ANTI_AFFINITY = None
@@ -330,6 +348,21 @@ class SchedulerUtilsTestCase(test.NoDBTestCase):
                                  'group_policies': ['policy']}
         self.assertEqual(expected_filter_props, filter_props)
 
+    @mock.patch.object(scheduler_utils, '_get_group_details')
+    def test_setup_instance_group_with_members(self, mock_ggd):
+        mock_ggd.return_value = scheduler_utils.GroupDetails(
+            hosts=set(['hostC']), policies=['policy'], members=['uuid1'])
+        spec = {'instance_properties': {'uuid': 'fake-uuid'}}
+        filter_props = {'group_hosts': ['hostC']}
+
+        scheduler_utils.setup_instance_group(self.context, spec, filter_props)
+
+        expected_filter_props = {'group_updated': True,
+                                 'group_hosts': set(['hostC']),
+                                 'group_policies': ['policy'],
+                                 'group_members': ['uuid1']}
+        self.assertEqual(expected_filter_props, filter_props)
+
     @mock.patch.object(scheduler_utils, '_get_group_details')
     def test_setup_instance_group_with_no_group(self, mock_ggd):
         mock_ggd.return_value = None
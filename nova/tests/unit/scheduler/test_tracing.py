@@ -0,0 +1,87 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For Scheduler tracing.
+"""
+
+from nova.scheduler import tracing
+from nova import test
+
+
+class SchedulerTraceTestCase(test.NoDBTestCase):
+
+    def test_add_span(self):
+        trace = tracing.SchedulerTrace('fake-request')
+        trace.add_span('RamFilter', 0.5, hosts_in=3, hosts_out=1)
+        self.assertEqual([{'name': 'RamFilter', 'duration': 0.5,
+                           'hosts_in': 3, 'hosts_out': 1}], trace.spans)
+
+    def test_span(self):
+        trace = tracing.SchedulerTrace()
+        with trace.span('get_all_host_states'):
+            pass
+        self.assertEqual(1, len(trace.spans))
+        self.assertEqual('get_all_host_states', trace.spans[0]['name'])
+        self.assertTrue(trace.spans[0]['duration'] >= 0)
+
+    def test_count(self):
+        trace = tracing.SchedulerTrace()
+        trace.count('consumed')
+        trace.count('consumed')
+        trace.count('attempts', 3)
+        self.assertEqual({'consumed': 2, 'attempts': 3},
+                         trace.to_dict()['counters'])
+
+    def test_span_without_trace(self):
+        with tracing.span(None, 'get_all_host_states'):
+            pass
+
+
+class SchedulerTracerTestCase(test.NoDBTestCase):
+
+    def test_disabled(self):
+        tracer = tracing.SchedulerTracer()
+        self.assertIsNone(tracer.start_trace('fake-request'))
+        tracer.finish_trace(None)
+        self.assertEqual([], tracer.get_report()['traces'])
+
+    def test_history(self):
+        self.flags(scheduler_tracing=True, scheduler_tracing_history=2)
+        tracer = tracing.SchedulerTracer()
+        for request_id in ('req1', 'req2', 'req3'):
+            tracer.finish_trace(tracer.start_trace(request_id))
+        self.assertEqual(['req2', 'req3'],
+                         [trace['request_id']
+                          for trace in tracer.get_report()['traces']])
+
+    def test_histograms(self):
+        self.flags(scheduler_tracing=True)
+        tracer = tracing.SchedulerTracer()
+        for duration in (0.0005, 0.001, 0.003, 10):
+            trace = tracer.start_trace()
+            trace.add_span('RamFilter', duration)
+            tracer.finish_trace(trace)
+
+        histogram = tracer.get_histograms()['RamFilter']
+
+        self.assertEqual(4, histogram['count'])
+        self.assertAlmostEqual(10.0045, histogram['total'])
+        expected = [0] * (len(tracing.HISTOGRAM_BUCKETS) + 1)
+        # 0.5ms and 1ms fall in the first bucket, 3ms in the one up to 5ms
+        # and 10s above the last bound.
+        expected[0] = 2
+        expected[2] = 1
+        expected[-1] = 1
+        self.assertEqual(expected, histogram['buckets'])
@@ -0,0 +1,86 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For Scheduler ImageCacheWeigher weights
+"""
+
+from nova.scheduler import weights
+from nova.scheduler.weights import image_cache
+from nova import test
+from nova.tests.unit.scheduler import fakes
+
+
+class ImageCacheWeigherTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(ImageCacheWeigherTestCase, self).setUp()
+        self.weight_handler = weights.HostWeightHandler()
+        self.weighers = [image_cache.ImageCacheWeigher()]
+
+    def _get_weighed_hosts(self, hosts, image_id,
+                           image_cache_weight_multiplier=None):
+        if image_cache_weight_multiplier is not None:
+            self.flags(
+                image_cache_weight_multiplier=image_cache_weight_multiplier)
+        weight_properties = {'request_spec': {'image': {'id': image_id}}}
+        return self.weight_handler.get_weighed_objects(self.weighers,
+                                                       hosts,
+                                                       weight_properties)
+
+    def _get_all_hosts(self):
+        host_values = [
+            ('host1', 'node1', {'cached_images': frozenset()}),
+            ('host2', 'node2', {'cached_images': frozenset(['image1'])}),
+            ('host3', 'node3', {'cached_images': frozenset(['image2'])}),
+            ('host4', 'node4', {'cached_images': frozenset(['image1',
+                                                            'image2'])}),
+        ]
+        return [fakes.FakeHostState(host, node, values)
+                for host, node, values in host_values]
+
+    def test_disabled_by_default(self):
+        weighed_hosts = self._get_weighed_hosts(self._get_all_hosts(),
+                                                'image2')
+        self.assertEqual([0.0] * 4, [h.weight for h in weighed_hosts])
+
+    def test_preferring_cached_image(self):
+        weighed_hosts = self._get_weighed_hosts(
+            self._get_all_hosts(), 'image2', image_cache_weight_multiplier=1)
+        self.assertEqual(1.0, weighed_hosts[0].weight)
+        self.assertEqual(['host3', 'host4'],
+                         sorted(h.obj.host for h in weighed_hosts[:2]))
+        self.assertEqual([0.0, 0.0], [h.weight for h in weighed_hosts[2:]])
+
+    def test_not_cached_anywhere(self):
+        weighed_hosts = self._get_weighed_hosts(
+            self._get_all_hosts(), 'image3', image_cache_weight_multiplier=1)
+        self.assertEqual([0.0] * 4, [h.weight for h in weighed_hosts])
+
+    def test_no_image(self):
+        weighed_hosts = self.weight_handler.get_weighed_objects(
+            self.weighers, self._get_all_hosts(), {'request_spec': {}})
+        self.assertEqual([0.0] * 4, [h.weight for h in weighed_hosts])
+
+    def test_image_cache_weight_multiplier(self):
+        weighed_hosts = self._get_weighed_hosts(
+            self._get_all_hosts(), 'image1', image_cache_weight_multiplier=2)
+        self.assertEqual(2.0, weighed_hosts[0].weight)
+        self.assertEqual(['host2', 'host4'],
+                         sorted(h.obj.host for h in weighed_hosts[:2]))
+
+    def test_weigh_object(self):
+        host = self._get_all_hosts()[1]
+        weigher = image_cache.ImageCacheWeigher()
+        props = {'request_spec': {'image': {'id': 'image1'}}}
+        self.assertEqual(1, weigher._weigh_object(host, props))
+        props = {'request_spec': {'image': {'id': 'image2'}}}
+        self.assertEqual(0, weigher._weigh_object(host, props))
@@ -69,3 +69,30 @@ class ServiceGroupApiTestCase(test.NoDBTestCase):
             driver = self.servicegroup_api._driver
             result = self.servicegroup_api.service_is_up(member)
             self.assertIs(result, False)
+
+    def test_get_up_services(self):
+        services = [{'id': 1, 'host': 'host1', 'topic': 'compute',
+                     'forced_down': False},
+                    {'id': 2, 'host': 'host2', 'topic': 'compute',
+                     'forced_down': True},
+                    {'id': 3, 'host': 'host1', 'topic': 'scheduler',
+                     'forced_down': False},
+                    {'id': 4, 'host': 'host3', 'topic': 'compute',
+                     'forced_down': False}]
+        self.driver.get_up_services = mock.MagicMock(
+            side_effect=lambda group_id, services: services[:1])
+
+        result = self.servicegroup_api.get_up_services(services)
+
+        self.assertEqual(set([1, 3]), result)
+        self.driver.get_up_services.assert_has_calls(
+            [mock.call('compute', [services[0], services[3]]),
+             mock.call('scheduler', [services[2]])], any_order=True)
+        self.assertEqual(2, self.driver.get_up_services.call_count)
+
+    def test_get_up_services_default(self):
+        services = [{'id': 1, 'host': 'host1', 'topic': 'compute'},
+                    {'id': 2, 'host': 'host2', 'topic': 'compute'}]
+        self.driver.is_up = mock.MagicMock(side_effect=[False, True])
+        self.assertEqual(set([2]),
+                         self.servicegroup_api.get_up_services(services))
@@ -46,6 +46,18 @@ class MemcachedServiceGroupTestCase(test.NoDBTestCase):
         self.assertTrue(self.servicegroup_api.service_is_up(service_ref))
         self.mc_client.get.assert_called_once_with('compute:fake-host')
 
+    def test_get_up_services(self):
+        service_refs = [{'id': 1, 'host': 'fake-host1', 'topic': 'compute'},
+                        {'id': 2, 'host': 'fake-host2', 'topic': 'compute'}]
+        self.mc_client.get_multi.return_value = {
+            'compute:fake-host2': mock.sentinel.updated_at}
+
+        self.assertEqual(set([2]),
+                         self.servicegroup_api.get_up_services(service_refs))
+        self.mc_client.get_multi.assert_called_once_with(
+            ['compute:fake-host1', 'compute:fake-host2'])
+        self.assertFalse(self.mc_client.get.called)
+
     def test_join(self):
         service = mock.MagicMock(report_interval=1)
 
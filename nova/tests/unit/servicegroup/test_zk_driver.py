@@ -99,3 +99,14 @@ class ZKServiceGroupTestCase(test.NoDBTestCase):
         mem_mock.assert_called_once_with(self.zk_sess,
                                          '/fake-topic',
                                          'fake-host')
+
+    def test_get_up_services(self):
+        self._setup_sg_api()
+        driver = self.servicegroup_api._driver
+        service_refs = [{'id': 1, 'host': 'fake-host1', 'topic': 'compute'},
+                        {'id': 2, 'host': 'fake-host2', 'topic': 'compute'}]
+        with mock.patch.object(driver, '_get_all',
+                               return_value=['fake-host2']) as mock_get_all:
+            self.assertEqual(
+                set([2]), self.servicegroup_api.get_up_services(service_refs))
+        mock_get_all.assert_called_once_with('compute')
@@ -2219,6 +2219,17 @@ class DbQuotaDriverTestCase(test.TestCase):
             return ['resv-1', 'resv-2', 'resv-3']
         self.stubs.Set(db, 'quota_reserve', fake_quota_reserve)
 
+        def fake_quota_reserve_optimistic(context, resources, quotas,
+                                          user_quotas, deltas, expire,
+                                          until_refresh, max_age,
+                                          project_id=None, user_id=None,
+                                          max_retries=10):
+            self.calls.append(('quota_reserve_optimistic', expire,
+                               until_refresh, max_age, max_retries))
+            return ['resv-1', 'resv-2', 'resv-3']
+        self.stubs.Set(db, 'quota_reserve_optimistic',
+                       fake_quota_reserve_optimistic)
+
     def test_reserve_bad_expire(self):
         self._stub_get_project_quotas()
         self._stub_quota_reserve()
@@ -2243,6 +2254,22 @@ class DbQuotaDriverTestCase(test.TestCase):
                 ])
         self.assertEqual(result, ['resv-1', 'resv-2', 'resv-3'])
 
+    def test_reserve_optimistic(self):
+        self.flags(quota_reserve_strategy='optimistic',
+                   quota_reserve_max_retries=3)
+        self._stub_get_project_quotas()
+        self._stub_quota_reserve()
+        result = self.driver.reserve(FakeContext('test_project', 'test_class'),
+                                     quota.QUOTAS._resources,
+                                     dict(instances=2))
+
+        expire = timeutils.utcnow() + datetime.timedelta(seconds=86400)
+        self.assertEqual(self.calls, [
+                'get_project_quotas',
+                ('quota_reserve_optimistic', expire, 0, 0, 3),
+                ])
+        self.assertEqual(result, ['resv-1', 'resv-2', 'resv-3'])
+
     def test_reserve_int_expire(self):
         self._stub_get_project_quotas()
         self._stub_quota_reserve()
@@ -220,6 +220,15 @@ class GenericUtilsTestCase(test.NoDBTestCase):
         self.assertEqual(
             value, utils.get_hash_str(base_unicode))
 
+    def test_get_set_digest(self):
+        self.assertEqual(utils.get_set_digest(['a', 'b', 'c']),
+                         utils.get_set_digest(['c', 'a', 'b']))
+        self.assertNotEqual(utils.get_set_digest(['a', 'b', 'c']),
+                            utils.get_set_digest(['a', 'b']))
+        self.assertEqual('0' * 32, utils.get_set_digest([]))
+        self.assertEqual(utils.get_hash_str('a'),
+                         utils.get_set_digest(['a']))
+
     def test_use_rootwrap(self):
         self.flags(disable_rootwrap=False, group='workarounds')
         self.flags(rootwrap_config='foo')
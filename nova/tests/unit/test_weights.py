@@ -72,3 +72,99 @@ class TestWeigher(test.NoDBTestCase):
         self.assertEqual(1, len(weighed_host))
         self.assertEqual('host1', weighed_host[0].obj.host)
         self.assertFalse(mock_weigh.called)
+
+    @mock.patch('nova.weights.BaseWeigher.weigh_objects')
+    def test_only_one_host_batch(self, mock_weigh):
+        hostinfo = [fakes.FakeHostState('host1', 'node1',
+                                        {'free_ram_mb': 512})]
+
+        weight_handler = scheduler_weights.HostWeightHandler()
+        with mock.patch.object(ram.RAMWeigher,
+                               'weigh_snapshot') as mock_snapshot:
+            weighed_host = weight_handler.get_weighed_objects(
+                [ram.RAMWeigher()], hostinfo, {})
+        self.assertEqual(1, len(weighed_host))
+        self.assertFalse(mock_weigh.called)
+        self.assertFalse(mock_snapshot.called)
+
+    def _get_hostinfo(self):
+        host_values = [
+            ('host1', 'node1', {'free_ram_mb': 512}),
+            ('host2', 'node2', {'free_ram_mb': 1024}),
+            ('host3', 'node3', {'free_ram_mb': 3072}),
+            ('host4', 'node4', {'free_ram_mb': 8192}),
+        ]
+        return [fakes.FakeHostState(host, node, values)
+                for host, node, values in host_values]
+
+    def test_batch_and_per_object_weighers(self):
+        class FakeWeigher(scheduler_weights.BaseHostWeigher):
+            def _weigh_object(self, host_state, weight_properties):
+                # Favour the smallest hosts twice as much as RAMWeigher
+                return -2 * host_state.free_ram_mb
+
+        weight_handler = scheduler_weights.HostWeightHandler()
+        weighers = [ram.RAMWeigher(), FakeWeigher()]
+        weighed_hosts = weight_handler.get_weighed_objects(
+            weighers, self._get_hostinfo(), {})
+        self.assertEqual(['host1', 'host2', 'host3', 'host4'],
+                         [weighed.obj.host for weighed in weighed_hosts])
+        for weighed in weighed_hosts:
+            self.assertIsInstance(weighed, scheduler_weights.WeighedHost)
+
+    def test_batch_weigher_overridden(self):
+        class FakeWeigher(ram.RAMWeigher):
+            def _weigh_object(self, host_state, weight_properties):
+                return -host_state.free_ram_mb
+
+        self.assertTrue(ram.RAMWeigher.weigh_snapshot_applies())
+        self.assertFalse(FakeWeigher.weigh_snapshot_applies())
+        weight_handler = scheduler_weights.HostWeightHandler()
+        weighed_hosts = weight_handler.get_weighed_objects(
+            [FakeWeigher()], self._get_hostinfo(), {})
+        self.assertEqual(['host1', 'host2', 'host3', 'host4'],
+                         [weighed.obj.host for weighed in weighed_hosts])
+
+    def test_max_objects(self):
+        weight_handler = scheduler_weights.HostWeightHandler()
+        weighed_hosts = weight_handler.get_weighed_objects(
+            [ram.RAMWeigher()], self._get_hostinfo(), {}, max_objects=2)
+        self.assertEqual(['host4', 'host3'],
+                         [weighed.obj.host for weighed in weighed_hosts])
+        self.assertEqual(1.0, weighed_hosts[0].weight)
+        self.assertEqual(3072.0 / 8192, weighed_hosts[1].weight)
+
+    def test_get_weighed_object(self):
+        weight_handler = scheduler_weights.HostWeightHandler()
+        weighers = [ram.RAMWeigher()]
+        hostinfo = self._get_hostinfo()
+        weight_handler.get_weighed_objects(weighers, hostinfo, {})
+        # Once consumed, host4 is normalized against the other hosts
+        hostinfo[3].free_ram_mb = 3072
+        weighed = weight_handler.get_weighed_object(weighers, hostinfo[3], {})
+        self.assertIsInstance(weighed, scheduler_weights.WeighedHost)
+        self.assertEqual(hostinfo[3], weighed.obj)
+        self.assertEqual((3072.0 - 512) / (8192 - 512), weighed.weight)
+
+    def test_traced(self):
+        trace = mock.Mock()
+        weight_handler = scheduler_weights.HostWeightHandler()
+        weight_handler.get_weighed_objects(
+            [ram.RAMWeigher()], self._get_hostinfo(), {}, trace=trace)
+        trace.add_span.assert_called_once_with('RAMWeigher', mock.ANY)
+
+    @mock.patch.object(weights.timeutils, 'StopWatch')
+    def test_untraced(self, mock_stopwatch):
+        weight_handler = scheduler_weights.HostWeightHandler()
+        weight_handler.get_weighed_objects(
+            [ram.RAMWeigher()], self._get_hostinfo(), {})
+        self.assertFalse(mock_stopwatch.called)
+
+    def test_weigh_snapshot_min_max(self):
+        weigher = ram.RAMWeigher()
+        snapshot = scheduler_weights.HostWeightHandler().get_snapshot(
+            self._get_hostinfo())
+        self.assertEqual([512, 1024, 3072, 8192],
+                         weigher.weigh_snapshot(snapshot, {}))
+        self.assertEqual(0, weigher.minval)
+        self.assertEqual(8192, weigher.maxval)
@@ -92,6 +92,7 @@ from nova.virt.libvirt import firewall
 from nova.virt.libvirt import guest as libvirt_guest
 from nova.virt.libvirt import host
 from nova.virt.libvirt import imagebackend
+from nova.virt.libvirt import imagecache
 from nova.virt.libvirt.storage import dmcrypt
 from nova.virt.libvirt.storage import lvm
 from nova.virt.libvirt.storage import rbd_utils
@@ -12237,6 +12238,45 @@ class LibvirtConnTestCase(test.NoDBTestCase):
         self._test_get_guest_config_parallels_volume(vm_mode.EXE, 4)
         self._test_get_guest_config_parallels_volume(vm_mode.HVM, 6)
 
+    @mock.patch.object(imagebackend, 'fetch_base_image')
+    def test_precache_image(self, mock_fetch):
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+        base_dir = os.path.join(CONF.instances_path,
+                                CONF.image_cache_subdirectory_name)
+        filename = imagecache.get_cache_fname({'image_id': 'fake-image'},
+                                              'image_id')
+
+        self.assertTrue(drvr.precache_image(ctxt, 'fake-image',
+                                            max_rate=1024, max_size=4096))
+        self.assertTrue(os.path.isdir(base_dir))
+        mock_fetch.assert_called_once_with(
+            fake_libvirt_utils.fetch_image, filename,
+            os.path.join(CONF.instances_path, 'locks'),
+            target=os.path.join(base_dir, filename), context=ctxt,
+            image_id='fake-image', user_id='fake-user',
+            project_id='fake-project', max_size=4096, max_rate=1024)
+
+    @mock.patch.object(imagebackend, 'fetch_base_image')
+    def test_precache_image_cached(self, mock_fetch):
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        base_dir = os.path.join(CONF.instances_path,
+                                CONF.image_cache_subdirectory_name)
+        filename = imagecache.get_cache_fname({'image_id': 'fake-image'},
+                                              'image_id')
+        fileutils.ensure_tree(base_dir)
+        open(os.path.join(base_dir, filename), 'w').close()
+
+        self.assertFalse(drvr.precache_image(self.context, 'fake-image'))
+        self.assertFalse(mock_fetch.called)
+
+    @mock.patch.object(imagebackend, 'fetch_base_image')
+    def test_precache_image_rbd(self, mock_fetch):
+        self.flags(images_type='rbd', group='libvirt')
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        self.assertFalse(drvr.precache_image(self.context, 'fake-image'))
+        self.assertFalse(mock_fetch.called)
+
 
 class HostStateTestCase(test.NoDBTestCase):
 
@@ -12314,13 +12354,16 @@ class HostStateTestCase(test.NoDBTestCase):
         def _get_host_numa_topology(self):
             return HostStateTestCase.numa_topology
 
+    @mock.patch.object(imagecache, 'get_cached_image_ids',
+                       return_value=['image1', 'image2'])
     @mock.patch.object(fakelibvirt, "openAuth")
-    def test_update_status(self, mock_open):
+    def test_update_status(self, mock_open, mock_cached_images):
         mock_open.return_value = fakelibvirt.Connection("qemu:///system")
 
         drvr = HostStateTestCase.FakeConnection()
 
         stats = drvr.get_available_resource("compute1")
+        self.assertEqual({'cached_images': 'image1,image2'}, stats['stats'])
         self.assertEqual(stats["vcpus"], 1)
         self.assertEqual(stats["memory_mb"], 497)
         self.assertEqual(stats["local_gb"], 100)
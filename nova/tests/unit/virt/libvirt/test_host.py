@@ -21,11 +21,13 @@ from eventlet import greenthread
 import mock
 
 from nova.compute import arch
+from nova.compute import power_state
 from nova import exception
 from nova import objects
 from nova import test
 from nova.tests.unit.virt.libvirt import fakelibvirt
 from nova.virt import event
+from nova.virt import hardware
 from nova.virt.libvirt import config as vconfig
 from nova.virt.libvirt import driver as libvirt_driver
 from nova.virt.libvirt import guest as libvirt_guest
@@ -423,6 +425,53 @@ class HostTestCase(test.NoDBTestCase):
 
         fake_get_domain.assert_called_once_with("instance-0000007c")
 
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats")
+    def test_list_instance_power_states(self, mock_get_stats):
+        vm0 = FakeVirtDomain(id=0, name="Domain-0")
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+        vm2 = FakeVirtDomain(name="instance00000002")
+        mock_get_stats.return_value = [
+            (vm0, {'state.state': fakelibvirt.VIR_DOMAIN_RUNNING}),
+            (vm1, {'state.state': fakelibvirt.VIR_DOMAIN_RUNNING}),
+            (vm2, {'state.state': fakelibvirt.VIR_DOMAIN_SHUTOFF})]
+
+        states = self.host.list_instance_power_states()
+
+        mock_get_stats.assert_called_once_with(
+            fakelibvirt.VIR_DOMAIN_STATS_STATE)
+        self.assertEqual({vm1.UUIDString(): power_state.RUNNING,
+                          vm2.UUIDString(): power_state.SHUTDOWN}, states)
+
+    @mock.patch.object(host.Host, "list_instance_domains")
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats")
+    def test_list_instance_power_states_fallback(self, mock_get_stats,
+                                                 mock_list):
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+        vm2 = FakeVirtDomain(name="instance00000002")
+        mock_get_stats.side_effect = fakelibvirt.make_libvirtError(
+            fakelibvirt.libvirtError, "no stats",
+            error_code=fakelibvirt.VIR_ERR_NO_SUPPORT)
+        mock_list.return_value = [vm1, vm2]
+        infos = {vm1: hardware.InstanceInfo(state=power_state.RUNNING),
+                 vm2: exception.InstanceNotFound(instance_id='fake')}
+
+        def fake_get_info(guest, host):
+            info = infos[guest._domain]
+            if isinstance(info, Exception):
+                raise info
+            return info
+
+        with mock.patch.object(libvirt_guest.Guest, 'get_info',
+                               autospec=True, side_effect=fake_get_info):
+            states = self.host.list_instance_power_states()
+            self.assertEqual({vm1.UUIDString(): power_state.RUNNING}, states)
+            # The bulk API is not tried again
+            self.host.list_instance_power_states()
+
+        mock_get_stats.assert_called_once_with(
+            fakelibvirt.VIR_DOMAIN_STATS_STATE)
+        mock_list.assert_called_with(only_running=False)
+
     @mock.patch.object(fakelibvirt.Connection, "listAllDomains")
     def test_list_instance_domains_fast(self, mock_list_all):
         vm1 = FakeVirtDomain(id=3, name="instance00000001")
@@ -19,6 +19,7 @@ import os
 import shutil
 import tempfile
 
+import eventlet
 import fixtures
 import mock
 from oslo_concurrency import lockutils
@@ -1511,6 +1512,65 @@ class PloopTestCase(_ImageTestCase, test.NoDBTestCase):
         image.cache(fake_fetch, self.TEMPLATE_PATH, self.SIZE)
 
 
+class FetchManagerTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(FetchManagerTestCase, self).setUp()
+        self.manager = imagebackend.FetchManager()
+        self.fetched = eventlet.event.Event()
+        self.calls = []
+
+    def _fetch(self, result):
+        self.calls.append(result)
+        if len(self.calls) == 1:
+            # Let the other callers wait for the first fetch
+            error = self.fetched.wait()
+            if error:
+                raise error
+        return result
+
+    def _spawn_fetches(self, scopes):
+        threads = [eventlet.spawn(self.manager.fetch, 'base', scope,
+                                  self._fetch, index)
+                   for index, scope in enumerate(scopes)]
+        eventlet.sleep(0)
+        return threads
+
+    def test_fetch_coalesced(self):
+        threads = self._spawn_fetches(['a', 'a', 'b'])
+        self.fetched.send(None)
+
+        self.assertEqual([0, 0, 0], [thread.wait() for thread in threads])
+        self.assertEqual([0], self.calls)
+        stats = self.manager.get_stats()
+        self.assertEqual(1, stats['fetches'])
+        self.assertEqual(2, stats['coalesced'])
+
+    def test_fetch_error(self):
+        threads = self._spawn_fetches(['a', 'a', 'b'])
+        self.fetched.send(exception.ImageNotFound(image_id='fake'))
+
+        for thread in threads[:2]:
+            self.assertRaises(exception.ImageNotFound, thread.wait)
+        # The error isn't raised to the callers of another scope, which
+        # fetch the image themselves
+        self.assertEqual(2, threads[2].wait())
+        self.assertEqual([0, 2], self.calls)
+
+    def test_fetch_after_fetch(self):
+        self.fetched.send(None)
+        self.assertEqual(0, self.manager.fetch('base', 'a', self._fetch, 0))
+        self.assertEqual(1, self.manager.fetch('base', 'a', self._fetch, 1))
+        self.assertEqual(0, self.manager.get_stats()['coalesced'])
+
+    def test_record_lock(self):
+        self.manager.record_lock('base', 1.5, 2.0)
+        self.manager.record_lock('base', 0.5, 1.0)
+        stats = self.manager.get_stats()
+        self.assertEqual(2.0, stats['lock_wait_time'])
+        self.assertEqual(3.0, stats['lock_hold_time'])
+
+
 class BackendTestCase(test.NoDBTestCase):
     INSTANCE = objects.Instance(id=1, uuid=uuidutils.generate_uuid())
     NAME = 'fake-name.suffix'
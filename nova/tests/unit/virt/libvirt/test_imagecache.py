@@ -105,6 +105,44 @@ class ImageCacheManagerTestCase(test.NoDBTestCase):
             self.assertEqual(csum_input.rstrip(),
                              '{"sha1": "%s"}' % csum_output)
 
+    @mock.patch.object(imagecache, '_hash_file')
+    def test_write_stored_checksum_precomputed(self, mock_hash):
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            self.flags(image_info_filename_pattern=('$instances_path/'
+                                                    '%(image)s.info'),
+                       group='libvirt')
+
+            fname = os.path.join(tmpdir, 'aaa')
+            imagecache.write_stored_checksum(fname, checksum='fake-sha1')
+
+            self.assertFalse(mock_hash.called)
+            self.assertEqual('fake-sha1',
+                             imagecache.read_stored_checksum(
+                                 fname, timestamped=False))
+
+    def test_get_cached_image_ids(self):
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            self.flags(image_info_filename_pattern=('$instances_path/'
+                                                    '%(image)s.info'),
+                       group='libvirt')
+            self.assertEqual([], imagecache.get_cached_image_ids())
+
+            base_dir = os.path.join(tmpdir, CONF.image_cache_subdirectory_name)
+            os.mkdir(base_dir)
+            for image_id in ('image2', 'image1', 'image3'):
+                fname = os.path.join(base_dir, imagecache.get_cache_fname(
+                    {'image_id': image_id}, 'image_id'))
+                open(fname, 'w').close()
+                if image_id != 'image3':
+                    imagecache.write_stored_info(fname, field='image_id',
+                                                 value=image_id)
+            open(os.path.join(base_dir, 'ephemeral_0_40d1d2c'), 'w').close()
+
+            self.assertEqual(['image1', 'image2'],
+                             imagecache.get_cached_image_ids())
+
     def test_read_stored_checksum_legacy_essex(self):
         with utils.tempdir() as tmpdir:
             self.flags(instances_path=tmpdir)
@@ -183,6 +221,43 @@ class ImageCacheManagerTestCase(test.NoDBTestCase):
         self.assertEqual(1, len(image_cache_manager.back_swap_images))
         self.assertIn('swap_1000', image_cache_manager.back_swap_images)
 
+    def test_list_base_images_partial_downloads(self):
+        partial = ['17d1b00b81642842e514494a78e804e9a511637c.part',
+                   '17d1b00b81642842e514494a78e804e9a511637c.part.ranges']
+        listing = ['17d1b00b81642842e514494a78e804e9a511637c'] + partial
+
+        self.stubs.Set(os, 'listdir', lambda x: listing)
+        self.stubs.Set(os.path, 'isfile', lambda x: True)
+
+        base_dir = '/var/lib/nova/instances/_base'
+        image_cache_manager = imagecache.ImageCacheManager()
+        image_cache_manager._list_base_images(base_dir)
+
+        self.assertEqual([os.path.join(base_dir, ent) for ent in partial],
+                         image_cache_manager.partial_downloads)
+        self.assertEqual([os.path.join(base_dir, listing[0])],
+                         image_cache_manager.unexplained_images)
+
+    def test_remove_partial_downloads(self):
+        with utils.tempdir() as tmpdir:
+            fnames = []
+            for ent in ('aaa.part', 'aaa.part.ranges', 'bbb.part'):
+                fname = os.path.join(tmpdir, ent)
+                with open(fname, 'w') as f:
+                    f.write('data')
+                fnames.append(fname)
+            # The download of bbb is still in progress
+            for fname in fnames[:2]:
+                os.utime(fname, (-1, time.time() - 86401))
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.partial_downloads = fnames
+            image_cache_manager._remove_partial_downloads()
+
+            self.assertFalse(os.path.exists(fnames[0]))
+            self.assertFalse(os.path.exists(fnames[1]))
+            self.assertTrue(os.path.exists(fnames[2]))
+
     def test_list_backing_images_small(self):
         self.stubs.Set(os, 'listdir',
                        lambda x: ['_base', 'instance-00000001',
@@ -715,7 +790,17 @@ class ImageCacheManagerTestCase(test.NoDBTestCase):
         self.mox.ReplayAll()
         # And finally we can make the call we're actually testing...
         # The argument here should be a context, but it is mocked out
-        image_cache_manager.update(ctxt, all_instances)
+        with mock.patch.object(imagecache,
+                               'write_stored_info') as mock_write_info:
+            image_cache_manager.update(ctxt, all_instances)
+
+        # The image IDs of the base images in use are recorded
+        mock_write_info.assert_has_calls(
+            [mock.call(fq_path(hashed_1), field='image_id', value='1'),
+             mock.call(fq_path(hashed_21), field='image_id', value='21'),
+             mock.call(fq_path(hashed_22), field='image_id', value='22')],
+            any_order=True)
+        self.assertEqual(3, mock_write_info.call_count)
 
         # Verify
         active = [fq_path(hashed_1), fq_path('%s_5368709120' % hashed_1),
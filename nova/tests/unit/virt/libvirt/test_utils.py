@@ -563,7 +563,28 @@ disk size: 4.4M
                                   user_id, project_id)
         mock_images.assert_called_once_with(
             context, image_id, target, user_id, project_id,
-            max_size=0)
+            max_size=0, max_rate=None)
+
+    @mock.patch('nova.virt.libvirt.imagecache.write_stored_info')
+    @mock.patch('nova.virt.libvirt.imagecache.write_stored_checksum')
+    @mock.patch('nova.virt.images.fetch_to_raw', return_value='fake-sha1')
+    def test_fetch_image_stores_checksum(self, mock_images, mock_write,
+                                         mock_write_info):
+        self.flags(instances_path='/instances')
+        self.flags(checksum_base_images=True, group='libvirt')
+        libvirt_utils.fetch_image('opaque context', '/instances/_base/aaa',
+                                  '4', 'fake', 'fake')
+        mock_write.assert_called_once_with('/instances/_base/aaa',
+                                           checksum='fake-sha1')
+        mock_write_info.assert_called_once_with('/instances/_base/aaa',
+                                                field='image_id', value='4')
+
+        mock_write.reset_mock()
+        mock_write_info.reset_mock()
+        libvirt_utils.fetch_image('opaque context', '/instances/uuid/kernel',
+                                  '4', 'fake', 'fake')
+        self.assertFalse(mock_write.called)
+        self.assertFalse(mock_write_info.called)
 
     def test_fetch_raw_image(self):
 
@@ -641,6 +662,14 @@ disk size: 4.4M
         images.fetch_to_raw(context, image_id, target, user_id, project_id)
         self.assertEqual(self.executes, expected_commands)
 
+        self.stubs.Set(images, 'fetch', lambda *_, **__: 'fake-sha1')
+        self.assertEqual('fake-sha1',
+                         images.fetch_to_raw(context, image_id, target,
+                                             user_id, project_id))
+        self.assertIsNone(images.fetch_to_raw(context, image_id, 't.qcow2',
+                                              user_id, project_id))
+        self.stubs.Set(images, 'fetch', lambda *_, **__: None)
+
         target = 'backing.qcow2'
         self.executes = []
         expected_commands = [('rm', '-f', 'backing.qcow2.part')]
@@ -1409,6 +1409,8 @@ class VirtNUMATopologyCellUsageTestCase(test.NoDBTestCase):
 class VirtNUMAHostTopologyTestCase(test.NoDBTestCase):
     def setUp(self):
         super(VirtNUMAHostTopologyTestCase, self).setUp()
+        hw._numa_fit_cache.clear()
+        self.addCleanup(hw._numa_fit_cache.clear)
 
         self.host = objects.NUMATopology(
                 cells=[
@@ -1508,6 +1510,85 @@ class VirtNUMAHostTopologyTestCase(test.NoDBTestCase):
                                                         pci_stats=pci_stats)
             self.assertIsNone(fitted_instance1)
 
+    def test_get_fitting_cached(self):
+        fitted_instance1 = hw.numa_fit_instance_to_host(
+                self.host, self.instance3, self.limits)
+        with mock.patch.object(hw, '_numa_fit_host_cell_permutations',
+                               return_value=[]) as mock_perms:
+            fitted_instance2 = hw.numa_fit_instance_to_host(
+                    self.host.obj_clone(), self.instance3, self.limits)
+        self.assertFalse(mock_perms.called)
+        self.assertEqual(fitted_instance1.cells[0].id,
+                         fitted_instance2.cells[0].id)
+        self.assertIsNot(fitted_instance1, fitted_instance2)
+
+    def test_get_fitting_cached_failure(self):
+        self.assertIsNone(hw.numa_fit_instance_to_host(
+                self.host, self.instance2, self.limits))
+        with mock.patch.object(hw, '_numa_fit_host_cell_permutations',
+                               return_value=[]) as mock_perms:
+            self.assertIsNone(hw.numa_fit_instance_to_host(
+                    self.host, self.instance2, self.limits))
+        self.assertFalse(mock_perms.called)
+
+    def test_get_fitting_cache_usage_changed(self):
+        hw.numa_fit_instance_to_host(self.host, self.instance3, self.limits)
+        self.host.cells[0].cpu_usage = 4
+        fitted_instance = hw.numa_fit_instance_to_host(
+                self.host, self.instance3, self.limits)
+        self.assertEqual(2, fitted_instance.cells[0].id)
+
+    def test_get_fitting_cache_disabled(self):
+        self.flags(numa_fit_cache_size=0)
+        hw.numa_fit_instance_to_host(self.host, self.instance3, self.limits)
+        with mock.patch.object(hw, '_numa_fit_host_cell_permutations',
+                               return_value=[]) as mock_perms:
+            self.assertIsNone(hw.numa_fit_instance_to_host(
+                    self.host, self.instance3, self.limits))
+        self.assertTrue(mock_perms.called)
+
+    def test_get_fitting_cache_eviction(self):
+        self.flags(numa_fit_cache_size=1)
+        hw.numa_fit_instance_to_host(self.host, self.instance3, self.limits)
+        hw.numa_fit_instance_to_host(self.host, self.instance2, self.limits)
+        with mock.patch.object(hw, '_numa_fit_host_cell_permutations',
+                               return_value=[]) as mock_perms:
+            self.assertIsNone(hw.numa_fit_instance_to_host(
+                    self.host, self.instance3, self.limits))
+        self.assertTrue(mock_perms.called)
+
+    def test_get_fitting_pci_not_cached(self):
+        pci_reqs = [objects.InstancePCIRequest(count=1,
+            spec=[{'vendor_id': '8086'}])]
+        pci_stats = stats.PciDeviceStats()
+        with mock.patch.object(stats.PciDeviceStats,
+                'support_requests', side_effect=[True, False, False]):
+            self.assertIsNotNone(hw.numa_fit_instance_to_host(
+                    self.host, self.instance1, pci_requests=pci_reqs,
+                    pci_stats=pci_stats))
+            self.assertIsNone(hw.numa_fit_instance_to_host(
+                    self.host, self.instance1, pci_requests=pci_reqs,
+                    pci_stats=pci_stats))
+
+    def test_host_cell_permutations_pruned(self):
+        host = objects.NUMATopology(cells=[
+            objects.NUMACell(id=i, cpuset=set([2 * i, 2 * i + 1]),
+                             memory=2048 if i % 2 else 512, cpu_usage=0,
+                             memory_usage=0, mempages=[], siblings=[],
+                             pinned_cpus=set([]))
+            for i in range(4)])
+        instance = objects.InstanceNUMATopology(cells=[
+            objects.InstanceNUMACell(id=i, cpuset=set([i]), memory=1024)
+            for i in range(2)])
+        with mock.patch.object(hw, '_numa_fit_instance_cell',
+                               wraps=hw._numa_fit_instance_cell) as mock_fit:
+            perms = list(hw._numa_fit_host_cell_permutations(
+                host, instance, None))
+        # Each pair of cells is only evaluated once
+        self.assertEqual(8, mock_fit.call_count)
+        self.assertEqual([(1, 3), (3, 1)],
+                         [tuple(cell.id for cell in perm) for perm in perms])
+
 
 class NumberOfSerialPortsTest(test.NoDBTestCase):
     def test_flavor(self):
@@ -43,3 +43,44 @@ class QemuTestCase(test.NoDBTestCase):
         image_info = images.qemu_img_info('/fake/path')
         self.assertTrue(image_info)
         self.assertTrue(str(image_info))
+
+    @mock.patch.object(images.IMAGE_API, 'download',
+                       side_effect=exception.GlanceConnectionFailed(
+                           host='host', port=9292, reason='reason'))
+    def test_fetch_keeps_resumable_download(self, mock_download):
+        with utils.tempdir() as tmpdir:
+            path = os.path.join(tmpdir, 'image.part')
+            open(path, 'w').close()
+            open(path + '.ranges', 'w').close()
+            self.assertRaises(exception.GlanceConnectionFailed,
+                              images.fetch, None, 'fake-image', path,
+                              'fake', 'fake')
+            self.assertTrue(os.path.exists(path))
+
+            os.unlink(path + '.ranges')
+            self.assertRaises(exception.GlanceConnectionFailed,
+                              images.fetch, None, 'fake-image', path,
+                              'fake', 'fake')
+            self.assertFalse(os.path.exists(path))
+        mock_download.assert_called_with(None, 'fake-image', dest_path=path,
+                                         verify_checksum=True)
+
+    @mock.patch('time.sleep')
+    @mock.patch('time.time', return_value=100)
+    @mock.patch.object(images.IMAGE_API, 'download')
+    def test_fetch_rate_limited(self, mock_download, mock_time, mock_sleep):
+        def fake_download(context, image_href, data=None,
+                          verify_checksum=False):
+            data.write(b'a' * 512)
+            data.write(b'a' * 512)
+            return 'fake-sha1'
+
+        mock_download.side_effect = fake_download
+        with utils.tempdir() as tmpdir:
+            path = os.path.join(tmpdir, 'image.part')
+            self.assertEqual('fake-sha1',
+                             images.fetch(None, 'fake-image', path, 'fake',
+                                          'fake', max_rate=1024))
+            with open(path, 'rb') as f:
+                self.assertEqual(1024, len(f.read()))
+        mock_sleep.assert_has_calls([mock.call(0.5), mock.call(1.0)])
@@ -1369,6 +1369,20 @@ def get_hash_str(base_str):
         base_str = base_str.encode('utf-8')
     return hashlib.md5(base_str).hexdigest()
 
+
+def get_set_digest(items):
+    """Returns a digest of a set of strings, which doesn't depend on their
+    order.
+
+    It is the XOR of the MD5 hashes of the strings, so that two services can
+    check that they agree on a large set, such as the UUIDs of the instances
+    of a host, without sending all of it.
+    """
+    digest = 0
+    for item in items:
+        digest ^= int(get_hash_str(item), 16)
+    return '%032x' % digest
+
 if hasattr(hmac, 'compare_digest'):
     constant_time_compare = hmac.compare_digest
 else:
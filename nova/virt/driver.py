@@ -196,6 +196,19 @@ class ComputeDriver(object):
         # TODO(Vek): Need to pass context in for access to auth_token
         raise NotImplementedError()
 
+    def get_power_states(self):
+        """Return the power states of all the instances known to the
+        virtualization layer, as a dict of nova.compute.power_state values
+        keyed by instance uuid.
+
+        .. note::
+
+            Drivers which can't query the power states of all their
+            instances in bulk don't implement this method, the power state
+            of each instance is then retrieved with get_info().
+        """
+        raise NotImplementedError()
+
     def get_num_instances(self):
         """Return the total number of virtual machines.
 
@@ -1341,6 +1354,20 @@ class ComputeDriver(object):
         """
         pass
 
+    def precache_image(self, context, image_id, max_rate=None, max_size=0):
+        """Fetch an image into the driver's local image cache, ahead of the
+        instances which will be created from it.
+
+        :param context: security context
+        :param image_id: ID of the image to fetch
+        :param max_rate: maximum download rate in bytes per second, or None
+        :param max_size: maximum virtual size of the image in bytes, or 0,
+                         FlavorDiskSmallerThanImage is raised if it is larger
+        :returns: True if the image was fetched, False if it was already
+                  cached or the driver doesn't cache it
+        """
+        raise NotImplementedError()
+
     def add_to_aggregate(self, context, aggregate, host, **kwargs):
         """Add a compute host to an aggregate.
 
@@ -32,6 +32,12 @@ virt_cpu_opts = [
     cfg.StrOpt('vcpu_pin_set',
                 help='Defines which pcpus that instance vcpus can use. '
                'For example, "4-12,^8,15"'),
+    cfg.IntOpt('numa_fit_cache_size',
+               default=1000,
+               help='Number of results of fitting an instance NUMA topology '
+                    'onto a host NUMA topology which are remembered, so that '
+                    'hosts with the same topology and usage are only '
+                    'evaluated once. Set to 0 to disable the cache.'),
 ]
 
 CONF = cfg.CONF
@@ -1066,6 +1072,125 @@ def numa_get_constraints(flavor, image_meta):
     return _add_cpu_pinning_constraint(flavor, image_meta, numa_topology)
 
 
+class _NUMAFitCache(object):
+    """Least recently used cache of NUMA fitting results.
+
+    The results are keyed by a fingerprint of the host cells, the instance
+    cells and the limits, which captures everything the fitting of each
+    instance cell depends on. Only the ids of the host cells the instance
+    cells were fitted on are stored (or None if the instance does not fit),
+    so that cached results never share objects between callers.
+    """
+
+    def __init__(self):
+        self._results = collections.OrderedDict()
+
+    def get(self, key):
+        # Moving the key to the end keeps the least recently used keys first
+        result = self._results.pop(key)
+        self._results[key] = result
+        return result
+
+    def set(self, key, result):
+        size = CONF.numa_fit_cache_size
+        if size <= 0:
+            return
+        self._results.pop(key, None)
+        self._results[key] = result
+        while len(self._results) > size:
+            self._results.popitem(last=False)
+
+    def clear(self):
+        self._results.clear()
+
+
+_numa_fit_cache = _NUMAFitCache()
+
+
+def _obj_fingerprint(obj, names):
+    values = []
+    for name in names:
+        value = getattr(obj, name) if obj.obj_attr_is_set(name) else None
+        if isinstance(value, (set, frozenset)):
+            value = tuple(sorted(value))
+        elif isinstance(value, list):
+            value = tuple(tuple(sorted(v)) if isinstance(v, set) else v
+                          for v in value)
+        values.append(value)
+    return tuple(values)
+
+
+def _numa_fit_fingerprint(host_topology, instance_topology, limits):
+    """Return a hashable fingerprint of the inputs of a NUMA fitting."""
+    host_cells = tuple(
+        _obj_fingerprint(cell, ('id', 'cpuset', 'memory', 'cpu_usage',
+                                'memory_usage', 'pinned_cpus', 'siblings')) +
+        (tuple(_obj_fingerprint(pages, ('size_kb', 'total', 'used'))
+               for pages in cell.mempages)
+         if cell.obj_attr_is_set('mempages') else None,)
+        for cell in host_topology.cells)
+    instance_cells = tuple(
+        _obj_fingerprint(cell, ('cpuset', 'memory', 'pagesize')) +
+        (cell.cpu_pinning_requested,
+         _obj_fingerprint(cell.cpu_topology,
+                          ('sockets', 'cores', 'threads'))
+         if cell.obj_attr_is_set('cpu_topology') and cell.cpu_topology
+         else None)
+        for cell in instance_topology.cells)
+    limit = (_obj_fingerprint(limits, ('cpu_allocation_ratio',
+                                       'ram_allocation_ratio'))
+             if limits else None)
+    return host_cells, instance_cells, limit
+
+
+def _numa_fit_host_cell_permutations(host_topology, instance_topology,
+                                     limits):
+    """Yield the permutations of host cells the instance cells fit on.
+
+    The permutations are yielded in the same order as
+    itertools.permutations(), but since each instance cell fits onto a host
+    cell independently of the other instance cells, each (host cell,
+    instance cell) pair is only evaluated once, on a copy of the instance
+    cell, and the permutations including a pair which does not fit are
+    pruned instead of being walked through.
+    """
+    host_cells = host_topology.cells
+    fits = [[_numa_fit_instance_cell(host_cell, instance_cell.obj_clone(),
+                                     limits) is not None
+             for host_cell in host_cells]
+            for instance_cell in instance_topology.cells]
+
+    num_cells = len(instance_topology.cells)
+    used = [False] * len(host_cells)
+    perm = []
+
+    def _walk(index):
+        if index == num_cells:
+            yield tuple(perm)
+            return
+        for host_index, fit in enumerate(fits[index]):
+            if fit and not used[host_index]:
+                used[host_index] = True
+                perm.append(host_cells[host_index])
+                for found in _walk(index + 1):
+                    yield found
+                perm.pop()
+                used[host_index] = False
+
+    return _walk(0)
+
+
+def _numa_fit_instance_cells(host_cell_perm, instance_topology, limits):
+    cells = []
+    for host_cell, instance_cell in zip(
+            host_cell_perm, instance_topology.cells):
+        got_cell = _numa_fit_instance_cell(host_cell, instance_cell, limits)
+        if got_cell is None:
+            return None
+        cells.append(got_cell)
+    return cells
+
+
 def numa_fit_instance_to_host(
         host_topology, instance_topology, limits=None,
         pci_requests=None, pci_stats=None):
@@ -1082,30 +1207,50 @@ def numa_fit_instance_to_host(
     by calling the _numa_fit_instance_cell method, and return a new
     InstanceNUMATopology with it's cell ids set to host cell id's of
     the first successful permutation, or None.
+
+    Unless PCI devices are requested, the ids of the host cells of the
+    chosen permutation are cached, so that fitting the same instance onto
+    hosts with the same topology and usage does not search again.
     """
     if (not (host_topology and instance_topology) or
         len(host_topology) < len(instance_topology)):
         return
-    else:
-        # TODO(ndipanov): We may want to sort permutations differently
-        # depending on whether we want packing/spreading over NUMA nodes
-        for host_cell_perm in itertools.permutations(
-                host_topology.cells, len(instance_topology)):
-            cells = []
-            for host_cell, instance_cell in zip(
-                    host_cell_perm, instance_topology.cells):
-                got_cell = _numa_fit_instance_cell(
-                    host_cell, instance_cell, limits)
-                if got_cell is None:
-                    break
-                cells.append(got_cell)
-            if len(cells) == len(host_cell_perm):
-                if not pci_requests:
-                    return objects.InstanceNUMATopology(cells=cells)
-                elif ((pci_stats is not None) and
-                    pci_stats.support_requests(pci_requests,
-                                                     cells)):
-                    return objects.InstanceNUMATopology(cells=cells)
+
+    key = None
+    if not pci_requests:
+        key = _numa_fit_fingerprint(host_topology, instance_topology, limits)
+        try:
+            cell_ids = _numa_fit_cache.get(key)
+        except KeyError:
+            pass
+        else:
+            if cell_ids is None:
+                return
+            host_cells = {cell.id: cell for cell in host_topology.cells}
+            cells = _numa_fit_instance_cells(
+                [host_cells[cell_id] for cell_id in cell_ids],
+                instance_topology, limits)
+            if cells is not None:
+                return objects.InstanceNUMATopology(cells=cells)
+
+    # TODO(ndipanov): We may want to sort permutations differently
+    # depending on whether we want packing/spreading over NUMA nodes
+    for host_cell_perm in _numa_fit_host_cell_permutations(
+            host_topology, instance_topology, limits):
+        cells = _numa_fit_instance_cells(host_cell_perm, instance_topology,
+                                         limits)
+        if cells is None:
+            continue
+        if not pci_requests:
+            _numa_fit_cache.set(key, tuple(cell.id for cell in host_cell_perm))
+            return objects.InstanceNUMATopology(cells=cells)
+        elif ((pci_stats is not None) and
+            pci_stats.support_requests(pci_requests,
+                                             cells)):
+            return objects.InstanceNUMATopology(cells=cells)
+
+    if key is not None:
+        _numa_fit_cache.set(key, None)
 
 
 def _numa_pagesize_usage_from_cell(hostcell, instancecell, sign):
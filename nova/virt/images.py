@@ -20,6 +20,7 @@ Handling of VM disk images.
 """
 
 import os
+import time
 
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -28,6 +29,7 @@ from oslo_utils import fileutils
 from nova import exception
 from nova.i18n import _, _LE
 from nova import image
+from nova.image import glance
 from nova.openstack.common import imageutils
 from nova import utils
 
@@ -72,19 +74,68 @@ def convert_image(source, dest, out_format, run_as_root=False):
     utils.execute(*cmd, run_as_root=run_as_root)
 
 
-def fetch(context, image_href, path, _user_id, _project_id, max_size=0):
-    with fileutils.remove_path_on_error(path):
-        IMAGE_API.download(context, image_href, dest_path=path)
+class _RateLimitedFile(object):
+    """Writes to a file at no more than max_rate bytes per second."""
+
+    def __init__(self, f, max_rate):
+        self._file = f
+        self._max_rate = float(max_rate)
+        self._started = None
+        self._written = 0
+
+    def write(self, data):
+        if self._started is None:
+            self._started = time.time()
+        self._file.write(data)
+        self._written += len(data)
+        delay = self._started + self._written / self._max_rate - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def fetch(context, image_href, path, _user_id, _project_id, max_size=0,
+          max_rate=None):
+    """Download an image, verifying its checksum while it is written.
+
+    If max_rate is set, the image is downloaded at no more than max_rate
+    bytes per second.
+
+    Returns the SHA-1 hex digest of the downloaded file, or None if it
+    wasn't computed during the download.
+    """
+    with fileutils.remove_path_on_error(path, remove=_remove_download):
+        if not max_rate:
+            return IMAGE_API.download(context, image_href, dest_path=path,
+                                      verify_checksum=True)
+        # The ranges recorded for a previous download don't apply to the
+        # file once it is rewritten
+        fileutils.delete_if_exists(glance.get_download_state_path(path))
+        with open(path, 'wb') as f:
+            return IMAGE_API.download(context, image_href,
+                                      data=_RateLimitedFile(f, max_rate),
+                                      verify_checksum=True)
+
+
+def _remove_download(path):
+    # A download made in byte ranges is kept to be resumed when it is retried
+    if not os.path.exists(glance.get_download_state_path(path)):
+        fileutils.delete_if_exists(path)
 
 
 def get_info(context, image_href):
     return IMAGE_API.get(context, image_href)
 
 
-def fetch_to_raw(context, image_href, path, user_id, project_id, max_size=0):
+def fetch_to_raw(context, image_href, path, user_id, project_id, max_size=0,
+                 max_rate=None):
+    """Download an image to path, converting it to raw if needed.
+
+    Returns the SHA-1 hex digest of the file at path if it was computed
+    while the image was downloaded, or None otherwise.
+    """
     path_tmp = "%s.part" % path
-    fetch(context, image_href, path_tmp, user_id, project_id,
-          max_size=max_size)
+    checksum = fetch(context, image_href, path_tmp, user_id, project_id,
+                     max_size=max_size, max_rate=max_rate)
 
     with fileutils.remove_path_on_error(path_tmp):
         data = qemu_img_info(path_tmp)
@@ -133,5 +184,9 @@ def fetch_to_raw(context, image_href, path, user_id, project_id, max_size=0):
                         data.file_format)
 
                 os.rename(staged, path)
+            # The converted file isn't the downloaded one
+            checksum = None
         else:
             os.rename(path_tmp, path)
+
+    return checksum
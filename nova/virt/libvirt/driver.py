@@ -278,6 +278,7 @@ CONF.register_opts(libvirt_opts, 'libvirt')
 CONF.import_opt('host', 'nova.netconf')
 CONF.import_opt('my_ip', 'nova.netconf')
 CONF.import_opt('use_cow_images', 'nova.virt.driver')
+CONF.import_opt('image_cache_subdirectory_name', 'nova.virt.imagecache')
 CONF.import_opt('enabled', 'nova.compute.api',
                 group='ephemeral_storage_encryption')
 CONF.import_opt('cipher', 'nova.compute.api',
@@ -660,6 +661,9 @@ class LibvirtDriver(driver.ComputeDriver):
 
         return uuids
 
+    def get_power_states(self):
+        return self._host.list_instance_power_states()
+
     def plug_vifs(self, instance, network_info):
         """Plug VIFs into networks."""
         for vif in network_info:
@@ -5036,6 +5040,9 @@ class LibvirtDriver(driver.ComputeDriver):
         else:
             data['numa_topology'] = None
 
+        data['stats'] = {
+            'cached_images': ','.join(imagecache.get_cached_image_ids())}
+
         return data
 
     def check_instance_shared_storage_local(self, context, instance):
@@ -6598,6 +6605,29 @@ class LibvirtDriver(driver.ComputeDriver):
         """Manage the local cache of images."""
         self.image_cache_manager.update(context, all_instances)
 
+    def precache_image(self, context, image_id, max_rate=None, max_size=0):
+        """Fetch an image into the local cache of images."""
+        # RBD images are cloned from glance rather than cached locally
+        if CONF.libvirt.images_type == 'rbd':
+            return False
+
+        filename = imagecache.get_cache_fname({'image_id': image_id},
+                                              'image_id')
+        base_dir = os.path.join(CONF.instances_path,
+                                CONF.image_cache_subdirectory_name)
+        base = os.path.join(base_dir, filename)
+        if os.path.exists(base):
+            return False
+
+        fileutils.ensure_tree(base_dir)
+        imagebackend.fetch_base_image(
+            libvirt_utils.fetch_image, filename,
+            os.path.join(CONF.instances_path, 'locks'), target=base,
+            context=context, image_id=image_id, user_id=context.user_id,
+            project_id=context.project_id, max_size=max_size,
+            max_rate=max_rate)
+        return True
+
     def _cleanup_remote_migration(self, dest, inst_base, inst_base_resize,
                                   shared_storage=False):
         """Used only for cleanup in case migrate_disk_and_power_off fails."""
@@ -205,6 +205,7 @@ class Host(object):
         self._conn_event_handler = conn_event_handler
         self._lifecycle_event_handler = lifecycle_event_handler
         self._skip_list_all_domains = False
+        self._skip_domain_stats = False
         self._caps = None
         self._hostname = None
 
@@ -730,6 +731,40 @@ class Host(object):
 
         return doms
 
+    def list_instance_power_states(self):
+        """Get the power states of the nova instances
+
+        Query libvirt for the state of all the domains of nova instances,
+        with a single call to the bulk domain stats API if available.
+        Otherwise the domains are listed and the state of each of them is
+        queried.
+
+        :returns: dict of nova.compute.power_state values keyed by instance
+                  uuid
+        """
+        if not self._skip_domain_stats:
+            try:
+                records = self.get_connection().getAllDomainStats(
+                    libvirt.VIR_DOMAIN_STATS_STATE)
+                return {dom.UUIDString():
+                        libvirt_guest.LIBVIRT_POWER_STATE[stats['state.state']]
+                        for dom, stats in records if dom.ID() != 0}
+            except (libvirt.libvirtError, AttributeError) as ex:
+                LOG.info(_LI("Unable to use bulk domain stats API, "
+                             "falling back to slow code path: %(ex)s"),
+                         {'ex': ex})
+                self._skip_domain_stats = True
+
+        states = {}
+        for dom in self.list_instance_domains(only_running=False):
+            try:
+                info = libvirt_guest.Guest(dom).get_info(self)
+            except exception.InstanceNotFound:
+                # the domain went away since it was listed
+                continue
+            states[dom.UUIDString()] = info.state
+        return states
+
     def get_online_cpus(self):
         """Get the set of CPUs that are online on the host
 
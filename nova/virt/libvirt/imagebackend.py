@@ -19,7 +19,10 @@ import contextlib
 import functools
 import os
 import shutil
+import sys
+import time
 
+import eventlet.event
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
@@ -68,6 +71,13 @@ __imagebackend_opts = [
                help='Discard option for nova managed disks. Need'
                     ' Libvirt(1.0.6) Qemu1.5 (raw format) Qemu1.6(qcow2'
                     ' format)'),
+    cfg.BoolOpt('coalesce_image_fetches',
+                default=True,
+                help='Whether the concurrent fetches of the same base image '
+                     'by a compute service wait for the fetch in progress '
+                     'and get its result, instead of queuing on the lock of '
+                     'the base image. The instance disks are then created '
+                     'from the base image as soon as it is fetched.'),
         ]
 
 CONF = cfg.CONF
@@ -88,6 +98,115 @@ LOG = logging.getLogger(__name__)
 IMAGE_API = image.API()
 
 
+class _Fetch(object):
+    def __init__(self, scope):
+        self.scope = scope
+        self.event = eventlet.event.Event()
+        self.waiters = 0
+
+
+class FetchManager(object):
+    """Coalesces the concurrent fetches of the same base image by the
+    compute service.
+
+    The first caller fetching a base image makes the fetch, while the
+    callers fetching it meanwhile wait for it and get its result. Its error
+    is only raised to the callers of the same scope, the other callers
+    retry the fetch themselves, as the error may not apply to them.
+    """
+
+    def __init__(self):
+        # Fetches in progress, keyed by base image path
+        self._fetches = {}
+        self._stats = {'fetches': 0, 'coalesced': 0,
+                       'lock_wait_time': 0.0, 'lock_hold_time': 0.0}
+
+    def fetch(self, key, scope, func, *args, **kwargs):
+        """Calls func unless a fetch of key is in progress, in which case
+        its result is returned instead.
+        """
+        while key in self._fetches:
+            in_progress = self._fetches[key]
+            in_progress.waiters += 1
+            self._stats['coalesced'] += 1
+            began = time.time()
+            try:
+                return in_progress.event.wait()
+            except Exception:
+                if in_progress.scope == scope:
+                    raise
+            finally:
+                LOG.debug('Waited %(waited).3fs for the fetch of %(key)s',
+                          {'waited': time.time() - began, 'key': key})
+
+        in_progress = _Fetch(scope)
+        self._fetches[key] = in_progress
+        self._stats['fetches'] += 1
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            exc_info = sys.exc_info()
+            del self._fetches[key]
+            if in_progress.waiters:
+                in_progress.event.send_exception(*exc_info)
+            six.reraise(*exc_info)
+        del self._fetches[key]
+        in_progress.event.send(result)
+        return result
+
+    def record_lock(self, key, wait_time, hold_time):
+        """Records the time spent waiting for and holding the lock of a
+        base image.
+        """
+        self._stats['lock_wait_time'] += wait_time
+        self._stats['lock_hold_time'] += hold_time
+        LOG.debug('Lock of %(key)s acquired after %(wait).3fs, held '
+                  '%(hold).3fs', {'key': key, 'wait': wait_time,
+                                  'hold': hold_time})
+
+    def get_stats(self):
+        """Returns the number of fetches and of coalesced fetches, and the
+        total time spent waiting for and holding the locks of base images.
+        """
+        return dict(self._stats)
+
+
+_FETCH_MANAGER = FetchManager()
+
+
+def get_fetch_stats():
+    return _FETCH_MANAGER.get_stats()
+
+
+def fetch_base_image(fetch_func, filename, lock_path, target, *args,
+                     **kwargs):
+    """Fetches the base image target with fetch_func, unless it exists.
+
+    The fetch holds the external lock of the base image, and the concurrent
+    fetches of the same base image are coalesced, see FetchManager.
+    """
+    @utils.synchronized(filename, external=True, lock_path=lock_path)
+    def fetch_func_locked(target, requested, *args, **kwargs):
+        acquired = time.time()
+        try:
+            # The image may have been fetched while a subsequent
+            # call was waiting to obtain the lock.
+            if not os.path.exists(target):
+                fetch_func(target=target, *args, **kwargs)
+        finally:
+            _FETCH_MANAGER.record_lock(target, acquired - requested,
+                                       time.time() - acquired)
+
+    if not CONF.libvirt.coalesce_image_fetches:
+        return fetch_func_locked(target, time.time(), *args, **kwargs)
+    # The errors of a fetch, like an image not found or too big for the
+    # flavor, may only apply to the same user and disk size
+    scope = (kwargs.get('user_id'), kwargs.get('project_id'),
+             kwargs.get('max_size'))
+    _FETCH_MANAGER.fetch(target, scope, fetch_func_locked,
+                         target, time.time(), *args, **kwargs)
+
+
 @six.add_metaclass(abc.ABCMeta)
 class Image(object):
 
@@ -231,12 +350,8 @@ class Image(object):
         :filename: Name of the file in the image directory
         :size: Size of created image in bytes (optional)
         """
-        @utils.synchronized(filename, external=True, lock_path=self.lock_path)
-        def fetch_func_sync(target, *args, **kwargs):
-            # The image may have been fetched while a subsequent
-            # call was waiting to obtain the lock.
-            if not os.path.exists(target):
-                fetch_func(target=target, *args, **kwargs)
+        fetch_func_sync = functools.partial(fetch_base_image, fetch_func,
+                                            filename, self.lock_path)
 
         base_dir = os.path.join(CONF.instances_path,
                                 CONF.image_cache_subdirectory_name)
@@ -59,6 +59,12 @@ imagecache_opts = [
                default=3600,
                help='Unused resized base images younger than this will not be '
                     'removed'),
+    cfg.IntOpt('remove_partial_downloads_minimum_age_seconds',
+               default=86400,
+               help='Partially downloaded base images, and the files '
+                    'recording the byte ranges downloaded for them, which '
+                    'have not been written to for this long will be '
+                    'removed'),
     cfg.BoolOpt('checksum_base_images',
                 default=False,
                 help='Write a checksum for files in _base to disk'),
@@ -230,9 +236,35 @@ def read_stored_checksum(target, timestamped=True):
     return read_stored_info(target, field='sha1', timestamped=timestamped)
 
 
-def write_stored_checksum(target):
-    """Write a checksum to disk for a file in _base."""
-    write_stored_info(target, field='sha1', value=_hash_file(target))
+def write_stored_checksum(target, checksum=None):
+    """Write a checksum to disk for a file in _base.
+
+    The file is only read to compute its checksum if checksum isn't set.
+    """
+    if checksum is None:
+        checksum = _hash_file(target)
+    write_stored_info(target, field='sha1', value=checksum)
+
+
+def get_cached_image_ids():
+    """Returns the IDs of the images whose base files are in the image
+    cache, as recorded in their info files when they were fetched.
+    """
+    base_dir = os.path.join(CONF.instances_path,
+                            CONF.image_cache_subdirectory_name)
+    if not os.path.isdir(base_dir):
+        return []
+
+    digest_size = hashlib.sha1().digestsize * 2
+    image_ids = []
+    for ent in os.listdir(base_dir):
+        base_file = os.path.join(base_dir, ent)
+        if len(ent) != digest_size or not os.path.isfile(base_file):
+            continue
+        image_id = read_stored_info(base_file, field='image_id')
+        if image_id:
+            image_ids.append(image_id)
+    return sorted(image_ids)
 
 
 class ImageCacheManager(imagecache.ImageCacheManager):
@@ -256,6 +288,7 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         self.originals = []
         self.removable_base_files = []
         self.unexplained_images = []
+        self.partial_downloads = []
 
     def _store_image(self, base_dir, ent, original=False):
         """Store a base image for later examination."""
@@ -286,6 +319,10 @@ class ImageCacheManager(imagecache.ImageCacheManager):
             if len(ent) == digest_size:
                 self._store_image(base_dir, ent, original=True)
 
+            elif (len(ent) > digest_size and
+                  ent[digest_size:] in ('.part', '.part.ranges')):
+                self.partial_downloads.append(os.path.join(base_dir, ent))
+
             elif (len(ent) > digest_size + 2 and
                   ent[digest_size] == '_' and
                   not is_valid_info_file(os.path.join(base_dir, ent))):
@@ -294,7 +331,8 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                 self._store_swap_image(ent)
 
         return {'unexplained_images': self.unexplained_images,
-                'originals': self.originals}
+                'originals': self.originals,
+                'partial_downloads': self.partial_downloads}
 
     def _list_backing_images(self):
         """List the backing images currently in use."""
@@ -419,8 +457,9 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                           'base_file': base_file})
 
                 # NOTE(mikal): If the checksum file is missing, then we should
-                # create one. We don't create checksums when we download images
-                # from glance because that would delay VM startup.
+                # create one. Checksums of the images downloaded from glance
+                # are written as they are downloaded, so this only happens
+                # for the converted images and older base files.
                 if CONF.libvirt.checksum_base_images and create_if_missing:
                     LOG.info(_LI('%(id)s (%(base_file)s): generating '
                                  'checksum'),
@@ -498,6 +537,17 @@ class ImageCacheManager(imagecache.ImageCacheManager):
 
         self._remove_old_enough_file(base_file, maxage)
 
+    def _remove_partial_downloads(self):
+        """Remove the leftovers of the downloads which were abandoned.
+
+        A download which fails is kept in _base to be resumed when it is
+        retried, but the image may never be requested again.
+        """
+        maxage = CONF.libvirt.remove_partial_downloads_minimum_age_seconds
+        for partial_file in self.partial_downloads:
+            self._remove_old_enough_file(partial_file, maxage,
+                                         remove_sig=False, remove_lock=False)
+
     def _handle_base_image(self, img_id, base_file):
         """Handle the checks for a single base image."""
 
@@ -596,6 +646,11 @@ class ImageCacheManager(imagecache.ImageCacheManager):
 
                 if not image_small and not image_resized:
                     self.originals.append(base_file)
+                    # The base images fetched before their image ID was
+                    # recorded are missing from the cache inventory
+                    if not read_stored_info(base_file, field='image_id'):
+                        write_stored_info(base_file, field='image_id',
+                                          value=img)
 
         # Elements remaining in unexplained_images might be in use
         inuse_backing_images = self._list_backing_images()
@@ -664,3 +719,5 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         # perform the aging and image verification
         self._age_and_verify_cached_images(context, all_instances, base_dir)
         self._age_and_verify_swap_images(context, base_dir)
+        if self.remove_unused_base_images:
+            self._remove_partial_downloads()
@@ -46,6 +46,7 @@ libvirt_opts = [
 CONF = cfg.CONF
 CONF.register_opts(libvirt_opts, 'libvirt')
 CONF.import_opt('instances_path', 'nova.compute.manager')
+CONF.import_opt('image_cache_subdirectory_name', 'nova.virt.imagecache')
 LOG = logging.getLogger(__name__)
 
 
@@ -383,10 +384,25 @@ def get_fs_info(path):
             'used': used}
 
 
-def fetch_image(context, target, image_id, user_id, project_id, max_size=0):
+def fetch_image(context, target, image_id, user_id, project_id, max_size=0,
+                max_rate=None):
     """Grab image."""
-    images.fetch_to_raw(context, image_id, target, user_id, project_id,
-                        max_size=max_size)
+    checksum = images.fetch_to_raw(context, image_id, target, user_id,
+                                   project_id, max_size=max_size,
+                                   max_rate=max_rate)
+    base_dir = os.path.join(CONF.instances_path,
+                            CONF.image_cache_subdirectory_name)
+    if os.path.dirname(target) != base_dir:
+        return
+
+    # Imported here as the image cache imports this module
+    from nova.virt.libvirt import imagecache
+    # The image ID is recorded for the inventory of the image cache, and the
+    # checksum computed while the image was downloaded is stored so that the
+    # image cache doesn't read the base file again to compute it
+    imagecache.write_stored_info(target, field='image_id', value=image_id)
+    if checksum and CONF.libvirt.checksum_base_images:
+        imagecache.write_stored_checksum(target, checksum=checksum)
 
 
 def get_instance_path(instance, forceold=False, relative=False):
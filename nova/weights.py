@@ -18,7 +18,9 @@ Pluggable Weighing support
 """
 
 import abc
+import heapq
 
+from oslo_utils import timeutils
 import six
 
 from nova import loadables
@@ -76,6 +78,15 @@ class BaseWeigher(object):
     minval = None
     maxval = None
 
+    # Set to true in a subclass which implements _weigh_snapshot(), so that
+    # the weight handler weighs all the objects at once from a columnar
+    # snapshot instead of calling _weigh_object() for each of them
+    supports_batch = False
+
+    # The methods weighing the objects one at a time. A subclass overriding
+    # any of them has to override _weigh_snapshot() as well for it to be used
+    _object_methods = ('_weigh_object', 'weigh_objects')
+
     def weight_multiplier(self):
         """How weighted this weigher should be.
 
@@ -117,27 +128,129 @@ class BaseWeigher(object):
 
         return weights
 
+    def _weigh_snapshot(self, snapshot, weight_properties):
+        """Return a list of weights, one per object in the snapshot.
+        Override this in a subclass setting supports_batch.
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def weigh_snapshot_applies(cls):
+        """Return True if _weigh_snapshot() is defined by the class defining
+        the methods weighing the objects one at a time, or by a subclass of
+        it.
+
+        supports_batch is inherited, so a subclass which only overrides how
+        the objects are weighed one at a time isn't weighed by the
+        _weigh_snapshot() of its parent.
+        """
+        snapshot_cls = loadables.get_defining_class(cls, '_weigh_snapshot')
+        return all(issubclass(snapshot_cls,
+                              loadables.get_defining_class(cls, name))
+                   for name in cls._object_methods)
+
+    def weigh_snapshot(self, snapshot, weight_properties):
+        """Weigh all the objects of a columnar snapshot at once.
+
+        This is the batch counterpart of weigh_objects(), it records the min
+        and max values the same way.
+        """
+        weights = self._weigh_snapshot(snapshot, weight_properties)
+        if weights:
+            lowest = min(weights)
+            highest = max(weights)
+            if self.minval is None or lowest < self.minval:
+                self.minval = lowest
+            if self.maxval is None or highest > self.maxval:
+                self.maxval = highest
+        return weights
+
 
 class BaseWeightHandler(loadables.BaseLoader):
     object_class = WeighedObject
 
-    def get_weighed_objects(self, weighers, obj_list, weighing_properties):
-        """Return a sorted (descending), normalized list of WeighedObjects."""
-        weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
+    def get_snapshot(self, objs):
+        """Return a columnar snapshot of objs for the weighers supporting
+        batch weighing, or None if batch weighing isn't supported by this
+        handler.
+        """
+        return None
 
-        if len(weighed_objs) <= 1:
-            return weighed_objs
+    def get_weighed_objects(self, weighers, obj_list, weighing_properties,
+                            max_objects=None, trace=None):
+        """Return a sorted (descending), normalized list of WeighedObjects.
+
+        If max_objects is set, only the max_objects heaviest WeighedObjects
+        are returned. If trace is set, the time spent in each weigher is
+        recorded as a span of the trace.
+        """
+        obj_list = list(obj_list)
 
+        if len(obj_list) <= 1:
+            return [self.object_class(obj, 0.0) for obj in obj_list]
+
+        # WeighedObjects are only needed by the weighers without batch
+        # support, otherwise they are only built for the returned objects.
+        weighed_objs = None
+        snapshot = None
+        totals = [0.0] * len(obj_list)
         for weigher in weighers:
-            weights = weigher.weigh_objects(weighed_objs, weighing_properties)
+            if trace is not None:
+                timer = timeutils.StopWatch().start()
+            batch = (weigher.supports_batch and
+                     weigher.weigh_snapshot_applies())
+            if batch and snapshot is None:
+                snapshot = self.get_snapshot(obj_list)
+            if batch and snapshot is not None:
+                weights = weigher.weigh_snapshot(snapshot,
+                                                 weighing_properties)
+            else:
+                if weighed_objs is None:
+                    weighed_objs = [self.object_class(obj, 0.0)
+                                    for obj in obj_list]
+                weights = weigher.weigh_objects(weighed_objs,
+                                                weighing_properties)
 
             # Normalize the weights
             weights = normalize(weights,
                                 minval=weigher.minval,
                                 maxval=weigher.maxval)
 
-            for i, weight in enumerate(weights):
-                obj = weighed_objs[i]
-                obj.weight += weigher.weight_multiplier() * weight
-
-        return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+            multiplier = weigher.weight_multiplier()
+            totals = [total + multiplier * weight
+                      for total, weight in zip(totals, weights)]
+            if trace is not None:
+                trace.add_span(weigher.__class__.__name__, timer.elapsed())
+
+        indexes = range(len(obj_list))
+        if max_objects is not None and max_objects < len(obj_list):
+            # A partial selection is cheaper than a full sort when only the
+            # first few objects are needed.
+            indexes = heapq.nlargest(max_objects, indexes,
+                                     key=totals.__getitem__)
+        else:
+            indexes = sorted(indexes, key=totals.__getitem__, reverse=True)
+
+        if weighed_objs is None:
+            return [self.object_class(obj_list[i], totals[i])
+                    for i in indexes]
+        for weighed_obj, total in zip(weighed_objs, totals):
+            weighed_obj.weight = total
+        return [weighed_objs[i] for i in indexes]
+
+    def get_weighed_object(self, weighers, obj, weighing_properties):
+        """Return a single WeighedObject.
+
+        Unlike get_weighed_objects(), the weights are normalized against the
+        minimum and maximum values recorded by the weighers when weighing
+        whole lists of objects, so that the weight is comparable to the
+        weights of those objects.
+        """
+        weighed_obj = self.object_class(obj, 0.0)
+        for weigher in weighers:
+            weights = weigher.weigh_objects([weighed_obj], weighing_properties)
+            weight = list(normalize(weights,
+                                    minval=weigher.minval,
+                                    maxval=weigher.maxval))[0]
+            weighed_obj.weight += weigher.weight_multiplier() * weight
+        return weighed_obj
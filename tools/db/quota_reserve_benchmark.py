@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Benchmark of the quota reservation strategies under contention.
+
+N concurrent reservers, each acting as a different user of the same project,
+repeatedly reserve an instance worth of quota then roll the reservation
+back, as the API does for a burst of boot requests. This is run once per
+quota_reserve_strategy, and the throughput, the latencies and the number of
+conflicts are reported for each of them.
+
+The database is specified by providing a SQLAlchemy connection URL to an
+empty database, whose schema is created by the benchmark. SQLite serializes
+all the writes, so a MySQL or PostgreSQL database should be used to get
+meaningful numbers.
+
+Run like:
+
+    ./tools/db/quota_reserve_benchmark.py \
+        --connection mysql+pymysql://root@localhost/quota_bench \
+        --reservers 50 --reservations 20
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+
+import eventlet
+from oslo_config import cfg
+from oslo_db import exception as db_exc
+
+from nova import context
+from nova import db
+from nova.db import migration
+from nova.db.sqlalchemy import api as sqlalchemy_api
+from nova import exception
+from nova import quota
+
+CONF = cfg.CONF
+
+
+class Counters(object):
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.conflicts = 0
+        self.deadlocks = 0
+        self.locked = 0
+
+
+def _count_calls(counters):
+    """Wraps the DB API to count the conflicts, the deadlocks and the
+    reservations made while locking the usages.
+    """
+    reserve_optimistic = sqlalchemy_api._quota_reserve_optimistic
+    reserve = sqlalchemy_api.quota_reserve
+    get_usages = sqlalchemy_api._get_project_user_quota_usages
+
+    def counted_reserve_optimistic(*args, **kwargs):
+        try:
+            return reserve_optimistic(*args, **kwargs)
+        except sqlalchemy_api._QuotaUsageConflict:
+            counters.conflicts += 1
+            raise
+        except db_exc.DBDeadlock:
+            counters.deadlocks += 1
+            raise
+
+    def counted_reserve(*args, **kwargs):
+        counters.locked += 1
+        return reserve(*args, **kwargs)
+
+    def counted_get_usages(*args, **kwargs):
+        try:
+            return get_usages(*args, **kwargs)
+        except db_exc.DBDeadlock:
+            counters.deadlocks += 1
+            raise
+
+    sqlalchemy_api._quota_reserve_optimistic = counted_reserve_optimistic
+    sqlalchemy_api.quota_reserve = counted_reserve
+    sqlalchemy_api._get_project_user_quota_usages = counted_get_usages
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100.0 * len(values))))
+    return values[index]
+
+
+def run(strategy, project_id, reservers, reservations, counters):
+    CONF.set_override('quota_reserve_strategy', strategy)
+    latencies = []
+    over_quota = [0]
+
+    def reserver(index):
+        ctxt = context.RequestContext('user%d' % index, project_id)
+        for _ in range(reservations):
+            start = time.time()
+            try:
+                uuids = quota.QUOTAS.reserve(ctxt, instances=1, cores=1,
+                                             ram=512)
+            except exception.OverQuota:
+                over_quota[0] += 1
+                continue
+            finally:
+                latencies.append(time.time() - start)
+            quota.QUOTAS.rollback(ctxt, uuids)
+
+    # Create the usages beforehand, their creation always takes the
+    # locking path
+    for index in range(reservers):
+        ctxt = context.RequestContext('user%d' % index, project_id)
+        quota.QUOTAS.rollback(ctxt, quota.QUOTAS.reserve(
+            ctxt, instances=1, cores=1, ram=512))
+    counters.reset()
+
+    pool = eventlet.GreenPool(reservers)
+    start = time.time()
+    for index in range(reservers):
+        pool.spawn_n(reserver, index)
+    pool.waitall()
+    elapsed = time.time() - start
+
+    print('%s strategy:' % strategy)
+    print('  %d reservations in %.2fs, %.1f reservations/s' % (
+          len(latencies), elapsed, len(latencies) / elapsed))
+    print('  latency p50 %.1fms, p95 %.1fms, p99 %.1fms' % (
+          _percentile(latencies, 50) * 1000,
+          _percentile(latencies, 95) * 1000,
+          _percentile(latencies, 99) * 1000))
+    print('  over quota %d, conflicts %d, deadlocks %d, locked '
+          'reservations %d' % (over_quota[0], counters.conflicts,
+                               counters.deadlocks, counters.locked))
+
+
+def main():
+    eventlet.monkey_patch()
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--connection', default='sqlite:///quota_bench.db',
+                        help='SQLAlchemy URL of an empty database')
+    parser.add_argument('--reservers', type=int, default=20,
+                        help='Number of concurrent reservers')
+    parser.add_argument('--reservations', type=int, default=10,
+                        help='Number of reservations made by each reserver')
+    parser.add_argument('--strategies', nargs='+',
+                        default=['locking', 'optimistic'],
+                        choices=['locking', 'optimistic'],
+                        help='Reservation strategies to compare')
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    CONF.set_override('connection', args.connection, group='database')
+    migration.db_sync()
+    counters = Counters()
+    _count_calls(counters)
+
+    # The quotas are large enough for all the reservations of a run to be
+    # held at once, only the contention is measured
+    admin = context.get_admin_context()
+    for strategy in args.strategies:
+        project_id = 'bench-%s' % strategy
+        for resource, limit in (('instances', args.reservers),
+                                ('cores', args.reservers),
+                                ('ram', args.reservers * 512)):
+            db.quota_create(admin, project_id, resource, limit)
+        run(strategy, project_id, args.reservers, args.reservations,
+            counters)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Benchmark of the compute node writes made by the resource tracker.
+
+A single compute host is simulated over a number of hours on a simulated
+clock: the resource audit runs every audit interval, while instances are
+booted in bursts, become active, and are deleted after a random lifetime,
+each of those steps updating the resource tracker as the compute manager
+does. This is run once with the full compute node updates, once with the
+delta updates, and once with the delta updates coalesced over the update
+window, and the number of compute node writes, of columns written and of
+bytes written per hour is reported for each of them.
+
+The instances and the compute node are stored in the database specified by
+a SQLAlchemy connection URL to an empty database, whose schema is created by
+the benchmark. Only the writes of the compute node record are counted.
+
+Run like:
+
+    ./tools/db/resource_tracker_benchmark.py --hours 4 --boots-per-hour 120
+"""
+
+from __future__ import print_function
+
+import argparse
+import heapq
+import itertools
+import random
+import uuid
+
+from oslo_config import cfg
+from oslo_serialization import jsonutils
+
+from nova.compute import resource_tracker
+from nova.compute import vm_states
+from nova import context
+from nova import db
+from nova.db import migration
+from nova import objects
+from nova.virt import fake
+
+CONF = cfg.CONF
+
+MODES = {
+    'full': {'compute_resource_delta_updates': False,
+             'compute_resource_update_window': 0.0},
+    'delta': {'compute_resource_delta_updates': True,
+              'compute_resource_update_window': 0.0},
+    'coalesced': {'compute_resource_delta_updates': True,
+                  'compute_resource_update_window': None},
+}
+
+
+class SimulatedClock(object):
+    """Replaces the time and greenthread modules used by the resource
+    tracker, so that the coalesced updates are written on the simulated
+    time.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self._timers = []
+        self._count = 0
+
+    def time(self):
+        return self.now
+
+    def spawn_after(self, delay, func, *args, **kwargs):
+        self._count += 1
+        heapq.heappush(self._timers,
+                       (self.now + delay, self._count, func, args, kwargs))
+
+    def advance(self, until):
+        while self._timers and self._timers[0][0] <= until:
+            when, _, func, args, kwargs = heapq.heappop(self._timers)
+            self.now = when
+            func(*args, **kwargs)
+        self.now = until
+
+
+class Counters(object):
+    def __init__(self):
+        self.writes = 0
+        self.columns = 0
+        self.bytes = 0
+
+
+def _count_writes(counters):
+    compute_node_update = db.compute_node_update
+
+    def counted_compute_node_update(context, compute_id, values):
+        counters.writes += 1
+        counters.columns += len(values)
+        counters.bytes += len(jsonutils.dumps(values, default=str))
+        return compute_node_update(context, compute_id, values)
+
+    db.compute_node_update = counted_compute_node_update
+
+
+def _create_instance(ctxt):
+    flavor = objects.Flavor(id=1, flavorid='1', name='m1.small',
+                            memory_mb=512, vcpus=1, root_gb=1,
+                            ephemeral_gb=0, swap=0, rxtx_factor=1.0,
+                            vcpu_weight=None, disabled=False, is_public=True,
+                            extra_specs={})
+    instance = objects.Instance(ctxt, uuid=str(uuid.uuid4()),
+                                project_id='bench', user_id='bench',
+                                memory_mb=512, vcpus=1, root_gb=1,
+                                ephemeral_gb=0, instance_type_id=1,
+                                os_type='linux', vm_state=vm_states.BUILDING,
+                                task_state=None, flavor=flavor,
+                                old_flavor=None, new_flavor=None,
+                                numa_topology=None)
+    instance.create()
+    return instance
+
+
+def run(mode, args, counters):
+    for name, value in MODES[mode].items():
+        if value is None:
+            value = args.update_window
+        CONF.set_override(name, value)
+
+    host = nodename = 'bench-%s' % mode
+    fake.set_nodes([nodename])
+    ctxt = context.get_admin_context()
+    clock = SimulatedClock()
+    resource_tracker.time = clock
+    resource_tracker.greenthread = clock
+    tracker = resource_tracker.ResourceTracker(
+        host, fake.FakeDriver(None), nodename)
+    # The compute node is only saved, the schedulers are not notified
+    tracker.scheduler_client.update_resource_stats = (
+        lambda compute_node: compute_node.save())
+    random.seed(args.seed)
+
+    duration = args.hours * 3600
+    events = []
+    sequence = itertools.count()
+
+    def schedule(when, action, *action_args):
+        if when < duration:
+            heapq.heappush(events,
+                           (when, next(sequence), action, action_args))
+
+    def audit():
+        tracker.update_available_resource(ctxt)
+
+    def boot(delay):
+        instance = _create_instance(ctxt)
+        with tracker.instance_claim(ctxt, instance):
+            pass
+        schedule(clock.now + delay, activate, instance)
+        schedule(clock.now + random.expovariate(1.0 / args.lifetime),
+                 delete, instance)
+
+    def activate(instance):
+        if instance.vm_state != vm_states.BUILDING:
+            return
+        instance.vm_state = vm_states.ACTIVE
+        instance.save()
+        tracker.update_usage(ctxt, instance)
+
+    def delete(instance):
+        instance.vm_state = vm_states.DELETED
+        instance.save()
+        tracker.update_usage(ctxt, instance)
+        instance.destroy()
+
+    audit_time = 0
+    while audit_time < duration:
+        schedule(audit_time, audit)
+        audit_time += args.audit_interval
+    burst_time = random.expovariate(args.boots_per_hour / 3600.0 /
+                                    args.burst_size)
+    while burst_time < duration:
+        for index in range(args.burst_size):
+            schedule(burst_time + index * 0.2, boot, args.boot_time)
+        burst_time += random.expovariate(args.boots_per_hour / 3600.0 /
+                                         args.burst_size)
+
+    start = (counters.writes, counters.columns, counters.bytes)
+    while events:
+        when, _, action, action_args = heapq.heappop(events)
+        clock.advance(when)
+        action(*action_args)
+    clock.advance(duration + 3600)
+
+    writes, columns, written = (counters.writes - start[0],
+                                counters.columns - start[1],
+                                counters.bytes - start[2])
+    print('%s updates:' % mode)
+    print('  %.1f writes/hour, %.1f columns/hour, %.1f KiB/hour' % (
+          writes / float(args.hours), columns / float(args.hours),
+          written / 1024.0 / args.hours))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--connection', default='sqlite://',
+                        help='SQLAlchemy URL of an empty database')
+    parser.add_argument('--hours', type=float, default=1,
+                        help='Simulated duration')
+    parser.add_argument('--audit-interval', type=float, default=60,
+                        help='Seconds between two resource audits')
+    parser.add_argument('--boots-per-hour', type=float, default=60,
+                        help='Average number of instances booted per hour')
+    parser.add_argument('--burst-size', type=int, default=5,
+                        help='Number of instances booted together')
+    parser.add_argument('--boot-time', type=float, default=30,
+                        help='Seconds for an instance to become active')
+    parser.add_argument('--lifetime', type=float, default=1800,
+                        help='Average lifetime of an instance in seconds')
+    parser.add_argument('--update-window', type=float, default=2,
+                        help='compute_resource_update_window of the '
+                             'coalesced updates')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the simulated workload')
+    parser.add_argument('--modes', nargs='+', default=sorted(MODES),
+                        choices=sorted(MODES), help='Update modes to compare')
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    CONF.set_override('connection', args.connection, group='database')
+    objects.register_all()
+    migration.db_sync()
+    counters = Counters()
+    _count_writes(counters)
+
+    for mode in args.modes:
+        run(mode, args, counters)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Benchmark of the image downloads from glance in parallel byte ranges.
+
+A local HTTP server stands in for the glance API: it serves the metadata and
+the data of a single image of the given size, supports byte ranges, limits
+the rate of each connection, and can drop a connection once after sending a
+given amount of data. The image is downloaded through the
+GlanceImageService with each of the given numbers of connections, and the
+download is retried as the compute manager would if it fails, and the
+throughput and the amount of data sent by the server are reported for each
+of them.
+
+Run like:
+
+    ./tools/image_download_benchmark.py --size 2048 --stream-rate 50 \
+        --connections 1 4 8 --drop-after 1500
+"""
+
+from __future__ import print_function
+
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+import eventlet
+from oslo_config import cfg
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+from nova import context
+from nova.image import glance
+from nova import utils
+
+CONF = cfg.CONF
+
+IMAGE_ID = '70a599e0-31e7-49b7-b260-868f441e862b'
+CHUNK_SIZE = 65536
+
+
+class Counters(object):
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+        self.drops = 0
+
+
+class ImageServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, args, image_path, checksum):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0),
+                                           ImageRequestHandler)
+        self.args = args
+        self.image_path = image_path
+        self.size = os.path.getsize(image_path)
+        self.checksum = checksum
+        self.counters = Counters()
+        self.drop_after = None
+
+
+class ImageRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_meta_headers(self):
+        server = self.server
+        self.send_header('x-image-meta-id', IMAGE_ID)
+        self.send_header('x-image-meta-name', 'benchmark')
+        self.send_header('x-image-meta-size', str(server.size))
+        self.send_header('x-image-meta-checksum', server.checksum)
+        self.send_header('x-image-meta-status', 'active')
+        self.send_header('x-image-meta-disk_format', 'raw')
+        self.send_header('x-image-meta-container_format', 'bare')
+        self.send_header('x-image-meta-is_public', 'True')
+        self.send_header('x-image-meta-deleted', 'False')
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self._send_meta_headers()
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        server = self.server
+        server.counters.requests += 1
+        start, end = 0, server.size
+        byte_range = self.headers.get('Range')
+        if byte_range and not server.args.no_ranges:
+            first, last = byte_range[len('bytes='):].split('-')
+            start, end = int(first), min(int(last) + 1, server.size)
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' %
+                             (start, end - 1, server.size))
+        else:
+            self.send_response(200)
+            self._send_meta_headers()
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start))
+        self.end_headers()
+
+        rate = server.args.stream_rate * 1024 * 1024
+        began = time.time()
+        sent = 0
+        with open(server.image_path, 'rb') as f:
+            f.seek(start)
+            while start + sent < end:
+                chunk = f.read(min(CHUNK_SIZE, end - start - sent))
+                if server.drop_after is not None:
+                    if server.drop_after <= len(chunk):
+                        server.drop_after = None
+                        server.counters.drops += 1
+                        self.close_connection = True
+                        return
+                    server.drop_after -= len(chunk)
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                server.counters.bytes += len(chunk)
+                delay = began + sent / rate - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+
+
+def _create_image(path, size):
+    checksum = hashlib.md5()
+    with open(path, 'wb') as f:
+        for _ in range(size):
+            data = os.urandom(1024 * 1024)
+            checksum.update(data)
+            f.write(data)
+    return checksum.hexdigest()
+
+
+def run(connections, args, server, workdir):
+    CONF.set_override('download_connections', connections, group='glance')
+    server.counters = Counters()
+    if args.drop_after is not None:
+        server.drop_after = args.drop_after * 1024 * 1024
+    dst_path = os.path.join(workdir, 'download-%d' % connections)
+
+    service = glance.GlanceImageService()
+    ctxt = context.get_admin_context()
+    began = time.time()
+    for attempt in range(1, args.attempts + 1):
+        try:
+            service.download(ctxt, IMAGE_ID, dst_path=dst_path,
+                             verify_checksum=True)
+            break
+        except Exception as e:
+            print('  attempt %d failed: %s' % (attempt, e))
+    else:
+        print('%d connection(s): download failed' % connections)
+        return
+    elapsed = time.time() - began
+
+    size = server.size / 1024.0 / 1024
+    print('%d connection(s):' % connections)
+    print('  %.1f MiB/s, %d attempt(s), %d request(s), %d drop(s), '
+          '%.1f MiB sent for %.1f MiB' % (
+              size / elapsed, attempt, server.counters.requests,
+              server.counters.drops,
+              server.counters.bytes / 1024.0 / 1024, size))
+    os.unlink(dst_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--size', type=int, default=1024,
+                        help='Size of the image in MiB')
+    parser.add_argument('--stream-rate', type=float, default=100,
+                        help='Rate of each connection in MiB/s')
+    parser.add_argument('--range-size', type=int, default=64,
+                        help='download_range_size in MiB')
+    parser.add_argument('--drop-after', type=int,
+                        help='Drop a connection once after sending this '
+                             'many MiB')
+    parser.add_argument('--attempts', type=int, default=3,
+                        help='Number of attempts to download the image')
+    parser.add_argument('--no-ranges', action='store_true',
+                        help='Make the server ignore the byte ranges')
+    parser.add_argument('--connections', type=int, nargs='+',
+                        default=[1, 4, 8],
+                        help='download_connections to compare')
+    args = parser.parse_args()
+
+    eventlet.monkey_patch()
+    CONF([], project='nova')
+    CONF.set_override('auth_strategy', 'noauth2')
+    CONF.set_override('download_range_size', args.range_size,
+                      group='glance')
+
+    workdir = tempfile.mkdtemp()
+    try:
+        image_path = os.path.join(workdir, 'image')
+        checksum = _create_image(image_path, args.size)
+        server = ImageServer(args, image_path, checksum)
+        utils.spawn_n(server.serve_forever)
+        CONF.set_override('api_servers',
+                          ['127.0.0.1:%d' % server.server_address[1]],
+                          group='glance')
+
+        for connections in args.connections:
+            run(connections, args, server, workdir)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()